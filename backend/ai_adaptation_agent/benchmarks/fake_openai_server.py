@@ -0,0 +1,414 @@
+# Local stand-in for the OpenAI chat completions API, for offline load tests and benchmarks
+
+import re
+import json
+import math
+import time
+import uuid
+import random
+import zlib
+import argparse
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+PERSONAS = [
+    {
+        "name": "Busy Homeowner Hannah",
+        "demographics": {"age": "35-50", "location": "Suburban", "role": "Parent, full-time professional"},
+        "psychographics": ["Values reliability", "Time-poor", "Reads online reviews"],
+        "pain_points": ["Finding trustworthy providers quickly", "Unclear pricing"],
+        "goals": ["Get problems fixed right the first time", "Predictable costs"],
+        "preferred_channels": ["Google Search", "Facebook groups", "Nextdoor"],
+    },
+    {
+        "name": "Small Business Owner Sam",
+        "demographics": {"age": "28-45", "location": "Urban", "role": "Founder"},
+        "psychographics": ["Growth-focused", "Price-conscious", "Early adopter"],
+        "pain_points": ["Limited marketing budget", "No time to run campaigns"],
+        "goals": ["Grow revenue steadily", "Build a recognisable local brand"],
+        "preferred_channels": ["LinkedIn", "Industry newsletters", "Instagram"],
+    },
+]
+
+STRATEGIES = [
+    {
+        "name": "Increase Local Brand Awareness",
+        "description": "Make the business the first name local customers think of.",
+        "tactics": ["Optimise Google Business Profile", "Run geo-targeted social ads"],
+        "channels": ["Google Business Profile", "Facebook"],
+        "kpis": ["Profile views", "Ad reach"],
+    },
+    {
+        "name": "Generate Qualified Leads",
+        "description": "Turn search and social traffic into enquiries.",
+        "tactics": ["Publish service landing pages", "Offer a free consultation"],
+        "channels": ["Company Website", "Google Ads"],
+        "kpis": ["Lead conversion rate", "Cost per lead"],
+    },
+    {
+        "name": "Enhance Customer Retention",
+        "description": "Keep existing customers coming back and referring others.",
+        "tactics": ["Monthly email newsletter", "Referral reward programme"],
+        "channels": ["Email", "Company Website"],
+        "kpis": ["Repeat purchase rate", "Referral count"],
+    },
+]
+
+CONTENT_PILLARS = [
+    "Solving everyday customer problems with expert help",
+    "Behind the scenes: craftsmanship and quality",
+    "Customer success stories",
+    "Seasonal tips and preventative advice",
+]
+
+ACTION_PLAN = {
+    "30-day": ["Set up analytics and conversion tracking", "Optimise Google Business Profile"],
+    "60-day": ["Launch first geo-targeted ad campaign", "Publish two service landing pages"],
+    "90-day": ["Review campaign performance and reallocate budget", "Start the referral programme"],
+}
+
+LOREM_SENTENCES = [
+    "The business has a clear opportunity to stand out through reliability and responsiveness.",
+    "Customers in this market compare providers online before they call, so visibility matters.",
+    "A consistent, helpful voice builds the trust needed to win repeat work.",
+    "Focus early effort on channels with measurable intent, then expand into brand building.",
+    "Competitors rarely publish transparent pricing, which is an advantage worth using.",
+    "Every stage of the funnel should point to a single, low-friction next step.",
+]
+
+
+@dataclass
+class FakeServerConfig:
+    """
+    Behaviour of the fake server.
+    latency_distribution: "fixed", "uniform" (median ± jitter fraction) or "lognormal" (sigma = latency_jitter).
+    error_rate / rate_limit_rate: Probability that a request fails with a 500 / 429.
+    """
+    latency_ms: float = 200.0
+    latency_jitter: float = 0.3
+    latency_distribution: str = "lognormal"
+    ms_per_output_token: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_ms: int = 50
+    seed: int = 42
+
+
+@dataclass
+class FakeServerStats:
+    requests: int = 0
+    completions: int = 0
+    streamed: int = 0
+    injected_errors: int = 0
+    injected_rate_limits: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    by_kind: Dict[str, int] = field(default_factory=dict)
+
+
+def _stable_fraction(*parts: str) -> float:
+    """Deterministic pseudo-random number in [0, 1) derived from the given strings."""
+    return (zlib.crc32("|".join(parts).encode("utf-8")) % 10000) / 10000.0
+
+
+def _extract_line(prompt: str, label: str) -> str:
+    match = re.search(rf"{re.escape(label)}\s*(.*)", prompt)
+    return match.group(1).strip() if match else ""
+
+
+def canned_response(prompt: str, json_mode: bool = False) -> Tuple[str, str]:
+    """
+    Picks a deterministic reply shaped like the one the prompt asks for.
+    Returns:
+        (kind, content) where kind names the matched prompt family (e.g. "personas", "semantic_batch").
+    """
+    lowered = prompt.lower()
+
+    def as_json(kind: str, value: Any, wrap_key: Optional[str] = None) -> Tuple[str, str]:
+        if json_mode and isinstance(value, list) and wrap_key:
+            value = {wrap_key: value}  # JSON mode only allows a top-level object
+        return kind, json.dumps(value)
+
+    # The strategy prompt also mentions "Target Audience Personas", so it is matched first
+    if "strategic marketing plan" in lowered and "marketing strategy objects" in lowered:
+        return as_json("strategy", STRATEGIES, "strategies")
+    if "audience personas" in lowered:
+        return as_json("personas", PERSONAS, "personas")
+    if "marketing channels identified" in lowered:
+        channels = {c for s in STRATEGIES for c in s["channels"]}
+        return as_json("channels", {c: f"Use {c} to reach customers with intent-driven messages." for c in sorted(channels)})
+    if "content pillars" in lowered:
+        return as_json("content_pillars", CONTENT_PILLARS, "content_pillars")
+    if "key performance indicators" in lowered:
+        kpis = {k for s in STRATEGIES for k in s["kpis"]}
+        return as_json("kpis", {k: "Google Analytics and CRM reporting" for k in sorted(kpis)})
+    if "30, 60, and 90 days" in lowered:
+        return as_json("action_plan", ACTION_PLAN)
+    if "understand their intent" in lowered:
+        query = _extract_line(prompt, "Customer Query:")
+        words = [w for w in re.findall(r"[a-zA-Z]{3,}", query.lower()) if w not in {"need", "the", "and", "for", "with", "near"}]
+        location = re.search(r"\bin ([A-Z][a-zA-Z]+)", query)
+        return as_json("intent", {
+            "intent": "find_service",
+            "service_keywords": words[:5],
+            "location_extracted": location.group(1) if location else None,
+            "other_details": "",
+        })
+    if "each numbered business offering" in lowered:
+        query = _extract_line(prompt, "Customer Query:")
+        results = []
+        for index, line in re.findall(r"^\s*\[(\d+)\]\s*(.*)$", prompt, flags=re.MULTILINE):
+            score = round(_stable_fraction(query, line), 2)
+            results.append({"index": int(index), "semantic_score": score, "semantic_justification": f"Deterministic score {score}."})
+        return as_json("semantic_batch", {"results": results})
+    if "semantic similarity between the customer query and the business offering" in lowered:
+        query = _extract_line(prompt, "Customer Query:")
+        business = _extract_line(prompt, "Business Name:")
+        score = round(_stable_fraction(query, business), 2)
+        return as_json("semantic", {"semantic_score": score, "semantic_justification": f"Deterministic score {score}."})
+    if "sentiment of each numbered text" in lowered:
+        results = []
+        for index, line in re.findall(r"^\s*\[(\d+)\]\s*(.*)$", prompt, flags=re.MULTILINE):
+            positive = round(_stable_fraction("sentiment", line), 2)
+            results.append({"index": int(index), "positive": positive, "neutral": round((1 - positive) / 2, 2), "negative": round((1 - positive) / 2, 2)})
+        return as_json("sentiment_batch", {"results": results})
+    if "sentiment" in lowered:
+        return as_json("sentiment", {"sentiment": "neutral", "confidence": 0.6})
+    if json_mode or "json" in lowered:
+        return as_json("json", {"result": "ok"})
+
+    offset = zlib.crc32(prompt.encode("utf-8")) % len(LOREM_SENTENCES)
+    text = " ".join(LOREM_SENTENCES[(offset + i) % len(LOREM_SENTENCES)] for i in range(4))
+    return "text", text
+
+
+class FakeOpenAIServer:
+    """
+    Serves POST /v1/chat/completions (plain and stream=True) on a background thread,
+    plus GET /stats with request counters. Use base_url as the OpenAI client's base_url.
+    """
+
+    def __init__(self, config: Optional[FakeServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeServerConfig()
+        self.stats = FakeServerStats()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def sample_latency(self, completion_tokens: int) -> float:
+        """Seconds to wait before answering, drawn from the configured distribution."""
+        config = self.config
+        with self._lock:
+            if config.latency_distribution == "fixed":
+                latency_ms = config.latency_ms
+            elif config.latency_distribution == "uniform":
+                spread = config.latency_ms * config.latency_jitter
+                latency_ms = self._rng.uniform(config.latency_ms - spread, config.latency_ms + spread)
+            else:
+                latency_ms = config.latency_ms * math.exp(self._rng.gauss(0.0, config.latency_jitter))
+        return max(0.0, latency_ms + completion_tokens * config.ms_per_output_token) / 1000.0
+
+    def _draw_failure(self) -> Optional[str]:
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.config.rate_limit_rate:
+            return "rate_limit"
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            return "error"
+        return None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass  # keep benchmark output clean
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                if self.path.rstrip("/") in ("/stats", "/v1/stats"):
+                    with server._lock:
+                        self._send_json(200, dict(server.stats.__dict__, by_kind=dict(server.stats.by_kind)))
+                else:
+                    self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+            def do_POST(self) -> None:
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+                    return
+                with server._lock:
+                    server.stats.requests += 1
+                    server.stats.in_flight += 1
+                    server.stats.max_in_flight = max(server.stats.max_in_flight, server.stats.in_flight)
+                try:
+                    self._handle_completion(request)
+                finally:
+                    with server._lock:
+                        server.stats.in_flight -= 1
+
+            def _handle_completion(self, request: Dict[str, Any]) -> None:
+                failure = server._draw_failure()
+                if failure == "rate_limit":
+                    with server._lock:
+                        server.stats.injected_rate_limits += 1
+                    self._send_json(429, {"error": {"message": "Rate limit reached (injected).", "type": "requests", "code": "rate_limit_exceeded"}},
+                                    headers={"retry-after-ms": str(server.config.retry_after_ms),
+                                             "x-ratelimit-remaining-requests": "0",
+                                             "x-ratelimit-reset-requests": f"{server.config.retry_after_ms}ms"})
+                    return
+                if failure == "error":
+                    time.sleep(server.sample_latency(0) / 2)
+                    with server._lock:
+                        server.stats.injected_errors += 1
+                    self._send_json(500, {"error": {"message": "Internal server error (injected).", "type": "server_error"}})
+                    return
+
+                messages = request.get("messages") or []
+                prompt = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+                json_mode = (request.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+                kind, content = canned_response(prompt, json_mode=json_mode)
+                max_tokens = request.get("max_tokens") or request.get("max_completion_tokens")
+                finish_reason = "stop"
+                if max_tokens and len(content) // 4 > max_tokens and kind == "text":
+                    content, finish_reason = content[:max_tokens * 4], "length"
+                prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+                completion_tokens = max(1, len(content) // 4)
+                with server._lock:
+                    server.stats.by_kind[kind] = server.stats.by_kind.get(kind, 0) + 1
+
+                model = request.get("model", "gpt-3.5-turbo")
+                completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+                created = int(time.time())
+                rate_headers = {"x-ratelimit-remaining-requests": "100000", "x-ratelimit-remaining-tokens": "100000000"}
+                latency = server.sample_latency(completion_tokens)
+
+                if request.get("stream"):
+                    usage = None
+                    if (request.get("stream_options") or {}).get("include_usage"):
+                        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                 "total_tokens": prompt_tokens + completion_tokens}
+                    self._stream(completion_id, created, model, content, finish_reason, latency, rate_headers, usage)
+                    with server._lock:
+                        server.stats.streamed += 1
+                        server.stats.completions += 1
+                    return
+
+                time.sleep(latency)
+                with server._lock:
+                    server.stats.completions += 1
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason, "logprobs": None}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+                }, headers=rate_headers)
+
+            def _stream(self, completion_id: str, created: int, model: str, content: str, finish_reason: str,
+                        latency: float, headers: Dict[str, str], usage: Optional[Dict[str, int]] = None) -> None:
+                pieces: List[str] = [content[i:i + 16] for i in range(0, len(content), 16)] or [""]
+                # Half the latency before the first token, the rest spread across the chunks
+                time.sleep(latency / 2)
+                per_chunk = (latency / 2) / len(pieces)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+
+                def send_chunk(delta: Dict[str, Any], reason: Optional[str]) -> None:
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [{"index": 0, "delta": delta, "finish_reason": reason, "logprobs": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                send_chunk({"role": "assistant", "content": ""}, None)
+                for piece in pieces:
+                    time.sleep(per_chunk)
+                    send_chunk({"content": piece}, None)
+                send_chunk({}, finish_reason)
+                if usage is not None:  # stream_options.include_usage: a final chunk with no choices carries the usage
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [], "usage": usage}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.3)
+    parser.add_argument("--latency-distribution", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    parser.add_argument("--ms-per-output-token", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    config = FakeServerConfig(
+        latency_ms=args.latency_ms, latency_jitter=args.latency_jitter, latency_distribution=args.latency_distribution,
+        ms_per_output_token=args.ms_per_output_token, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, seed=args.seed,
+    )
+    server = FakeOpenAIServer(config, host=args.host, port=args.port)
+    print(f"Fake OpenAI server listening on {server.base_url} (set OPENAI_BASE_URL to use it)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
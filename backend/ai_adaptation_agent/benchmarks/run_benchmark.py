@@ -0,0 +1,295 @@
+# Load benchmark for the LLM-heavy paths, driven against the fake OpenAI server
+#
+# Examples:
+#   python benchmarks/run_benchmark.py --scenario matcher --requests 200 --concurrency 16
+#   python benchmarks/run_benchmark.py --scenario blueprint --requests 20 --concurrency 4 --latency-ms 400
+#   python benchmarks/run_benchmark.py --scenario llm --rate-limit-rate 0.05 --json
+#   python benchmarks/run_benchmark.py --scenario sentiment --texts-per-request 200 --no-llm
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+# Add the project root to the Python path so both src/ and benchmarks/ are importable
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openai import OpenAI
+
+from benchmarks.fake_openai_server import FakeOpenAIServer, FakeServerConfig
+from src.shared.data_models import BusinessIntakeData, CustomerQuery
+from src.shared.llm_metrics import LLMMetrics
+from src.shared.llm_service import LLMService
+from src.shared.rate_limiter import AdaptiveRateLimiter
+from src.shared.single_flight import SingleFlight
+from src.blueprint_generator.blueprint_service import BlueprintService
+from src.customer_matcher.customer_matcher_service import CustomerMatcherService
+from src.customer_matcher.deadline import Deadline
+from src.customer_matcher.result_cache import MatchResultCache
+
+NO_DB_CONFIG = {"host": "", "port": "5432", "user": "", "password": "", "dbname": ""}
+
+SERVICE_CATALOGUE = [
+    ("Plumbing", "Home Services", ["plumbing", "emergency", "leak repair", "drain cleaning"]),
+    ("Garden Design", "Landscaping Services", ["garden design", "landscaping", "lawn care"]),
+    ("Insurance", "Financial Services", ["insurance", "home insurance", "financial planning"]),
+    ("Electrical", "Home Services", ["electrician", "rewiring", "lighting", "emergency"]),
+    ("Bakery", "Food & Beverage", ["bakery", "cakes", "catering", "bread"]),
+    ("Web Design", "Marketing Services", ["web design", "seo", "branding"]),
+    ("Dental Care", "Healthcare", ["dentist", "teeth whitening", "orthodontics"]),
+    ("Auto Repair", "Automotive", ["car repair", "mot", "tyres", "servicing"]),
+]
+CITIES = ["TestCity", "TestSuburb", "Springfield", "Riverton"]
+QUERIES = [
+    "I need an emergency plumber for a burst pipe in {city}",
+    "looking for garden design and lawn care near {city}",
+    "affordable home insurance advice in {city}",
+    "electrician to rewire an old house in {city}",
+    "custom birthday cake and catering in {city}",
+    "new website and seo for my small business in {city}",
+]
+REVIEWS = [
+    "Excellent service, the plumber was fast and really friendly.",
+    "Delivery was late and the support team was not helpful at all.",
+    "The cake was okay, nothing special.",
+    "Absolutely love the new garden design, highly recommended!",
+    "Terrible experience, rude staff and an overpriced quote.",
+    "We booked an electrician for Tuesday.",
+]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def make_business_profiles(count: int) -> List[BusinessIntakeData]:
+    profiles = []
+    for i in range(count):
+        name, industry, tags = SERVICE_CATALOGUE[i % len(SERVICE_CATALOGUE)]
+        city = CITIES[i % len(CITIES)]
+        profiles.append(BusinessIntakeData(
+            business_name=f"{city} {name} #{i}",
+            industry=industry,
+            business_stage="Established",
+            goals=["Grow local customer base"],
+            target_audience_description=f"Residents and businesses in {city}.",
+            products_services_description=f"{name} services: {', '.join(tags)}.",
+            raw_responses={"business_id": f"bench_biz_{i:04d}", "location": city, "service_tags": tags},
+        ))
+    return profiles
+
+
+def make_intake(index: int) -> BusinessIntakeData:
+    name, industry, tags = SERVICE_CATALOGUE[index % len(SERVICE_CATALOGUE)]
+    return BusinessIntakeData(
+        business_name=f"Benchmark {name} Co {index}",
+        industry=industry,
+        business_stage="Startup",
+        goals=["Build brand awareness", "Generate qualified leads"],
+        target_audience_description="Local homeowners and small businesses.",
+        products_services_description=f"{name} services: {', '.join(tags)}.",
+        raw_responses={"business_id": f"bench_intake_{index:04d}"},
+    )
+
+
+class InMemoryMatcher(CustomerMatcherService):
+    """Matcher that serves candidates from a list instead of PostgreSQL."""
+
+    def __init__(self, llm_service: LLMService, profiles: List[BusinessIntakeData], **kwargs: Any):
+        super().__init__(llm_service=llm_service, db_config=NO_DB_CONFIG, **kwargs)
+        self.profiles = profiles
+
+    def _retrieve_candidate_businesses(self, processed_query: Dict[str, Any], deadline: Optional[Deadline] = None) -> List[BusinessIntakeData]:
+        return list(self.profiles)
+
+
+def build_llm_service(args: argparse.Namespace, base_url: str, metrics: LLMMetrics) -> LLMService:
+    llm_service = LLMService(
+        api_key="sk-benchmark",
+        model_name=args.model,
+        enable_cache=args.cache,
+        rate_limiter=AdaptiveRateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm),
+        max_retries=args.max_retries,
+        single_flight=SingleFlight(),
+        metrics=metrics,
+    )
+    llm_service.client = OpenAI(api_key="sk-benchmark", base_url=base_url, max_retries=0, timeout=args.timeout)
+    return llm_service
+
+
+def build_operation(args: argparse.Namespace, llm_service: LLMService) -> Callable[[int], Any]:
+    """Returns a function that performs request number i of the chosen scenario."""
+    if args.scenario == "blueprint":
+        blueprint_service = BlueprintService(llm_service=llm_service, db_config=NO_DB_CONFIG)
+        return lambda i: blueprint_service.generate_blueprint(make_intake(i))
+
+    if args.scenario == "matcher":
+        matcher = InMemoryMatcher(llm_service, make_business_profiles(args.businesses),
+                                  semantic_mode=args.semantic_mode, semantic_batch_size=args.semantic_batch_size,
+                                  result_cache=MatchResultCache(max_entries=None if args.result_cache else 0),
+                                  deadline_seconds=args.deadline_seconds)
+
+        def match(i: int) -> Any:
+            template = QUERIES[i % len(QUERIES)]
+            text = template.format(city=CITIES[i % len(CITIES)])
+            if not args.repeat_queries:
+                text = f"{text} (request {i})"
+            return matcher.find_matched_businesses(CustomerQuery(query_text=text))
+        return match
+
+    if args.scenario == "sentiment":
+        def sentiment(i: int) -> Any:
+            texts = [f"{REVIEWS[(i + j) % len(REVIEWS)]} (review {i}-{j})" for j in range(args.texts_per_request)]
+            return llm_service.analyze_sentiment_batch(texts, use_llm=not args.no_llm)
+        return sentiment
+
+    def single_call(i: int) -> Any:
+        prompt = (f"Assess the semantic similarity between the customer query and the business offering.\n"
+                  f"Customer Query: benchmark query {i if not args.repeat_queries else 0}\n"
+                  f"Business Name: Benchmark Business\nReturn JSON.")
+        response = llm_service.generate_text(prompt, max_tokens=200, caller="benchmark.llm")
+        if response.metadata and response.metadata.get("error"):
+            raise RuntimeError(response.generated_text)
+        return response
+    return single_call
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    config = FakeServerConfig(
+        latency_ms=args.latency_ms, latency_jitter=args.latency_jitter, latency_distribution=args.latency_distribution,
+        ms_per_output_token=args.ms_per_output_token, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, seed=args.seed,
+    )
+    server = None if args.base_url else FakeOpenAIServer(config).start()
+    base_url = args.base_url or server.base_url
+    metrics = LLMMetrics()
+    try:
+        llm_service = build_llm_service(args, base_url, metrics)
+        operation = build_operation(args, llm_service)
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+
+        def timed(i: int) -> None:
+            start = time.perf_counter()
+            try:
+                operation(i)
+            except Exception as e:
+                key = f"{type(e).__name__}: {str(e)[:120]}"
+                errors[key] = errors.get(key, 0) + 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+        quiet = open(os.devnull, "w") if not args.verbose else None
+        with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+            for i in range(args.warmup):
+                timed(-1 - i)
+            latencies.clear()
+            errors.clear()
+            wall_start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                list(executor.map(timed, range(args.requests)))
+            wall_seconds = time.perf_counter() - wall_start
+        if quiet:
+            quiet.close()
+
+        latencies.sort()
+        report = {
+            "scenario": args.scenario,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "succeeded": len(latencies),
+            "failed": sum(errors.values()),
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_rps": round(len(latencies) / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99": round(percentile(latencies, 0.99) * 1000, 1),
+                "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+                "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            },
+            "errors": errors,
+            "llm_by_caller": metrics.get_summary(),
+            "single_flight": llm_service.get_single_flight_stats(),
+            "rate_limiter": {k: v for k, v in llm_service.get_rate_limiter_state().items() if k != "last_provider_headers"},
+        }
+        if server is not None:
+            report["fake_server"] = dict(server.stats.__dict__)
+        return report
+    finally:
+        if server is not None:
+            server.stop()
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency_ms"]
+    print(f"Scenario: {report['scenario']}  requests={report['requests']}  concurrency={report['concurrency']}")
+    print(f"  succeeded={report['succeeded']}  failed={report['failed']}  wall={report['wall_seconds']}s  throughput={report['throughput_rps']} req/s")
+    print(f"  latency ms: p50={latency['p50']}  p95={latency['p95']}  p99={latency['p99']}  max={latency['max']}  mean={latency['mean']}")
+    for message, count in report["errors"].items():
+        print(f"  error x{count}: {message}")
+    if report["llm_by_caller"]:
+        print("  LLM calls by caller (total wall seconds, upstream calls, prompt/completion tokens):")
+        for caller, totals in report["llm_by_caller"].items():
+            print(f"    {caller:<28} {totals['wall_seconds']:>9.3f}s  {totals['upstream_calls']:>6}  "
+                  f"{totals['prompt_tokens']:>8}/{totals['completion_tokens']:<8} errors={totals['errors']}")
+    if "fake_server" in report:
+        stats = report["fake_server"]
+        print(f"  fake server: requests={stats['requests']}  429s={stats['injected_rate_limits']}  "
+              f"500s={stats['injected_errors']}  max_in_flight={stats['max_in_flight']}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark LLM-heavy paths against a fake OpenAI server.")
+    parser.add_argument("--scenario", choices=("llm", "matcher", "blueprint", "sentiment"), default="matcher")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--businesses", type=int, default=30, help="Candidate businesses for the matcher scenario.")
+    parser.add_argument("--semantic-mode", choices=("llm", "vector"), default="llm")
+    parser.add_argument("--semantic-batch-size", type=int, default=10)
+    parser.add_argument("--texts-per-request", type=int, default=50, help="Texts per call in the sentiment scenario.")
+    parser.add_argument("--no-llm", action="store_true", help="Sentiment scenario: score with the local lexicon only.")
+    parser.add_argument("--repeat-queries", action="store_true", help="Reuse identical queries (exercises cache/coalescing).")
+    parser.add_argument("--cache", action="store_true", help="Enable the LLM response cache (off by default).")
+    parser.add_argument("--result-cache", action="store_true", help="Matcher scenario: enable the match result cache (off by default).")
+    parser.add_argument("--deadline-seconds", type=float, default=0.0,
+                        help="Matcher scenario: per-request deadline (0, the default, disables it so the full pipeline is measured).")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--rpm", type=float, default=100000)
+    parser.add_argument("--tpm", type=float, default=100000000)
+    parser.add_argument("--max-retries", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--base-url", help="Use an already running server instead of starting the fake one.")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.3)
+    parser.add_argument("--latency-distribution", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    parser.add_argument("--ms-per-output-token", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Keep service stdout output.")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if not arguments.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    result = run(arguments)
+    if arguments.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
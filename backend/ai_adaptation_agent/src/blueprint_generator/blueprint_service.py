@@ -3,12 +3,13 @@
 import os
 import json
 import uuid # For generating unique blueprint IDs
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Generator, Iterator, List, Optional, Tuple
 import psycopg2
 from psycopg2 import pool, extras
 
-from ..shared.data_models import BusinessIntakeData, BusinessBlueprint, LLMResponse
-from ..shared.llm_service import LLMService
+from ..shared.data_models import AudiencePersona, BusinessIntakeData, BusinessBlueprint, LLMResponse, MarketingStrategy
+from ..shared.llm_service import LLMService, LLMStreamError
+from ..shared.prompt_governor import PromptGovernor, get_shared_prompt_governor
 
 class BlueprintService:
     """
@@ -18,7 +19,21 @@ class BlueprintService:
     """
     DB_TABLE_NAME = "marketing_blueprints"
 
-    def __init__(self, llm_service: LLMService, db_config: Optional[Dict[str, str]] = None, min_conn: int = 1, max_conn: int = 5):
+    # Relative importance of free-text prompt inputs when a prompt must be trimmed (higher is kept longer)
+    PROMPT_FIELD_PRIORITIES = {
+        "products_services_description": 3,
+        "target_audience_description": 3,
+        "goals": 2,
+        "personas_summary": 2,
+        "plan_summary": 2,
+        "core_analysis": 2,
+        "business_analysis": 1,
+        "current_marketing_efforts": 1,
+        "competitors": 1,
+    }
+
+    def __init__(self, llm_service: LLMService, db_config: Optional[Dict[str, str]] = None, min_conn: int = 1, max_conn: int = 5,
+                 prompt_governor: Optional[PromptGovernor] = None, connection_pool: Optional[pool.AbstractConnectionPool] = None):
         """
         Initialize the BlueprintService.
         Args:
@@ -27,12 +42,20 @@ class BlueprintService:
                        If not provided, uses environment variables.
             min_conn: Minimum number of connections for the pool.
             max_conn: Maximum number of connections for the pool.
+            prompt_governor: (Optional) Trims verbose intake fields to a token budget. Defaults to the process-wide governor.
+            connection_pool: (Optional) A thread-safe pool shared with other services. When given, db_config,
+                       min_conn and max_conn are ignored and close_db_pool() leaves the pool open for its owner.
         """
         self.llm_service = llm_service
+        self.prompt_governor = prompt_governor or get_shared_prompt_governor()
         self.db_connection_pool = None
         self._db_config = None
+        self._owns_db_pool = connection_pool is None
 
-        if db_config:
+        if connection_pool is not None:
+            self.db_connection_pool = connection_pool
+            print("BlueprintService: Using shared database connection pool.")
+        elif db_config:
             self._db_config = db_config
         else:
             print("BlueprintService: Database configuration not provided directly, attempting to load from environment variables...")
@@ -48,10 +71,11 @@ class BlueprintService:
             else:
                 print("BlueprintService: Database configuration loaded from environment variables.")
 
-        if self._db_config and all(val for val in [self._db_config["host"], self._db_config["user"], self._db_config["password"], self._db_config["dbname"]]):
+        if self._owns_db_pool and self._db_config and all(val for val in [self._db_config["host"], self._db_config["user"], self._db_config["password"], self._db_config["dbname"]]):
             try:
                 print(f"BlueprintService: Initializing database connection pool for {self._db_config["dbname"]} on {self._db_config["host"]}:{self._db_config["port"]}...")
-                self.db_connection_pool = psycopg2.pool.SimpleConnectionPool(
+                # Threaded: one instance may serve concurrent requests
+                self.db_connection_pool = psycopg2.pool.ThreadedConnectionPool(
                     min_conn, 
                     max_conn,
                     host=self._db_config["host"],
@@ -67,7 +91,7 @@ class BlueprintService:
             except psycopg2.Error as e:
                 print(f"BlueprintService Error: Error creating database connection pool: {e}")
                 self.db_connection_pool = None
-        else:
+        elif self._owns_db_pool:
             print("BlueprintService: Database configuration is incomplete. Connection pool not created.")
         
         print("BlueprintService initialized.")
@@ -87,51 +111,77 @@ class BlueprintService:
             self.db_connection_pool.putconn(conn)
 
     def close_db_pool(self):
-        if self.db_connection_pool:
+        if self.db_connection_pool and self._owns_db_pool:
             print("BlueprintService: Closing database connection pool...")
             self.db_connection_pool.closeall()
             print("BlueprintService: Database connection pool closed.")
 
-    def _generate_executive_summary(self, intake_data: BusinessIntakeData, core_analysis: str) -> str:
-        print("Generating Executive Summary...")
-        prompt = f"""Based on the following business intake data and core analysis, write a concise and compelling executive summary (around 150-250 words) for a marketing blueprint for {intake_data.business_name}.
+    def _fit_prompt_fields(self, **fields: Any) -> Dict[str, str]:
+        """Trims verbose prompt inputs to the governor's field budget, lowest priority first."""
+        return self.prompt_governor.fit_fields(
+            {name: (text, self.PROMPT_FIELD_PRIORITIES.get(name, 1)) for name, text in fields.items()}
+        )
+
+    def _executive_summary_prompt(self, intake_data: BusinessIntakeData, core_analysis: str) -> str:
+        fields = self._fit_prompt_fields(
+            goals=", ".join(intake_data.goals),
+            products_services_description=intake_data.products_services_description,
+            target_audience_description=intake_data.target_audience_description,
+            core_analysis=core_analysis,
+        )
+        return f"""Based on the following business intake data and core analysis, write a concise and compelling executive summary (around 150-250 words) for a marketing blueprint for {intake_data.business_name}.
         Business Name: {intake_data.business_name}
         Industry: {intake_data.industry}
         Business Stage: {intake_data.business_stage}
-        Key Goals: {", ".join(intake_data.goals)}
-        Products/Services: {intake_data.products_services_description}
-        Target Audience: {intake_data.target_audience_description}
-        Core Analysis Insights: {core_analysis}
+        Key Goals: {fields["goals"]}
+        Products/Services: {fields["products_services_description"]}
+        Target Audience: {fields["target_audience_description"]}
+        Core Analysis Insights: {fields["core_analysis"]}
 
         The executive summary should highlight the primary marketing objectives and the overall strategic direction recommended in the blueprint.
         """
-        response = self.llm_service.generate_text(prompt, max_tokens=300)
+
+    def _generate_executive_summary(self, intake_data: BusinessIntakeData, core_analysis: str) -> str:
+        print("Generating Executive Summary...")
+        prompt = self._executive_summary_prompt(intake_data, core_analysis)
+        response = self.llm_service.generate_text(prompt, max_tokens=300, caller="blueprint.summary")
         return response.generated_text if response.success else "Could not generate executive summary."
 
-    def _analyze_business_profile(self, intake_data: BusinessIntakeData) -> str:
-        print("Analyzing Business Profile...")
-        prompt = f"""Conduct a brief analysis of the following business profile for {intake_data.business_name}. 
+    def _business_profile_analysis_prompt(self, intake_data: BusinessIntakeData) -> str:
+        fields = self._fit_prompt_fields(
+            goals=", ".join(intake_data.goals),
+            target_audience_description=intake_data.target_audience_description,
+            products_services_description=intake_data.products_services_description,
+            current_marketing_efforts=intake_data.raw_responses.get("current_marketing_efforts", "Not specified"),
+            competitors=intake_data.raw_responses.get("competitors", "Not specified"),
+        )
+        return f"""Conduct a brief analysis of the following business profile for {intake_data.business_name}. 
         Focus on its strengths, weaknesses, opportunities, and threats (SWOT) from a marketing perspective. 
         Identify key marketing challenges and advantages.
 
         Business Name: {intake_data.business_name}
         Industry: {intake_data.industry}
         Business Stage: {intake_data.business_stage}
-        Goals: {", ".join(intake_data.goals)}
-        Target Audience: {intake_data.target_audience_description}
-        Products/Services: {intake_data.products_services_description}
-        Current Marketing Efforts (if any from raw_responses): {intake_data.raw_responses.get("current_marketing_efforts", "Not specified")}
-        Competitor Landscape (if any from raw_responses): {intake_data.raw_responses.get("competitors", "Not specified")}
+        Goals: {fields["goals"]}
+        Target Audience: {fields["target_audience_description"]}
+        Products/Services: {fields["products_services_description"]}
+        Current Marketing Efforts (if any from raw_responses): {fields["current_marketing_efforts"]}
+        Competitor Landscape (if any from raw_responses): {fields["competitors"]}
 
         Provide the analysis as a coherent text block (around 200-300 words).
         """
-        response = self.llm_service.generate_text(prompt, max_tokens=400)
+
+    def _analyze_business_profile(self, intake_data: BusinessIntakeData) -> str:
+        print("Analyzing Business Profile...")
+        prompt = self._business_profile_analysis_prompt(intake_data)
+        response = self.llm_service.generate_text(prompt, max_tokens=400, caller="blueprint.analysis")
         return response.generated_text if response.success else "Could not generate business profile analysis."
 
     def _generate_audience_personas(self, intake_data: BusinessIntakeData) -> List[Dict[str, Any]]:
         print("Generating Audience Personas...")
+        fields = self._fit_prompt_fields(target_audience_description=intake_data.target_audience_description)
         prompt = f"""Based on the target audience description for {intake_data.business_name} (Industry: {intake_data.industry}): 
-        "{intake_data.target_audience_description}"
+        "{fields["target_audience_description"]}"
 
         Generate 2 detailed audience personas. For each persona, include:
         - name (e.g., "Marketing Manager Mark", "Small Business Owner Sarah")
@@ -145,22 +195,23 @@ class BlueprintService:
         Example of a single persona object in the list:
         {{ "name": "Innovative Ian", "demographics": {{"age": "30-45", "role": "CTO"}}, "psychographics": ["Early adopter", "Data-driven"], "pain_points": ["Outdated systems", "Inefficient workflows"], "goals": ["Improve team productivity", "Implement cutting-edge tech"], "preferred_channels": ["Tech blogs", "Industry conferences", "LinkedIn"] }}
         """
-        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=1000)
+        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=1000, response_model=List[AudiencePersona], caller="blueprint.personas")
         if response_obj and isinstance(response_obj, list):
             return response_obj
         elif response_obj and isinstance(response_obj, dict) and "personas" in response_obj and isinstance(response_obj["personas"], list):
              return response_obj["personas"] # Sometimes LLM wraps it
         print(f"Failed to generate valid JSON for personas. LLM response: {response_obj}")
-        return [{ "name": "Default Persona", "error": "Could not parse LLM response for personas." }]
+        return [{ "name": "Default Persona", "demographics": {}, "psychographics": [], "pain_points": [], "goals": [], "error": "Could not parse LLM response for personas." }]
 
     def _generate_strategic_marketing_plan(self, intake_data: BusinessIntakeData, personas: List[Dict[str, Any]], business_analysis: str) -> List[Dict[str, Any]]:
         print("Generating Strategic Marketing Plan...")
         personas_summary = "\n".join([f"- Persona: {p.get("name", "N/A")}, Key Pain Point: {p.get("pain_points", ["N/A"])[0] if p.get("pain_points") else "N/A"}" for p in personas])
+        fields = self._fit_prompt_fields(goals=", ".join(intake_data.goals), personas_summary=personas_summary, business_analysis=business_analysis)
         prompt = f"""Develop a strategic marketing plan for {intake_data.business_name} (Industry: {intake_data.industry}).
-        Business Goals: {", ".join(intake_data.goals)}
+        Business Goals: {fields["goals"]}
         Target Audience Personas Summary:
-        {personas_summary}
-        Business Profile Analysis Insights: {business_analysis}
+        {fields["personas_summary"]}
+        Business Profile Analysis Insights: {fields["business_analysis"]}
 
         Outline 3-4 key strategic marketing objectives. For each objective, suggest:
         - name (e.g., "Increase Brand Awareness", "Generate Qualified Leads", "Enhance Customer Engagement")
@@ -171,13 +222,13 @@ class BlueprintService:
 
         Return the response as a JSON list of marketing strategy objects. Each object should have keys: "name", "description", "tactics", "channels", "kpis".
         """
-        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=1500)
+        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=1500, response_model=List[MarketingStrategy], caller="blueprint.strategy")
         if response_obj and isinstance(response_obj, list):
             return response_obj
         elif response_obj and isinstance(response_obj, dict) and "strategies" in response_obj and isinstance(response_obj["strategies"], list):
             return response_obj["strategies"]
         print(f"Failed to generate valid JSON for strategic plan. LLM response: {response_obj}")
-        return [{ "name": "Default Strategy", "error": "Could not parse LLM response for strategic plan." }]
+        return [{ "name": "Default Strategy", "description": "", "tactics": [], "channels": [], "kpis": [], "error": "Could not parse LLM response for strategic plan." }]
 
     def _generate_channel_plan(self, strategic_plan: List[Dict[str, Any]]) -> Dict[str, str]:
         print("Generating Channel Plan...")
@@ -195,7 +246,7 @@ class BlueprintService:
         Return the response as a JSON object where keys are channel names and values are their recommended roles.
         Example: {{ "Company Blog": "Serve as the primary hub for thought leadership content and SEO value.", "LinkedIn": "Focus on B2B networking, professional content sharing, and direct outreach." }}
         """
-        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=700)
+        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=700, response_model=Dict[str, str], caller="blueprint.channels")
         if response_obj and isinstance(response_obj, dict):
             return response_obj
         print(f"Failed to generate valid JSON for channel plan. LLM response: {response_obj}")
@@ -204,38 +255,47 @@ class BlueprintService:
     def _generate_content_pillars(self, intake_data: BusinessIntakeData, personas: List[Dict[str, Any]]) -> List[str]:
         print("Generating Content Pillars/Themes...")
         personas_summary = "\n".join([f"- Persona: {p.get("name", "N/A")}, Key Interests/Pain Points: {p.get("pain_points", ["N/A"])[0] if p.get("pain_points") else "N/A"}, {p.get("goals", ["N/A"])[0] if p.get("goals") else "N/A"}" for p in personas])
-        prompt = f"""For {intake_data.business_name} (Industry: {intake_data.industry}), which offers "{intake_data.products_services_description}", and targets the following personas:
-        {personas_summary}
+        fields = self._fit_prompt_fields(products_services_description=intake_data.products_services_description, personas_summary=personas_summary)
+        prompt = f"""For {intake_data.business_name} (Industry: {intake_data.industry}), which offers "{fields["products_services_description"]}", and targets the following personas:
+        {fields["personas_summary"]}
 
         Suggest 3-5 core content pillars or recurring themes that would resonate with these personas and align with the business"s offerings. These pillars should guide content creation.
         Return the response as a JSON list of strings, where each string is a content pillar/theme.
         Example: ["Solving [Common Pain Point] with [Product/Service Type]", "The Future of [Industry Trend] for [Target Audience Segment]", "Client Success Stories and Case Studies"] 
         """
-        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=500)
+        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=500, response_model=List[str], caller="blueprint.content_pillars")
         if response_obj and isinstance(response_obj, list) and all(isinstance(item, str) for item in response_obj):
             return response_obj
         print(f"Failed to generate valid JSON list of strings for content pillars. LLM response: {response_obj}")
         return ["Default Content Pillar: Addressing customer needs effectively."]
 
-    def _generate_lead_funnel_outline(self, intake_data: BusinessIntakeData, strategic_plan: List[Dict[str, Any]]) -> str:
-        print("Generating Lead Funnel Outline...")
+    def _lead_funnel_outline_prompt(self, intake_data: BusinessIntakeData, strategic_plan: List[Dict[str, Any]]) -> str:
         plan_summary = "\n".join([f"- Strategy: {s.get("name")}, Tactics: {", ".join(s.get("tactics", []))}" for s in strategic_plan])
-        prompt = f"""Outline a basic lead generation funnel for {intake_data.business_name}, considering its goals ({", ".join(intake_data.goals)}) and the following marketing strategies:
-        {plan_summary}
+        fields = self._fit_prompt_fields(goals=", ".join(intake_data.goals), plan_summary=plan_summary)
+        return f"""Outline a basic lead generation funnel for {intake_data.business_name}, considering its goals ({fields["goals"]}) and the following marketing strategies:
+        {fields["plan_summary"]}
 
         Describe the key stages (e.g., Awareness, Interest/Consideration, Decision, Action) and suggest 1-2 primary activities or content types for each stage, drawing from the strategic plan.
         Provide the outline as a coherent text block (around 150-200 words).
         """
-        response = self.llm_service.generate_text(prompt, max_tokens=300)
+
+    def _generate_lead_funnel_outline(self, intake_data: BusinessIntakeData, strategic_plan: List[Dict[str, Any]]) -> str:
+        print("Generating Lead Funnel Outline...")
+        prompt = self._lead_funnel_outline_prompt(intake_data, strategic_plan)
+        response = self.llm_service.generate_text(prompt, max_tokens=300, caller="blueprint.funnel")
         return response.generated_text if response.success else "Could not generate lead funnel outline."
 
-    def _generate_brand_voice_guidelines(self, intake_data: BusinessIntakeData) -> str:
-        print("Generating Brand Voice Guidelines...")
-        prompt = f"""Based on the profile of {intake_data.business_name} (Industry: {intake_data.industry}, Stage: {intake_data.business_stage}, Target Audience: {intake_data.target_audience_description}), recommend 3-5 core attributes for its brand voice and provide a brief messaging guideline.
+    def _brand_voice_guidelines_prompt(self, intake_data: BusinessIntakeData) -> str:
+        fields = self._fit_prompt_fields(target_audience_description=intake_data.target_audience_description)
+        return f"""Based on the profile of {intake_data.business_name} (Industry: {intake_data.industry}, Stage: {intake_data.business_stage}, Target Audience: {fields["target_audience_description"]}), recommend 3-5 core attributes for its brand voice and provide a brief messaging guideline.
         For example: "Voice: Confident, Expert, Approachable. Messaging: Focus on clarity, value, and customer success. Avoid jargon."
         Provide the guidelines as a coherent text block (around 100-150 words).
         """
-        response = self.llm_service.generate_text(prompt, max_tokens=200)
+
+    def _generate_brand_voice_guidelines(self, intake_data: BusinessIntakeData) -> str:
+        print("Generating Brand Voice Guidelines...")
+        prompt = self._brand_voice_guidelines_prompt(intake_data)
+        response = self.llm_service.generate_text(prompt, max_tokens=200, caller="blueprint.brand_voice")
         return response.generated_text if response.success else "Could not generate brand voice guidelines."
 
     def _generate_kpi_framework(self, strategic_plan: List[Dict[str, Any]]) -> Dict[str, str]:
@@ -254,7 +314,7 @@ class BlueprintService:
         Return the response as a JSON object where keys are KPI names and values are the suggested measurement tools/methods.
         Example: {{ "Website Traffic": "Google Analytics", "Lead Conversion Rate": "CRM data and campaign tracking", "Social Media Engagement": "Platform-specific analytics (e.g., Facebook Insights, LinkedIn Analytics)" }}
         """
-        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=500)
+        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=500, response_model=Dict[str, str], caller="blueprint.kpis")
         if response_obj and isinstance(response_obj, dict):
             return response_obj
         print(f"Failed to generate valid JSON for KPI framework. LLM response: {response_obj}")
@@ -276,7 +336,7 @@ class BlueprintService:
             "90-day": ["Analyze campaign performance and optimize ads", "Host first webinar", "Expand content production to video"]
         }}
         """
-        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=700)
+        response_obj = self.llm_service.generate_json_response(prompt, max_tokens=700, response_model=Dict[str, List[str]], caller="blueprint.action_plan")
         if response_obj and isinstance(response_obj, dict) and "30-day" in response_obj:
             return response_obj
         print(f"Failed to generate valid JSON for action plan. LLM response: {response_obj}")
@@ -286,23 +346,95 @@ class BlueprintService:
             "90-day": ["Launch first small campaign"]
         }
 
-    def generate_blueprint(self, intake_data: BusinessIntakeData) -> Optional[BusinessBlueprint]:
+    def _stream_text_section(self, section: str, prompt: str, max_tokens: int, fallback: str, caller: str) -> Generator[Tuple[str, Any], None, str]:
         """
-        Main method to generate a full business blueprint.
+        Streams one free-text section, yielding ("delta", {...}) events as tokens arrive.
+        Returns the complete text (or the fallback on failure) to the caller via `yield from`.
+        A stream that fails, even part-way through, yields an ("error", {...}) event and the fallback is used,
+        so the deltas already sent for the section must be discarded.
+        """
+        parts: List[str] = []
+        try:
+            for delta in self.llm_service.generate_text_stream(prompt, max_tokens=max_tokens, caller=caller):
+                parts.append(delta)
+                yield "delta", {"section": section, "text": delta}
+        except LLMStreamError as e:
+            print(f"BlueprintService: Streaming failed for section {section}: {e}")
+            yield "error", {"section": section, "error": f"Streaming failed; the section uses its fallback text: {e}"}
+            return fallback
+        text = "".join(parts).strip()
+        return text or fallback
+
+    def generate_blueprint_stream(self, intake_data: BusinessIntakeData, stream_text: bool = False) -> Iterator[Tuple[str, Any]]:
+        """
+        Generates a blueprint section by section, yielding each section as soon as it is ready.
+
+        Args:
+            intake_data: The business intake data.
+            stream_text: If True, free-text sections are generated with LLM streaming and their
+                         tokens are yielded as ("delta", {"section", "text"}) events.
+
+        Yields:
+            ("delta", {"section": name, "text": fragment}) events (only when stream_text is True),
+            ("error", {"section": name, "error": message}) if a streamed section failed (its deltas are void),
+            ("section", {"section": name, "content": value}) once per blueprint field, and finally
+            ("complete", BusinessBlueprint).
         """
         print(f"BlueprintService: Starting blueprint generation for: {intake_data.business_name}")
 
-        business_profile_analysis = self._analyze_business_profile(intake_data)
+        if stream_text:
+            print("Analyzing Business Profile...")
+            business_profile_analysis = yield from self._stream_text_section(
+                "business_profile_analysis", self._business_profile_analysis_prompt(intake_data), 400,
+                "Could not generate business profile analysis.", "blueprint.analysis")
+        else:
+            business_profile_analysis = self._analyze_business_profile(intake_data)
+        yield "section", {"section": "business_profile_analysis", "content": business_profile_analysis}
+
         refined_target_audience_personas = self._generate_audience_personas(intake_data)
+        yield "section", {"section": "refined_target_audience_personas", "content": refined_target_audience_personas}
+
         strategic_marketing_plan_list = self._generate_strategic_marketing_plan(intake_data, refined_target_audience_personas, business_profile_analysis)
-        
-        executive_summary = self._generate_executive_summary(intake_data, business_profile_analysis)
+        yield "section", {"section": "strategic_marketing_plan", "content": strategic_marketing_plan_list}
+
+        if stream_text:
+            print("Generating Executive Summary...")
+            executive_summary = yield from self._stream_text_section(
+                "executive_summary", self._executive_summary_prompt(intake_data, business_profile_analysis), 300,
+                "Could not generate executive summary.", "blueprint.summary")
+        else:
+            executive_summary = self._generate_executive_summary(intake_data, business_profile_analysis)
+        yield "section", {"section": "executive_summary", "content": executive_summary}
+
         channel_plan_dict = self._generate_channel_plan(strategic_marketing_plan_list)
+        yield "section", {"section": "channel_plan", "content": channel_plan_dict}
+
         content_pillars_themes_list = self._generate_content_pillars(intake_data, refined_target_audience_personas)
-        lead_generation_funnel_outline_str = self._generate_lead_funnel_outline(intake_data, strategic_marketing_plan_list)
-        brand_voice_messaging_guidelines_str = self._generate_brand_voice_guidelines(intake_data)
+        yield "section", {"section": "content_pillars_themes", "content": content_pillars_themes_list}
+
+        if stream_text:
+            print("Generating Lead Funnel Outline...")
+            lead_generation_funnel_outline_str = yield from self._stream_text_section(
+                "lead_generation_funnel_outline", self._lead_funnel_outline_prompt(intake_data, strategic_marketing_plan_list), 300,
+                "Could not generate lead funnel outline.", "blueprint.funnel")
+        else:
+            lead_generation_funnel_outline_str = self._generate_lead_funnel_outline(intake_data, strategic_marketing_plan_list)
+        yield "section", {"section": "lead_generation_funnel_outline", "content": lead_generation_funnel_outline_str}
+
+        if stream_text:
+            print("Generating Brand Voice Guidelines...")
+            brand_voice_messaging_guidelines_str = yield from self._stream_text_section(
+                "brand_voice_messaging_guidelines", self._brand_voice_guidelines_prompt(intake_data), 200,
+                "Could not generate brand voice guidelines.", "blueprint.brand_voice")
+        else:
+            brand_voice_messaging_guidelines_str = self._generate_brand_voice_guidelines(intake_data)
+        yield "section", {"section": "brand_voice_messaging_guidelines", "content": brand_voice_messaging_guidelines_str}
+
         kpi_measurement_framework_dict = self._generate_kpi_framework(strategic_marketing_plan_list)
+        yield "section", {"section": "kpi_measurement_framework", "content": kpi_measurement_framework_dict}
+
         initial_action_plan_dict = self._generate_initial_action_plan(intake_data, strategic_marketing_plan_list)
+        yield "section", {"section": "initial_action_plan", "content": initial_action_plan_dict}
 
         # Ensure business_id is present, default if not (though it should be from intake)
         business_id = str(intake_data.raw_responses.get("business_id", uuid.uuid4()))
@@ -323,6 +455,16 @@ class BlueprintService:
         )
 
         print(f"BlueprintService: Blueprint generation complete for: {intake_data.business_name}")
+        yield "complete", blueprint
+
+    def generate_blueprint(self, intake_data: BusinessIntakeData) -> Optional[BusinessBlueprint]:
+        """
+        Main method to generate a full business blueprint.
+        """
+        blueprint = None
+        for event, payload in self.generate_blueprint_stream(intake_data):
+            if event == "complete":
+                blueprint = payload
         return blueprint
 
     def save_blueprint(self, blueprint: BusinessBlueprint) -> Optional[str]:
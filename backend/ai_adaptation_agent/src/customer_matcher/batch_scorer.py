@@ -0,0 +1,128 @@
+"""Vectorized keyword/tag/industry/location relevance scoring of a whole candidate set"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .business_features import BusinessFeatures, TermVocabulary
+from .geo import LocationScorer
+
+logger = logging.getLogger(__name__)
+
+# Component weights shared with CustomerMatcherService._calculate_relevance
+KEYWORD_WEIGHT = 0.4
+LOCATION_WEIGHT = 0.3
+SEMANTIC_WEIGHT = 0.3  # Only applied if the candidate has a semantic score (0.0 included)
+MATCH_THRESHOLD = 0.15  # Candidates scoring at or below this are not returned
+
+
+class BatchRelevanceScorer:
+    """
+    Computes exactly the scores of _calculate_relevance for all candidates at once.
+    The candidates' description tokens and tags become a CSR-style incidence (concatenated vocabulary ids
+    plus a row id per entry); matching the query keywords is one np.isin over it and the per-candidate
+    counts are an np.bincount. Locations are scored (by the same LocationScorer) once per distinct
+    location and gathered by id. The operations are ordered like the scalar code so the float results
+    are bit-identical.
+    """
+
+    def __init__(self, location_scorer: Optional[LocationScorer] = None):
+        """
+        Args:
+            location_scorer: (Optional) Must be the one _calculate_relevance uses. Defaults to a LocationScorer
+                             over the process-wide gazetteer.
+        """
+        self.location_scorer = location_scorer if location_scorer is not None else LocationScorer()
+
+    def _location_scores(self, location_ids: np.ndarray, query_location: Optional[str],
+                         vocabulary: Optional[TermVocabulary]) -> np.ndarray:
+        if not query_location:
+            return np.full(len(location_ids), 0.2)  # No location in query, so profiles are not penalized
+        unique_ids, inverse = np.unique(location_ids, return_inverse=True)
+        unique_scores = np.zeros(len(unique_ids))
+        for position, location_id in enumerate(unique_ids.tolist()):
+            profile_location = vocabulary.term(location_id) if location_id >= 0 else ""
+            unique_scores[position] = self.location_scorer.score(query_location, profile_location)[0]
+        return unique_scores[inverse]
+
+    def score(self, processed_query: Dict[str, Any], features: Sequence[BusinessFeatures],
+              semantic_scores: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Args:
+            processed_query: The output of _preprocess_query ("keywords", "location").
+            features: BusinessFeatures of each candidate, in candidate order, built with one vocabulary
+                      (BusinessFeatureCache.features_for_batch).
+            semantic_scores: (Optional) Semantic score per candidate; NaN where there is none. A score of 0.0 is
+                             a real "not similar" and uses the same weighted formula as any other score.
+
+        Returns:
+            Final relevance score per candidate (float64), equal to _calculate_relevance's.
+        """
+        n = len(features)
+        vocabulary = features[0].vocabulary if n else None
+        if any(f.vocabulary is not vocabulary for f in features):
+            raise ValueError("features must share one vocabulary; use BusinessFeatureCache.features_for_batch")
+        query_ids = vocabulary.lookup(set(processed_query.get("keywords", []))) if vocabulary is not None else np.array([], dtype=np.int64)
+
+        description_lengths = np.fromiter((len(f.description_ids) for f in features), dtype=np.int64, count=n)
+        tag_lengths = np.fromiter((len(f.tag_ids) for f in features), dtype=np.int64, count=n)
+        rows = np.arange(n)
+        if n and len(query_ids):
+            description_ids = np.concatenate([f.description_ids for f in features])
+            tag_ids = np.concatenate([f.tag_ids for f in features])
+            description_hits = np.bincount(np.repeat(rows, description_lengths), weights=np.isin(description_ids, query_ids), minlength=n)
+            tag_hits = np.bincount(np.repeat(rows, tag_lengths), weights=np.isin(tag_ids, query_ids), minlength=n)
+            industry_ids = np.fromiter((f.industry_id for f in features), dtype=np.int64, count=n)
+            industry_match = np.isin(industry_ids, query_ids)
+        else:
+            description_hits = tag_hits = np.zeros(n)
+            industry_match = np.zeros(n, dtype=bool)
+
+        keyword_score = np.zeros(n)
+        keyword_score += np.where(description_hits > 0, np.minimum(description_hits * 0.1, 0.4), 0.0)
+        keyword_score += np.where(tag_hits > 0, np.minimum(tag_hits * 0.2, 0.5), 0.0)  # Higher weight for direct tag match
+        keyword_score += np.where(industry_match, 0.1, 0.0)
+        keyword_score = np.minimum(keyword_score, 1.0)
+
+        location_ids = np.fromiter((f.location_id for f in features), dtype=np.int64, count=n)
+        location_score = self._location_scores(location_ids, processed_query.get("location"), vocabulary)
+
+        semantic = semantic_scores if semantic_scores is not None else np.full(n, np.nan)
+        has_semantic = ~np.isnan(semantic)
+        with_semantic = keyword_score * KEYWORD_WEIGHT + location_score * LOCATION_WEIGHT + np.where(has_semantic, semantic, 0.0) * SEMANTIC_WEIGHT
+        without_semantic = (keyword_score * KEYWORD_WEIGHT + location_score * LOCATION_WEIGHT) / (KEYWORD_WEIGHT + LOCATION_WEIGHT)
+        final = np.where(has_semantic, with_semantic, without_semantic)
+        return np.minimum(np.maximum(final, 0.0), 1.0)
+
+
+def top_k_indices(scores: np.ndarray, k: Optional[int] = None, threshold: float = MATCH_THRESHOLD,
+                  tie_keys: Optional[Sequence[str]] = None, after: Optional[Tuple[float, str]] = None) -> List[int]:
+    """
+    Indices of the k best scores above threshold (all of them if k is None), best first. Ties are ordered
+    by tie_keys (e.g. business ids) if given, else by candidate order. Uses np.argpartition, so selecting
+    k of n is O(n).
+
+    Args:
+        after: (Optional) Keyset cursor (score, tie key): only candidates ranked after it are eligible.
+               Requires tie_keys.
+    """
+    eligible = np.flatnonzero(scores > threshold)
+    keys = np.array([tie_keys[index] for index in eligible.tolist()], dtype=str) if tie_keys is not None else eligible
+    if after is not None:
+        after_score, after_key = after
+        eligible_scores = scores[eligible]
+        later = (eligible_scores < after_score) | ((eligible_scores == after_score) & (keys > after_key))
+        eligible, keys = eligible[later], keys[later]
+    if k is not None and 0 <= k < len(eligible):
+        if k == 0:
+            return []
+        eligible_scores = scores[eligible]
+        kth = eligible_scores[np.argpartition(-eligible_scores, k - 1)[k - 1]]
+        above = eligible_scores > kth
+        ties = np.flatnonzero(eligible_scores == kth)
+        ties = ties[np.argsort(keys[ties], kind="stable")][:k - int(above.sum())]
+        chosen = np.concatenate([np.flatnonzero(above), ties])
+        eligible, keys = eligible[chosen], keys[chosen]
+    order = np.lexsort((keys, -scores[eligible]))
+    return eligible[order].tolist()
@@ -0,0 +1,221 @@
+"""Precomputed per-business features used by relevance scoring, kept in a bounded LRU cache"""
+
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..shared.data_models import BusinessIntakeData
+
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r'\b\w+\b')
+
+
+class TermVocabulary:
+    """
+    Interning of normalized strings (tokens, tags, industries, locations) to dense int ids. Each
+    BusinessFeatureCache owns one and replaces it on clear() or once it outgrows max_terms, so terms
+    of businesses that are gone do not accumulate for the life of the process.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def intern(self, term: str) -> int:
+        term_id = self._ids.get(term)
+        if term_id is None:
+            with self._lock:
+                term_id = self._ids.get(term)
+                if term_id is None:
+                    term_id = len(self._terms)
+                    self._terms.append(term)
+                    self._ids[term] = term_id
+        return term_id
+
+    def lookup(self, terms: Iterable[str]) -> np.ndarray:
+        """Ids of the terms already interned (unknown terms cannot match anything and are skipped)."""
+        ids = self._ids
+        return np.array(sorted({ids[term] for term in terms if term in ids}), dtype=np.int64)
+
+    def term(self, term_id: int) -> str:
+        return self._terms[term_id]
+
+
+
+@dataclass(frozen=True, eq=False)
+class BusinessFeatures:
+    """
+    What _calculate_relevance, _extract_relevant_services and BatchRelevanceScorer read from a profile, normalized once.
+    The source_* fields are the raw values the features were built from, used to detect a changed profile.
+    """
+    business_id: Optional[str]
+    description: str                      # lower-cased products_services_description
+    description_tokens: FrozenSet[str]    # \b\w+\b tokens of description
+    tags: FrozenSet[str]                  # lower-cased string service tags
+    tag_pairs: Tuple[Tuple[str, str], ...]  # (original, lower-cased) string tags, in profile order
+    location: str                         # lower-cased location ("" if none)
+    industry: str                         # lower-cased industry ("" if none)
+    vocabulary: TermVocabulary            # The vocabulary the *_ids below come from
+    description_ids: np.ndarray           # vocabulary ids of description_tokens
+    tag_ids: np.ndarray                   # vocabulary ids of tags
+    location_id: int                      # vocabulary id of location (-1 if none)
+    industry_id: int                      # vocabulary id of industry (-1 if none)
+    source_description: Optional[str]
+    source_tags: Any
+    source_location: Optional[str]
+    source_industry: Optional[str]
+
+    def matches(self, profile: BusinessIntakeData) -> bool:
+        """True if profile still has the values these features were built from (identity makes this cheap)."""
+        raw_responses = profile.raw_responses
+        return (
+            self.source_description == profile.products_services_description
+            and self.source_industry == profile.industry
+            and self.source_location == raw_responses.get("location")
+            and self.source_tags == raw_responses.get("service_tags", [])
+        )
+
+
+def build_features(profile: BusinessIntakeData, vocabulary: Optional[TermVocabulary] = None) -> BusinessFeatures:
+    """Features of profile with ids from vocabulary (a new one if not given, e.g. outside a BusinessFeatureCache)."""
+    vocabulary = vocabulary if vocabulary is not None else TermVocabulary()
+    raw_responses = profile.raw_responses
+    description = (profile.products_services_description or "").lower()
+    source_tags = raw_responses.get("service_tags", [])
+    tag_pairs = tuple((tag, tag.lower()) for tag in (source_tags or []) if isinstance(tag, str))
+    description_tokens = frozenset(_WORD_PATTERN.findall(description))
+    tags = frozenset(lower for _, lower in tag_pairs)
+    location = (raw_responses.get("location") or "").lower()
+    industry = (profile.industry or "").lower()
+    return BusinessFeatures(
+        business_id=raw_responses.get("business_id"),
+        description=description,
+        description_tokens=description_tokens,
+        tags=tags,
+        tag_pairs=tag_pairs,
+        location=location,
+        industry=industry,
+        vocabulary=vocabulary,
+        description_ids=np.array([vocabulary.intern(token) for token in description_tokens], dtype=np.int64),
+        tag_ids=np.array([vocabulary.intern(tag) for tag in tags], dtype=np.int64),
+        location_id=vocabulary.intern(location) if location else -1,
+        industry_id=vocabulary.intern(industry) if industry else -1,
+        source_description=profile.products_services_description,
+        source_tags=list(source_tags) if isinstance(source_tags, list) else source_tags,  # copy: lists can change in place
+        source_location=raw_responses.get("location"),
+        source_industry=profile.industry,
+    )
+
+
+class BusinessFeatureCache:
+    """
+    Bounded LRU of BusinessFeatures by business_id. Entries are written when profiles are loaded or
+    refreshed, and features_for() rebuilds an entry whose profile changed, so a stale entry is never used.
+    Term ids come from the cache's own TermVocabulary. When that outgrows max_terms (evicted and edited
+    profiles leave their terms behind), the cache starts over with a new vocabulary and rebuilds entries
+    on demand; features already handed out keep the vocabulary they were built with.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_terms: Optional[int] = None):
+        """
+        Args:
+            max_entries: Most businesses kept. Defaults to MATCHER_FEATURE_CACHE_SIZE or 20000.
+            max_terms: Vocabulary size that triggers a fresh vocabulary. Defaults to MATCHER_VOCABULARY_MAX_TERMS or 1000000.
+        """
+        self.max_entries = max(1, max_entries if max_entries is not None else int(os.getenv("MATCHER_FEATURE_CACHE_SIZE", "20000")))
+        self.max_terms = max(1, max_terms if max_terms is not None else int(os.getenv("MATCHER_VOCABULARY_MAX_TERMS", "1000000")))
+        self._entries: "OrderedDict[str, BusinessFeatures]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.vocabulary = TermVocabulary()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.vocabulary_resets = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, features: BusinessFeatures) -> None:
+        if not features.business_id:
+            return
+        with self._lock:
+            self._entries[features.business_id] = features
+            self._entries.move_to_end(features.business_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put_profile(self, profile: BusinessIntakeData) -> BusinessFeatures:
+        features = build_features(profile, self._current_vocabulary())
+        self.put(features)
+        return features
+
+    def invalidate(self, business_id: str) -> None:
+        with self._lock:
+            self._entries.pop(business_id, None)
+
+    def clear(self) -> None:
+        """Drops every entry and starts a new vocabulary (e.g. before reloading all profiles)."""
+        with self._lock:
+            self._entries.clear()
+            self.vocabulary = TermVocabulary()
+
+    def _current_vocabulary(self) -> TermVocabulary:
+        """The vocabulary to build features with, replaced (with the entries built from it) once it exceeds max_terms."""
+        with self._lock:
+            if len(self.vocabulary) > self.max_terms:
+                logger.info(f"Feature vocabulary reached {len(self.vocabulary)} terms; rebuilding it.")
+                self._entries.clear()
+                self.vocabulary = TermVocabulary()
+                self.vocabulary_resets += 1
+            return self.vocabulary
+
+    def features_for(self, profile: BusinessIntakeData) -> BusinessFeatures:
+        """The cached features for profile, built (and cached, if it has a business_id) on a miss or change."""
+        return self._features_for(profile, self._current_vocabulary())
+
+    def features_for_batch(self, profiles: Sequence[BusinessIntakeData]) -> List[BusinessFeatures]:
+        """features_for() of each profile, all with ids from one vocabulary, as BatchRelevanceScorer requires."""
+        vocabulary = self._current_vocabulary()
+        return [self._features_for(profile, vocabulary) for profile in profiles]
+
+    def _features_for(self, profile: BusinessIntakeData, vocabulary: TermVocabulary) -> BusinessFeatures:
+        business_id = profile.raw_responses.get("business_id")
+        if business_id:
+            with self._lock:
+                features = self._entries.get(business_id)
+                if features is not None and features.vocabulary is vocabulary and features.matches(profile):
+                    self._entries.move_to_end(business_id)
+                    self.hits += 1
+                    return features
+                self.misses += 1
+        features = build_features(profile, vocabulary)
+        if vocabulary is self.vocabulary:  # Not if the vocabulary was replaced meanwhile
+            self.put(features)
+        return features
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "vocabulary_terms": len(self.vocabulary),
+                "vocabulary_resets": self.vocabulary_resets,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
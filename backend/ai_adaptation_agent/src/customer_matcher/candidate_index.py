@@ -0,0 +1,199 @@
+"""In-process inverted index over business profiles for candidate retrieval"""
+
+import re
+import bisect
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ..shared.data_models import BusinessIntakeData
+from .geo import place_key
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def index_terms(text: Optional[str]) -> List[str]:
+    """Normalized terms of a text: lower-cased word tokens."""
+    return _TOKEN_PATTERN.findall((text or "").lower())
+
+
+def normalize_location(location: Optional[str]) -> str:
+    """Location filter key: "Demo City", "democity" and "Demo-City" are the same location."""
+    return place_key(location)
+
+
+class CandidateIndex:
+    """
+    Maps normalized terms from business_name, products_services_description, industry and service_tags
+    to posting sets of business ids, plus exact (normalize_location) location -> ids, and keeps each profile so
+    retrieval needs no database round trip.
+
+    search() mirrors the SQL retrieval it replaces: a profile is a candidate if ANY keyword matches and,
+    when a location is given, its location matches exactly or its id is among the given nearby_ids
+    (businesses within the query radius, see geo.GeoIndex). A multi-word keyword matches when all of
+    its terms do; a term also matches indexed terms it is a prefix of (from prefix_min_length characters),
+    which covers the common "plumb" -> "plumbing" case of the old ILIKE '%kw%' substring match.
+
+    Reads and writes are guarded by one lock; each search is a few set unions/intersections.
+    """
+
+    def __init__(self, prefix_min_length: int = 3):
+        """
+        Args:
+            prefix_min_length: Shortest query term expanded to the indexed terms it prefixes.
+        """
+        self.prefix_min_length = prefix_min_length
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Set[str]] = {}
+        self._location_postings: Dict[str, Set[str]] = {}
+        self._doc_terms: Dict[str, Set[str]] = {}
+        self._doc_location: Dict[str, str] = {}
+        self._profiles: Dict[str, BusinessIntakeData] = {}
+        self._sorted_terms: Optional[List[str]] = None
+        self.watermark: Optional[datetime] = None  # Highest updated_at indexed so far
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def __contains__(self, business_id: str) -> bool:
+        return business_id in self._profiles
+
+    @staticmethod
+    def profile_terms(profile: BusinessIntakeData) -> Set[str]:
+        tags = profile.raw_responses.get("service_tags") or []
+        fields = [profile.business_name, profile.products_services_description, profile.industry]
+        fields.extend(tag for tag in tags if isinstance(tag, str))
+        return {term for field in fields for term in index_terms(field)}
+
+    def build(self, profiles: Iterable[BusinessIntakeData], watermark: Optional[datetime] = None) -> None:
+        """Replaces the index contents. Profiles carry their business_id in raw_responses."""
+        with self._lock:
+            self._postings, self._location_postings = {}, {}
+            self._doc_terms, self._doc_location, self._profiles = {}, {}, {}
+            for profile in profiles:
+                self._add(profile)
+            self._sorted_terms = None
+            self.watermark = watermark
+            self.loaded = True
+        logger.info(f"Candidate index built: {len(self._profiles)} businesses, {len(self._postings)} terms.")
+
+    def upsert(self, profile: BusinessIntakeData) -> None:
+        with self._lock:
+            business_id = profile.raw_responses.get("business_id")
+            if business_id in self._profiles:
+                self._remove(business_id)
+            self._add(profile)
+
+    def remove(self, business_id: str) -> None:
+        with self._lock:
+            if business_id in self._profiles:
+                self._remove(business_id)
+
+    def business_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._profiles)
+
+    def _add(self, profile: BusinessIntakeData) -> None:
+        business_id = profile.raw_responses.get("business_id")
+        if not business_id:
+            logger.warning(f"Skipping profile without business_id: {profile.business_name}")
+            return
+        terms = self.profile_terms(profile)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                self._postings[term] = postings = set()
+                self._sorted_terms = None
+            postings.add(business_id)
+        location = normalize_location(profile.raw_responses.get("location"))
+        if location:
+            self._location_postings.setdefault(location, set()).add(business_id)
+        self._doc_terms[business_id] = terms
+        self._doc_location[business_id] = location
+        self._profiles[business_id] = profile
+
+    def _remove(self, business_id: str) -> None:
+        for term in self._doc_terms.pop(business_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.discard(business_id)
+                if not postings:
+                    del self._postings[term]
+                    self._sorted_terms = None
+        location = self._doc_location.pop(business_id, "")
+        if location and location in self._location_postings:
+            self._location_postings[location].discard(business_id)
+            if not self._location_postings[location]:
+                del self._location_postings[location]
+        self._profiles.pop(business_id, None)
+
+    def _term_matches(self, term: str) -> Set[str]:
+        """Ids whose indexed terms equal term or (for long enough terms) start with it. Caller holds the lock."""
+        if len(term) < self.prefix_min_length:
+            return self._postings.get(term, set())
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        matches: Set[str] = set()
+        position = bisect.bisect_left(self._sorted_terms, term)
+        while position < len(self._sorted_terms) and self._sorted_terms[position].startswith(term):
+            matches |= self._postings[self._sorted_terms[position]]
+            position += 1
+        return matches
+
+    def candidate_ids(self, keywords: List[str], location: Optional[str] = None, limit: Optional[int] = 100,
+                      nearby_ids: Optional[Set[str]] = None) -> List[str]:
+        """
+        Args:
+            keywords: Query keywords; any of them may match (OR).
+            location: (Optional) Exact location filter (case-, space- and punctuation-insensitive).
+            limit: Maximum ids returned, or None for all.
+            nearby_ids: (Optional) Ids that also pass the location filter, e.g. those within the query radius.
+
+        Returns:
+            Matching business ids, the ones matching most keywords first (ties by business_id).
+        """
+        keyword_terms = [terms for terms in (index_terms(keyword) for keyword in keywords or []) if terms]
+        with self._lock:
+            allowed: Optional[Set[str]] = None
+            if location and normalize_location(location):
+                allowed = self._location_postings.get(normalize_location(location), set())
+                if nearby_ids is not None:
+                    allowed = allowed | (nearby_ids & self._profiles.keys())
+            if not keyword_terms:
+                ids = sorted(allowed if allowed is not None else self._profiles)
+                return ids[:limit] if limit is not None else ids
+
+            hits: Counter = Counter()
+            for terms in keyword_terms:
+                matched = self._term_matches(terms[0])
+                for term in terms[1:]:
+                    if not matched:
+                        break
+                    matched = matched & self._term_matches(term)
+                if allowed is not None:
+                    matched = matched & allowed
+                hits.update(matched)
+        ranked = sorted(hits, key=lambda business_id: (-hits[business_id], business_id))
+        return ranked[:limit] if limit is not None else ranked
+
+    def search(self, keywords: List[str], location: Optional[str] = None, limit: Optional[int] = 100,
+               nearby_ids: Optional[Set[str]] = None) -> List[BusinessIntakeData]:
+        """The profiles for candidate_ids(keywords, location, limit, nearby_ids)."""
+        ids = self.candidate_ids(keywords, location, limit, nearby_ids)
+        with self._lock:
+            return [self._profiles[business_id] for business_id in ids if business_id in self._profiles]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "businesses": len(self._profiles),
+                "terms": len(self._postings),
+                "locations": len(self._location_postings),
+                "watermark": self.watermark.isoformat() if self.watermark else None,
+            }
@@ -1,15 +1,32 @@
 """Service for matching customers to businesses"""
 
 import os
+import time
 import re # For more sophisticated keyword extraction
 import json # For parsing LLM JSON responses
 import logging # For logging
-from typing import List, Dict, Any, Optional
+import heapq
+import threading
+from datetime import timedelta
+from typing import List, Dict, Any, Optional, Set, Tuple
 import psycopg2 # For PostgreSQL interaction
 from psycopg2 import pool, extras # Added extras for DictCursor
+import psycopg2.errors
+import numpy as np
 
-from ..shared.data_models import CustomerQuery, MatchedBusiness, BusinessIntakeData
+from ..shared.data_models import CustomerQuery, MatchedBusiness, MatchedBusinessPage, BusinessIntakeData
+from ..shared.circuit_breaker import CircuitBreaker, HedgedCaller, get_shared_circuit_breaker, get_shared_hedged_caller
 from ..shared.llm_service import LLMService
+from .batch_scorer import KEYWORD_WEIGHT, LOCATION_WEIGHT, MATCH_THRESHOLD, SEMANTIC_WEIGHT, BatchRelevanceScorer, top_k_indices
+from .business_features import BusinessFeatureCache
+from .candidate_index import CandidateIndex
+from .deadline import MIN_STAGE_SECONDS, Deadline, stage_budgets_from_env
+from .geo import Gazetteer, GeoIndex, LocationScorer, get_shared_gazetteer
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, query_fingerprint
+from .query_understanding import QueryUnderstandingStore
+from .result_cache import MatchResultCache, result_cache_key
+from .semantic_index import SemanticIndex, business_profile_text
+from .taxonomy import Taxonomy, get_shared_taxonomy
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,8 +40,20 @@ class CustomerMatcherService:
     """
 
     DB_TABLE_NAME = "business_profiles" # Define table name as a constant
+    FTS_CONFIG = "english" # Must match the configuration of the search_vector column in master_schema.sql
+    PROFILE_COLUMNS = "business_id, business_name, industry, business_stage, goals, target_audience_description, products_services_description, location, service_tags, raw_data_json"
 
-    def __init__(self, llm_service: LLMService, db_config: Optional[Dict[str, str]] = None, min_conn: int = 1, max_conn: int = 5):
+    def __init__(self, llm_service: LLMService, db_config: Optional[Dict[str, str]] = None, min_conn: int = 1, max_conn: int = 5,
+                 semantic_batch_size: Optional[int] = None, semantic_mode: Optional[str] = None,
+                 semantic_index: Optional[SemanticIndex] = None, llm_rerank_top_n: Optional[int] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None, hedged_caller: Optional[HedgedCaller] = None,
+                 llm_timeout_seconds: Optional[float] = None, connection_pool: Optional[pool.AbstractConnectionPool] = None,
+                 retrieval_mode: Optional[str] = None, candidate_index: Optional[CandidateIndex] = None,
+                 feature_cache: Optional[BusinessFeatureCache] = None, batch_scoring: Optional[bool] = None,
+                 gazetteer: Optional[Gazetteer] = None, geo_radius_km: Optional[float] = None,
+                 result_cache: Optional[MatchResultCache] = None, query_understanding: Optional[QueryUnderstandingStore] = None,
+                 deadline_seconds: Optional[float] = None, stage_budgets: Optional[Dict[str, float]] = None,
+                 taxonomy: Optional[Taxonomy] = None):
         """
         Initialize the CustomerMatcherService.
         Args:
@@ -33,12 +62,94 @@ class CustomerMatcherService:
                        If not provided, uses environment variables.
             min_conn: Minimum number of connections for the pool.
             max_conn: Maximum number of connections for the pool.
+            semantic_batch_size: (Optional) Number of candidates scored per LLM semantic-similarity call.
+                       Defaults to MATCHER_SEMANTIC_BATCH_SIZE or 10. A value of 1 scores each candidate separately.
+            semantic_mode: (Optional) "vector" (default, local SemanticIndex) or "llm" (LLM scoring of every candidate).
+                       Defaults to MATCHER_SEMANTIC_MODE.
+            semantic_index: (Optional) A prebuilt SemanticIndex to share between services.
+            llm_rerank_top_n: (Optional) In vector mode, re-score the top N results with the LLM, once per query
+                       (the re-ranked scores are kept in result_cache for its later pages). Defaults to MATCHER_LLM_RERANK_TOP_N or 0 (disabled).
+            circuit_breaker: (Optional) Breaker guarding the matcher's LLM calls. While it is open, matching uses
+                       keyword/location (and vector) scoring only. Defaults to the process-wide "matcher.llm" breaker.
+            hedged_caller: (Optional) Runs LLM calls with a timeout and optional hedging (LLM_HEDGE_*).
+                       Defaults to the process-wide instance.
+            llm_timeout_seconds: (Optional) Longest the matcher waits on one LLM call before treating it as failed.
+                       Defaults to MATCHER_LLM_TIMEOUT_SECONDS or 10; 0 disables the timeout.
+            connection_pool: (Optional) A thread-safe pool shared with other services. When given, db_config,
+                       min_conn and max_conn are ignored and close_db_pool() leaves the pool open for its owner.
+            retrieval_mode: (Optional) "index" (default, in-memory CandidateIndex loaded at startup and refreshed
+                       from updated_at), "fts" (Postgres full-text search ranked by ts_rank_cd) or "sql" (ILIKE query
+                       per request). Defaults to MATCHER_RETRIEVAL_MODE.
+            candidate_index: (Optional) A prebuilt CandidateIndex to share between services.
+            feature_cache: (Optional) The BusinessFeatureCache of per-business scoring features (token set, tag set,
+                       normalized location and industry) and the term vocabulary behind them. Defaults to one sized by
+                       MATCHER_FEATURE_CACHE_SIZE and MATCHER_VOCABULARY_MAX_TERMS.
+            batch_scoring: (Optional) Score all candidates with the vectorized BatchRelevanceScorer when no
+                       per-candidate LLM call is needed, building reasons only for returned matches.
+                       Defaults to MATCHER_BATCH_SCORING or True.
+            gazetteer: (Optional) Place names -> coordinates used to match locations by distance.
+                       Defaults to the process-wide one loaded from MATCHER_GAZETTEER_FILE (empty if unset).
+            geo_radius_km: (Optional) In index retrieval, businesses within this distance of a query location
+                       found in the gazetteer are candidates too. Defaults to MATCHER_GEO_RADIUS_KM or 25;
+                       CustomerQuery.radius_km overrides it per query.
+            result_cache: (Optional) The MatchResultCache of ranked result pages by normalized query and page. Entries are
+                       invalidated when a business they contain changes in business_profiles. Defaults to one
+                       configured by MATCHER_RESULT_CACHE_SIZE and MATCHER_RESULT_CACHE_TTL_SECONDS.
+            query_understanding: (Optional) The QueryUnderstandingStore memoizing LLM query understanding by
+                       canonicalized query text. Defaults to one with a memory tier and, when there is a connection
+                       pool, the query_understanding table as a shared tier.
+            deadline_seconds: (Optional) Default time budget of one find_matched_businesses request; when it runs out,
+                       LLM stages are skipped and the result is flagged as degraded. Defaults to MATCHER_DEADLINE_SECONDS
+                       or 2.5; 0 disables the deadline and the stage budgets. A request may bring its own (see new_deadline).
+            stage_budgets: (Optional) Seconds per pipeline stage ("understanding", "retrieval", "semantic", "rerank").
+                       Defaults to MATCHER_<STAGE>_BUDGET_SECONDS (see deadline.py).
+            taxonomy: (Optional) Canonical service tags and synonyms; phrases found in a query add their tags to its
+                       keywords. Defaults to the process-wide one loaded from MATCHER_TAXONOMY_FILE (see taxonomy.py).
         """
         self.llm_service = llm_service
+        self.semantic_batch_size = max(1, semantic_batch_size or int(os.getenv("MATCHER_SEMANTIC_BATCH_SIZE", "10")))
+        self.semantic_mode = (semantic_mode or os.getenv("MATCHER_SEMANTIC_MODE", "vector")).lower()
+        if self.semantic_mode not in ("vector", "llm"):
+            logger.warning(f"Unknown semantic_mode '{self.semantic_mode}', falling back to 'vector'.")
+            self.semantic_mode = "vector"
+        self.semantic_index = semantic_index or SemanticIndex()
+        self.llm_rerank_top_n = max(0, llm_rerank_top_n if llm_rerank_top_n is not None else int(os.getenv("MATCHER_LLM_RERANK_TOP_N", "0")))
+        self.llm_breaker = circuit_breaker or get_shared_circuit_breaker("matcher.llm")
+        self.hedged_caller = hedged_caller or get_shared_hedged_caller()
+        timeout = llm_timeout_seconds if llm_timeout_seconds is not None else float(os.getenv("MATCHER_LLM_TIMEOUT_SECONDS", "10"))
+        self.llm_timeout_seconds = timeout if timeout > 0 else None
+        self.retrieval_mode = (retrieval_mode or os.getenv("MATCHER_RETRIEVAL_MODE", "index")).lower()
+        if self.retrieval_mode not in ("index", "fts", "sql"):
+            logger.warning(f"Unknown retrieval_mode '{self.retrieval_mode}', falling back to 'index'.")
+            self.retrieval_mode = "index"
+        self.candidate_index = candidate_index if candidate_index is not None else CandidateIndex()
+        self.feature_cache = feature_cache if feature_cache is not None else BusinessFeatureCache()
+        self.batch_scoring = batch_scoring if batch_scoring is not None else os.getenv("MATCHER_BATCH_SCORING", "true").lower() == "true"
+        self.gazetteer = gazetteer if gazetteer is not None else get_shared_gazetteer()
+        self.geo_radius_km = geo_radius_km if geo_radius_km is not None else float(os.getenv("MATCHER_GEO_RADIUS_KM", "25"))
+        self.geo_index = GeoIndex()
+        self.location_scorer = LocationScorer(self.gazetteer)
+        self.batch_scorer = BatchRelevanceScorer(self.location_scorer)
+        self.result_cache = result_cache if result_cache is not None else MatchResultCache()
+        self.deadline_seconds = deadline_seconds if deadline_seconds is not None else float(os.getenv("MATCHER_DEADLINE_SECONDS", "2.5"))
+        self.stage_budgets = stage_budgets if stage_budgets is not None else stage_budgets_from_env()
+        self.taxonomy = taxonomy if taxonomy is not None else get_shared_taxonomy()
+        self._seen_updates: Dict[str, Any] = {}  # business_id -> updated_at of rows read by the last refresh
+        self._result_cache_watermark = None  # Highest updated_at seen by refresh_result_cache
+        self.index_refresh_seconds = float(os.getenv("MATCHER_INDEX_REFRESH_SECONDS", "30"))
+        self.index_refresh_overlap_seconds = float(os.getenv("MATCHER_INDEX_REFRESH_OVERLAP_SECONDS", "60"))
+        self.index_delete_sweep_seconds = float(os.getenv("MATCHER_INDEX_DELETE_SWEEP_SECONDS", "300"))
+        self._index_refresh_lock = threading.Lock()
+        self._last_index_refresh = time.monotonic()
+        self._last_delete_sweep = time.monotonic()
         self.db_connection_pool = None
         self._db_config = None
+        self._owns_db_pool = connection_pool is None
 
-        if db_config:
+        if connection_pool is not None:
+            self.db_connection_pool = connection_pool
+            logger.info("Using shared database connection pool.")
+        elif db_config:
             self._db_config = db_config
         else:
             logger.info("Database configuration not provided directly, attempting to load from environment variables...")
@@ -54,10 +165,11 @@ class CustomerMatcherService:
             else:
                 logger.info("Database configuration loaded from environment variables.")
 
-        if self._db_config and all(val for val in [self._db_config["host"], self._db_config["user"], self._db_config["password"], self._db_config["dbname"]]):
+        if self._owns_db_pool and self._db_config and all(val for val in [self._db_config["host"], self._db_config["user"], self._db_config["password"], self._db_config["dbname"]]):
             try:
                 logger.info(f"Initializing database connection pool for {self._db_config['dbname']} on {self._db_config['host']}:{self._db_config['port']}...")
-                self.db_connection_pool = psycopg2.pool.SimpleConnectionPool(
+                # Threaded: one instance may serve concurrent requests
+                self.db_connection_pool = psycopg2.pool.ThreadedConnectionPool(
                     min_conn, 
                     max_conn,
                     host=self._db_config["host"],
@@ -72,8 +184,15 @@ class CustomerMatcherService:
             except psycopg2.Error as e:
                 logger.error(f"Error creating database connection pool: {e}")
                 self.db_connection_pool = None
-        else:
+        elif self._owns_db_pool:
             logger.warning("Database configuration is incomplete. Connection pool not created.")
+
+        self.query_understanding = query_understanding if query_understanding is not None else QueryUnderstandingStore(self.db_connection_pool)
+
+        if self.db_connection_pool and self.semantic_mode == "vector" and semantic_index is None:
+            self.load_semantic_index()
+        if self.db_connection_pool and self.retrieval_mode == "index" and not self.candidate_index.loaded:
+            self.load_candidate_index()
         
         logger.info("CustomerMatcherService initialized. Database integration setup attempted.")
         logger.info("Note: Ensure psycopg2-binary is installed (pip install psycopg2-binary).")
@@ -92,24 +211,383 @@ class CustomerMatcherService:
             self.db_connection_pool.putconn(conn)
 
     def close_db_pool(self):
-        if self.db_connection_pool:
+        if self.db_connection_pool and self._owns_db_pool:
             logger.info("Closing database connection pool...")
             self.db_connection_pool.closeall()
             logger.info("Database connection pool closed.")
 
-    def _retrieve_candidate_businesses(self, processed_query: Dict[str, Any]) -> List[BusinessIntakeData]:
-        """Retrieves candidate business profiles from the database based on processed query criteria."""
+    def load_semantic_index(self) -> int:
+        """(Re)builds the vector index from every row of business_profiles. Returns the number of vectors loaded."""
+        conn = self._get_db_connection()
+        if not conn:
+            logger.error("Cannot load semantic index: No database connection.")
+            return 0
+        sql_query = (f"SELECT business_id, business_name, industry, target_audience_description, "
+                     f"products_services_description, service_tags FROM {self.DB_TABLE_NAME};")
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                cur.execute(sql_query)
+                items = []
+                for row in cur.fetchall():
+                    profile = BusinessIntakeData(
+                        business_name=row["business_name"],
+                        industry=row["industry"] or "",
+                        business_stage="",
+                        goals=[],
+                        target_audience_description=row["target_audience_description"] or "",
+                        products_services_description=row["products_services_description"] or "",
+                        raw_responses={"service_tags": list(row["service_tags"]) if row["service_tags"] else []}
+                    )
+                    items.append((row["business_id"], business_profile_text(profile)))
+            self.semantic_index.build(items)
+            return len(items)
+        except psycopg2.Error as e:
+            logger.error(f"Database error while loading semantic index: {e}")
+            return 0
+        finally:
+            self._put_db_connection(conn)
+
+    def _llm_enabled(self) -> bool:
+        """True if LLM calls can be attempted: an API key is configured and the LLM circuit is not open."""
+        return self.llm_service.is_api_key_available() and not self.llm_breaker.is_open()
+
+    def _guarded_json_call(self, prompt: str, max_tokens: int, caller: str, deadline: Optional[Deadline] = None,
+                           stage: Optional[str] = None, **kwargs: Any) -> Optional[Any]:
+        """
+        generate_json_response behind the circuit breaker, with the matcher's timeout and optional hedging.
+        Returns None (so callers fall back to keyword/location scoring) when the circuit is open,
+        the call fails or it times out. Failures and slow calls are recorded on the breaker.
+        With a deadline, the timeout is also capped by the time stage has left; a call cut short by it degrades the result.
+        """
+        if not self.llm_breaker.allow_request():
+            logger.info(f"LLM circuit '{self.llm_breaker.name}' is open, skipping {caller} call.")
+            return None
+        timeout = deadline.timeout_for(stage, self.llm_timeout_seconds) if deadline is not None else self.llm_timeout_seconds
+        start = time.monotonic()
+        success = False
+        try:
+            result, timed_out = self.hedged_caller.call(
+                caller,
+                # The timeout is passed on too, so an abandoned call stops instead of holding a hedged-call worker
+                lambda: self.llm_service.generate_json_response(prompt, max_tokens=max_tokens, caller=caller, timeout=timeout, **kwargs),
+                # The hedge bypasses the cache so it is not coalesced onto the primary's in-flight call
+                hedge=lambda: self.llm_service.generate_json_response(prompt, max_tokens=max_tokens, caller=caller, use_cache=False,
+                                                                      timeout=timeout, **kwargs),
+                timeout=timeout,
+            )
+            success = result is not None and not timed_out
+            if timed_out and deadline is not None and timeout != self.llm_timeout_seconds:
+                deadline.skip(stage)
+            return result
+        finally:
+            self.llm_breaker.record(success, time.monotonic() - start)
+
+    def new_deadline(self, timeout_seconds: Optional[float] = None) -> Deadline:
+        """
+        A Deadline for one request, with the configured stage budgets. A timeout <= 0 disables the deadline
+        entirely: no stage budgets apply either, so nothing is cut short or skipped for time.
+
+        Args:
+            timeout_seconds: (Optional) The request's own time budget, e.g. from a request header.
+                             Defaults to deadline_seconds.
+        """
+        timeout_seconds = timeout_seconds if timeout_seconds is not None else self.deadline_seconds
+        if timeout_seconds <= 0:
+            return Deadline()
+        return Deadline(timeout_seconds, self.stage_budgets)
+
+    def get_llm_guard_stats(self) -> Dict[str, Any]:
+        """Returns the LLM circuit breaker state and timeout/hedging counters."""
+        return {"circuit_breaker": self.llm_breaker.get_stats(), "hedging": self.hedged_caller.get_stats()}
+
+    def _profile_from_row(self, row) -> BusinessIntakeData:
+        """Builds a BusinessIntakeData from a business_profiles row (PROFILE_COLUMNS, via DictCursor)."""
+        raw_responses_data = {
+            "business_id": row["business_id"],
+            "location": row["location"],
+            "service_tags": list(row["service_tags"]) if row["service_tags"] else [],
+        }
+        if row["raw_data_json"] and isinstance(row["raw_data_json"], dict):
+            raw_responses_data.update(row["raw_data_json"])
+        elif isinstance(row["raw_data_json"], str):
+            try:
+                raw_responses_data.update(json.loads(row["raw_data_json"]))
+            except json.JSONDecodeError as json_e:
+                logger.warning(f"Could not parse raw_data_json string for business_id {row['business_id']}: {json_e}")
+
+        return BusinessIntakeData(
+            business_name=row["business_name"],
+            industry=row["industry"],
+            business_stage=row["business_stage"],
+            goals=list(row["goals"]) if row["goals"] else [],
+            target_audience_description=row["target_audience_description"],
+            products_services_description=row["products_services_description"],
+            raw_responses=raw_responses_data
+        )
+
+    def load_candidate_index(self) -> int:
+        """(Re)builds the in-memory CandidateIndex from every row of business_profiles. Returns the number of profiles loaded."""
+        conn = self._get_db_connection()
+        if not conn:
+            logger.error("Cannot load candidate index: No database connection.")
+            return 0
+        sql_query = f"SELECT {self.PROFILE_COLUMNS}, updated_at FROM {self.DB_TABLE_NAME};"
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                cur.execute(sql_query)
+                rows = cur.fetchall()
+            profiles = [self._profile_from_row(row) for row in rows]
+            self.geo_index.build([])
+            self.feature_cache.clear()  # A full reload also starts a new term vocabulary
+            for profile in profiles:
+                self.feature_cache.put_profile(profile)
+                self._index_coordinates(profile)
+            watermark = max((row["updated_at"] for row in rows if row["updated_at"]), default=None)
+            self.candidate_index.build(profiles, watermark=watermark)
+            self._last_index_refresh = self._last_delete_sweep = time.monotonic()
+            return len(profiles)
+        except psycopg2.Error as e:
+            logger.error(f"Database error while loading candidate index: {e}")
+            return 0
+        finally:
+            self._put_db_connection(conn)
+
+    def refresh_candidate_index(self, sweep_deletions: bool = False) -> Dict[str, int]:
+        """
+        Applies changes since the index watermark: rows with a newer updated_at are re-indexed (in the
+        SemanticIndex too, in vector mode). Rows are re-read from MATCHER_INDEX_REFRESH_OVERLAP_SECONDS before
+        the watermark, so updates from transactions that committed late are not missed; re-indexing is idempotent.
+        Deleted rows have no updated_at, so with sweep_deletions the current ids are compared against the index.
+
+        Returns:
+            Counts of "upserted" and "removed" profiles.
+        """
+        counts = {"upserted": 0, "removed": 0}
+        if not self.candidate_index.loaded:
+            return counts
+        conn = self._get_db_connection()
+        if not conn:
+            logger.error("Cannot refresh candidate index: No database connection.")
+            return counts
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                watermark = self.candidate_index.watermark
+                if watermark is None:
+                    cur.execute(f"SELECT {self.PROFILE_COLUMNS}, updated_at FROM {self.DB_TABLE_NAME};")
+                else:
+                    since = watermark - timedelta(seconds=self.index_refresh_overlap_seconds)
+                    cur.execute(f"SELECT {self.PROFILE_COLUMNS}, updated_at FROM {self.DB_TABLE_NAME} WHERE updated_at >= %s;", (since,))
+                rows = cur.fetchall()
+                seen: Dict[str, Any] = {}
+                for row in rows:
+                    self._invalidate_if_changed(row["business_id"], row["updated_at"], seen)
+                    profile = self._profile_from_row(row)
+                    self.candidate_index.upsert(profile)
+                    self.feature_cache.put_profile(profile)
+                    self._index_coordinates(profile)
+                    if self.semantic_mode == "vector" and len(self.semantic_index):
+                        self.semantic_index.upsert(row["business_id"], business_profile_text(profile))
+                    if row["updated_at"] and (self.candidate_index.watermark is None or row["updated_at"] > self.candidate_index.watermark):
+                        self.candidate_index.watermark = row["updated_at"]
+                counts["upserted"] = len(rows)
+                self._seen_updates = seen
+
+                if sweep_deletions:
+                    cur.execute(f"SELECT business_id FROM {self.DB_TABLE_NAME};")
+                    current_ids = {row["business_id"] for row in cur.fetchall()}
+                    for business_id in self.candidate_index.business_ids() - current_ids:
+                        self.candidate_index.remove(business_id)
+                        self.semantic_index.remove(business_id)
+                        self.feature_cache.invalidate(business_id)
+                        self.geo_index.remove(business_id)
+                        self.result_cache.invalidate_business(business_id)
+                        counts["removed"] += 1
+            if counts["upserted"] or counts["removed"]:
+                logger.info(f"Candidate index refreshed: {counts['upserted']} upserted, {counts['removed']} removed.")
+        except psycopg2.Error as e:
+            logger.error(f"Database error while refreshing candidate index: {e}")
+        finally:
+            self._put_db_connection(conn)
+        return counts
+
+    def _invalidate_if_changed(self, business_id: str, updated_at: Any, seen: Dict[str, Any]) -> None:
+        """
+        Invalidates the cached results containing business_id unless the previous refresh already read this
+        version of the row (rows inside the overlap window are read again by every refresh).
+        """
+        seen[business_id] = updated_at
+        if self._seen_updates.get(business_id) != updated_at:
+            self.result_cache.invalidate_business(business_id)
+
+    def refresh_result_cache(self, sweep_deletions: bool = False) -> int:
+        """
+        Without a loaded CandidateIndex (sql/fts retrieval) nothing else reads business_profiles changes, so this
+        reads the rows updated since the last call (with the same overlap as refresh_candidate_index) and
+        invalidates the cached results containing them. With sweep_deletions, cached businesses that no longer
+        exist are invalidated too.
+
+        Returns:
+            The number of changed or deleted businesses.
+        """
+        conn = self._get_db_connection()
+        if not conn:
+            logger.error("Cannot refresh result cache: No database connection.")
+            return 0
+        changed = 0
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                if self._result_cache_watermark is None:
+                    cur.execute(f"SELECT MAX(updated_at) AS updated_at FROM {self.DB_TABLE_NAME};")
+                    rows = cur.fetchall()
+                    self._result_cache_watermark = rows[0]["updated_at"] if rows else None
+                    self.result_cache.clear()  # Nothing is known about what changed before the first watermark
+                else:
+                    since = self._result_cache_watermark - timedelta(seconds=self.index_refresh_overlap_seconds)
+                    cur.execute(f"SELECT business_id, updated_at FROM {self.DB_TABLE_NAME} WHERE updated_at >= %s;", (since,))
+                    seen: Dict[str, Any] = {}
+                    for row in cur.fetchall():
+                        changed += self._seen_updates.get(row["business_id"]) != row["updated_at"]
+                        self._invalidate_if_changed(row["business_id"], row["updated_at"], seen)
+                        if row["updated_at"] > self._result_cache_watermark:
+                            self._result_cache_watermark = row["updated_at"]
+                    self._seen_updates = seen
+
+                cached_ids = self.result_cache.business_ids()
+                if sweep_deletions and cached_ids:
+                    cur.execute(f"SELECT business_id FROM {self.DB_TABLE_NAME} WHERE business_id = ANY(%s);", (list(cached_ids),))
+                    for business_id in cached_ids - {row["business_id"] for row in cur.fetchall()}:
+                        self.result_cache.invalidate_business(business_id)
+                        changed += 1
+        except psycopg2.Error as e:
+            logger.error(f"Database error while refreshing result cache: {e}")
+        finally:
+            self._put_db_connection(conn)
+        return changed
+
+    def _maybe_refresh_candidate_index(self) -> None:
+        """
+        Applies business_profiles changes when MATCHER_INDEX_REFRESH_SECONDS have passed: refreshes the CandidateIndex,
+        or without one, just the result cache invalidations. Other requests keep searching meanwhile.
+        """
+        now = time.monotonic()
+        if now - self._last_index_refresh < self.index_refresh_seconds or not self._index_refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if now - self._last_index_refresh < self.index_refresh_seconds:
+                return  # Another request refreshed it first
+            sweep = now - self._last_delete_sweep >= self.index_delete_sweep_seconds
+            if self.candidate_index.loaded:
+                self.refresh_candidate_index(sweep_deletions=sweep)
+            elif self.result_cache.enabled:
+                self.refresh_result_cache(sweep_deletions=sweep)
+            self._last_index_refresh = time.monotonic()
+            if sweep:
+                self._last_delete_sweep = self._last_index_refresh
+        finally:
+            self._index_refresh_lock.release()
+
+    def _index_coordinates(self, profile: BusinessIntakeData) -> None:
+        """Keeps the GeoIndex entry of a profile in step with its location (removed if it is not in the gazetteer)."""
+        business_id = profile.raw_responses.get("business_id")
+        if not business_id:
+            return
+        place = self.gazetteer.resolve(profile.raw_responses.get("location"))
+        if place is not None:
+            self.geo_index.upsert(business_id, place.latitude, place.longitude)
+        else:
+            self.geo_index.remove(business_id)
+
+    def _nearby_business_ids(self, processed_query: Dict[str, Any]) -> Optional[Set[str]]:
+        """Ids of indexed businesses within the query radius, or None if the query location is not in the gazetteer."""
+        place = self.gazetteer.resolve(processed_query.get("location"))
+        if place is None or not len(self.geo_index):
+            return None
+        radius_km = processed_query.get("radius_km") or self.geo_radius_km
+        return set(self.geo_index.within_radius(place.latitude, place.longitude, radius_km))
+
+    def get_result_cache_stats(self) -> Dict[str, Any]:
+        """Returns the result cache size, hit rate, and expiration, eviction and invalidation counts."""
+        return self.result_cache.get_stats()
+
+    def get_candidate_index_stats(self) -> Dict[str, Any]:
+        """Returns the retrieval mode, the CandidateIndex size and watermark, the feature cache counters and the GeoIndex size."""
+        return {"retrieval_mode": self.retrieval_mode, **self.candidate_index.get_stats(), "feature_cache": self.feature_cache.get_stats(),
+                "geo_index": {**self.geo_index.get_stats(), "gazetteer_places": len(self.gazetteer)}}
+
+    def _retrieve_candidate_businesses(self, processed_query: Dict[str, Any], deadline: Optional[Deadline] = None) -> List[BusinessIntakeData]:
+        """
+        Retrieves candidate business profiles from the in-memory index, or from the database based on processed query criteria.
+        With a deadline, the database query runs under a statement_timeout of the retrieval stage's remaining time,
+        and a failed retrieval (no connection, database error, timeout) is recorded on it, so its empty result is
+        flagged as degraded rather than cached as "no matches".
+        """
+        query_keywords = processed_query.get("keywords", [])
+        query_location = processed_query.get("location")
+        if self.retrieval_mode == "index" and self.candidate_index.loaded:
+            if self.db_connection_pool:
+                self._maybe_refresh_candidate_index()
+            profiles = self.candidate_index.search(query_keywords, query_location, limit=100,
+                                                   nearby_ids=self._nearby_business_ids(processed_query))
+            logger.debug(f"Retrieved {len(profiles)} candidate profiles from the candidate index.")
+            return profiles
+
+        statement_timeout = deadline.timeout_for("retrieval") if deadline is not None else None
+        if statement_timeout is not None and statement_timeout < MIN_STAGE_SECONDS:
+            deadline.skip("retrieval")
+            return []
+
         conn = self._get_db_connection()
         if not conn:
             logger.error("Cannot retrieve candidates: No database connection.")
+            if deadline is not None:
+                deadline.skip("retrieval", "no database connection")
             return []
 
         profiles: List[BusinessIntakeData] = []
-        query_keywords = processed_query.get("keywords", [])
-        query_location = processed_query.get("location")
+        candidate_query = self._fts_candidate_query(query_keywords, query_location) if self.retrieval_mode == "fts" else None
+        sql_query, params = candidate_query or self._ilike_candidate_query(query_keywords, query_location)
+        logger.debug(f"Executing candidate retrieval query: {sql_query} with params {params}")
 
-        select_columns = "business_id, business_name, industry, business_stage, goals, target_audience_description, products_services_description, location, service_tags, raw_data_json"
-        sql_base = f"SELECT {select_columns} FROM {self.DB_TABLE_NAME}"
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                try:
+                    self._set_statement_timeout(cur, statement_timeout)
+                    cur.execute(sql_query, tuple(params))
+                except (psycopg2.errors.UndefinedColumn, psycopg2.errors.UndefinedFunction) as e:
+                    if candidate_query is None:
+                        raise
+                    # Schema predates search_vector: keep serving with the ILIKE query until it is migrated
+                    logger.error(f"Full-text retrieval unavailable ({e}). Apply database/master_schema.sql; using 'sql' retrieval meanwhile.")
+                    self.retrieval_mode = "sql"
+                    conn.rollback()
+                    sql_query, params = self._ilike_candidate_query(query_keywords, query_location)
+                    self._set_statement_timeout(cur, statement_timeout)  # SET LOCAL ended with the rolled back transaction
+                    cur.execute(sql_query, tuple(params))
+                rows = cur.fetchall()
+                for row in rows:
+                    profiles.append(self._profile_from_row(row))
+            logger.debug(f"Retrieved {len(profiles)} candidate profiles from database.")
+        except psycopg2.errors.QueryCanceled as e:
+            logger.warning(f"Candidate retrieval was canceled (statement_timeout {statement_timeout}s): {e}")
+            if deadline is not None:
+                deadline.skip("retrieval")
+        except psycopg2.Error as e:
+            logger.error(f"Database error while retrieving candidate profiles: {e}")
+            if deadline is not None:
+                deadline.skip("retrieval", "database error")
+        finally:
+            self._put_db_connection(conn)
+        return profiles
+
+    @staticmethod
+    def _set_statement_timeout(cur, timeout_seconds: Optional[float]) -> None:
+        """Limits the statements of the current transaction to timeout_seconds (no-op for None)."""
+        if timeout_seconds is not None:
+            cur.execute("SET LOCAL statement_timeout = %s;", (max(1, int(timeout_seconds * 1000)),))
+
+    def _ilike_candidate_query(self, query_keywords: List[str], query_location: Optional[str]) -> Tuple[str, List[Any]]:
+        """Any keyword as a substring of name, description, industry or a service tag; the first 100 matches in no particular order."""
+        sql_base = f"SELECT {self.PROFILE_COLUMNS} FROM {self.DB_TABLE_NAME}"
         
         where_clauses = []
         params = []
@@ -137,84 +615,186 @@ class CustomerMatcherService:
         if where_clauses:
             sql_query += " WHERE " + " AND ".join(where_clauses)
         sql_query += " LIMIT 100;"
-        
-        logger.debug(f"Executing candidate retrieval query: {sql_query} with params {params}")
-
-        try:
-            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                cur.execute(sql_query, tuple(params))
-                rows = cur.fetchall()
-                for row in rows:
-                    raw_responses_data = {
-                        "business_id": row["business_id"],
-                        "location": row["location"],
-                        "service_tags": list(row["service_tags"]) if row["service_tags"] else [],
-                    }
-                    if row["raw_data_json"] and isinstance(row["raw_data_json"], dict):
-                        raw_responses_data.update(row["raw_data_json"])
-                    elif isinstance(row["raw_data_json"], str):
-                        try:
-                            raw_responses_data.update(json.loads(row["raw_data_json"]))
-                        except json.JSONDecodeError as json_e:
-                            logger.warning(f"Could not parse raw_data_json string for business_id {row['business_id']}: {json_e}")
+        return sql_query, params
 
-                    profiles.append(BusinessIntakeData(
-                        business_name=row["business_name"],
-                        industry=row["industry"],
-                        business_stage=row["business_stage"],
-                        goals=list(row["goals"]) if row["goals"] else [],
-                        target_audience_description=row["target_audience_description"],
-                        products_services_description=row["products_services_description"],
-                        raw_responses=raw_responses_data
-                    ))
-            logger.debug(f"Retrieved {len(profiles)} candidate profiles from database.")
-        except psycopg2.Error as e:
-            logger.error(f"Database error while retrieving candidate profiles: {e}")
-        finally:
-            self._put_db_connection(conn)
-        return profiles
+    def _fts_candidate_query(self, query_keywords: List[str], query_location: Optional[str]) -> Optional[Tuple[str, List[Any]]]:
+        """
+        The 100 best full-text matches: the keywords OR-ed into a websearch_to_tsquery (words of one keyword
+        are AND-ed), matched against the GIN-indexed search_vector column and ordered by ts_rank_cd.
+        Returns None when no keyword has a searchable word (the ILIKE query then applies).
+        """
+        groups = []
+        for keyword in query_keywords:
+            words = [word for word in re.findall(r"\w+", keyword.lower()) if word != "or"]
+            if words:
+                groups.append(" ".join(words))
+        if not groups:
+            return None
+        params: List[Any] = [" or ".join(groups)]
+        sql_query = (f"SELECT {self.PROFILE_COLUMNS}, ts_rank_cd(search_vector, fts_query) AS fts_rank "
+                     f"FROM {self.DB_TABLE_NAME}, websearch_to_tsquery('{self.FTS_CONFIG}', %s) AS fts_query "
+                     f"WHERE search_vector @@ fts_query")
+        if query_location:
+            sql_query += " AND LOWER(location) = %s"
+            params.append(query_location.lower())
+        sql_query += " ORDER BY fts_rank DESC, business_id LIMIT 100;"
+        return sql_query, params
 
     def find_matched_businesses(self, customer_query: CustomerQuery) -> List[MatchedBusiness]:
         """
-        Main method to find and rank businesses matching a customer query.
+        Main method to find and rank businesses matching a customer query. Returns every match, best first
+        (find_matched_businesses_page pages through them).
         """
+        return self.find_matched_businesses_page(customer_query).matches
+
+    def find_matched_businesses_page(self, customer_query: CustomerQuery, limit: Optional[int] = None,
+                                     cursor: Optional[str] = None, deadline: Optional[Deadline] = None) -> MatchedBusinessPage:
+        """
+        Finds and ranks businesses matching a customer query and returns one page of them, ordered by
+        relevance_score and then business_id. Only the page's matches get match reasons and relevant services.
+
+        Args:
+            customer_query: The customer's query.
+            limit: (Optional) Page size. None returns all matches after the cursor.
+            cursor: (Optional) The next_cursor of the previous page of the same query.
+            deadline: (Optional) The request's Deadline. Defaults to new_deadline(). LLM stages it has no time
+                      left for are skipped and the page is flagged as degraded (and not cached).
+
+        Returns:
+            The page, with next_cursor set when more matches follow.
+
+        Raises:
+            InvalidCursor: The cursor is malformed or was issued for a different query.
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be at least 1")
         logger.info(f"Starting business matching for query: {customer_query.query_text or customer_query.keywords}")
+        deadline = deadline if deadline is not None else self.new_deadline()
 
-        processed_query = self._preprocess_query(customer_query)
-        
+        processed_query = self._preprocess_query(customer_query, deadline)
+        query_key = result_cache_key(processed_query)
+        fingerprint = query_fingerprint(query_key)
+        after = decode_cursor(cursor, fingerprint) if cursor else None
+
+        if self.db_connection_pool:
+            self._maybe_refresh_candidate_index()  # Apply profile changes (and their invalidations) before reading the cache
+        cache_key = (query_key, after, limit)
+        cached_page = self.result_cache.get(cache_key)
+        if cached_page is not None:
+            logger.info(f"Returning {len(cached_page.matches)} cached matches for this query.")
+            return cached_page
+        generation = self.result_cache.generation
+
+        matches, has_more = self._rank_matches(processed_query, limit, after, deadline)
+        next_cursor = encode_cursor(matches[-1].relevance_score, matches[-1].business_id, fingerprint) if has_more else None
+        page = MatchedBusinessPage(matches=matches, next_cursor=next_cursor, degraded=deadline.degraded,
+                                   degraded_stages=list(deadline.degraded_stages))
+        # Results computed without the LLM because its circuit is open or time ran out are not cached
+        if not self.llm_breaker.is_open() and not page.degraded:
+            self.result_cache.put(cache_key, page, generation)
+        return page
+
+    @staticmethod
+    def _result_business_id(business_profile: BusinessIntakeData) -> str:
+        return business_profile.raw_responses.get("business_id", "unknown")
+
+    def _rank_matches(self, processed_query: Dict[str, Any], limit: Optional[int] = None,
+                      after: Optional[Tuple[float, str]] = None, deadline: Optional[Deadline] = None) -> Tuple[List[MatchedBusiness], bool]:
+        """
+        Stages 3 and 4 of find_matched_businesses: candidate retrieval, scoring and top-k selection of the
+        limit best matches after the cursor position. Returns the page's matches and whether more follow.
+        LLM scoring and re-ranking only run while the deadline leaves their stage time.
+        """
         logger.info("Stage 3: Candidate Business Retrieval (from DB)...")
-        candidate_businesses = self._retrieve_candidate_businesses(processed_query)
+        candidate_businesses = self._retrieve_candidate_businesses(processed_query, deadline)
 
         logger.info("Stage 4: Fine-Grained Matching & Ranking...")
         matched_businesses: List[MatchedBusiness] = []
         if not candidate_businesses:
             logger.info("No candidate businesses found from database for this query.")
-            return []
-            
-        for business_profile in candidate_businesses:
-            relevance_score, match_reason_list = self._calculate_relevance(processed_query, business_profile)
+            return [], False
+
+        semantic_results: Dict[int, Tuple[float, Optional[str]]] = {}
+        if self.semantic_mode == "vector":
+            semantic_source = "Vector"
+            semantic_results = self._vector_semantic_scores(processed_query, candidate_businesses)
+        else:
+            semantic_source = "LLM"
+            if self.semantic_batch_size > 1 and processed_query.get("original_text") and self._llm_enabled():
+                semantic_results = self._batch_semantic_scores(processed_query, candidate_businesses, deadline)
+
+        result_ids = [self._result_business_id(profile) for profile in candidate_businesses]
+        k = limit + 1 if limit is not None else None  # One extra match tells whether another page follows
+
+        # Per-candidate LLM scoring is only needed for candidates without a semantic result while the LLM is usable
+        needs_llm_per_candidate = len(semantic_results) < len(candidate_businesses) and bool(processed_query.get("original_text")) and self._llm_enabled()
+        if needs_llm_per_candidate and semantic_source == "LLM" and deadline is not None and not deadline.allows("semantic"):
+            deadline.skip("semantic")
+            needs_llm_per_candidate = False
+        if self.batch_scoring and not needs_llm_per_candidate:
+            scored_candidates = self._batch_scored_candidates(processed_query, candidate_businesses, semantic_results, semantic_source,
+                                                              result_ids=result_ids, k=k, after=after)
+        else:
+            scored_candidates = []
+            for index, business_profile in enumerate(candidate_businesses):
+                # In LLM mode, candidates the batch call could not score fall back to per-candidate scoring inside _calculate_relevance
+                relevance_score, match_reason_list = self._calculate_relevance(
+                    processed_query, business_profile, semantic_result=semantic_results.get(index), semantic_source=semantic_source,
+                    deadline=deadline
+                )
+                scored_candidates.append((relevance_score, match_reason_list, index))
+
+        if semantic_source == "Vector" and self.llm_rerank_top_n > 0 and processed_query.get("original_text"):
+            scored_candidates = self._reranked_candidates(processed_query, candidate_businesses, scored_candidates, result_ids, deadline)
+
+        page = self._select_page(scored_candidates, result_ids, k, after)
+        has_more = k is not None and len(page) == k
+        for relevance_score, match_reason_list, index in page[:limit]:
+            business_profile = candidate_businesses[index]
+            if match_reason_list is None:
+                # Batch-scored: reasons are built only for returned matches (the score is identical)
+                _, match_reason_list = self._calculate_relevance(
+                    processed_query, business_profile, semantic_result=semantic_results.get(index), semantic_source=semantic_source,
+                    deadline=deadline
+                )
             match_reason_str = "; ".join(match_reason_list)
-            # Adjusted threshold, can be tuned further based on real data performance
-            if relevance_score > 0.15: 
-                matched_businesses.append(
-                    MatchedBusiness(
-                        business_id=business_profile.raw_responses.get("business_id", "unknown"), # Ensure this is reliable
-                        business_name=business_profile.business_name,
-                        tagline=business_profile.raw_responses.get("tagline", f"Your trusted {business_profile.industry} provider"),
-                        relevant_services=self._extract_relevant_services(business_profile, processed_query),
-                        location=business_profile.raw_responses.get("location"),
-                        contact_info=f"Contact details for {business_profile.business_name}", # Placeholder
-                        match_reason=match_reason_str,
-                        relevance_score=relevance_score
-                    )
+            matched_businesses.append(
+                MatchedBusiness(
+                    business_id=result_ids[index], # Ensure this is reliable
+                    business_name=business_profile.business_name,
+                    tagline=business_profile.raw_responses.get("tagline", f"Your trusted {business_profile.industry} provider"),
+                    relevant_services=self._extract_relevant_services(business_profile, processed_query),
+                    location=business_profile.raw_responses.get("location"),
+                    contact_info=f"Contact details for {business_profile.business_name}", # Placeholder
+                    match_reason=match_reason_str,
+                    relevance_score=relevance_score
                 )
-        
-        matched_businesses.sort(key=lambda x: x.relevance_score, reverse=True)
-        logger.info(f"Matching complete. Found {len(matched_businesses)} relevant businesses after ranking.")
-        return matched_businesses
+            )
+
+        logger.info(f"Matching complete. Returning {len(matched_businesses)} relevant businesses after ranking.")
+        return matched_businesses, has_more
 
-    def _preprocess_query(self, query: CustomerQuery) -> Dict[str, Any]:
-        """Processes the customer query to extract keywords, location, and understand intent."""
+    @staticmethod
+    def _select_page(scored_candidates: List[Tuple[float, Optional[List[str]], int]], result_ids: List[str],
+                     k: Optional[int], after: Optional[Tuple[float, str]]) -> List[Tuple[float, Optional[List[str]], int]]:
+        """
+        The k best scored candidates above MATCH_THRESHOLD (all if k is None) ranked after the cursor position,
+        ordered by score and then business_id. Uses a bounded heap, so a page costs O(n log k).
+        """
+        def rank_key(item: Tuple[float, Optional[List[str]], int]) -> Tuple[float, str]:
+            return -item[0], result_ids[item[2]]
+
+        # Adjusted threshold, can be tuned further based on real data performance
+        eligible = (item for item in scored_candidates if item[0] > MATCH_THRESHOLD)
+        if after is not None:
+            after_key = (-after[0], after[1])
+            eligible = (item for item in eligible if rank_key(item) > after_key)
+        if k is None:
+            return sorted(eligible, key=rank_key)
+        return heapq.nsmallest(k, eligible, key=rank_key)
+
+    def _preprocess_query(self, query: CustomerQuery, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Processes the customer query to extract keywords, location, and understand intent (the LLM step only within the deadline)."""
         original_keywords = [k.lower().strip() for k in query.keywords if k.strip()] if query.keywords else []
         original_text = query.query_text.lower().strip() if query.query_text else ""
         
@@ -231,6 +811,8 @@ class CustomerMatcherService:
 
         if query.location and query.location.strip():
             processed["location"] = query.location.lower().strip()
+        if query.radius_km and query.radius_km > 0:
+            processed["radius_km"] = float(query.radius_km)
         
         if original_text and not processed["keywords"]:
             # Basic keyword extraction from text if no keywords provided
@@ -238,7 +820,14 @@ class CustomerMatcherService:
             processed["keywords"].extend(potential_keywords)
             processed["keywords"] = list(set(processed["keywords"])) 
 
-        if original_text and self.llm_service.is_api_key_available():
+        # Text seen before (by any instance) reuses its stored understanding, even while the LLM is unavailable
+        llm_response_obj = self.query_understanding.get(original_text) if original_text else None
+        if llm_response_obj is not None:
+            logger.info("Using stored query understanding, skipping the LLM call.")
+            self._apply_query_understanding(processed, llm_response_obj)
+        elif original_text and self._llm_enabled() and deadline is not None and not deadline.allows("understanding"):
+            deadline.skip("understanding")
+        elif original_text and self._llm_enabled():
             logger.info("Attempting LLM-based query understanding...")
             llm_prompt = f"""Analyze the following customer query to understand their intent and extract key entities. 
 Customer Query: {original_text}
@@ -254,62 +843,259 @@ Example: For "I need an emergency plumber in London for a burst pipe", the outpu
 }}
 """
             try:
-                llm_response_obj = self.llm_service.generate_json_response(llm_prompt, max_tokens=150)
+                llm_response_obj = self._guarded_json_call(
+                    llm_prompt, max_tokens=150, caller="matcher.intent", deadline=deadline, stage="understanding",
+                    required_keys=["intent", "service_keywords", "location_extracted", "other_details"]
+                )
                 if llm_response_obj:
                     logger.info(f"LLM Query Understanding Response: {llm_response_obj}")
-                    processed["intent"] = llm_response_obj.get("intent", processed["intent"])
-                    llm_keywords = llm_response_obj.get("service_keywords", [])
-                    if isinstance(llm_keywords, list):
-                        processed["keywords"].extend([k.lower().strip() for k in llm_keywords if k.strip()])
-                        processed["keywords"] = list(set(processed["keywords"])) 
-                    
-                    llm_location = llm_response_obj.get("location_extracted")
-                    if llm_location and not processed.get("location"): 
-                        processed["location"] = llm_location.lower().strip()
-                    
-                    processed["entities"]["llm_details"] = llm_response_obj.get("other_details", "")
+                    self._apply_query_understanding(processed, llm_response_obj)
+                    self.query_understanding.put(original_text, llm_response_obj)
                 else:
                     logger.warning("LLM query understanding did not return a valid JSON object.")
             except Exception as e:
                 logger.error(f"Error during LLM query understanding: {e}")
         else:
             if original_text:
-                 logger.info("LLM API key not available or query text empty, skipping LLM query understanding.")
+                 logger.info("LLM unavailable (no API key or circuit open), skipping LLM query understanding.")
+
+        # Service phrases and synonyms ("plumber", "burst pipe") in the text and keywords add their canonical tags
+        taxonomy_tags = self.taxonomy.canonical_tags([original_text, *processed["keywords"]])
+        if taxonomy_tags:
+            processed["keywords"] = list(set(processed["keywords"]) | taxonomy_tags)
+            processed["entities"]["taxonomy_tags"] = sorted(taxonomy_tags)
 
         logger.debug(f"Processed Query: {processed}")
         return processed
 
-    def _calculate_relevance(self, processed_query: Dict[str, Any], business_profile: BusinessIntakeData) -> tuple[float, List[str]]:
-        """Calculates a relevance score between a processed query and a business profile, potentially using LLM."""
+    @staticmethod
+    def _apply_query_understanding(processed: Dict[str, Any], llm_response_obj: Dict[str, Any]) -> None:
+        """Merges an LLM query-understanding result (fresh or stored) into the processed query."""
+        processed["intent"] = llm_response_obj.get("intent", processed["intent"])
+        llm_keywords = llm_response_obj.get("service_keywords", [])
+        if isinstance(llm_keywords, list):
+            processed["keywords"].extend([k.lower().strip() for k in llm_keywords if k.strip()])
+            processed["keywords"] = list(set(processed["keywords"])) 
+        
+        llm_location = llm_response_obj.get("location_extracted")
+        if llm_location and not processed.get("location"): 
+            processed["location"] = llm_location.lower().strip()
+        
+        processed["entities"]["llm_details"] = llm_response_obj.get("other_details", "")
+
+    def _llm_semantic_score(self, processed_query: Dict[str, Any], business_profile: BusinessIntakeData,
+                            deadline: Optional[Deadline] = None, stage: str = "semantic") -> Optional[Tuple[float, Optional[str]]]:
+        """Scores one candidate with its own LLM call. Returns (score, justification) or None on failure."""
+        logger.info(f"Attempting LLM semantic similarity for: {business_profile.business_name}")
+        semantic_prompt = f"""Assess the semantic similarity between the customer query and the business offering. 
+Customer Query: {processed_query["original_text"]}
+
+Business Name: {business_profile.business_name}
+Business Description: {business_profile.products_services_description}
+Business Industry: {business_profile.industry}
+Service Tags: {', '.join(business_profile.raw_responses.get("service_tags", []))}
+
+Provide a semantic similarity score as a float between 0.0 (not similar) and 1.0 (highly similar). 
+Also provide a brief justification for the score. 
+Return the response as a JSON object with keys: "semantic_score" (float) and "semantic_justification" (string).
+Example JSON response: {{"semantic_score": 0.75, "semantic_justification": "The business offers services that closely match the customer's stated needs for X and Y."}}
+"""
+        try:
+            llm_response_obj = self._guarded_json_call(
+                semantic_prompt, max_tokens=200, caller="matcher.semantic", deadline=deadline, stage=stage,
+                required_keys=["semantic_score", "semantic_justification"]
+            )
+            if llm_response_obj and isinstance(llm_response_obj, dict):
+                parsed = self._parse_semantic_result(llm_response_obj)
+                if parsed is None:
+                    logger.warning(f"LLM returned invalid semantic_score: {llm_response_obj.get('semantic_score')} for business {business_profile.business_name}")
+                return parsed
+            logger.warning(f"LLM semantic similarity did not return a valid JSON object for business {business_profile.business_name}. Response: {llm_response_obj}")
+        except Exception as e:
+            logger.error(f"Error during LLM semantic similarity assessment for {business_profile.business_name}: {e}")
+        return None
+
+    @staticmethod
+    def _parse_semantic_result(result: Dict[str, Any]) -> Optional[Tuple[float, Optional[str]]]:
+        score = result.get("semantic_score")
+        if isinstance(score, bool) or not isinstance(score, (float, int)) or not 0.0 <= score <= 1.0:
+            return None
+        justification = result.get("semantic_justification")
+        return float(score), justification if isinstance(justification, str) and justification else None
+
+    def _batch_semantic_scores(self, processed_query: Dict[str, Any], candidates: List[BusinessIntakeData],
+                               deadline: Optional[Deadline] = None, stage: str = "semantic") -> Dict[int, Tuple[float, Optional[str]]]:
+        """
+        Scores candidates in batches of semantic_batch_size, one LLM call per batch, while the deadline leaves stage time.
+        Returns a mapping of candidate index -> (score, justification). Candidates missing from the
+        mapping (unparseable batch or entry) are scored individually by _calculate_relevance.
+        """
+        results: Dict[int, Tuple[float, Optional[str]]] = {}
+        for batch_start in range(0, len(candidates), self.semantic_batch_size):
+            if deadline is not None and not deadline.allows(stage):
+                deadline.skip(stage)
+                break
+            batch = candidates[batch_start:batch_start + self.semantic_batch_size]
+            summaries = []
+            for offset, profile in enumerate(batch):
+                tags = ", ".join(t for t in profile.raw_responses.get("service_tags", []) if isinstance(t, str))
+                description = (profile.products_services_description or "")[:300]
+                summaries.append(f"[{offset}] {profile.business_name} | Industry: {profile.industry} | Tags: {tags} | {description}")
+            candidate_block = "\n".join(summaries)
+            batch_prompt = f"""Assess the semantic similarity between the customer query and each numbered business offering.
+Customer Query: {processed_query["original_text"]}
+
+Businesses:
+{candidate_block}
+
+For every business, provide a semantic similarity score as a float between 0.0 (not similar) and 1.0 (highly similar) and a one-sentence justification.
+Return the response as a JSON object with key "results": a list of objects with keys "index" (int, the number in brackets), "semantic_score" (float) and "semantic_justification" (string).
+Example JSON response: {{"results": [{{"index": 0, "semantic_score": 0.8, "semantic_justification": "Offers the requested emergency repairs."}}]}}
+"""
+            try:
+                llm_response_obj = self._guarded_json_call(batch_prompt, max_tokens=60 + 60 * len(batch), caller="matcher.semantic",
+                                                           deadline=deadline, stage=stage)
+            except Exception as e:
+                logger.error(f"Error during batched LLM semantic scoring: {e}")
+                continue
+            entries = llm_response_obj.get("results") if isinstance(llm_response_obj, dict) else llm_response_obj
+            if not isinstance(entries, list):
+                logger.warning(f"Batched semantic scoring returned an unexpected payload; falling back to per-candidate scoring. Response: {llm_response_obj}")
+                continue
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                offset = entry.get("index")
+                if isinstance(offset, bool) or not isinstance(offset, int) or not 0 <= offset < len(batch):
+                    continue
+                parsed = self._parse_semantic_result(entry)
+                if parsed is not None:
+                    results[batch_start + offset] = parsed
+        logger.info(f"Batched semantic scoring covered {len(results)}/{len(candidates)} candidates.")
+        return results
+
+    def _vector_semantic_scores(self, processed_query: Dict[str, Any], candidates: List[BusinessIntakeData]) -> Dict[int, Tuple[float, Optional[str]]]:
+        """
+        Scores all candidates against the query with one matrix-vector product over the local SemanticIndex.
+        Candidates missing from the index, or whose profile changed since they were encoded (e.g. edited rows
+        read by sql/fts retrieval, which nothing else re-encodes), are (re-)encoded first.
+        """
+        query_text = processed_query.get("original_text") or " ".join(processed_query.get("keywords", []))
+        if not query_text:
+            return {}
+        business_ids = []
+        for profile in candidates:
+            business_id = str(profile.raw_responses.get("business_id", profile.business_name))
+            text = business_profile_text(profile)
+            if not self.semantic_index.is_current(business_id, text):
+                self.semantic_index.upsert(business_id, text)
+            business_ids.append(business_id)
+        scores = self.semantic_index.score(query_text, business_ids)
+        return {index: (float(score), None) for index, score in enumerate(scores)}
+
+    def _batch_scored_candidates(self, processed_query: Dict[str, Any], candidates: List[BusinessIntakeData],
+                                 semantic_results: Dict[int, Tuple[float, Optional[str]]], semantic_source: str,
+                                 result_ids: Optional[List[str]] = None, k: Optional[int] = None,
+                                 after: Optional[Tuple[float, str]] = None) -> List[Tuple[float, Optional[List[str]], int]]:
+        """
+        Scores every candidate in one vectorized pass (BatchRelevanceScorer). Returns (score, None, index)
+        for the k best candidates above MATCH_THRESHOLD and after the cursor position, best first (ties by
+        result_ids), or - when LLM re-ranking is on - for every candidate, since _llm_rerank may promote any
+        of them. Reasons (None here) are filled in for returned matches only.
+        """
+        features = self.feature_cache.features_for_batch(candidates)
+        semantic_scores = np.full(len(candidates), np.nan)  # NaN: no semantic score for this candidate
+        for index, (score, _) in semantic_results.items():
+            semantic_scores[index] = score
+        scores = self.batch_scorer.score(processed_query, features, semantic_scores)
+        if semantic_source == "Vector" and self.llm_rerank_top_n > 0:
+            return [(float(scores[index]), None, index) for index in top_k_indices(scores, threshold=-1.0)]
+        return [(float(scores[index]), None, index) for index in top_k_indices(scores, k=k, tie_keys=result_ids, after=after)]
+
+    def _reranked_candidates(self, processed_query: Dict[str, Any], candidates: List[BusinessIntakeData],
+                             scored_candidates: List[Tuple[float, Optional[List[str]], int]], result_ids: List[str],
+                             deadline: Optional[Deadline] = None) -> List[Tuple[float, Optional[List[str]], int]]:
+        """
+        Applies the LLM re-ranking of the query's top llm_rerank_top_n candidates. The re-ranked scores are computed
+        once per query and kept in the result cache (under the query key plus "rerank"), so every page of the query
+        is cut from the same ordering: re-running the LLM per page could move businesses across the cursor position.
+        """
+        rerank_key = (result_cache_key(processed_query), "rerank")
+        cached_head = self.result_cache.get(rerank_key)
+        if cached_head is not None:
+            reranked = {match.business_id: match for match in cached_head.matches}
+            return [
+                (reranked[result_ids[index]].relevance_score, [reranked[result_ids[index]].match_reason], index)
+                if result_ids[index] in reranked else (score, reasons, index)
+                for score, reasons, index in scored_candidates
+            ]
+        if not self._llm_enabled():
+            return scored_candidates
+        if deadline is not None and not deadline.allows("rerank"):
+            deadline.skip("rerank")
+            return scored_candidates
+
+        generation = self.result_cache.generation
+        scored_candidates = self._llm_rerank(processed_query, candidates, scored_candidates, deadline)
+        # Like result pages, an ordering computed without the LLM or short of time is not kept
+        if not self.llm_breaker.is_open() and (deadline is None or not deadline.degraded):
+            head = [
+                MatchedBusiness(business_id=result_ids[index], business_name=candidates[index].business_name, relevant_services=[],
+                                match_reason="; ".join(reasons), relevance_score=score)
+                for score, reasons, index in scored_candidates[:self.llm_rerank_top_n]
+            ]
+            self.result_cache.put(rerank_key, MatchedBusinessPage(matches=head), generation)
+        return scored_candidates
+
+    def _llm_rerank(self, processed_query: Dict[str, Any], candidates: List[BusinessIntakeData],
+                    scored_candidates: List[Tuple[float, List[str], int]],
+                    deadline: Optional[Deadline] = None) -> List[Tuple[float, List[str], int]]:
+        """Re-scores the top llm_rerank_top_n candidates with LLM semantic similarity (within the "rerank" budget) and re-sorts them."""
+        ranked = sorted(scored_candidates, key=lambda item: item[0], reverse=True)
+        head, tail = ranked[:self.llm_rerank_top_n], ranked[self.llm_rerank_top_n:]
+        head_profiles = [candidates[index] for _, _, index in head]
+        llm_results = self._batch_semantic_scores(processed_query, head_profiles, deadline, "rerank") if self.semantic_batch_size > 1 else {}
+        reranked = []
+        for position, (_, _, index) in enumerate(head):
+            # Missing batch results are scored individually inside _calculate_relevance
+            score, reasons = self._calculate_relevance(processed_query, candidates[index], semantic_result=llm_results.get(position),
+                                                       deadline=deadline, deadline_stage="rerank")
+            reranked.append((score, reasons, index))
+        reranked.sort(key=lambda item: item[0], reverse=True)
+        return reranked + tail
+
+    def _calculate_relevance(self, processed_query: Dict[str, Any], business_profile: BusinessIntakeData,
+                             semantic_result: Optional[Tuple[float, Optional[str]]] = None,
+                             semantic_source: str = "LLM", deadline: Optional[Deadline] = None,
+                             deadline_stage: str = "semantic") -> tuple[float, List[str]]:
+        """
+        Calculates a relevance score between a processed query and a business profile, potentially using LLM.
+        If semantic_result (score, justification) is supplied, e.g. from batched or vector scoring, no per-candidate
+        LLM call is made. semantic_source labels where that score came from in the match reasons.
+        The per-candidate LLM call is skipped when the deadline leaves deadline_stage no time.
+        """
         final_score = 0.0
         reasons: List[str] = [] # Changed to List[str]
         query_keywords = set(processed_query.get("keywords", []))
-        
-        # --- Component Weights (can be tuned) ---
-        KEYWORD_WEIGHT = 0.4
-        LOCATION_WEIGHT = 0.3
-        SEMANTIC_WEIGHT = 0.3 # Only applied if LLM is used
+        # Component weights (KEYWORD_WEIGHT, LOCATION_WEIGHT, SEMANTIC_WEIGHT) are shared with BatchRelevanceScorer
 
         # --- Keyword-based scoring --- 
         keyword_score_component = 0.0
         temp_reasons_keyword = []
-        desc_text = (business_profile.products_services_description or "").lower()
-        # More robust word splitting, handles punctuation better
-        desc_words = set(re.findall(r'\b\w+\b', desc_text))
-        common_desc_keywords = query_keywords.intersection(desc_words)
+        # Tokens, tags, location and industry are normalized once per business (see business_features.py)
+        features = self.feature_cache.features_for(business_profile)
+        common_desc_keywords = query_keywords.intersection(features.description_tokens)
         if common_desc_keywords:
             # Score based on number of common keywords, capped
             keyword_score_component += min(len(common_desc_keywords) * 0.1, 0.4) 
             temp_reasons_keyword.append(f"{len(common_desc_keywords)} keyword(s) in description: {', '.join(list(common_desc_keywords)[:3])}{'...' if len(common_desc_keywords)>3 else ''}.")
 
-        profile_tags = business_profile.raw_responses.get("service_tags", [])
-        tags = set([tag.lower() for tag in profile_tags if isinstance(tag, str)])
-        common_tags_keywords = query_keywords.intersection(tags)
+        common_tags_keywords = query_keywords.intersection(features.tags)
         if common_tags_keywords:
             keyword_score_component += min(len(common_tags_keywords) * 0.2, 0.5) # Higher weight for direct tag match
             temp_reasons_keyword.append(f"{len(common_tags_keywords)} keyword(s) in service tags: {', '.join(list(common_tags_keywords)[:3])}{'...' if len(common_tags_keywords)>3 else ''}.")
 
-        if business_profile.industry and business_profile.industry.lower() in query_keywords:
+        if features.industry and features.industry in query_keywords:
             keyword_score_component += 0.1 # Small bonus for industry match
             temp_reasons_keyword.append(f"Industry '{business_profile.industry}' matched.")
         
@@ -317,63 +1103,32 @@ Example: For "I need an emergency plumber in London for a burst pipe", the outpu
         if normalized_keyword_score > 0: reasons.extend(temp_reasons_keyword)
 
         # --- Location scoring --- 
-        location_score_component = 0.0
-        profile_location = (business_profile.raw_responses.get("location") or "").lower()
-        query_location = processed_query.get("location")
-        if query_location and profile_location:
-            if profile_location == query_location:
-                location_score_component = 1.0 # Full score for exact location match
-                reasons.append("Exact location match.")
-            elif query_location in profile_location or profile_location in query_location: 
-                location_score_component = 0.5 # Partial score for broader match
-                reasons.append("Partial location match.")
-        elif query_location and not profile_location:
-            location_score_component = 0.0 # Query has location, profile doesn't - low match for location
-        elif not query_location:
-            location_score_component = 0.2 # No location in query, so don't penalize profile heavily for having one
-
-        # --- LLM-based Semantic Similarity --- 
-        semantic_score_component = 0.0
-        if processed_query.get("original_text") and self.llm_service.is_api_key_available():
-            logger.info(f"Attempting LLM semantic similarity for: {business_profile.business_name}")
-            # Corrected and completed f-string for semantic_prompt
-            semantic_prompt = f"""Assess the semantic similarity between the customer query and the business offering. 
-Customer Query: {processed_query["original_text"]}
+        # Distance decay when both locations are in the gazetteer, else string comparison (see geo.LocationScorer)
+        location_score_component, location_reason = self.location_scorer.score(processed_query.get("location"), features.location)
+        if location_reason:
+            reasons.append(location_reason)
 
-Business Name: {business_profile.business_name}
-Business Description: {business_profile.products_services_description}
-Business Industry: {business_profile.industry}
-Service Tags: {', '.join(business_profile.raw_responses.get("service_tags", []))}
+        # --- Semantic Similarity (precomputed vector/batch score, or per-candidate LLM call) --- 
+        semantic_score_component = 0.0
+        if semantic_result is None and processed_query.get("original_text") and self._llm_enabled():
+            if deadline is None or deadline.allows(deadline_stage):
+                semantic_result = self._llm_semantic_score(processed_query, business_profile, deadline, deadline_stage)
+            else:
+                deadline.skip(deadline_stage)
+        elif semantic_result is None and processed_query.get("original_text"):
+            logger.info(f"LLM unavailable (no API key or circuit open), skipping semantic similarity for {business_profile.business_name}.")
 
-Provide a semantic similarity score as a float between 0.0 (not similar) and 1.0 (highly similar). 
-Also provide a brief justification for the score. 
-Return the response as a JSON object with keys: "semantic_score" (float) and "semantic_justification" (string).
-Example JSON response: {{"semantic_score": 0.75, "semantic_justification": "The business offers services that closely match the customer's stated needs for X and Y."}}
-"""
-            try:
-                llm_response_obj = self.llm_service.generate_json_response(semantic_prompt, max_tokens=200)
-                if llm_response_obj and isinstance(llm_response_obj, dict):
-                    score = llm_response_obj.get("semantic_score")
-                    justification = llm_response_obj.get("semantic_justification")
-                    if isinstance(score, (float, int)) and 0.0 <= score <= 1.0:
-                        semantic_score_component = float(score)
-                        if justification and isinstance(justification, str):
-                            reasons.append(f"LLM Semantic Match: {justification} (Score: {semantic_score_component:.2f})")
-                        else:
-                            reasons.append(f"LLM Semantic Score: {semantic_score_component:.2f}")
-                    else:
-                        logger.warning(f"LLM returned invalid semantic_score: {score} for business {business_profile.business_name}")
-                else:
-                    logger.warning(f"LLM semantic similarity did not return a valid JSON object for business {business_profile.business_name}. Response: {llm_response_obj}")
-            except Exception as e:
-                logger.error(f"Error during LLM semantic similarity assessment for {business_profile.business_name}: {e}")
-        else:
-            if processed_query.get("original_text"):
-                logger.info(f"LLM API key not available, skipping semantic similarity for {business_profile.business_name}.")
+        if semantic_result is not None:
+            semantic_score_component, justification = semantic_result
+            if justification:
+                reasons.append(f"{semantic_source} Semantic Match: {justification} (Score: {semantic_score_component:.2f})")
+            elif semantic_score_component > 0:
+                reasons.append(f"{semantic_source} Semantic Score: {semantic_score_component:.2f}")
 
         # --- Combine scores --- 
-        # If LLM was used and provided a score, it contributes; otherwise, its weight is redistributed or ignored.
-        if semantic_score_component > 0 and self.llm_service.is_api_key_available():
+        # If a semantic score (vector or LLM) is available it contributes, even when it is 0.0, so candidates scored by the
+        # same semantic source share one formula; only without a score is its weight redistributed.
+        if semantic_result is not None:
             final_score = (normalized_keyword_score * KEYWORD_WEIGHT) + \
                           (location_score_component * LOCATION_WEIGHT) + \
                           (semantic_score_component * SEMANTIC_WEIGHT)
@@ -394,15 +1149,15 @@ Example JSON response: {{"semantic_score": 0.75, "semantic_justification": "The
         relevant_services_found: List[str] = []
         query_keywords = set(processed_query.get("keywords", []))
 
+        features = self.feature_cache.features_for(business_profile)
+
         # 1. Check service tags
-        profile_tags = business_profile.raw_responses.get("service_tags", [])
-        if profile_tags:
-            for tag in profile_tags:
-                if isinstance(tag, str) and tag.lower() in query_keywords:
-                    relevant_services_found.append(tag)
+        for tag, tag_lower in features.tag_pairs:
+            if tag_lower in query_keywords:
+                relevant_services_found.append(tag)
         
         # 2. Check products_services_description for keywords
-        desc_text = (business_profile.products_services_description or "").lower()
+        desc_text = features.description
         if desc_text:
             # Simple check: if a query keyword is in the description, consider the business's primary industry/service type relevant
             # This could be made more sophisticated by extracting specific service phrases from the description that match keywords.
@@ -0,0 +1,83 @@
+"""Request deadline and per-stage time budgets for the matching pipeline"""
+
+import os
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages with a time budget. Only LLM stages are skipped when time runs out; retrieval is cut short
+# by a statement_timeout and local (keyword/location/vector) scoring always runs.
+STAGES = ("understanding", "retrieval", "semantic", "rerank")
+DEFAULT_STAGE_BUDGETS = {"understanding": 0.8, "retrieval": 0.5, "semantic": 1.2, "rerank": 0.8}
+MIN_STAGE_SECONDS = 0.05  # A stage left with less than this is skipped rather than started
+
+
+def stage_budgets_from_env() -> Dict[str, float]:
+    """Budgets in seconds from MATCHER_<STAGE>_BUDGET_SECONDS (e.g. MATCHER_SEMANTIC_BUDGET_SECONDS), else DEFAULT_STAGE_BUDGETS."""
+    return {stage: float(os.getenv(f"MATCHER_{stage.upper()}_BUDGET_SECONDS", str(default)))
+            for stage, default in DEFAULT_STAGE_BUDGETS.items()}
+
+
+class Deadline:
+    """
+    The time left for one matching request, and each stage's share of it. A stage's clock starts the first
+    time it asks for time, so a stage made of several calls (e.g. semantic scoring batches) shares one budget.
+    Stages skipped or cut short, for lack of time or because they failed, are recorded; a result computed
+    with any of them is degraded.
+
+    Not thread-safe: one Deadline belongs to one request.
+    """
+
+    def __init__(self, timeout_seconds: Optional[float] = None, stage_budgets: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            timeout_seconds: (Optional) Time the whole request may take. None (or <= 0) means no deadline.
+            stage_budgets: (Optional) Seconds per stage (see STAGES); a stage without a budget only has the deadline.
+            clock: Monotonic clock, replaceable in tests.
+        """
+        self._clock = clock
+        self.started_at = clock()
+        self.expires_at = self.started_at + timeout_seconds if timeout_seconds and timeout_seconds > 0 else None
+        self.stage_budgets = dict(stage_budgets or {})
+        self._stage_started: Dict[str, float] = {}
+        self.degraded_stages: List[str] = []
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.degraded_stages)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline (may be negative), or None without a deadline."""
+        return self.expires_at - self._clock() if self.expires_at is not None else None
+
+    def stage_remaining(self, stage: str) -> Optional[float]:
+        """Seconds left for stage: its unused budget, capped by the deadline. None if neither applies."""
+        remaining = self.remaining()
+        budget = self.stage_budgets.get(stage)
+        if budget is not None:
+            started = self._stage_started.setdefault(stage, self._clock())
+            stage_left = budget - (self._clock() - started)
+            remaining = stage_left if remaining is None else min(remaining, stage_left)
+        return remaining
+
+    def allows(self, stage: str) -> bool:
+        """True if stage has at least MIN_STAGE_SECONDS left."""
+        remaining = self.stage_remaining(stage)
+        return remaining is None or remaining >= MIN_STAGE_SECONDS
+
+    def timeout_for(self, stage: str, cap: Optional[float] = None) -> Optional[float]:
+        """Timeout for one call in stage: the time the stage has left, capped by cap (e.g. the LLM timeout)."""
+        remaining = self.stage_remaining(stage)
+        if remaining is None:
+            return cap
+        remaining = max(remaining, 0.0)
+        return remaining if cap is None else min(cap, remaining)
+
+    def skip(self, stage: str, reason: str = "out of time") -> None:
+        """Records that stage was skipped or cut short (for lack of time unless reason says otherwise)."""
+        if stage not in self.degraded_stages:
+            logger.warning(f"Matching stage '{stage}' skipped or cut short ({reason}), continuing without it.")
+            self.degraded_stages.append(stage)
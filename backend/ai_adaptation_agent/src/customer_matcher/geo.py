@@ -0,0 +1,294 @@
+"""Location normalization from a local gazetteer, a grid index of business coordinates and distance-decay location scoring"""
+
+import os
+import re
+import csv
+import math
+import logging
+import threading
+import unicodedata
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0  # Along a meridian
+_NON_ALNUM_PATTERN = re.compile(r"[^0-9a-z]+")
+_MISSING = object()
+
+
+def place_key(text: Optional[str]) -> str:
+    """Lower-cased ASCII alphanumerics only, so "DemoCity", "Demo City" and "demo-city" share a key."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM_PATTERN.sub("", text.lower())
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km. Arguments may be floats or NumPy arrays (broadcast)."""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def distance_decay(distance_km: float, half_distance_km: float) -> float:
+    """1.0 at distance 0, halving every half_distance_km."""
+    return 0.5 ** (distance_km / half_distance_km)
+
+
+@dataclass(frozen=True)
+class Place:
+    name: str
+    latitude: float
+    longitude: float
+    region: str = ""
+    country: str = ""
+    population: int = 0
+    aliases: Tuple[str, ...] = ()
+
+
+class Gazetteer:
+    """
+    Place names (and aliases) -> coordinates. resolve() maps free-text locations such as "DemoCity" or
+    "Demo City, CA" to a Place: the whole text is looked up first, then its first comma-separated part,
+    using the remaining parts (region or country) and then population to choose among places sharing
+    a name. Lookups compare place_key()s and are memoized per text.
+    """
+
+    def __init__(self, places: Optional[Iterable[Place]] = None, memo_size: int = 50000):
+        """
+        Args:
+            places: (Optional) The places to load.
+            memo_size: Most resolved texts remembered; the memo is cleared when it fills up.
+        """
+        self.memo_size = memo_size
+        self._by_key: Dict[str, List[Place]] = {}
+        self._memo: Dict[str, Optional[Place]] = {}
+        self._count = 0
+        for place in places or ():
+            self.add(place)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, place: Place) -> None:
+        for key in {place_key(name) for name in (place.name, *place.aliases)}:
+            if key:
+                self._by_key.setdefault(key, []).append(place)
+        self._count += 1
+        self._memo.clear()
+
+    @classmethod
+    def from_file(cls, path: str) -> "Gazetteer":
+        """
+        Loads a CSV file with a header row. Required columns: name, latitude, longitude. Optional: region,
+        country, population and aliases (separated by "|"). Invalid rows are logged and skipped.
+        """
+        places = []
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    latitude, longitude = float(row["latitude"]), float(row["longitude"])
+                    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0) or not (row["name"] or "").strip():
+                        raise ValueError("missing name or coordinates out of range")
+                    places.append(Place(
+                        name=row["name"].strip(),
+                        latitude=latitude,
+                        longitude=longitude,
+                        region=(row.get("region") or "").strip(),
+                        country=(row.get("country") or "").strip(),
+                        population=int(row.get("population") or 0),
+                        aliases=tuple(alias.strip() for alias in (row.get("aliases") or "").split("|") if alias.strip()),
+                    ))
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.warning(f"Skipping gazetteer row {line_number} of {path}: {e}")
+        logger.info(f"Gazetteer loaded from {path}: {len(places)} places.")
+        return cls(places)
+
+    def resolve(self, location: Optional[str]) -> Optional[Place]:
+        """The Place a location text refers to, or None if it is not in the gazetteer."""
+        if not location or not self._count:
+            return None
+        place = self._memo.get(location, _MISSING)
+        if place is _MISSING:
+            place = self._resolve(location)
+            if len(self._memo) >= self.memo_size:
+                self._memo.clear()
+            self._memo[location] = place
+        return place
+
+    def _resolve(self, location: str) -> Optional[Place]:
+        parts = [key for key in (place_key(part) for part in location.split(",")) if key]
+        if not parts:
+            return None
+        whole = "".join(parts)
+        if whole in self._by_key:
+            return self._best(self._by_key[whole], [])
+        candidates = self._by_key.get(parts[0])
+        return self._best(candidates, parts[1:]) if candidates else None
+
+    @staticmethod
+    def _best(candidates: List[Place], qualifiers: Sequence[str]) -> Place:
+        if qualifiers:
+            qualified = [place for place in candidates if {place_key(place.region), place_key(place.country)} & set(qualifiers)]
+            candidates = qualified or candidates
+        return max(candidates, key=lambda place: place.population)  # First loaded wins ties
+
+
+_shared_gazetteer: Optional[Gazetteer] = None
+_shared_gazetteer_lock = threading.Lock()
+
+
+def get_shared_gazetteer() -> Gazetteer:
+    """Returns the process-wide Gazetteer, loaded from MATCHER_GAZETTEER_FILE on first use (empty if unset)."""
+    global _shared_gazetteer
+    with _shared_gazetteer_lock:
+        if _shared_gazetteer is None:
+            gazetteer_file = os.getenv("MATCHER_GAZETTEER_FILE")
+            _shared_gazetteer = Gazetteer()
+            if gazetteer_file:
+                try:
+                    _shared_gazetteer = Gazetteer.from_file(gazetteer_file)
+                except OSError as e:
+                    logger.warning(f"Ignoring unreadable MATCHER_GAZETTEER_FILE {gazetteer_file}: {e}")
+        return _shared_gazetteer
+
+
+class GeoIndex:
+    """
+    Business coordinates bucketed into a grid of cell_degrees x cell_degrees cells. within_radius() visits
+    only the cells overlapping the bounding box of the query circle (split at the antimeridian) and
+    computes exact haversine distances for their businesses in one NumPy call.
+    """
+
+    def __init__(self, cell_degrees: float = 0.1):
+        """
+        Args:
+            cell_degrees: Grid cell size in degrees (0.1 is about 11 km north-south).
+        """
+        self.cell_degrees = cell_degrees
+        self._lock = threading.RLock()
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._coordinates: Dict[str, Tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._coordinates)
+
+    def __contains__(self, business_id: str) -> bool:
+        return business_id in self._coordinates
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees)
+
+    def build(self, items: Iterable[Tuple[str, float, float]]) -> None:
+        """Replaces the index contents with (business_id, latitude, longitude) items."""
+        with self._lock:
+            self._cells, self._coordinates = {}, {}
+            for business_id, latitude, longitude in items:
+                self.upsert(business_id, latitude, longitude)
+
+    def upsert(self, business_id: str, latitude: float, longitude: float) -> None:
+        with self._lock:
+            self.remove(business_id)
+            self._coordinates[business_id] = (latitude, longitude)
+            self._cells.setdefault(self._cell(latitude, longitude), set()).add(business_id)
+
+    def remove(self, business_id: str) -> None:
+        with self._lock:
+            coordinates = self._coordinates.pop(business_id, None)
+            if coordinates is None:
+                return
+            cell = self._cell(*coordinates)
+            self._cells[cell].discard(business_id)
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float) -> Dict[str, float]:
+        """
+        Returns:
+            business_id -> distance in km for every business within radius_km of the point.
+        """
+        lat_span = radius_km / KM_PER_DEGREE
+        lat_low, lat_high = max(latitude - lat_span, -90.0), min(latitude + lat_span, 90.0)
+        widest = math.cos(math.radians(max(abs(lat_low), abs(lat_high))))  # Longitude degrees are shortest there
+        lon_span = 180.0 if widest < 1e-9 else min(radius_km / (KM_PER_DEGREE * widest), 180.0)
+        if lon_span >= 180.0:
+            lon_ranges = [(-180.0, 180.0)]
+        elif longitude - lon_span < -180.0:
+            lon_ranges = [(-180.0, longitude + lon_span), (longitude - lon_span + 360.0, 180.0)]
+        elif longitude + lon_span > 180.0:
+            lon_ranges = [(longitude - lon_span, 180.0), (-180.0, longitude + lon_span - 360.0)]
+        else:
+            lon_ranges = [(longitude - lon_span, longitude + lon_span)]
+
+        with self._lock:
+            ids: List[str] = []
+            row_low, row_high = self._cell(lat_low, 0.0)[0], self._cell(lat_high, 0.0)[0]
+            for lon_low, lon_high in lon_ranges:
+                column_low, column_high = self._cell(0.0, lon_low)[1], self._cell(0.0, lon_high)[1]
+                if (row_high - row_low + 1) * (column_high - column_low + 1) > len(self._cells):
+                    # Sparse grid: scanning the occupied cells is cheaper than probing every cell in the box
+                    ids.extend(business_id for (row, column), cell in self._cells.items()
+                               if row_low <= row <= row_high and column_low <= column <= column_high for business_id in cell)
+                    continue
+                for row in range(row_low, row_high + 1):
+                    for column in range(column_low, column_high + 1):
+                        ids.extend(self._cells.get((row, column), ()))
+            if not ids:
+                return {}
+            coordinates = self._coordinates
+            flat = np.fromiter(chain.from_iterable(coordinates[business_id] for business_id in ids), dtype=np.float64, count=2 * len(ids))
+        distances = haversine_km(latitude, longitude, flat[0::2], flat[1::2])
+        within = np.flatnonzero(distances <= radius_km).tolist()
+        distances = distances.tolist()
+        return {ids[position]: distances[position] for position in within}
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"businesses": len(self._coordinates), "cells": len(self._cells)}
+
+
+class LocationScorer:
+    """
+    The location component of relevance scoring, shared by _calculate_relevance and BatchRelevanceScorer.
+    When both locations resolve in the gazetteer the score decays with distance (1.0 for the same place,
+    0.5 at half_distance_km); otherwise their place_key()s are compared: equal is an exact match and
+    containment a partial one.
+    """
+
+    def __init__(self, gazetteer: Optional[Gazetteer] = None, half_distance_km: Optional[float] = None):
+        """
+        Args:
+            gazetteer: (Optional) Defaults to the process-wide one (MATCHER_GAZETTEER_FILE).
+            half_distance_km: (Optional) Distance at which the location score halves.
+                              Defaults to MATCHER_GEO_HALF_DISTANCE_KM or 10.
+        """
+        self.gazetteer = gazetteer if gazetteer is not None else get_shared_gazetteer()
+        half = half_distance_km if half_distance_km is not None else float(os.getenv("MATCHER_GEO_HALF_DISTANCE_KM", "10"))
+        self.half_distance_km = max(half, 1e-6)
+
+    def score(self, query_location: Optional[str], profile_location: Optional[str]) -> Tuple[float, Optional[str]]:
+        """Returns (location score, match reason or None)."""
+        if not query_location:
+            return 0.2, None  # No location in query, so don't penalize profile heavily for having one
+        if not profile_location:
+            return 0.0, None  # Query has location, profile doesn't - low match for location
+
+        query_place = self.gazetteer.resolve(query_location)
+        profile_place = self.gazetteer.resolve(profile_location) if query_place is not None else None
+        if query_place is not None and profile_place is not None:
+            if query_place == profile_place:
+                return 1.0, "Exact location match."
+            distance = float(haversine_km(query_place.latitude, query_place.longitude, profile_place.latitude, profile_place.longitude))
+            return distance_decay(distance, self.half_distance_km), f"{distance:.1f} km from {query_place.name}."
+
+        query_key, profile_key = place_key(query_location), place_key(profile_location)
+        if query_key and profile_key:
+            if profile_key == query_key:
+                return 1.0, "Exact location match."  # Full score for exact location match
+            if query_key in profile_key or profile_key in query_key:
+                return 0.5, "Partial location match."  # Partial score for broader match
+        return 0.0, None
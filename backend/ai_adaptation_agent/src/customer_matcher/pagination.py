@@ -0,0 +1,42 @@
+"""Opaque keyset cursors for paging through ranked matches"""
+
+import json
+import base64
+import hashlib
+import binascii
+from typing import Hashable, Tuple
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed or was issued for a different query."""
+
+
+def query_fingerprint(query_key: Hashable) -> str:
+    """Short stable hash of a normalized query (result_cache_key), embedded in its cursors."""
+    return hashlib.sha1(repr(query_key).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(score: float, business_id: str, fingerprint: str) -> str:
+    """Cursor positioned after the match (score, business_id) of the query with this fingerprint."""
+    payload = json.dumps([score, business_id, fingerprint], separators=(",", ":"))  # repr of floats round-trips exactly
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, fingerprint: str) -> Tuple[float, str]:
+    """
+    Returns:
+        The (score, business_id) position encoded in cursor.
+
+    Raises:
+        InvalidCursor: The cursor cannot be decoded or belongs to another query.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, business_id, cursor_fingerprint = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not isinstance(business_id, str):
+            raise ValueError("unexpected cursor contents")
+    except (ValueError, TypeError, binascii.Error, UnicodeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}") from e
+    if cursor_fingerprint != fingerprint:
+        raise InvalidCursor("Cursor was issued for a different query.")
+    return float(score), business_id
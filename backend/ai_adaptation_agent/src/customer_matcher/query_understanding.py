@@ -0,0 +1,221 @@
+"""Memoized LLM query understanding: an in-memory LFU tier in front of a Postgres table shared across instances"""
+
+import os
+import re
+import copy
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import psycopg2
+import psycopg2.errors
+from psycopg2 import extras, pool
+
+logger = logging.getLogger(__name__)
+
+QUERY_UNDERSTANDING_VERSION = "v1"  # Bump when the query-understanding prompt changes, so old entries are not used
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]+")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def canonicalize_query_text(text: Optional[str]) -> str:
+    """Case, whitespace and punctuation folded: "Plumber in  London?" -> "plumber in london"."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _WHITESPACE_PATTERN.sub(" ", _PUNCTUATION_PATTERN.sub(" ", text)).strip()
+
+
+class LFUCache:
+    """
+    Bounded least-frequently-used cache with O(1) operations: keys sit in per-frequency buckets and the
+    least recently used key of the lowest frequency is evicted.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(0, max_entries)
+        self._values: Dict[str, Any] = {}
+        self._counts: Dict[str, int] = {}
+        self._buckets: Dict[int, "OrderedDict[str, None]"] = {}
+        self._min_count = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._values
+
+    def _touch(self, key: str) -> None:
+        count = self._counts[key]
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+        self._counts[key] = count + 1
+        self._buckets.setdefault(count + 1, OrderedDict())[key] = None
+
+    def get(self, key: str) -> Optional[Any]:
+        if key not in self._values:
+            return None
+        self._touch(key)
+        return self._values[key]
+
+    def put(self, key: str, value: Any) -> None:
+        if self.max_entries == 0:
+            return
+        if key in self._values:
+            self._values[key] = value
+            self._touch(key)
+            return
+        if len(self._values) >= self.max_entries:
+            bucket = self._buckets[self._min_count]
+            evicted, _ = bucket.popitem(last=False)
+            if not bucket:
+                del self._buckets[self._min_count]
+            del self._values[evicted], self._counts[evicted]
+            self.evictions += 1
+        self._values[key] = value
+        self._counts[key] = 1
+        self._buckets.setdefault(1, OrderedDict())[key] = None
+        self._min_count = 1
+
+    def frequency(self, key: str) -> int:
+        return self._counts.get(key, 0)
+
+
+class QueryUnderstandingStore:
+    """
+    Query-understanding results (the validated LLM JSON: intent, service_keywords, location_extracted,
+    other_details) by canonicalized query text. Lookups go to the in-memory LFU tier, then to the
+    query_understanding table, whose hits are promoted to memory. Puts write both tiers.
+
+    Database errors never fail a lookup: they count as misses. If the table does not exist the
+    database tier is switched off until the schema is applied and the process restarted.
+    """
+
+    TABLE_NAME = "query_understanding"
+
+    def __init__(self, connection_pool: Optional[pool.AbstractConnectionPool] = None, max_entries: Optional[int] = None,
+                 db_max_rows: Optional[int] = None):
+        """
+        Args:
+            connection_pool: (Optional) Pool for the Postgres tier; without one only the memory tier is used.
+            max_entries: (Optional) Size of the memory tier. Defaults to MATCHER_QUERY_UNDERSTANDING_CACHE_SIZE or 5000.
+            db_max_rows: (Optional) Rows kept in the table; the least used are pruned every 1000 puts.
+                         Defaults to MATCHER_QUERY_UNDERSTANDING_DB_MAX_ROWS or 100000 (0 disables pruning).
+        """
+        self.connection_pool = connection_pool
+        self.memory = LFUCache(max_entries if max_entries is not None else int(os.getenv("MATCHER_QUERY_UNDERSTANDING_CACHE_SIZE", "5000")))
+        self.db_max_rows = db_max_rows if db_max_rows is not None else int(os.getenv("MATCHER_QUERY_UNDERSTANDING_DB_MAX_ROWS", "100000"))
+        self.db_enabled = connection_pool is not None
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.db_errors = 0
+
+    @staticmethod
+    def key_for(query_text: Optional[str]) -> str:
+        return f"{QUERY_UNDERSTANDING_VERSION}:{canonicalize_query_text(query_text)}"
+
+    def get(self, query_text: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The stored understanding of query_text (a copy), or None."""
+        if not canonicalize_query_text(query_text):
+            return None
+        key = self.key_for(query_text)
+        with self._lock:
+            result = self.memory.get(key)
+            if result is not None:
+                self.memory_hits += 1
+                return copy.deepcopy(result)
+        result = self._db_get(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.db_hits += 1
+            self.memory.put(key, result)
+        return copy.deepcopy(result)
+
+    def put(self, query_text: Optional[str], result: Dict[str, Any]) -> None:
+        if not canonicalize_query_text(query_text) or not isinstance(result, dict):
+            return
+        key = self.key_for(query_text)
+        stored = copy.deepcopy(result)
+        with self._lock:
+            self.memory.put(key, stored)
+            self._puts_since_prune += 1
+            prune = self.db_max_rows > 0 and self._puts_since_prune >= 1000
+            if prune:
+                self._puts_since_prune = 0
+        self._db_execute(
+            f"INSERT INTO {self.TABLE_NAME} (query_key, result) VALUES (%s, %s) "
+            f"ON CONFLICT (query_key) DO UPDATE SET result = EXCLUDED.result, last_used_at = NOW();",
+            (key, extras.Json(stored)),
+        )
+        if prune:
+            self.prune_db_tier()
+
+    def prune_db_tier(self) -> None:
+        """Deletes all but the db_max_rows most used rows (by hit_count, then last_used_at)."""
+        self._db_execute(
+            f"DELETE FROM {self.TABLE_NAME} WHERE query_key NOT IN "
+            f"(SELECT query_key FROM {self.TABLE_NAME} ORDER BY hit_count DESC, last_used_at DESC LIMIT %s);",
+            (self.db_max_rows,),
+        )
+
+    def _db_get(self, key: str) -> Optional[Dict[str, Any]]:
+        rows = self._db_execute(
+            f"UPDATE {self.TABLE_NAME} SET hit_count = hit_count + 1, last_used_at = NOW() WHERE query_key = %s RETURNING result;",
+            (key,), fetch=True,
+        )
+        if not rows:
+            return None
+        result = rows[0]["result"]
+        return result if isinstance(result, dict) else None
+
+    def _db_execute(self, sql: str, params: tuple, fetch: bool = False) -> Optional[list]:
+        if not self.db_enabled:
+            return None
+        try:
+            conn = self.connection_pool.getconn()
+        except psycopg2.Error as e:
+            logger.error(f"Error getting connection from pool: {e}")
+            return None
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall() if fetch else None
+            conn.commit()
+            return rows
+        except psycopg2.errors.UndefinedTable as e:
+            conn.rollback()
+            self.db_enabled = False
+            logger.error(f"Query understanding table missing ({e}). Apply database/master_schema.sql; using the memory tier only.")
+        except psycopg2.Error as e:
+            conn.rollback()
+            with self._lock:
+                self.db_errors += 1
+            logger.error(f"Database error in query understanding store: {e}")
+        finally:
+            self.connection_pool.putconn(conn)
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "memory_entries": len(self.memory),
+                "memory_max_entries": self.memory.max_entries,
+                "memory_evictions": self.memory.evictions,
+                "db_enabled": self.db_enabled,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "db_errors": self.db_errors,
+                "hit_rate": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else None,
+            }
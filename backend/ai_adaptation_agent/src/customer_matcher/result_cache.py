@@ -0,0 +1,149 @@
+"""Cache of ranked find_matched_businesses_page results keyed by the normalized processed query and page position"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, Optional, Set, Tuple
+
+from ..shared.data_models import MatchedBusinessPage
+
+logger = logging.getLogger(__name__)
+
+
+def result_cache_key(processed_query: Dict[str, Any]) -> Tuple[Hashable, ...]:
+    """Sorted keywords, location, search radius and intent of a _preprocess_query result."""
+    return (
+        tuple(sorted(set(processed_query.get("keywords", [])))),
+        processed_query.get("location") or "",
+        processed_query.get("radius_km"),
+        processed_query.get("intent") or "unknown",
+    )
+
+
+class MatchResultCache:
+    """
+    TTL + LRU cache of pages of ranked matches. A reverse index from business_id to the keys whose results contain
+    it lets invalidate_business() drop exactly the entries an updated or deleted profile appears in.
+    Pages are copied in and out, so callers may modify what they get.
+
+    A result computed while an invalidation happened is not stored (put() compares generations), so
+    a request that read a profile just before it changed cannot cache the old version.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            max_entries: Most queries kept; 0 disables the cache. Defaults to MATCHER_RESULT_CACHE_SIZE or 1000.
+            ttl_seconds: Lifetime of an entry. Defaults to MATCHER_RESULT_CACHE_TTL_SECONDS or 300.
+        """
+        self.max_entries = max(0, max_entries if max_entries is not None else int(os.getenv("MATCHER_RESULT_CACHE_SIZE", "1000")))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("MATCHER_RESULT_CACHE_TTL_SECONDS", "300"))
+        self._entries: "OrderedDict[Hashable, Tuple[float, MatchedBusinessPage, FrozenSet[str]]]" = OrderedDict()
+        self._keys_by_business: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.generation = 0  # Incremented by every invalidation
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0  # Entries dropped because a business in them changed
+        self.invalidated_businesses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Optional[MatchedBusinessPage]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            page = entry[1]
+        return page.model_copy(deep=True)
+
+    def put(self, key: Hashable, page: MatchedBusinessPage, generation: Optional[int] = None) -> bool:
+        """
+        Stores page for key. Pass the generation read before the result was computed: if any business was
+        invalidated since, nothing is stored. Returns True if the entry was stored.
+        """
+        if not self.enabled:
+            return False
+        copy = page.model_copy(deep=True)
+        business_ids = frozenset(match.business_id for match in page.matches)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy, business_ids)
+            for business_id in business_ids:
+                self._keys_by_business.setdefault(business_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def _drop(self, key: Hashable) -> None:
+        """Removes an entry and its reverse-index references. Caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for business_id in entry[2]:
+            keys = self._keys_by_business.get(business_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_business[business_id]
+
+    def invalidate_business(self, business_id: str) -> int:
+        """Drops every entry whose page contains business_id. Returns the number of entries dropped."""
+        with self._lock:
+            self.generation += 1
+            keys = list(self._keys_by_business.get(business_id, ()))
+            for key in keys:
+                self._drop(key)
+            if keys:
+                self.invalidations += len(keys)
+                self.invalidated_businesses += 1
+        return len(keys)
+
+    def business_ids(self) -> Set[str]:
+        """Ids of the businesses in cached pages."""
+        with self._lock:
+            return set(self._keys_by_business)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._keys_by_business.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "invalidated_businesses": self.invalidated_businesses,
+            }
@@ -0,0 +1,200 @@
+"""In-process vector similarity index for semantic matching of business profiles"""
+
+import re
+import math
+import zlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from ..shared.data_models import BusinessIntakeData
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\b\w+\b")
+GROWTH_FACTOR = 1.25  # Spare rows allocated at build and when upserts outgrow the matrix
+ENCODE_CHUNK_SIZE = 1024  # Texts encoded at a time by build, so no second full-size matrix is allocated
+
+
+class TextEncoder(Protocol):
+    """Anything that turns texts into fixed-size, L2-normalised dense vectors."""
+    dim: int
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class HashingEncoder:
+    """
+    No-network default encoder: hashed unigram + bigram features with sublinear TF and
+    optional IDF weighting, L2-normalised so a dot product is cosine similarity.
+    Uses crc32 rather than hash() so vectors are stable across processes. The index stores dim float32
+    values per business (4KB at the default 1024, about 100MB for 20k businesses with headroom).
+    """
+
+    def __init__(self, dim: int = 1024, use_bigrams: bool = True):
+        self.dim = dim
+        self.use_bigrams = use_bigrams
+        self.idf: Optional[np.ndarray] = None
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_PATTERN.findall((text or "").lower())
+        if self.use_bigrams:
+            tokens = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return tokens
+
+    def _bucket(self, feature: str) -> int:
+        return zlib.crc32(feature.encode("utf-8")) % self.dim
+
+    def fit(self, texts: Sequence[str]) -> "HashingEncoder":
+        """Learns IDF weights over the hashed buckets from a corpus."""
+        document_frequency = np.zeros(self.dim, dtype=np.float64)
+        for text in texts:
+            buckets = {self._bucket(f) for f in self._features(text)}
+            if buckets:
+                document_frequency[list(buckets)] += 1.0
+        n_docs = max(len(texts), 1)
+        self.idf = (np.log((1.0 + n_docs) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        return self
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[int, int] = {}
+            for feature in self._features(text):
+                bucket = self._bucket(feature)
+                counts[bucket] = counts.get(bucket, 0) + 1
+            for bucket, count in counts.items():
+                vectors[row, bucket] = 1.0 + math.log(count)
+        if self.idf is not None:
+            vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0
+        return vectors / norms
+
+
+def _grown_capacity(rows: int) -> int:
+    return max(int(rows * GROWTH_FACTOR), rows + 16)
+
+
+def _checksum(text: str) -> int:
+    return zlib.crc32((text or "").encode("utf-8"))
+
+
+def business_profile_text(profile: BusinessIntakeData) -> str:
+    """The text that represents a business in the vector index."""
+    tags = " ".join(t for t in profile.raw_responses.get("service_tags", []) if isinstance(t, str))
+    return " ".join(filter(None, [
+        profile.business_name,
+        profile.industry,
+        tags,
+        profile.products_services_description,
+        profile.target_audience_description,
+    ]))
+
+
+class SemanticIndex:
+    """
+    Dense vectors for business profiles held in one contiguous NumPy matrix, with GROWTH_FACTOR spare rows.
+    Scoring a query against any subset of businesses is a single matrix-vector product.
+    """
+
+    def __init__(self, encoder: Optional[TextEncoder] = None, initial_capacity: int = 256):
+        self.encoder = encoder or HashingEncoder()
+        self._matrix = np.zeros((initial_capacity, self.encoder.dim), dtype=np.float32)
+        self._row_by_id: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._checksums: Dict[str, int] = {}  # crc32 of the text each vector was encoded from
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, business_id: str) -> bool:
+        return business_id in self._row_by_id
+
+    def build(self, items: Iterable[Tuple[str, str]]) -> None:
+        """
+        Replaces the index contents with the given (business_id, text) pairs.
+        Fits the encoder's IDF weights on the corpus first when the encoder supports it.
+        """
+        items = list(items)
+        texts = [text for _, text in items]
+        if hasattr(self.encoder, "fit"):
+            self.encoder.fit(texts)
+        matrix = np.zeros((_grown_capacity(len(items)), self.encoder.dim), dtype=np.float32)
+        for start in range(0, len(texts), ENCODE_CHUNK_SIZE):
+            chunk = texts[start:start + ENCODE_CHUNK_SIZE]
+            matrix[start:start + len(chunk)] = self.encoder.encode(chunk)
+        with self._lock:
+            self._matrix = matrix
+            self._ids = [business_id for business_id, _ in items]
+            self._row_by_id = {business_id: row for row, business_id in enumerate(self._ids)}
+            self._checksums = {business_id: _checksum(text) for business_id, text in items}
+        logger.info(f"Semantic index built with {len(items)} business vectors.")
+
+    def upsert(self, business_id: str, text: str) -> None:
+        vector = self.encoder.encode([text])[0]
+        with self._lock:
+            row = self._row_by_id.get(business_id)
+            if row is None:
+                row = len(self._ids)
+                if row >= self._matrix.shape[0]:
+                    grown = np.zeros((_grown_capacity(self._matrix.shape[0]), self.encoder.dim), dtype=np.float32)
+                    grown[:row] = self._matrix[:row]
+                    self._matrix = grown
+                self._ids.append(business_id)
+                self._row_by_id[business_id] = row
+            self._matrix[row] = vector
+            self._checksums[business_id] = _checksum(text)
+
+    def is_current(self, business_id: str, text: str) -> bool:
+        """True if business_id is indexed with a vector encoded from text (False once its profile has changed)."""
+        return self._checksums.get(business_id) == _checksum(text)
+
+    def remove(self, business_id: str) -> None:
+        with self._lock:
+            row = self._row_by_id.pop(business_id, None)
+            self._checksums.pop(business_id, None)
+            if row is None:
+                return
+            last = len(self._ids) - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved_id
+                self._row_by_id[moved_id] = row
+            self._ids.pop()
+            self._matrix[last] = 0.0
+
+    def encode_query(self, query_text: str) -> np.ndarray:
+        return self.encoder.encode([query_text])[0]
+
+    def score(self, query_text: str, business_ids: Sequence[str]) -> np.ndarray:
+        """
+        Cosine similarity between the query and each of business_ids, clipped to [0, 1].
+        Unknown ids score 0.0; call upsert first to include them.
+        """
+        query_vector = self.encode_query(query_text)
+        with self._lock:
+            rows = np.array([self._row_by_id.get(b, -1) for b in business_ids], dtype=np.int64)
+            scores = np.zeros(len(business_ids), dtype=np.float32)
+            known = rows >= 0
+            if known.any():
+                scores[known] = self._matrix[rows[known]] @ query_vector
+        return np.clip(scores, 0.0, 1.0)
+
+    def top_k(self, query_text: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Returns the k most similar businesses across the whole index."""
+        query_vector = self.encode_query(query_text)
+        with self._lock:
+            n = len(self._ids)
+            if n == 0:
+                return []
+            scores = self._matrix[:n] @ query_vector
+            k = min(k, n)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[i], float(scores[i])) for i in top]
@@ -0,0 +1,159 @@
+"""Service taxonomy and synonym dictionary compiled into a word-level Aho-Corasick automaton"""
+
+import os
+import re
+import json
+import logging
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY_FILE = os.path.join(os.path.dirname(__file__), "service_taxonomy.json")
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def fold_token(token: str) -> str:
+    """Light plural folding ("plumbers" -> "plumber", "companies" -> "company"); applied to phrases and queries alike."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Case-folded, plural-folded word tokens: "Burst Pipes!" -> ["burst", "pipe"]."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return [fold_token(token) for token in _TOKEN_PATTERN.findall(text)]
+
+
+class Taxonomy:
+    """
+    Canonical service tags and their synonyms ("plumber", "burst pipe" -> "plumbing"), compiled once into an
+    Aho-Corasick automaton over word tokens. find() reports every phrase in a text, multi-word and
+    overlapping ones included, in one pass over its tokens; phrases only match whole words.
+    Immutable after construction, so one instance can be shared between threads.
+    """
+
+    def __init__(self, synonyms: Optional[Dict[str, Iterable[str]]] = None):
+        """
+        Args:
+            synonyms: (Optional) Canonical tag -> phrases that mean it. Each tag also matches itself.
+        """
+        self.tags: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[Tuple[Tuple[int, int], ...]] = [()]  # (tag number, phrase length in tokens) ending at a node
+        self.phrase_count = 0
+        tag_numbers: Dict[str, int] = {}
+        for tag, phrases in (synonyms or {}).items():
+            tag = " ".join(tag.casefold().split())
+            if not tag:
+                continue
+            tag_number = tag_numbers.setdefault(tag, len(tag_numbers))
+            if tag_number == len(self.tags):
+                self.tags.append(tag)
+            for phrase in (tag, *phrases):
+                self._add_phrase(tokenize(phrase), tag_number)
+        self._compile()
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    @classmethod
+    def from_file(cls, path: str) -> "Taxonomy":
+        """
+        Loads a JSON object of canonical tag -> list of synonym phrases, e.g.
+        {"plumbing": ["plumber", "pipe repair", "burst pipe"]}. Invalid entries are logged and skipped.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path} must contain a JSON object of tag -> synonyms")
+        synonyms: Dict[str, List[str]] = {}
+        for tag, phrases in data.items():
+            if not isinstance(phrases, list) or not all(isinstance(phrase, str) for phrase in phrases):
+                logger.warning(f"Skipping taxonomy tag '{tag}' of {path}: synonyms must be a list of strings")
+                continue
+            synonyms[tag] = phrases
+        taxonomy = cls(synonyms)
+        logger.info(f"Taxonomy loaded from {path}: {len(taxonomy)} tags, {taxonomy.phrase_count} phrases.")
+        return taxonomy
+
+    def _add_phrase(self, tokens: List[str], tag_number: int) -> None:
+        if not tokens:
+            return
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][token] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+            node = next_node
+        output = (tag_number, len(tokens))
+        if output not in self._outputs[node]:
+            self._outputs[node] += (output,)
+            self.phrase_count += 1
+
+    def _compile(self) -> None:
+        """Sets failure links breadth-first and merges each node's outputs with those of its failure node."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._outputs[child] += self._outputs[self._fail[child]]  # Suffix phrases also end here
+                queue.append(child)
+
+    def find(self, text: Optional[str]) -> List[Tuple[int, int, str]]:
+        """Every taxonomy phrase in text as (first token, end token, canonical tag), in order of phrase end."""
+        matches: List[Tuple[int, int, str]] = []
+        if len(self._goto) == 1:
+            return matches
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        node = 0
+        for position, token in enumerate(tokenize(text)):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for tag_number, length in outputs[node]:
+                matches.append((position + 1 - length, position + 1, self.tags[tag_number]))
+        return matches
+
+    def canonical_tags(self, texts: Iterable[Optional[str]]) -> Set[str]:
+        """Canonical tags of the phrases found in any of texts (each text is scanned separately)."""
+        return {tag for text in texts for _, _, tag in self.find(text)}
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"tags": len(self.tags), "phrases": self.phrase_count, "automaton_nodes": len(self._goto)}
+
+
+_shared_taxonomy: Optional[Taxonomy] = None
+_shared_taxonomy_lock = threading.Lock()
+
+
+def get_shared_taxonomy() -> Taxonomy:
+    """
+    Returns the process-wide Taxonomy, loaded on first use from MATCHER_TAXONOMY_FILE (default: the bundled
+    service_taxonomy.json). Set MATCHER_TAXONOMY_FILE to an empty string to disable it.
+    """
+    global _shared_taxonomy
+    with _shared_taxonomy_lock:
+        if _shared_taxonomy is None:
+            taxonomy_file = os.getenv("MATCHER_TAXONOMY_FILE", DEFAULT_TAXONOMY_FILE)
+            _shared_taxonomy = Taxonomy()
+            if taxonomy_file:
+                try:
+                    _shared_taxonomy = Taxonomy.from_file(taxonomy_file)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable MATCHER_TAXONOMY_FILE {taxonomy_file}: {e}")
+        return _shared_taxonomy
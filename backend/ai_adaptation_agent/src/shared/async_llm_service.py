@@ -0,0 +1,319 @@
+# Asynchronous LLM Interaction Service using the AsyncOpenAI client
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import weakref
+import concurrent.futures
+from typing import Dict, Any, Awaitable, Optional, Tuple, TypeVar
+from openai import APITimeoutError, AsyncOpenAI
+
+from .data_models import LLMResponse
+from .llm_cache import TieredResponseCache, make_cache_key
+from .llm_metrics import LLMMetrics
+from .prompt_governor import PromptGovernor
+from .llm_service import LLMService
+from .model_router import ModelRoute, ModelRouter
+from .rate_limiter import AdaptiveRateLimiter
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _BackgroundEventLoop:
+    """
+    A single event loop running on a daemon thread for the whole process.
+    Synchronous callers (e.g. Flask worker threads) submit coroutines to it, so every
+    async LLM call in the process shares one HTTP connection pool and one concurrency limit.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="llm-async-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+
+
+_background_loop = _BackgroundEventLoop()
+
+# One (client, semaphore) pair per (event loop, api key). httpx connection pools and asyncio semaphores are
+# bound to the loop they were created on; upstream calls all run on _background_loop, so in practice there
+# is one pair per api key for the whole process (a new pair only if that loop's thread ever has to be restarted).
+_loop_resources: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Optional[str], int], Tuple[AsyncOpenAI, asyncio.Semaphore]]]" = weakref.WeakKeyDictionary()
+_loop_resources_lock = threading.Lock()
+
+
+def _get_loop_resources(api_key: Optional[str], max_concurrency: int) -> Tuple[AsyncOpenAI, asyncio.Semaphore]:
+    loop = asyncio.get_running_loop()
+    with _loop_resources_lock:
+        per_loop = _loop_resources.setdefault(loop, {})
+        key = (api_key, max_concurrency)
+        if key not in per_loop:
+            per_loop[key] = (AsyncOpenAI(api_key=api_key, max_retries=0), asyncio.Semaphore(max_concurrency))
+        return per_loop[key]
+
+
+class AsyncLLMService(LLMService):
+    """
+    Async twin of LLMService built on AsyncOpenAI.
+    Whatever event loop a call is awaited on (asyncio.run per request included), its upstream request runs
+    on the process-wide background loop, so all calls share one keep-alive HTTP client and are capped by one
+    semaphore (LLM_MAX_CONCURRENCY, default 32); hundreds of calls can be awaited concurrently without
+    overwhelming the provider. The synchronous LLMService methods remain available on the same instance;
+    their OpenAI client is only built the first time one of them is used.
+    """
+
+    _sync_client = None
+    _sync_client_built = False
+    _sync_client_lock = threading.Lock()
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model_name: str = "gpt-3.5-turbo",
+        cache: Optional[TieredResponseCache] = None,
+        enable_cache: bool = True,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        max_retries: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        single_flight: Optional[SingleFlight] = None,
+        metrics: Optional[LLMMetrics] = None,
+        prompt_governor: Optional[PromptGovernor] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        """
+        Initialize the async LLM service.
+        Args:
+            api_key: (Optional) The OpenAI API key. Falls back to OPENAI_API_KEY.
+            model_name: The specific OpenAI model to use.
+            cache: (Optional) The TieredResponseCache to use (process-wide by default).
+            enable_cache: Set to False to disable response caching entirely.
+            rate_limiter: (Optional) The AdaptiveRateLimiter to throttle calls with (process-wide by default).
+            max_retries: Retries for transient errors. Defaults to LLM_MAX_RETRIES or 4.
+            max_concurrency: Maximum in-flight LLM calls per process (per api key and max_concurrency value). Defaults to LLM_MAX_CONCURRENCY or 32.
+            single_flight: (Optional) The SingleFlight used to coalesce identical concurrent calls.
+            metrics: (Optional) The LLMMetrics registry per-call records are written to.
+            prompt_governor: (Optional) The PromptGovernor that caps prompt size.
+            router: (Optional) The ModelRouter that picks the model, token cap, timeout and fallback per caller tag.
+        """
+        super().__init__(api_key=api_key, model_name=model_name, cache=cache, enable_cache=enable_cache,
+                         rate_limiter=rate_limiter, max_retries=max_retries, single_flight=single_flight,
+                         metrics=metrics, prompt_governor=prompt_governor, router=router)
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "32")))
+
+    def _create_client(self) -> None:
+        return None  # See client: the synchronous client is built on first use
+
+    @property
+    def client(self):
+        """The synchronous OpenAI client, built on first use (async calls use the shared AsyncOpenAI client)."""
+        if not self._sync_client_built:
+            with self._sync_client_lock:
+                if not self._sync_client_built:
+                    self._sync_client = LLMService._create_client(self)
+                    self._sync_client_built = True
+        return self._sync_client
+
+    @client.setter
+    def client(self, value) -> None:
+        self._sync_client = value
+        self._sync_client_built = value is not None
+
+    def close(self) -> None:
+        """Closes the synchronous client if one was built. The shared async client lives as long as the process."""
+        if self._sync_client_built:
+            super().close()
+
+    def is_api_key_available(self) -> bool:
+        return bool(self.api_key)
+
+    async def generate_text_async(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = "You are a helpful AI assistant.",
+        max_tokens: int = 1500,
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        caller: Optional[str] = None,
+        model: Optional[str] = None,
+        **kwargs: Any
+    ) -> LLMResponse:
+        """
+        Async version of generate_text. Waits for a concurrency slot before calling the API, and
+        identical concurrent calls on the same event loop share one upstream request.
+
+        Args:
+            prompt: The user's input text prompt for the LLM.
+            system_prompt: (Optional) The system message to set the context for the assistant.
+            max_tokens: The maximum number of tokens to generate.
+            temperature: The sampling temperature for generation.
+            use_cache: Set to False to bypass the response cache (and call coalescing) for this call.
+            caller: (Optional) Tag for instrumentation, e.g. "matcher.semantic".
+            model: (Optional) Model to use instead of the route's model.
+            **kwargs: Additional model-specific parameters for the chat completion.
+
+        Returns:
+            An LLMResponse object, with an error message in generated_text if the call fails.
+        """
+        if not self.api_key:
+            error_message = "OPENAI_API_KEY not set. Cannot make API call."
+            print(error_message)
+            return LLMResponse(original_prompt=prompt, generated_text=f"Error: {error_message}", metadata={"error": True})
+
+        route = self._resolve_route(caller, model)
+        model = route.model or self.model_name
+        max_tokens = route.cap_tokens(max_tokens)
+        prompt = self.prompt_governor.enforce_budget(prompt)
+        cache_key, cached_response = self._check_cache(prompt, system_prompt, max_tokens, temperature, use_cache, model=model, **kwargs)
+        if cached_response is not None:
+            self._record_call(caller, "cache_hit", model=model)
+            return cached_response
+
+        if not use_cache:
+            return await self._call_routed_async(prompt, system_prompt, max_tokens, temperature, cache_key, caller, route, **kwargs)
+        flight_key = cache_key or make_cache_key(model, system_prompt, prompt, temperature, max_tokens, **kwargs)
+        response, shared = await self.single_flight.do_async(
+            flight_key, lambda: self._call_routed_async(prompt, system_prompt, max_tokens, temperature, cache_key, caller, route, **kwargs)
+        )
+        if not shared:
+            return response
+        self._record_call(caller, "coalesced", model=model)
+        return self._coalesced_response(response)
+
+    async def _call_routed_async(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        cache_key: Optional[str],
+        caller: Optional[str],
+        route: ModelRoute,
+        **kwargs: Any
+    ) -> LLMResponse:
+        """Async version of _call_routed: the route's model and timeout, then its fallback model on failure."""
+        start = time.monotonic()
+        model = route.model or self.model_name
+        response = await self._call_llm_async(prompt, system_prompt, max_tokens, temperature, cache_key, caller,
+                                               model=model, timeout=route.timeout_seconds, **kwargs)
+        fallback = route.fallback_model
+        used_fallback = not response.success and bool(fallback) and fallback != model
+        if used_fallback:
+            logger.warning(f"Async LLM call on {model} failed for route '{route.name}', falling back to {fallback}")
+            fallback_key = make_cache_key(fallback, system_prompt, prompt, temperature, max_tokens, **kwargs) if cache_key is not None else None
+            response = await self._call_llm_async(prompt, system_prompt, max_tokens, temperature, fallback_key, caller,
+                                                   model=fallback, timeout=route.timeout_seconds, **kwargs)
+            response.metadata = dict(response.metadata or {}, fallback_from=model)
+        self.router.record(route, fallback if used_fallback else model, time.monotonic() - start, response.success, fallback=used_fallback)
+        return response
+
+    async def _call_llm_async(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        cache_key: Optional[str],
+        caller: Optional[str] = None,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any
+    ) -> LLMResponse:
+        """
+        Makes the upstream chat completion call with the shared client, semaphore, limiter and retries,
+        on the background loop (awaited from any other loop through a wrapped future).
+        """
+        if asyncio.get_running_loop() is not _background_loop.get_loop():
+            return await asyncio.wrap_future(_background_loop.submit(self._call_llm_async(
+                prompt, system_prompt, max_tokens, temperature, cache_key, caller, model=model, timeout=timeout, **kwargs
+            )))
+        model = model or self.model_name
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        client, semaphore = _get_loop_resources(self.api_key, self.max_concurrency)
+        messages = self._build_messages(prompt, system_prompt)
+        estimated_tokens = self._estimate_request_tokens(messages, max_tokens)
+        start = time.monotonic()
+        queue_wait = 0.0
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                wait_start = time.monotonic()
+                async with semaphore:
+                    await self.rate_limiter.acquire_async(estimated_tokens)
+                    queue_wait += time.monotonic() - wait_start
+                    logger.debug(f"Making async LLM call for prompt: {prompt[:100]}... with model {model}")
+                    raw_response = await client.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        **kwargs
+                    )
+                self.rate_limiter.update_from_headers(raw_response.headers)
+                completion = raw_response.parse()
+                if completion.usage:
+                    self.rate_limiter.reconcile(estimated_tokens, completion.usage.total_tokens)
+            except Exception as e:
+                delay = None if timeout is not None and isinstance(e, APITimeoutError) else self._retry_delay(e, attempt)
+                if delay is None:
+                    self._record_call(caller, "error", start, queue_wait, attempts=attempt + 1, model=model)
+                    return self._error_response(prompt, e)
+                logger.warning(f"Async LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+                continue
+            response = self._response_from_completion(prompt, completion, cache_key, attempts=attempt + 1, model=model)
+            record = self._record_call(caller, "success", start, queue_wait, completion=completion, attempts=attempt + 1, model=model)
+            return self._with_call_metadata(response, record)
+
+    async def generate_json_response_async(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = "You are a helpful AI assistant. Respond only with valid JSON.",
+        max_tokens: int = 1500,
+        temperature: float = 0.2,
+        response_model: Any = None,
+        **kwargs: Any
+    ) -> Optional[Any]:
+        """
+        Async call that expects a JSON reply (JSON mode per LLM_JSON_MODE, local repair, optional
+        validation against response_model - see LLMService.generate_json_response).
+
+        Returns:
+            The parsed JSON value (dict or list), or None if the call failed or the reply could not be parsed.
+        """
+        if "response_format" not in kwargs:
+            response_format = self._json_response_format(response_model)
+            if response_format is not None:
+                kwargs["response_format"] = response_format
+        response = await self.generate_text_async(
+            prompt, system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature, **kwargs
+        )
+        if not response.success:
+            return None
+        parsed = self._parse_json_text(response.generated_text)
+        if parsed is None:
+            logger.warning(f"Async LLM reply was not valid JSON: {response.generated_text[:200]}")
+        return self._validate_json_value(parsed, response_model)
+
+    @staticmethod
+    def run_coroutine(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """
+        Runs a coroutine on the process-wide background event loop and blocks until it finishes.
+        Lets synchronous code (e.g. Flask views) fan out many LLM calls with asyncio.gather.
+        """
+        return _background_loop.submit(coro).result(timeout=timeout)
@@ -0,0 +1,329 @@
+# Circuit breaking and hedged requests for latency-sensitive LLM dependencies
+
+import os
+import time
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Count-based sliding-window circuit breaker.
+    The circuit opens when, over the last window_size calls (and at least min_calls), the failure rate
+    or the slow-call rate reaches its threshold. While open, allow_request() returns False so callers
+    take their fallback path without waiting on the dependency. After open_seconds one probe call is
+    let through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str = "llm",
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 8.0,
+        slow_call_rate_threshold: float = 0.8,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0
+    ):
+        """
+        Args:
+            name: Label used in logs and stats.
+            failure_rate_threshold: Fraction of failed calls in the window that opens the circuit.
+            slow_call_seconds: Calls slower than this count as slow (even when they succeed).
+            slow_call_rate_threshold: Fraction of slow calls in the window that opens the circuit.
+            window_size: Number of most recent calls considered.
+            min_calls: Calls required in the window before the rates are evaluated.
+            open_seconds: How long the circuit stays open before a half-open probe is allowed.
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = max(1, min_calls)
+        self.open_seconds = open_seconds
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=max(self.min_calls, window_size))
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejected_calls = 0
+        self.last_open_reason: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, name: str = "llm") -> "CircuitBreaker":
+        """
+        Reads LLM_BREAKER_FAILURE_RATE (default 0.5), LLM_BREAKER_SLOW_CALL_SECONDS (8),
+        LLM_BREAKER_SLOW_CALL_RATE (0.8), LLM_BREAKER_WINDOW (20), LLM_BREAKER_MIN_CALLS (5)
+        and LLM_BREAKER_OPEN_SECONDS (30).
+        """
+        return cls(
+            name=name,
+            failure_rate_threshold=float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "8")),
+            slow_call_rate_threshold=float(os.getenv("LLM_BREAKER_SLOW_CALL_RATE", "0.8")),
+            window_size=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "5")),
+            open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30")),
+        )
+
+    def _current_state(self, now: float) -> str:
+        """Caller holds the lock. An open circuit whose timeout has passed reports half-open."""
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def is_open(self) -> bool:
+        """True while calls are being short-circuited (a half-open circuit with its probe in flight included)."""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            return state == OPEN or (state == HALF_OPEN and self._probe_in_flight)
+
+    def allow_request(self) -> bool:
+        """
+        Returns True if a call may proceed. In the half-open state only one probe is admitted at a time.
+        Every admitted call must be followed by record().
+        """
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected_calls += 1
+            return False
+
+    def record(self, success: bool, duration_seconds: float = 0.0) -> None:
+        """Records the outcome of an admitted call and updates the circuit state."""
+        slow = duration_seconds >= self.slow_call_seconds
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == HALF_OPEN:
+                self._probe_in_flight = False
+                if success and not slow:
+                    logger.info(f"Circuit '{self.name}' closed after a successful probe.")
+                    self._state = CLOSED
+                    self._window.clear()
+                else:
+                    self._open("half-open probe failed" if not success else "half-open probe was slow")
+                return
+            if state == OPEN:
+                return  # A call admitted before the circuit opened finished late
+            self._window.append((success, slow))
+            if len(self._window) < self.min_calls:
+                return
+            failure_rate = sum(1 for ok, _ in self._window if not ok) / len(self._window)
+            slow_rate = sum(1 for _, is_slow in self._window if is_slow) / len(self._window)
+            if failure_rate >= self.failure_rate_threshold:
+                self._open(f"failure rate {failure_rate:.0%}")
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._open(f"slow-call rate {slow_rate:.0%} (>= {self.slow_call_seconds}s)")
+
+    def _open(self, reason: str) -> None:
+        """Caller holds the lock."""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._window.clear()
+        self.times_opened += 1
+        self.last_open_reason = reason
+        logger.warning(f"Circuit '{self.name}' opened: {reason}. Calls short-circuited for {self.open_seconds}s.")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self._current_state(time.monotonic()),
+                "window_calls": len(self._window),
+                "window_failures": sum(1 for ok, _ in self._window if not ok),
+                "window_slow_calls": sum(1 for _, slow in self._window if slow),
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected_calls,
+                "last_open_reason": self.last_open_reason,
+            }
+
+
+class HedgedCaller:
+    """
+    Runs a call with an overall timeout and, optionally, a hedge: if the primary has not finished
+    after the hedge_percentile latency of recent successful calls (per key), a duplicate is started
+    and whichever returns a usable result first wins. Late results are left to finish in the background.
+    """
+
+    def __init__(
+        self,
+        hedge_enabled: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        min_hedge_delay_seconds: float = 0.05,
+        history_size: int = 200,
+        max_workers: int = 16
+    ):
+        """
+        Args:
+            hedge_enabled: Send a duplicate request once the latency percentile is exceeded.
+            hedge_percentile: Latency percentile (of recent successful calls) that triggers the hedge.
+            hedge_min_samples: Successful calls needed for a key before hedging starts.
+            min_hedge_delay_seconds: Lower bound on the hedge delay.
+            history_size: Latency samples kept per key.
+            max_workers: Threads available for timed and hedged calls.
+        """
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.min_hedge_delay_seconds = min_hedge_delay_seconds
+        self.history_size = history_size
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedged-call")
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_env(cls) -> "HedgedCaller":
+        """Reads LLM_HEDGE_ENABLED (default false), LLM_HEDGE_PERCENTILE (95), LLM_HEDGE_MIN_SAMPLES (20)."""
+        return cls(
+            hedge_enabled=os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes"),
+            hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+            hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        )
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """The current hedge trigger for key, or None while hedging is off or there are too few samples."""
+        if not self.hedge_enabled:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        rank = min(len(samples) - 1, int(round(self.hedge_percentile / 100.0 * (len(samples) - 1))))
+        return max(samples[rank], self.min_hedge_delay_seconds)
+
+    def _observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.history_size)).append(seconds)
+
+    def call(
+        self,
+        key: str,
+        primary: Callable[[], T],
+        hedge: Optional[Callable[[], T]] = None,
+        timeout: Optional[float] = None,
+        is_success: Callable[[Any], bool] = lambda result: result is not None
+    ) -> Tuple[Optional[T], bool]:
+        """
+        Args:
+            key: Latency-history key, e.g. the caller tag ("matcher.semantic").
+            primary: The call to make.
+            hedge: (Optional) The duplicate call (defaults to primary). It should bypass request
+                   coalescing, or it would just join the primary.
+            timeout: (Optional) Give up after this many seconds and return (None, True).
+            is_success: Decides whether a result is usable; an unusable first result waits for the other call.
+
+        Returns:
+            (result, timed_out)
+        """
+        with self._lock:
+            self.calls += 1
+        delay = self.hedge_delay(key)
+        start = time.monotonic()
+        if delay is None and timeout is None:
+            result = primary()
+            if is_success(result):
+                self._observe(key, time.monotonic() - start)
+            return result, False
+
+        deadline = start + timeout if timeout is not None else None
+        pending = {self._executor.submit(primary)}
+        hedged = False
+        first_wait = delay if delay is not None else timeout
+        if deadline is not None:
+            first_wait = min(first_wait, deadline - time.monotonic())
+        done, _ = concurrent.futures.wait(pending, timeout=max(0.0, first_wait))
+        primary_future = next(iter(pending))
+        if not done and delay is not None and (deadline is None or time.monotonic() < deadline):
+            pending.add(self._executor.submit(hedge or primary))
+            hedged = True
+            with self._lock:
+                self.hedges_sent += 1
+
+        result: Optional[T] = None
+        while pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = concurrent.futures.wait(pending, timeout=remaining, return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    candidate = future.result()
+                except Exception as e:
+                    logger.warning(f"Hedged call '{key}' raised {type(e).__name__}: {e}")
+                    continue
+                if is_success(candidate):
+                    self._observe(key, time.monotonic() - start)
+                    if hedged and future is not primary_future:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return candidate, False
+                result = candidate
+            if not pending:
+                return result, False
+        with self._lock:
+            self.timeouts += 1
+        logger.warning(f"Call '{key}' timed out after {timeout}s (hedged: {hedged}).")
+        return None, True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = list(self._latencies)
+            stats = {
+                "hedge_enabled": self.hedge_enabled,
+                "calls": self.calls,
+                "hedges_sent": self.hedges_sent,
+                "hedges_won": self.hedges_won,
+                "timeouts": self.timeouts,
+            }
+        stats["hedge_delay_seconds"] = {key: self.hedge_delay(key) for key in keys}
+        return stats
+
+
+_shared_breakers: Dict[str, CircuitBreaker] = {}
+_shared_hedged_caller: Optional[HedgedCaller] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_circuit_breaker(name: str = "llm") -> CircuitBreaker:
+    """Returns the process-wide breaker for a dependency name, creating it from the environment on first use."""
+    with _shared_lock:
+        if name not in _shared_breakers:
+            _shared_breakers[name] = CircuitBreaker.from_env(name)
+        return _shared_breakers[name]
+
+
+def get_shared_hedged_caller() -> HedgedCaller:
+    """Returns the process-wide HedgedCaller configured from the environment."""
+    global _shared_hedged_caller
+    with _shared_lock:
+        if _shared_hedged_caller is None:
+            _shared_hedged_caller = HedgedCaller.from_env()
+        return _shared_hedged_caller
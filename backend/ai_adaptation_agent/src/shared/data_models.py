@@ -55,6 +55,7 @@ class CustomerQuery(BaseModel):
     service_category: Optional[str] = None
     keywords: List[str] = Field(default_factory=list)
     location: Optional[str] = None
+    radius_km: Optional[float] = None # Search radius around a location found in the gazetteer
     # ... other potential fields for structured queries
 
 class MatchedBusiness(BaseModel):
@@ -68,6 +69,13 @@ class MatchedBusiness(BaseModel):
     match_reason: Optional[str] = None
     relevance_score: float
 
+class MatchedBusinessPage(BaseModel):
+    """One page of ranked matches. Pass next_cursor back to get the following page (None on the last page)."""
+    matches: List[MatchedBusiness]
+    next_cursor: Optional[str] = None
+    degraded: bool = False # True if a stage was skipped or cut short (out of time, or failed like a database outage)
+    degraded_stages: List[str] = Field(default_factory=list)
+
 # --- Shared Utility Models ---
 
 class LLMResponse(BaseModel):
@@ -76,5 +84,10 @@ class LLMResponse(BaseModel):
     generated_text: str
     metadata: Optional[Dict[str, Any]] = None
 
+    @property
+    def success(self) -> bool:
+        """False when the call failed (error responses carry metadata["error"])."""
+        return not (self.metadata or {}).get("error")
+
 # Add more models as needed for knowledge base, configurations, etc.
 
@@ -0,0 +1,268 @@
+# Structured-output helpers: incremental JSON parsing, local repair and schema validation
+
+import re
+import ast
+import json
+import logging
+import typing
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+logger = logging.getLogger(__name__)
+
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_DANGLING_TAIL = re.compile(r'(,\s*|,?\s*"(?:[^"\\]|\\.)*"\s*:\s*)$')
+
+
+class IncrementalJSONParser:
+    """
+    Consumes a JSON document chunk by chunk (e.g. from a streamed completion) and tracks which
+    top-level object keys (or array items) are complete, so a caller can stop the stream as soon
+    as everything it needs has arrived. Leading prose or code fences before the root are ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self.completed_keys: Set[str] = set()
+        self.completed_items = 0
+        self._pos = 0
+        self._root_start: Optional[int] = None
+        self._root_kind: Optional[str] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expecting_key = False
+        self._key_start: Optional[int] = None
+        self._current_key: Optional[str] = None
+        self._member_open = False
+        self._last_member_end: Optional[int] = None
+        self._root_end: Optional[int] = None
+
+    def feed(self, chunk: str) -> None:
+        """Appends chunk and advances the scanner over it."""
+        if self.done or not chunk:
+            return
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            char = text[self._pos]
+            if self._root_start is None:
+                if char in "{[":
+                    self._root_start = self._pos
+                    self._root_kind = char
+                    self._depth = 1
+                    self._expecting_key = char == "{"
+                self._pos += 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._current_key = json.loads(text[self._key_start:self._pos + 1])
+                        self._key_start = None
+                        self._expecting_key = False
+                self._pos += 1
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._root_kind == "{" and self._expecting_key:
+                    self._key_start = self._pos
+                elif self._depth == 1:
+                    self._member_open = True
+            elif char in "{[":
+                if self._depth == 1:
+                    self._member_open = True
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_member(self._pos)
+                    self._root_end = self._pos + 1
+                    self.done = True
+            elif char == "," and self._depth == 1:
+                self._complete_member(self._pos)
+                self._expecting_key = self._root_kind == "{"
+            elif self._depth == 1 and not char.isspace() and char != ":":
+                self._member_open = True
+            self._pos += 1
+
+    def _complete_member(self, end: int) -> None:
+        if not self._member_open:
+            return
+        if self._root_kind == "{" and self._current_key is not None:
+            self.completed_keys.add(self._current_key)
+            self._current_key = None
+        elif self._root_kind == "[":
+            self.completed_items += 1
+        self._member_open = False
+        self._last_member_end = end
+
+    def has_keys(self, keys: Iterable[str]) -> bool:
+        """True once every key in keys has a complete value (or the document is complete)."""
+        return self.done or set(keys) <= self.completed_keys
+
+    def value(self) -> Optional[Any]:
+        """The full document if complete, otherwise the completed members so far (or None)."""
+        if self._root_start is None:
+            return None
+        try:
+            if self.done:
+                return json.loads(self.text[self._root_start:self._root_end])
+            if self._last_member_end is None:
+                return None
+            closer = "}" if self._root_kind == "{" else "]"
+            return json.loads(self.text[self._root_start:self._last_member_end] + closer)
+        except json.JSONDecodeError:
+            return None
+
+
+def _strip_fences(text: str) -> str:
+    candidate = text.strip()
+    if candidate.startswith("```"):
+        candidate = candidate.strip("`")
+        if candidate.lower().startswith("json"):
+            candidate = candidate[4:]
+    return candidate.strip()
+
+
+def _close_open_structures(text: str) -> str:
+    """Closes an unterminated string and any unclosed brackets (e.g. output cut off by max_tokens)."""
+    stack: List[str] = []
+    in_string = escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = _DANGLING_TAIL.sub("", text.rstrip())
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: Optional[str]) -> Optional[Any]:
+    """
+    Parses a model reply as JSON, repairing common defects locally instead of asking the model again:
+    code fences and surrounding prose, smart quotes, trailing commas, truncated output, and
+    Python-style literals (single quotes, True/False/None).
+    Returns the parsed value, or None if it cannot be recovered.
+    """
+    if not text:
+        return None
+    candidate = _strip_fences(text)
+    starts = [i for i in (candidate.find("{"), candidate.find("[")) if i != -1]
+    if not starts:
+        return None
+    candidate = candidate[min(starts):]
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+
+    closer = "}" if candidate[0] == "{" else "]"
+    end = candidate.rfind(closer)
+    attempts = [candidate[:end + 1]] if end != -1 else []
+    attempts.append(candidate)
+    for attempt in attempts:
+        fixed = _TRAILING_COMMA.sub(r"\1", attempt.translate(_SMART_QUOTES))
+        for variant in (fixed, _close_open_structures(fixed)):
+            try:
+                return json.loads(variant)
+            except json.JSONDecodeError:
+                pass
+            try:
+                value = ast.literal_eval(variant)
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                continue
+            if isinstance(value, (dict, list)):
+                return value
+    return None
+
+
+def _is_list_type(response_model: Any) -> bool:
+    return typing.get_origin(response_model) in (list, List)
+
+
+def unwrap_list(value: Any) -> Any:
+    """JSON mode only allows top-level objects; unwraps {"items": [...]} style replies when a list is expected."""
+    if isinstance(value, dict):
+        lists = [v for v in value.values() if isinstance(v, list)]
+        if len(lists) == 1:
+            return lists[0]
+    return value
+
+
+def json_schema_for(response_model: Any) -> Dict[str, Any]:
+    """JSON schema for a response_format of type json_schema. Lists are wrapped in {"items": [...]}."""
+    schema = TypeAdapter(response_model).json_schema()
+    if _is_list_type(response_model):
+        definitions = schema.pop("$defs", None)
+        schema = {"type": "object", "properties": {"items": schema}, "required": ["items"]}
+        if definitions:
+            schema["$defs"] = definitions
+    elif schema.get("type") != "object":
+        raise ValueError("response_model must describe a JSON object or a list")
+    return schema
+
+
+def _keep_extras(raw: Any, validated: Any) -> Any:
+    """Validated (coerced) values win, but keys the model does not declare are kept rather than dropped."""
+    if isinstance(raw, dict) and isinstance(validated, dict):
+        return {**raw, **validated}
+    if isinstance(raw, list) and isinstance(validated, list) and len(raw) == len(validated):
+        return [_keep_extras(r, v) for r, v in zip(raw, validated)]
+    return validated
+
+
+def validate_json(value: Any, response_model: Any) -> Optional[Any]:
+    """
+    Validates value against a pydantic model or type (e.g. List[AudiencePersona], Dict[str, str]).
+    Invalid items of a list are dropped rather than failing the whole reply.
+    Returns plain Python data (models dumped to dicts), or None if nothing valid remains.
+    """
+    if _is_list_type(response_model):
+        value = unwrap_list(value)
+    adapter = TypeAdapter(response_model)
+    try:
+        return _keep_extras(value, adapter.dump_python(adapter.validate_python(value)))
+    except ValidationError as e:
+        if not (_is_list_type(response_model) and isinstance(value, list)):
+            logger.warning(f"LLM JSON reply failed validation against {response_model}: {e.error_count()} errors")
+            return None
+    item_adapter = TypeAdapter(typing.get_args(response_model)[0] if typing.get_args(response_model) else Any)
+    kept = []
+    for item in value:
+        try:
+            kept.append(_keep_extras(item, item_adapter.dump_python(item_adapter.validate_python(item))))
+        except ValidationError:
+            continue
+    if not kept:
+        logger.warning(f"No item of the LLM JSON reply validated against {response_model}")
+        return None
+    logger.info(f"Dropped {len(value) - len(kept)} invalid items from LLM JSON reply")
+    return kept
+
+
+def model_name_for(response_model: Any) -> str:
+    """A schema name acceptable to the API (letters, digits, _ and -)."""
+    if isinstance(response_model, type) and issubclass(response_model, BaseModel):
+        name = response_model.__name__
+    else:
+        name = re.sub(r"[^A-Za-z0-9_-]+", "_", str(response_model)).strip("_")
+    return name[:64] or "response"
@@ -0,0 +1,326 @@
+# Two-tier response cache for LLM calls (in-process LRU + persistent SQLite)
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(
+    model: str,
+    system_prompt: Optional[str],
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    **kwargs: Any
+) -> str:
+    """
+    Builds a stable cache key covering every input that influences the completion.
+    Args:
+        model: The model name the request is sent to.
+        system_prompt: The system message (may be None).
+        prompt: The user prompt.
+        temperature: The sampling temperature.
+        max_tokens: The maximum number of tokens to generate.
+        **kwargs: Any extra chat completion parameters (e.g. response_format, top_p).
+
+    Returns:
+        A hex SHA-256 digest of the canonical JSON encoding of the inputs.
+    """
+    payload = {
+        "model": model,
+        "system_prompt": system_prompt,
+        "prompt": prompt,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "kwargs": kwargs,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LRUTTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries also expire after a fixed TTL.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        """
+        Args:
+            max_entries: Maximum number of entries held before the least recently used one is evicted.
+            ttl_seconds: Lifetime of an entry in seconds.
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteResponseCache:
+    """
+    Persistent cache tier backed by a local SQLite file, so cached responses survive restarts.
+    """
+
+    TABLE_NAME = "llm_response_cache"
+
+    def __init__(self, db_path: str, ttl_seconds: float = 86400.0, max_entries: int = 50000):
+        """
+        Args:
+            db_path: Path to the SQLite database file. Parent directories are created if needed.
+            ttl_seconds: Lifetime of an entry in seconds.
+            max_entries: Maximum number of rows kept; the oldest rows are pruned beyond this. The row count is
+                         read once on open and then tracked per write, so writes never scan the table.
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} ("
+            "cache_key TEXT PRIMARY KEY, value_json TEXT NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.TABLE_NAME}_created_at ON {self.TABLE_NAME} (created_at)"
+        )
+        self._conn.commit()
+        self._row_count = self._conn.execute(f"SELECT COUNT(*) FROM {self.TABLE_NAME}").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value_json, expires_at FROM {self.TABLE_NAME} WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value_json, expires_at = row
+            if expires_at <= time.time():
+                cur = self._conn.execute(f"DELETE FROM {self.TABLE_NAME} WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                self._row_count -= cur.rowcount
+                self.expirations += 1
+                return None
+        try:
+            return json.loads(value_json)
+        except json.JSONDecodeError:
+            logger.warning(f"Discarding unreadable LLM cache entry {key[:12]}...")
+            self.delete(key)
+            return None
+
+    def set(self, key: str, value: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        with self._lock:
+            # A primary key lookup, unlike COUNT(*), does not grow with the table
+            exists = self._conn.execute(f"SELECT 1 FROM {self.TABLE_NAME} WHERE cache_key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE_NAME} (cache_key, value_json, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now, now + ttl),
+            )
+            if not exists:
+                self._row_count += 1
+            if self._row_count > self.max_entries:
+                cur = self._conn.execute(
+                    f"DELETE FROM {self.TABLE_NAME} WHERE cache_key IN "
+                    f"(SELECT cache_key FROM {self.TABLE_NAME} ORDER BY created_at ASC LIMIT ?)",
+                    (self._row_count - self.max_entries,),
+                )
+                self._row_count -= cur.rowcount
+                self.evictions += cur.rowcount
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            cur = self._conn.execute(f"DELETE FROM {self.TABLE_NAME} WHERE cache_key = ?", (key,))
+            self._conn.commit()
+            self._row_count -= cur.rowcount
+
+    def purge_expired(self) -> int:
+        """Removes all expired rows and returns how many were deleted."""
+        with self._lock:
+            cur = self._conn.execute(f"DELETE FROM {self.TABLE_NAME} WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            self._row_count -= cur.rowcount
+            self.expirations += cur.rowcount
+            return cur.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.TABLE_NAME}")
+            self._conn.commit()
+            self._row_count = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredResponseCache:
+    """
+    Combines an in-process LRU/TTL tier with an optional persistent SQLite tier.
+    Lookups check memory first, then disk (promoting disk hits into memory).
+    Writes go to both tiers.
+    """
+
+    def __init__(self, memory_tier: Optional[LRUTTLCache] = None, disk_tier: Optional[SQLiteResponseCache] = None):
+        self.memory_tier = memory_tier or LRUTTLCache()
+        self.disk_tier = disk_tier
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    @classmethod
+    def from_env(cls) -> "TieredResponseCache":
+        """
+        Builds a cache from environment variables:
+            LLM_CACHE_MAX_ENTRIES (default 1024), LLM_CACHE_TTL_SECONDS (default 3600),
+            LLM_CACHE_DB_PATH (unset disables the disk tier), LLM_CACHE_DISK_TTL_SECONDS (default 86400).
+        """
+        memory_tier = LRUTTLCache(
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600")),
+        )
+        disk_tier = None
+        db_path = os.getenv("LLM_CACHE_DB_PATH")
+        if db_path:
+            try:
+                disk_tier = SQLiteResponseCache(
+                    db_path,
+                    ttl_seconds=float(os.getenv("LLM_CACHE_DISK_TTL_SECONDS", "86400")),
+                )
+            except sqlite3.Error as e:
+                logger.error(f"Could not open LLM disk cache at {db_path}: {e}. Continuing with memory tier only.")
+        return cls(memory_tier=memory_tier, disk_tier=disk_tier)
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Looks up a key in both tiers.
+        Returns:
+            A (value, tier) tuple where tier is "memory", "disk" or None on a miss.
+        """
+        value = self.memory_tier.get(key)
+        if value is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return value, "memory"
+
+        if self.disk_tier is not None:
+            try:
+                value = self.disk_tier.get(key)
+            except sqlite3.Error as e:
+                logger.error(f"LLM disk cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.memory_tier.set(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value, "disk"
+
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.memory_tier.set(key, value)
+        if self.disk_tier is not None:
+            try:
+                self.disk_tier.set(key, value)
+            except sqlite3.Error as e:
+                logger.error(f"LLM disk cache write failed: {e}")
+        with self._lock:
+            self.writes += 1
+
+    def clear(self) -> None:
+        self.memory_tier.clear()
+        if self.disk_tier is not None:
+            self.disk_tier.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/eviction counters for monitoring."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            stats = {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+                "memory_entries": len(self.memory_tier),
+                "memory_evictions": self.memory_tier.evictions,
+                "memory_expirations": self.memory_tier.expirations,
+                "disk_enabled": self.disk_tier is not None,
+            }
+        if self.disk_tier is not None:
+            stats["disk_evictions"] = self.disk_tier.evictions
+            stats["disk_expirations"] = self.disk_tier.expirations
+        return stats
+
+
+_shared_response_cache: Optional[TieredResponseCache] = None
+_shared_response_cache_lock = threading.Lock()
+
+
+def get_shared_response_cache() -> TieredResponseCache:
+    """
+    Returns the process-wide response cache, built from the LLM_CACHE_* environment variables on first use,
+    so every service shares one memory tier and one SQLite connection.
+    """
+    global _shared_response_cache
+    with _shared_response_cache_lock:
+        if _shared_response_cache is None:
+            _shared_response_cache = TieredResponseCache.from_env()
+        return _shared_response_cache
@@ -0,0 +1,215 @@
+# Per-call LLM instrumentation: latency, queue wait, token and cost histograms with Prometheus export
+
+import os
+import json
+import bisect
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUEUE_WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+COST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+# USD per 1K (prompt, completion) tokens. Override or extend with LLM_PRICING_JSON,
+# e.g. '{"gpt-4o": [0.0025, 0.01]}'. Unknown models are recorded with zero cost.
+DEFAULT_PRICING_PER_1K: Dict[str, Tuple[float, float]] = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+}
+
+UNTAGGED_CALLER = "untagged"
+
+
+@dataclass
+class LLMCallRecord:
+    """Structured description of one LLMService call."""
+    caller: str
+    model: str
+    outcome: str  # "success", "error", "cache_hit" or "coalesced"
+    wall_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    finish_reason: Optional[str] = None
+    attempts: int = 1
+    streamed: bool = False
+    cost_usd: float = 0.0
+
+
+class Histogram:
+    """A labelled cumulative histogram in the Prometheus data model. Thread-safe."""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], label_names: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = _format_labels(self.label_names, label_values)
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names + ('le',), label_values + (_format_number(bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names + ('le',), label_values + ('+Inf',))} {series['count']}")
+                lines.append(f"{self.name}_sum{labels} {_format_number(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Counter:
+    """A labelled monotonically increasing counter in the Prometheus data model. Thread-safe."""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_number(value)}")
+        return lines
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_number(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def load_pricing() -> Dict[str, Tuple[float, float]]:
+    """Default per-1K token prices merged with LLM_PRICING_JSON overrides."""
+    pricing = dict(DEFAULT_PRICING_PER_1K)
+    overrides = os.getenv("LLM_PRICING_JSON")
+    if overrides:
+        try:
+            for model, prices in json.loads(overrides).items():
+                pricing[model] = (float(prices[0]), float(prices[1]))
+        except (ValueError, TypeError, IndexError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid LLM_PRICING_JSON: {e}")
+    return pricing
+
+
+class LLMMetrics:
+    """
+    Aggregates LLMCallRecords into Prometheus histograms and counters, labelled by caller tag
+    (e.g. "blueprint.personas", "matcher.semantic") and model, and keeps per-caller totals
+    for a quick view of which stage uses the most latency and spend.
+    """
+
+    def __init__(self, pricing: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.pricing = pricing if pricing is not None else load_pricing()
+        labels = ("caller", "model")
+        self.call_duration = Histogram("llm_call_duration_seconds", "Wall time of upstream LLM calls, including retries and queue wait.", LATENCY_BUCKETS, labels)
+        self.queue_wait = Histogram("llm_queue_wait_seconds", "Time spent waiting for rate-limit or concurrency capacity.", QUEUE_WAIT_BUCKETS, labels)
+        self.prompt_tokens = Histogram("llm_prompt_tokens", "Prompt tokens per LLM call.", TOKEN_BUCKETS, labels)
+        self.completion_tokens = Histogram("llm_completion_tokens", "Completion tokens per LLM call.", TOKEN_BUCKETS, labels)
+        self.call_cost = Histogram("llm_call_cost_usd", "Estimated cost per LLM call in USD.", COST_BUCKETS, labels)
+        self.calls = Counter("llm_calls_total", "LLM calls by outcome (success, error, cache_hit, coalesced) and finish reason.", ("caller", "model", "outcome", "finish_reason"))
+        self._summary: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def estimate_cost(self, model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> float:
+        prices = self.pricing.get(model)
+        if prices is None:
+            # Dated snapshots (e.g. "gpt-4o-2024-08-06") are priced like their base model
+            prices = next((p for name, p in sorted(self.pricing.items(), key=lambda item: -len(item[0])) if model.startswith(name)), None)
+        if prices is None:
+            return 0.0
+        return ((prompt_tokens or 0) * prices[0] + (completion_tokens or 0) * prices[1]) / 1000.0
+
+    def record(self, record: LLMCallRecord) -> None:
+        caller = record.caller or UNTAGGED_CALLER
+        if record.outcome in ("success", "error"):
+            record.cost_usd = self.estimate_cost(record.model, record.prompt_tokens, record.completion_tokens)
+            self.call_duration.observe(record.wall_seconds, caller, record.model)
+            self.queue_wait.observe(record.queue_wait_seconds, caller, record.model)
+            if record.prompt_tokens is not None:
+                self.prompt_tokens.observe(record.prompt_tokens, caller, record.model)
+            if record.completion_tokens is not None:
+                self.completion_tokens.observe(record.completion_tokens, caller, record.model)
+            self.call_cost.observe(record.cost_usd, caller, record.model)
+        self.calls.inc(caller, record.model, record.outcome, record.finish_reason or "")
+
+        with self._lock:
+            summary = self._summary.setdefault(caller, {
+                "calls": 0, "upstream_calls": 0, "errors": 0, "wall_seconds": 0.0, "queue_wait_seconds": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+            })
+            summary["calls"] += 1
+            if record.outcome in ("success", "error"):
+                summary["upstream_calls"] += 1
+                summary["errors"] += record.outcome == "error"
+                summary["wall_seconds"] += record.wall_seconds
+                summary["queue_wait_seconds"] += record.queue_wait_seconds
+                summary["prompt_tokens"] += record.prompt_tokens or 0
+                summary["completion_tokens"] += record.completion_tokens or 0
+                summary["cost_usd"] += record.cost_usd
+        logger.debug("llm_call %s", json.dumps(dict(asdict(record), caller=caller)))
+
+    def get_summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-caller totals, sorted by total wall time (largest first)."""
+        with self._lock:
+            items = sorted(self._summary.items(), key=lambda item: item[1]["wall_seconds"], reverse=True)
+            return {caller: {k: round(v, 6) if isinstance(v, float) else v for k, v in totals.items()} for caller, totals in items}
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in (self.calls, self.call_duration, self.queue_wait, self.prompt_tokens, self.completion_tokens, self.call_cost):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+_shared_metrics: Optional[LLMMetrics] = None
+_shared_metrics_lock = threading.Lock()
+
+
+def get_shared_metrics() -> LLMMetrics:
+    """Returns the process-wide LLMMetrics registry."""
+    global _shared_metrics
+    with _shared_metrics_lock:
+        if _shared_metrics is None:
+            _shared_metrics = LLMMetrics()
+        return _shared_metrics
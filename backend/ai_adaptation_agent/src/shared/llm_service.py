@@ -1,9 +1,30 @@
 # LLM Interaction Service using OpenAI API
 
 import os
-from typing import Dict, Any, Optional
-from openai import OpenAI, APIError, RateLimitError
+import json
+import time
+import dataclasses
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Generator, Iterator, List, Optional, Tuple
+from openai import OpenAI, APIError, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from .data_models import LLMResponse
+from .json_output import IncrementalJSONParser, json_schema_for, model_name_for, repair_json, validate_json
+from .llm_cache import TieredResponseCache, get_shared_response_cache, make_cache_key
+from .llm_metrics import LLMCallRecord, LLMMetrics, get_shared_metrics
+from .model_router import ModelRoute, ModelRouter, get_shared_model_router
+from .prompt_governor import PromptGovernor, estimate_tokens, get_shared_prompt_governor
+from .rate_limiter import AdaptiveRateLimiter, RateLimitTimeout, backoff_delay, get_shared_rate_limiter, parse_retry_after
+from .sentiment import build_batch_prompt, get_shared_sentiment_scorer, parse_batch_entry
+from .single_flight import SingleFlight, get_shared_single_flight
+
+StreamUsage = namedtuple("StreamUsage", "prompt_tokens completion_tokens total_tokens")
+MIN_CALL_SECONDS = 0.05  # A call budget with less than this left does not start another model
+
+
+class LLMStreamError(Exception):
+    """Raised by generate_text_stream when the call fails; any text already yielded is incomplete."""
+
 
 class LLMService:
     """
@@ -11,13 +32,41 @@ class LLMService:
     Handles API calls, prompt engineering, error handling, and API key management via environment variables.
     """
 
-    def __init__(self, api_key: Optional[str] = None, model_name: str = "gpt-3.5-turbo"):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model_name: str = "gpt-3.5-turbo",
+        cache: Optional[TieredResponseCache] = None,
+        enable_cache: bool = True,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        max_retries: Optional[int] = None,
+        single_flight: Optional[SingleFlight] = None,
+        metrics: Optional[LLMMetrics] = None,
+        prompt_governor: Optional[PromptGovernor] = None,
+        router: Optional[ModelRouter] = None
+    ):
         """
         Initialize the LLM service.
         Args:
             api_key: (Optional) The OpenAI API key. If not provided, it will be fetched from the 
                      OPENAI_API_KEY environment variable.
             model_name: The specific OpenAI model to use (e.g., "gpt-3.5-turbo", "gpt-4").
+            cache: (Optional) The TieredResponseCache to use. If not provided and enable_cache is True,
+                   the process-wide cache (built from the LLM_CACHE_* environment variables) is used.
+            enable_cache: Set to False to disable response caching entirely.
+            rate_limiter: (Optional) The AdaptiveRateLimiter to throttle calls with. Defaults to the
+                          process-wide limiter configured by LLM_RATE_LIMIT_RPM / LLM_RATE_LIMIT_TPM.
+            max_retries: Retries for rate-limit, timeout, connection and 5xx errors, with jittered
+                         exponential backoff. Defaults to LLM_MAX_RETRIES or 4.
+            single_flight: (Optional) The SingleFlight used to coalesce identical concurrent calls.
+                           Defaults to the process-wide instance.
+            metrics: (Optional) The LLMMetrics registry per-call records are written to.
+                     Defaults to the process-wide registry.
+            prompt_governor: (Optional) The PromptGovernor that caps prompt size (LLM_MAX_PROMPT_TOKENS).
+                             Defaults to the process-wide governor.
+            router: (Optional) The ModelRouter that picks the model, token cap, timeout and fallback model
+                    per caller tag (LLM_ROUTES_FILE / LLM_ROUTES_JSON). Defaults to the process-wide router.
+                    Routes without a model use model_name.
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
@@ -26,12 +75,24 @@ class LLMService:
             # For now, we'll let it proceed but calls will fail if key is not set when client is used.
         
         self.model_name = model_name
+        self.cache = (cache if cache is not None else get_shared_response_cache()) if enable_cache else None
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.max_retries = max(0, max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "4")))
+        self.single_flight = single_flight or get_shared_single_flight()
+        self.metrics = metrics or get_shared_metrics()
+        self.prompt_governor = prompt_governor or get_shared_prompt_governor()
+        self.router = router or get_shared_model_router()
+        self.client = self._create_client()
+
+    def _create_client(self) -> Optional[OpenAI]:
         try:
-            self.client = OpenAI(api_key=self.api_key)
+            # Retries are handled here (with the shared limiter), so the SDK's own retries are disabled
+            client = OpenAI(api_key=self.api_key, max_retries=0)
             print(f"LLMService initialized for model: {self.model_name}. OpenAI client configured.")
+            return client
         except Exception as e:
             print(f"Error initializing OpenAI client: {e}")
-            self.client = None
+            return None
 
     def generate_text(
         self, 
@@ -39,6 +100,10 @@ class LLMService:
         system_prompt: Optional[str] = "You are a helpful AI assistant.",
         max_tokens: int = 1500,
         temperature: float = 0.7,
+        use_cache: bool = True,
+        caller: Optional[str] = None,
+        timeout: Optional[float] = None,
+        model: Optional[str] = None,
         **kwargs: Any
     ) -> LLMResponse:
         """
@@ -49,105 +114,715 @@ class LLMService:
             system_prompt: (Optional) The system message to set the context for the assistant.
             max_tokens: The maximum number of tokens to generate.
             temperature: The sampling temperature for generation (creativity vs. coherence).
+            use_cache: Set to False to bypass the response cache for this call (no read, no write).
+                       This also opts out of sharing an identical in-flight call.
+            caller: (Optional) Task tag, e.g. "blueprint.personas" or "matcher.semantic". It selects the model
+                    route (model, token cap, timeout, fallback model) and labels the call's metrics.
+            timeout: (Optional) Seconds the whole call may take, e.g. what a request deadline leaves. It caps the
+                     route's timeout, bounds rate-limiter waits and retries, and the fallback model is not tried
+                     once it is spent.
+            model: (Optional) Model to use instead of the route's model (the route's fallback model still applies).
             **kwargs: Additional model-specific parameters for the chat completion.
 
         Returns:
             An LLMResponse object containing the generated text and metadata.
             Returns a response with an error message if the API call fails.
+            metadata["coalesced"] is True when the result was shared from an identical concurrent call.
         """
         if not self.client:
             error_message = "OpenAI client not initialized. Cannot make API call."
             print(error_message)
             return LLMResponse(original_prompt=prompt, generated_text=f"Error: {error_message}", metadata={"error": True})
 
-        print(f"Making LLM call for prompt: {prompt[:100]}... with model {self.model_name}")
-        messages = [
+        route = self._resolve_route(caller, model)
+        model = route.model or self.model_name
+        max_tokens = route.cap_tokens(max_tokens)
+        prompt = self.prompt_governor.enforce_budget(prompt)
+        cache_key, cached_response = self._check_cache(prompt, system_prompt, max_tokens, temperature, use_cache, model=model, **kwargs)
+        if cached_response is not None:
+            self._record_call(caller, "cache_hit", model=model)
+            return cached_response
+
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        if not use_cache:
+            return self._call_routed(prompt, system_prompt, max_tokens, temperature, cache_key, caller, route, expires_at, **kwargs)
+        flight_key = cache_key or make_cache_key(model, system_prompt, prompt, temperature, max_tokens, **kwargs)
+        response, shared = self.single_flight.do(
+            flight_key, lambda: self._call_routed(prompt, system_prompt, max_tokens, temperature, cache_key, caller, route, expires_at, **kwargs)
+        )
+        if not shared:
+            return response
+        self._record_call(caller, "coalesced", model=model)
+        return self._coalesced_response(response)
+
+    def _resolve_route(self, caller: Optional[str], model: Optional[str] = None) -> ModelRoute:
+        """The caller's route, with its model replaced by model when one is given."""
+        route = self.router.resolve(caller)
+        return dataclasses.replace(route, model=model) if model else route
+
+    def _call_routed(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        cache_key: Optional[str],
+        caller: Optional[str],
+        route: ModelRoute,
+        expires_at: Optional[float] = None,
+        **kwargs: Any
+    ) -> LLMResponse:
+        """
+        Calls the route's model with the route's timeout, retrying once on the fallback model if that fails.
+        expires_at (time.monotonic()) caps both calls; the fallback is skipped once it has passed.
+        """
+        start = time.monotonic()
+        model = route.model or self.model_name
+        response = self._call_llm(prompt, system_prompt, max_tokens, temperature, cache_key, caller, model=model,
+                                  timeout=route.timeout_seconds, expires_at=expires_at, **kwargs)
+        fallback = route.fallback_model
+        used_fallback = not response.success and bool(fallback) and fallback != model and not self._budget_spent(expires_at)
+        if used_fallback:
+            print(f"LLM call on {model} failed for route '{route.name}', falling back to {fallback}")
+            fallback_key = make_cache_key(fallback, system_prompt, prompt, temperature, max_tokens, **kwargs) if cache_key is not None else None
+            response = self._call_llm(prompt, system_prompt, max_tokens, temperature, fallback_key, caller, model=fallback,
+                                      timeout=route.timeout_seconds, expires_at=expires_at, **kwargs)
+            response.metadata = dict(response.metadata or {}, fallback_from=model)
+        self.router.record(route, fallback if used_fallback else model, time.monotonic() - start, response.success, fallback=used_fallback)
+        return response
+
+    def _call_llm(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        cache_key: Optional[str],
+        caller: Optional[str] = None,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        expires_at: Optional[float] = None,
+        **kwargs: Any
+    ) -> LLMResponse:
+        """
+        Makes the upstream chat completion call with rate limiting and retries, and records its metrics.
+        With a timeout (per route), a timed-out attempt is not retried so the route's fallback can take over.
+        With expires_at, the rate-limiter wait, each attempt's timeout and the retry sleeps all fit before it.
+        """
+        model = model or self.model_name
+        print(f"Making LLM call for prompt: {prompt[:100]}... with model {model}")
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        messages = self._build_messages(prompt, system_prompt)
+        estimated_tokens = self._estimate_request_tokens(messages, max_tokens)
+        start = time.monotonic()
+        queue_wait = 0.0
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                queue_wait += self.rate_limiter.acquire(estimated_tokens, timeout=self._time_left(expires_at))
+                if expires_at is not None:
+                    kwargs["timeout"] = self._capped_timeout(timeout, expires_at)
+                raw_response = self.client.chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    **kwargs
+                )
+                self.rate_limiter.update_from_headers(raw_response.headers)
+                completion = raw_response.parse()
+                if completion.usage:
+                    self.rate_limiter.reconcile(estimated_tokens, completion.usage.total_tokens)
+            except Exception as e:
+                delay = None if "timeout" in kwargs and isinstance(e, APITimeoutError) else self._retry_delay(e, attempt)
+                if delay is not None and expires_at is not None and time.monotonic() + delay >= expires_at:
+                    delay = None  # No time left for another attempt
+                if delay is None:
+                    self._record_call(caller, "error", start, queue_wait, attempts=attempt + 1, model=model)
+                    return self._error_response(prompt, e)
+                print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                continue
+            response = self._response_from_completion(prompt, completion, cache_key, attempts=attempt + 1, model=model)
+            record = self._record_call(caller, "success", start, queue_wait, completion=completion, attempts=attempt + 1, model=model)
+            return self._with_call_metadata(response, record)
+
+    def generate_text_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = "You are a helpful AI assistant.",
+        max_tokens: int = 1500,
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        caller: Optional[str] = None,
+        timeout: Optional[float] = None,
+        model: Optional[str] = None,
+        **kwargs: Any
+    ) -> Iterator[str]:
+        """
+        Streams generated text as it is produced (stream=True), yielding content deltas.
+        A cache hit yields the whole cached text at once; a completed stream is written to the cache.
+        Transient errors are retried only before the first delta has been yielded.
+
+        Args:
+            Same as generate_text.
+
+        Yields:
+            Text fragments.
+
+        Raises:
+            LLMStreamError: If the call fails, whether before the first fragment or part-way through the reply.
+        """
+        if not self.client:
+            raise LLMStreamError("OpenAI client not initialized. Cannot make API call.")
+
+        route = self._resolve_route(caller, model)
+        model = route.model or self.model_name
+        max_tokens = route.cap_tokens(max_tokens)
+        prompt = self.prompt_governor.enforce_budget(prompt)
+        cache_key, cached_response = self._check_cache(prompt, system_prompt, max_tokens, temperature, use_cache, model=model, **kwargs)
+        if cached_response is not None:
+            self._record_call(caller, "cache_hit", streamed=True, model=model)
+            yield cached_response.generated_text
+            return
+
+        messages = self._build_messages(prompt, system_prompt)
+        models = [model] + ([route.fallback_model] if route.fallback_model and route.fallback_model != model else [])
+        chunks: List[str] = []
+        route_start = time.monotonic()
+        expires_at = route_start + timeout if timeout is not None else None
+        for current_model in models:
+            if current_model != model and self._budget_spent(expires_at):
+                break
+            if current_model != model:
+                print(f"Streaming LLM call on {model} failed for route '{route.name}', falling back to {current_model}")
+            print(f"Making streaming LLM call for prompt: {prompt[:100]}... with model {current_model}")
+            try:
+                success, finish_reason, error = yield from self._stream_from_model(
+                    messages, current_model, max_tokens, temperature, caller, route.timeout_seconds, chunks,
+                    expires_at=expires_at, **kwargs
+                )
+            except GeneratorExit:
+                self.router.record(route, current_model, time.monotonic() - route_start, True, fallback=current_model != model)
+                raise
+            if success or chunks:
+                break  # A partially streamed reply cannot be retried on another model
+
+        self.router.record(route, current_model, time.monotonic() - route_start, success, fallback=current_model != model)
+        if not success:
+            if chunks:
+                print(f"Streaming LLM call interrupted after {len(chunks)} chunks: {error}")
+            raise LLMStreamError(self._error_response(prompt, error).generated_text) from error
+        if cache_key is not None and finish_reason is not None:
+            if current_model != model:
+                cache_key = make_cache_key(current_model, system_prompt, prompt, temperature, max_tokens, **kwargs)
+            self.cache.set(cache_key, {
+                "generated_text": "".join(chunks).strip(),
+                "metadata": {"model_used": current_model, "finish_reason": finish_reason, "simulated": False, "streamed": True}
+            })
+
+    def _stream_from_model(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        caller: Optional[str],
+        timeout: Optional[float],
+        chunks: List[str],
+        expires_at: Optional[float] = None,
+        **kwargs: Any
+    ) -> Generator[str, None, Tuple[bool, Optional[str], Optional[Exception]]]:
+        """
+        Streams one model's reply with rate limiting and retries (only before the first delta), appending
+        deltas to chunks as they are yielded. Returns (success, finish_reason, error) via `yield from`.
+        A stream still running at expires_at is closed and reported as an error.
+        """
+        estimated_tokens = self._estimate_request_tokens(messages, max_tokens)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        kwargs.setdefault("stream_options", {"include_usage": True})  # Usage arrives in a final chunk without choices
+        finish_reason = None
+        usage = None
+        start = time.monotonic()
+        queue_wait = 0.0
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                queue_wait += self.rate_limiter.acquire(estimated_tokens, timeout=self._time_left(expires_at))
+                if expires_at is not None:
+                    kwargs["timeout"] = self._capped_timeout(timeout, expires_at)
+                raw_response = self.client.chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True,
+                    **kwargs
+                )
+                self.rate_limiter.update_from_headers(raw_response.headers)
+                stream = raw_response.parse()
+                try:
+                    for chunk in stream:
+                        if getattr(chunk, "usage", None) is not None:
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        choice = chunk.choices[0]
+                        delta = choice.delta.content if choice.delta else None
+                        if delta:
+                            chunks.append(delta)
+                            yield delta
+                        if choice.finish_reason:
+                            finish_reason = choice.finish_reason
+                        if expires_at is not None and finish_reason is None and time.monotonic() >= expires_at:
+                            raise TimeoutError("streaming LLM call ran past its time budget")
+                except GeneratorExit:
+                    # The consumer stopped reading (e.g. a JSON reply already has every required key)
+                    self._record_call(caller, "success", start, queue_wait, attempts=attempt + 1, streamed=True, finish_reason="early_stop",
+                                      model=model, usage=self._stream_usage(messages, chunks, usage))
+                    raise
+                finally:
+                    close = getattr(stream, "close", None)
+                    if close is not None:
+                        close()  # Drops the HTTP connection so the provider stops generating
+                break
+            except Exception as e:
+                timed_out = "timeout" in kwargs and isinstance(e, (APITimeoutError, TimeoutError))
+                delay = None if chunks or timed_out else self._retry_delay(e, attempt)
+                if delay is not None and expires_at is not None and time.monotonic() + delay >= expires_at:
+                    delay = None
+                if delay is None:
+                    self._record_call(caller, "error", start, queue_wait, attempts=attempt + 1, streamed=True, model=model,
+                                      usage=self._stream_usage(messages, chunks, usage) if chunks else None)
+                    return False, None, e
+                print(f"Streaming LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+        if usage is not None:
+            self.rate_limiter.reconcile(estimated_tokens, usage.total_tokens)
+        self._record_call(caller, "success", start, queue_wait, attempts=attempt + 1, streamed=True, finish_reason=finish_reason,
+                          model=model, usage=self._stream_usage(messages, chunks, usage))
+        return True, finish_reason, None
+
+    @staticmethod
+    def _stream_usage(messages: List[Dict[str, str]], chunks: List[str], usage: Any) -> Any:
+        """The usage the provider reported for a stream or, if it sent none (e.g. stopped early), an estimate."""
+        if usage is not None:
+            return usage
+        prompt_tokens = sum(estimate_tokens(m.get("content")) for m in messages)
+        completion_tokens = estimate_tokens("".join(chunks))
+        return StreamUsage(prompt_tokens, completion_tokens, prompt_tokens + completion_tokens)
+
+    def close(self) -> None:
+        """Closes the OpenAI client's HTTP connection pool. Call once when the service is no longer used."""
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception as e:
+                print(f"Error closing OpenAI client: {e}")
+
+    def is_api_key_available(self) -> bool:
+        """True if an API key is configured and the client was created, i.e. LLM calls can be attempted."""
+        return bool(self.api_key) and self.client is not None
+
+    def generate_json_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = "You are a helpful AI assistant. Respond only with valid JSON.",
+        max_tokens: int = 1500,
+        temperature: float = 0.2,
+        response_model: Any = None,
+        required_keys: Optional[List[str]] = None,
+        use_cache: bool = True,
+        caller: Optional[str] = None,
+        timeout: Optional[float] = None,
+        model: Optional[str] = None,
+        **kwargs: Any
+    ) -> Optional[Any]:
+        """
+        Generates a structured (JSON) reply.
+        The provider's JSON mode (or a JSON schema built from response_model) is requested according to
+        LLM_JSON_MODE ("json_object" by default, "json_schema" or "off"). Malformed replies are repaired
+        locally (fences, prose, trailing commas, truncation) - a bad reply never costs a second call.
+
+        Args:
+            prompt: The user's input text prompt; it should describe the expected JSON.
+            system_prompt: (Optional) The system message.
+            max_tokens: The maximum number of tokens to generate.
+            temperature: The sampling temperature for generation.
+            response_model: (Optional) A pydantic model or type to validate against, e.g. List[AudiencePersona]
+                            or Dict[str, str]. Invalid list items are dropped.
+            required_keys: (Optional) Top-level keys the caller needs. The reply is then streamed and the
+                           stream is closed as soon as all of them are complete.
+            use_cache: Set to False to bypass the response cache for this call.
+            caller: (Optional) Tag for instrumentation, e.g. "blueprint.personas".
+            timeout: (Optional) Seconds the whole call may take (see generate_text).
+            model: (Optional) Model to use instead of the route's model.
+            **kwargs: Additional model-specific parameters for the chat completion.
+
+        Returns:
+            The parsed (and validated) JSON value, or None if the call failed or the reply could not be recovered.
+        """
+        if "response_format" not in kwargs:
+            response_format = self._json_response_format(response_model)
+            if response_format is not None:
+                kwargs["response_format"] = response_format
+
+        if required_keys:
+            value = self._stream_json(prompt, system_prompt, max_tokens, temperature, required_keys, use_cache, caller,
+                                      timeout=timeout, model=model, **kwargs)
+        else:
+            response = self.generate_text(
+                prompt, system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature,
+                use_cache=use_cache, caller=caller, timeout=timeout, model=model, **kwargs
+            )
+            if not response.success:
+                return None
+            value = self._parse_json_text(response.generated_text)
+            if value is None:
+                print(f"LLM reply could not be parsed as JSON ({caller or 'untagged'}): {response.generated_text[:200]}")
+        return self._validate_json_value(value, response_model)
+
+    def _stream_json(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        required_keys: List[str],
+        use_cache: bool,
+        caller: Optional[str],
+        timeout: Optional[float] = None,
+        model: Optional[str] = None,
+        **kwargs: Any
+    ) -> Optional[Any]:
+        """Streams a JSON reply through an IncrementalJSONParser, stopping once required_keys are complete."""
+        prompt = self.prompt_governor.enforce_budget(prompt)
+        parser = IncrementalJSONParser()
+        stream = self.generate_text_stream(
+            prompt, system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature,
+            use_cache=use_cache, caller=caller, timeout=timeout, model=model, **kwargs
+        )
+        stopped_early = False
+        try:
+            for delta in stream:
+                parser.feed(delta)
+                if not parser.done and parser.has_keys(required_keys):
+                    stopped_early = True
+                    stream.close()
+                    break
+        except LLMStreamError as e:
+            print(f"Streaming JSON call failed ({caller or 'untagged'}): {e}")
+            return parser.value() if parser.has_keys(required_keys) else None  # Keys completed before the failure are whole
+
+        value = parser.value() if parser.has_keys(required_keys) else None
+        if value is None:
+            # Incomplete or malformed stream: fall back to local repair of whatever arrived
+            value = self._parse_json_text(parser.text)
+        elif stopped_early and use_cache and self.cache is not None:
+            # An early-stopped stream is not cached by generate_text_stream; cache the part we kept
+            route = self._resolve_route(caller, model)
+            model = route.model or self.model_name
+            cache_key = make_cache_key(model, system_prompt, prompt, temperature, route.cap_tokens(max_tokens), **kwargs)
+            self.cache.set(cache_key, {
+                "generated_text": json.dumps(value),
+                "metadata": {"model_used": model, "finish_reason": "early_stop", "simulated": False, "streamed": True}
+            })
+        return value
+
+    @staticmethod
+    def _json_response_format(response_model: Any = None) -> Optional[Dict[str, Any]]:
+        """The response_format to request for JSON replies, per LLM_JSON_MODE."""
+        mode = os.getenv("LLM_JSON_MODE", "json_object").lower()
+        if mode == "off":
+            return None
+        if mode == "json_schema" and response_model is not None:
+            return {
+                "type": "json_schema",
+                "json_schema": {"name": model_name_for(response_model), "schema": json_schema_for(response_model), "strict": False}
+            }
+        return {"type": "json_object"}
+
+    @staticmethod
+    def _validate_json_value(value: Any, response_model: Any = None) -> Optional[Any]:
+        if value is None or response_model is None:
+            return value
+        return validate_json(value, response_model)
+
+    @staticmethod
+    def _estimate_request_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+        """Prompt token estimate plus max_tokens, which providers count against TPM."""
+        return sum(estimate_tokens(m.get("content")) for m in messages) + max_tokens
+
+    @staticmethod
+    def _time_left(expires_at: Optional[float]) -> Optional[float]:
+        return max(expires_at - time.monotonic(), 0.0) if expires_at is not None else None
+
+    @staticmethod
+    def _budget_spent(expires_at: Optional[float]) -> bool:
+        return expires_at is not None and expires_at - time.monotonic() < MIN_CALL_SECONDS
+
+    def _capped_timeout(self, timeout: Optional[float], expires_at: float) -> float:
+        """The timeout for one attempt: the route's timeout, capped by the time left before expires_at."""
+        time_left = self._time_left(expires_at)
+        return time_left if timeout is None else min(timeout, time_left)
+
+    @staticmethod
+    def _is_retryable(e: Exception) -> bool:
+        if isinstance(e, RateLimitError):
+            return getattr(e, "code", None) != "insufficient_quota"
+        return isinstance(e, (APIConnectionError, InternalServerError))
+
+    def _retry_delay(self, e: Exception, attempt: int) -> Optional[float]:
+        """Returns how long to sleep before retrying e, or None if the error should be returned to the caller."""
+        if attempt >= self.max_retries or not self._is_retryable(e):
+            return None
+        response = getattr(e, "response", None)
+        headers = response.headers if response is not None else None
+        retry_after = parse_retry_after(headers)
+        if isinstance(e, RateLimitError):
+            self.rate_limiter.record_rate_limited(retry_after, headers)
+        return backoff_delay(attempt, retry_after=retry_after)
+
+    def _build_messages(self, prompt: str, system_prompt: Optional[str]) -> List[Dict[str, str]]:
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
         ]
-        
-        try:
-            completion = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                **kwargs
-            )
-            generated_text = completion.choices[0].message.content.strip()
-            tokens_used = completion.usage.total_tokens if completion.usage else 0
-            
-            return LLMResponse(
-                original_prompt=prompt,
-                generated_text=generated_text,
-                metadata={
-                    "model_used": self.model_name,
-                    "tokens_used": tokens_used,
-                    "finish_reason": completion.choices[0].finish_reason,
-                    "simulated": False
-                }
-            )
-        except APIError as e:
-            error_message = f"OpenAI API Error: {e}"
-            print(error_message)
-            return LLMResponse(original_prompt=prompt, generated_text=f"Error: {error_message}", metadata={"error": True, "details": str(e)})
-        except RateLimitError as e:
+
+    def _check_cache(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        use_cache: bool,
+        model: Optional[str] = None,
+        **kwargs: Any
+    ) -> Tuple[Optional[str], Optional[LLMResponse]]:
+        """Returns (cache_key, cached LLMResponse or None). cache_key is None when caching is bypassed."""
+        if not use_cache or self.cache is None:
+            return None, None
+        cache_key = make_cache_key(model or self.model_name, system_prompt, prompt, temperature, max_tokens, **kwargs)
+        cached, tier = self.cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+        metadata = dict(cached.get("metadata") or {})
+        metadata.update({"cache_hit": True, "cache_tier": tier})
+        return cache_key, LLMResponse(original_prompt=prompt, generated_text=cached["generated_text"], metadata=metadata)
+
+    def _response_from_completion(self, prompt: str, completion: Any, cache_key: Optional[str], attempts: int = 1,
+                                  model: Optional[str] = None) -> LLMResponse:
+        """Converts a chat completion into an LLMResponse and stores it in the cache when a key is given."""
+        generated_text = (completion.choices[0].message.content or "").strip()
+        tokens_used = completion.usage.total_tokens if completion.usage else 0
+        metadata = {
+            "model_used": model or self.model_name,
+            "tokens_used": tokens_used,
+            "finish_reason": completion.choices[0].finish_reason,
+            "simulated": False
+        }
+        if cache_key is not None:
+            self.cache.set(cache_key, {"generated_text": generated_text, "metadata": metadata})
+            metadata = dict(metadata, cache_hit=False)
+        if attempts > 1:
+            metadata = dict(metadata, attempts=attempts)
+
+        return LLMResponse(
+            original_prompt=prompt,
+            generated_text=generated_text,
+            metadata=metadata
+        )
+
+    def _record_call(
+        self,
+        caller: Optional[str],
+        outcome: str,
+        start: Optional[float] = None,
+        queue_wait: float = 0.0,
+        completion: Any = None,
+        attempts: int = 1,
+        streamed: bool = False,
+        finish_reason: Optional[str] = None,
+        model: Optional[str] = None,
+        usage: Any = None
+    ) -> LLMCallRecord:
+        """Builds an LLMCallRecord for this call (token counts from completion, else usage) and writes it to the metrics registry."""
+        usage = getattr(completion, "usage", None) or usage
+        if completion is not None and completion.choices:
+            finish_reason = completion.choices[0].finish_reason
+        record = LLMCallRecord(
+            caller=caller or "",
+            model=model or self.model_name,
+            outcome=outcome,
+            wall_seconds=time.monotonic() - start if start is not None else 0.0,
+            queue_wait_seconds=queue_wait,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            finish_reason=finish_reason,
+            attempts=attempts,
+            streamed=streamed
+        )
+        self.metrics.record(record)
+        return record
+
+    @staticmethod
+    def _with_call_metadata(response: LLMResponse, record: LLMCallRecord) -> LLMResponse:
+        """Adds the call's timing and token counts to the response metadata (never to the cached copy)."""
+        response.metadata = dict(
+            response.metadata or {},
+            caller=record.caller or None,
+            latency_ms=round(record.wall_seconds * 1000, 1),
+            queue_wait_ms=round(record.queue_wait_seconds * 1000, 1),
+            prompt_tokens=record.prompt_tokens,
+            completion_tokens=record.completion_tokens
+        )
+        return response
+
+    @staticmethod
+    def _coalesced_response(response: LLMResponse) -> LLMResponse:
+        """Copy of a response shared from another caller's identical in-flight call."""
+        metadata = dict(response.metadata or {}, coalesced=True)
+        return LLMResponse(original_prompt=response.original_prompt, generated_text=response.generated_text, metadata=metadata)
+
+    def _error_response(self, prompt: str, e: Exception) -> LLMResponse:
+        if isinstance(e, RateLimitTimeout):
+            error_message = f"Rate limiter timeout: {e}"
+        elif isinstance(e, RateLimitError):
             error_message = f"OpenAI Rate Limit Error: {e}. Please check your usage and limits."
-            print(error_message)
-            return LLMResponse(original_prompt=prompt, generated_text=f"Error: {error_message}", metadata={"error": True, "details": str(e)})
-        except Exception as e:
+        elif isinstance(e, APIError):
+            error_message = f"OpenAI API Error: {e}"
+        else:
             error_message = f"An unexpected error occurred during LLM call: {e}"
-            print(error_message)
-            return LLMResponse(original_prompt=prompt, generated_text=f"Error: {error_message}", metadata={"error": True, "details": str(e)})
+        print(error_message)
+        return LLMResponse(original_prompt=prompt, generated_text=f"Error: {error_message}", metadata={"error": True, "details": str(e)})
+
+    @staticmethod
+    def _parse_json_text(text: str) -> Optional[Any]:
+        """Parses an LLM reply as JSON, repairing fences, surrounding prose, trailing commas and truncation locally."""
+        return repair_json(text)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Returns response cache counters (hits, misses, evictions), or {"enabled": False} if caching is off."""
+        if self.cache is None:
+            return {"enabled": False}
+        return dict(self.cache.get_stats(), enabled=True)
+
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        """Returns how many calls were coalesced onto an identical in-flight call."""
+        return self.single_flight.get_stats()
+
+    def get_metrics_summary(self) -> Dict[str, Dict[str, float]]:
+        """Returns per-caller call counts, latency, tokens and estimated cost, largest total latency first."""
+        return self.metrics.get_summary()
+
+    def get_prompt_governor_stats(self) -> Dict[str, Any]:
+        """Returns how often prompts or prompt fields were truncated and the tokens saved."""
+        return self.prompt_governor.get_stats()
+
+    def get_routing_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns per-route configuration, call/fallback counts and latency percentiles."""
+        return self.router.get_stats()
+
+    def get_rate_limiter_state(self) -> Dict[str, Any]:
+        """Returns the shared rate limiter's current state for monitoring."""
+        return self.rate_limiter.get_state()
 
     def analyze_sentiment(self, text: str, model_override: Optional[str] = None) -> Dict[str, Any]:
         """
-        Analyzes the sentiment of a given text using an LLM.
+        Analyzes the sentiment of a given text using an LLM (see analyze_sentiment_batch).
         Args:
             text: The text to analyze.
-            model_override: (Optional) Specify a different model for this specific task if needed.
+            model_override: (Optional) Model to use instead of the one the "sentiment" route picks.
 
         Returns:
-            A dictionary with sentiment scores (e.g., positive, neutral, negative) or an error message.
+            A dictionary with sentiment scores (positive, neutral, negative), compound, label and source.
         """
-        if not self.client:
-            error_message = "OpenAI client not initialized. Cannot make API call."
-            print(error_message)
-            return {"error": error_message, "simulated": False}
+        return self.analyze_sentiment_batch([text], model=model_override)[0]
 
-        sentiment_prompt = f"""Analyze the sentiment of the following text and classify it as predominantly positive, negative, or neutral. Provide a confidence score for each classification. Text: 
-{text}
-"""
-        
-        # Use a simpler response structure for sentiment if possible, or parse a more complex one.
-        # For this example, we'll ask for a structured-like response.
-        system_prompt = "You are a sentiment analysis expert. Respond with a JSON-like structure: {\"positive\": score, \"neutral\": score, \"negative\": score}."
-        
-        current_model = model_override or self.model_name
-        print(f"Simulating sentiment analysis for: {text[:100]}... with model {current_model}")
-
-        # This is still a placeholder for actual sentiment logic using LLM.
-        # A real implementation would call self.generate_text and parse the output.
-        # For brevity, we keep the simulation from the previous version here.
-        # To make it real, you'd do:
-        # response = self.generate_text(prompt=sentiment_prompt, system_prompt=system_prompt, model_name=current_model)
-        # if "Error:" in response.generated_text:
-        #     return {"error": response.generated_text, "simulated": False}
-        # else:
-        #     # Attempt to parse response.generated_text as JSON
-        #     try:
-        #         sentiment_scores = json.loads(response.generated_text)
-        #         sentiment_scores["simulated"] = False 
-        #         return sentiment_scores
-        #     except json.JSONDecodeError:
-        #         return {"error": "Failed to parse LLM sentiment response", "raw_response": response.generated_text, "simulated": False}
-
-        if "great" in text.lower() or "excellent" in text.lower():
-            return {"positive": 0.9, "neutral": 0.05, "negative": 0.05, "simulated": True, "note": "Using placeholder logic"}
-        elif "bad" in text.lower() or "poor" in text.lower():
-            return {"positive": 0.05, "neutral": 0.05, "negative": 0.9, "simulated": True, "note": "Using placeholder logic"}
-        else:
-            return {"positive": 0.4, "neutral": 0.5, "negative": 0.1, "simulated": True, "note": "Using placeholder logic"}
+    def analyze_sentiment_batch(
+        self,
+        texts: List[str],
+        use_llm: bool = True,
+        batch_size: Optional[int] = None,
+        caller: str = "sentiment",
+        model: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyzes the sentiment of many texts, packing up to batch_size texts (and SENTIMENT_BATCH_MAX_CHARS
+        characters) into each LLM request and matching the replies back by index. Batches run concurrently
+        (SENTIMENT_MAX_CONCURRENCY) under the shared rate limiter. Texts the LLM did not score - or all of
+        them when use_llm is False or no API key is configured - are scored by the vectorized lexicon scorer.
+
+        Args:
+            texts: The texts to analyze.
+            use_llm: Set to False to score locally only (no cost, thousands of texts per second).
+            batch_size: Texts per LLM request. Defaults to SENTIMENT_BATCH_SIZE or 20.
+            caller: Task tag selecting the model route and labelling the calls' metrics.
+            model: (Optional) Model to use instead of the route's model.
+
+        Returns:
+            One dict per text, in input order: "positive", "neutral", "negative" (summing to 1), "compound"
+            (-1..1), "label" and "source" ("llm" or "lexicon").
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        if use_llm and texts and self.is_api_key_available():
+            batches = self._sentiment_batches(texts, batch_size or int(os.getenv("SENTIMENT_BATCH_SIZE", "20")))
+            max_workers = max(1, min(len(batches), int(os.getenv("SENTIMENT_MAX_CONCURRENCY", "4"))))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sentiment-batch") as executor:
+                for indices, scored in executor.map(lambda batch: (batch, self._llm_sentiment_batch(texts, batch, caller, model)), batches):
+                    for offset, result in scored.items():
+                        results[indices[offset]] = result
+
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            lexicon_results = get_shared_sentiment_scorer().score([texts[index] for index in missing])
+            for index, result in zip(missing, lexicon_results):
+                results[index] = result
+        return results
+
+    @staticmethod
+    def _sentiment_batches(texts: List[str], batch_size: int) -> List[List[int]]:
+        """Groups text indices into batches bounded by batch_size texts and SENTIMENT_BATCH_MAX_CHARS characters."""
+        max_chars = int(os.getenv("SENTIMENT_BATCH_MAX_CHARS", "8000"))
+        max_text_chars = int(os.getenv("SENTIMENT_MAX_TEXT_CHARS", "1000"))
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_chars = 0
+        for index, text in enumerate(texts):
+            length = min(len(text or ""), max_text_chars)
+            if current and (len(current) >= max(1, batch_size) or current_chars + length > max_chars):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(index)
+            current_chars += length
+        if current:
+            batches.append(current)
+        return batches
+
+    def _llm_sentiment_batch(self, texts: List[str], indices: List[int], caller: str,
+                             model: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        """One LLM call for the texts at indices. Returns offset within the batch -> result for the parsable entries."""
+        prompt = build_batch_prompt([texts[index] for index in indices], int(os.getenv("SENTIMENT_MAX_TEXT_CHARS", "1000")))
+        system_prompt = "You are a sentiment analysis expert. Respond only with valid JSON."
+        try:
+            reply = self.generate_json_response(prompt, system_prompt=system_prompt, max_tokens=40 + 30 * len(indices),
+                                                temperature=0.0, caller=caller, model=model)
+        except Exception as e:
+            print(f"Error during batched sentiment analysis: {e}")
+            return {}
+        entries = reply.get("results") if isinstance(reply, dict) else reply
+        if not isinstance(entries, list):
+            print(f"Batched sentiment analysis returned an unexpected payload; using the lexicon scorer. Response: {str(reply)[:200]}")
+            return {}
+        scored: Dict[int, Dict[str, Any]] = {}
+        for entry in entries:
+            parsed = parse_batch_entry(entry, len(indices))
+            if parsed is not None:
+                scored[parsed[0]] = parsed[1]
+        return scored
 
 # Example usage (for testing purposes, would not be here in production code)
 if __name__ == "__main__":
@@ -171,8 +846,11 @@ if __name__ == "__main__":
             print(f"\n--- LLM Call Failed ---")
             print(response.generated_text)
 
-        # Test sentiment analysis (still using placeholder logic in this example)
-        sentiment = llm_service.analyze_sentiment("The new product launch was a massive success and customers love it!")
-        print(f"\n--- Sentiment Analysis (Placeholder Logic) ---")
+        # Test sentiment analysis (one LLM call for the batch; the lexicon scorer covers anything unscored)
+        sentiment = llm_service.analyze_sentiment_batch([
+            "The new product launch was a massive success and customers love it!",
+            "Delivery was late and support was not helpful.",
+        ])
+        print(f"\n--- Sentiment Analysis ---")
         print(f"Sentiment: {sentiment}")
 
@@ -0,0 +1,178 @@
+# Task-aware model routing: per-task model, token cap, timeout and fallback model, with per-route latency
+
+import os
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTE = "default"
+
+# Keys are caller tags ("matcher.intent") or tag prefixes ("blueprint"); the most specific match wins.
+# A route without "model" uses the LLMService's model_name. The defaults only set token caps and timeouts;
+# models and fallback models are a deployment choice, made with LLM_ROUTES_FILE / LLM_ROUTES_JSON, e.g.
+# {"matcher": {"model": "gpt-4o-mini", "timeout_seconds": 8, "fallback_model": "gpt-3.5-turbo"}}.
+DEFAULT_ROUTES: Dict[str, Dict[str, Any]] = {
+    DEFAULT_ROUTE: {"timeout_seconds": 60},
+    "matcher": {"timeout_seconds": 8},
+    "matcher.intent": {"max_tokens": 150, "timeout_seconds": 5},
+    "sentiment": {"timeout_seconds": 30},
+    "blueprint": {"timeout_seconds": 60},
+    "blueprint.summary": {"max_tokens": 300, "timeout_seconds": 30},
+    "blueprint.strategy": {"max_tokens": 1500, "timeout_seconds": 90},
+}
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """How calls for one task are made. Unset fields fall back to the service defaults."""
+    name: str = DEFAULT_ROUTE
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    timeout_seconds: Optional[float] = None
+    fallback_model: Optional[str] = None
+
+    def cap_tokens(self, max_tokens: int) -> int:
+        """The caller's max_tokens, capped by the route's max_tokens."""
+        return min(max_tokens, self.max_tokens) if self.max_tokens else max_tokens
+
+
+def _route_from_dict(name: str, values: Dict[str, Any]) -> ModelRoute:
+    allowed = {f.name for f in fields(ModelRoute)} - {"name"}
+    unknown = set(values) - allowed
+    if unknown:
+        logger.warning(f"Ignoring unknown keys {sorted(unknown)} in LLM route '{name}'.")
+    return ModelRoute(
+        name=name,
+        model=values.get("model") or None,
+        max_tokens=int(values["max_tokens"]) if values.get("max_tokens") else None,
+        timeout_seconds=float(values["timeout_seconds"]) if values.get("timeout_seconds") else None,
+        fallback_model=values.get("fallback_model") or None,
+    )
+
+
+def load_routes() -> Dict[str, ModelRoute]:
+    """
+    DEFAULT_ROUTES, then routes from the JSON file at LLM_ROUTES_FILE, then LLM_ROUTES_JSON.
+    Each source is a {"route": {"model": ..., "max_tokens": ..., "timeout_seconds": ..., "fallback_model": ...}}
+    object; a later source replaces whole routes of the same name.
+    """
+    raw: Dict[str, Dict[str, Any]] = {name: dict(values) for name, values in DEFAULT_ROUTES.items()}
+    sources = []
+    routes_file = os.getenv("LLM_ROUTES_FILE")
+    if routes_file:
+        try:
+            with open(routes_file, "r", encoding="utf-8") as f:
+                sources.append(("LLM_ROUTES_FILE", f.read()))
+        except OSError as e:
+            logger.warning(f"Could not read LLM_ROUTES_FILE {routes_file}: {e}")
+    if os.getenv("LLM_ROUTES_JSON"):
+        sources.append(("LLM_ROUTES_JSON", os.getenv("LLM_ROUTES_JSON")))
+    for source, text in sources:
+        try:
+            overrides = json.loads(text)
+            for name, values in overrides.items():
+                if not isinstance(values, dict):
+                    raise ValueError(f"route '{name}' must be an object")
+                raw[name] = values
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid {source}: {e}")
+    routes = {}
+    for name, values in raw.items():
+        try:
+            routes[name] = _route_from_dict(name, values)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring invalid LLM route '{name}': {e}")
+    return routes
+
+
+class ModelRouter:
+    """
+    Resolves a caller tag to its ModelRoute (exact tag, then the longest dotted prefix, then "default")
+    and keeps per-route call counts, fallbacks and latency percentiles.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Dict[str, Any]]] = None, latency_samples: int = 500):
+        """
+        Args:
+            routes: (Optional) Route table as {"route": {...}}. Defaults to load_routes() (DEFAULT_ROUTES
+                    plus the LLM_ROUTES_FILE / LLM_ROUTES_JSON overrides).
+            latency_samples: Recent latencies kept per route for the percentiles in get_stats().
+        """
+        self.routes = {name: _route_from_dict(name, values) for name, values in routes.items()} if routes is not None else load_routes()
+        self.latency_samples = latency_samples
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def reload(self) -> None:
+        """Re-reads the route table from the environment (e.g. after LLM_ROUTES_FILE was edited)."""
+        routes = load_routes()
+        with self._lock:
+            self.routes = routes
+        logger.info(f"Reloaded {len(routes)} LLM routes.")
+
+    def resolve(self, caller: Optional[str]) -> ModelRoute:
+        routes = self.routes
+        tag = caller or ""
+        while tag:
+            if tag in routes:
+                return routes[tag]
+            tag = tag.rpartition(".")[0]
+        return routes.get(DEFAULT_ROUTE) or ModelRoute()
+
+    def record(self, route: ModelRoute, model: str, seconds: float, success: bool, fallback: bool = False) -> None:
+        """Records one routed call (including any fallback attempt) against its route."""
+        with self._lock:
+            stats = self._stats.setdefault(route.name, {
+                "calls": 0, "errors": 0, "fallbacks": 0, "models": {}, "latencies": deque(maxlen=self.latency_samples)
+            })
+            stats["calls"] += 1
+            stats["errors"] += 0 if success else 1
+            stats["fallbacks"] += 1 if fallback else 0
+            stats["models"][model] = stats["models"].get(model, 0) + 1
+            stats["latencies"].append(seconds)
+
+    @staticmethod
+    def _percentile(samples, percentile: float) -> float:
+        ordered = sorted(samples)
+        rank = min(len(ordered) - 1, int(round(percentile / 100.0 * (len(ordered) - 1))))
+        return ordered[rank]
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per route: configuration, call/error/fallback counts, models used and p50/p95/p99 latency (ms)."""
+        with self._lock:
+            summary = {}
+            for name, stats in self._stats.items():
+                route = self.routes.get(name) or ModelRoute(name=name)
+                latencies = stats["latencies"]
+                summary[name] = {
+                    "model": route.model,
+                    "max_tokens": route.max_tokens,
+                    "timeout_seconds": route.timeout_seconds,
+                    "fallback_model": route.fallback_model,
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "fallbacks": stats["fallbacks"],
+                    "models_used": dict(stats["models"]),
+                    "p50_ms": round(self._percentile(latencies, 50) * 1000, 1) if latencies else None,
+                    "p95_ms": round(self._percentile(latencies, 95) * 1000, 1) if latencies else None,
+                    "p99_ms": round(self._percentile(latencies, 99) * 1000, 1) if latencies else None,
+                }
+            return summary
+
+
+_shared_router: Optional[ModelRouter] = None
+_shared_router_lock = threading.Lock()
+
+
+def get_shared_model_router() -> ModelRouter:
+    """Returns the process-wide ModelRouter, loading the route table on first use."""
+    global _shared_router
+    with _shared_router_lock:
+        if _shared_router is None:
+            _shared_router = ModelRouter()
+        return _shared_router
@@ -0,0 +1,209 @@
+# Prompt size governor: token estimation, per-prompt budgets and priority-based field truncation
+
+import os
+import re
+import math
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:  # Exact counts when tiktoken is installed; otherwise a character heuristic is used
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+TRUNCATION_MARKER = " [...]"
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None and tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:  # encoding files may be unavailable offline
+                logger.warning(f"tiktoken encoding unavailable, using character heuristic: {e}")
+        return _encoding
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimates the number of tokens in text: exact with tiktoken if installed, otherwise
+    ~4 characters per token (the usual ratio for English with OpenAI tokenizers).
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def _chars_for_tokens(text: str, max_tokens: int, from_end: bool = False) -> int:
+    """
+    How many characters of text its first (or last) max_tokens tokens cover: measured with tiktoken if
+    installed, otherwise ~4 characters per token. Never more than len(text).
+    """
+    if max_tokens <= 0:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return min(len(text), max_tokens * 4)
+    token_ids = encoding.encode(text, disallowed_special=())
+    kept = token_ids[-max_tokens:] if from_end else token_ids[:max_tokens]
+    return min(len(text), len(encoding.decode(kept)))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Trims text to about max_tokens, keeping whole leading sentences where possible
+    (falling back to a word boundary) and appending a truncation marker.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget_chars = _chars_for_tokens(text, max_tokens - estimate_tokens(TRUNCATION_MARKER))
+    kept = ""
+    for sentence in _SENTENCE_END.split(text):
+        candidate = f"{kept} {sentence}".strip()
+        if len(candidate) > budget_chars:
+            break
+        kept = candidate
+    if not kept:
+        kept = text[:budget_chars].rsplit(" ", 1)[0] if " " in text[:budget_chars] else text[:budget_chars]
+    return kept.rstrip() + TRUNCATION_MARKER
+
+
+class PromptGovernor:
+    """
+    Keeps prompt tokens bounded for verbose inputs.
+    fit_fields() trims the variable fields of a prompt template by priority (lowest priority first,
+    never below min_field_tokens) so the fields fit a budget; enforce_budget() is a last-resort cap
+    on a fully assembled prompt that keeps its head and tail (where instructions usually are).
+    """
+
+    def __init__(
+        self,
+        max_prompt_tokens: Optional[int] = None,
+        field_budget_tokens: Optional[int] = None,
+        max_field_tokens: Optional[int] = None,
+        min_field_tokens: int = 32
+    ):
+        """
+        Args:
+            max_prompt_tokens: Hard cap for a whole prompt. Defaults to LLM_MAX_PROMPT_TOKENS or 6000.
+            field_budget_tokens: Default combined budget for a prompt's variable fields.
+                                 Defaults to LLM_PROMPT_FIELD_BUDGET_TOKENS or 1500.
+            max_field_tokens: Cap applied to any single field. Defaults to LLM_MAX_FIELD_TOKENS or 500.
+            min_field_tokens: Fields are never trimmed below this size by priority trimming.
+        """
+        self.max_prompt_tokens = max_prompt_tokens or int(os.getenv("LLM_MAX_PROMPT_TOKENS", "6000"))
+        self.field_budget_tokens = field_budget_tokens or int(os.getenv("LLM_PROMPT_FIELD_BUDGET_TOKENS", "1500"))
+        self.max_field_tokens = max_field_tokens or int(os.getenv("LLM_MAX_FIELD_TOKENS", "500"))
+        self.min_field_tokens = min_field_tokens
+        self._lock = threading.Lock()
+        self.prompts_checked = 0
+        self.prompts_truncated = 0
+        self.fields_truncated = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def _record(self, tokens_before: int, tokens_after: int, fields_truncated: int) -> None:
+        with self._lock:
+            self.prompts_checked += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+            if tokens_after < tokens_before:
+                self.prompts_truncated += 1
+                self.fields_truncated += fields_truncated
+
+    def fit_fields(self, fields: Dict[str, Tuple[Optional[str], int]], budget_tokens: Optional[int] = None) -> Dict[str, str]:
+        """
+        Trims prompt fields to fit a token budget.
+
+        Args:
+            fields: Mapping of field name -> (text, priority). Higher priority fields are trimmed last.
+            budget_tokens: Combined budget for all fields (defaults to field_budget_tokens).
+
+        Returns:
+            Mapping of field name -> text to interpolate into the prompt.
+        """
+        budget = budget_tokens or self.field_budget_tokens
+        texts = {name: str(text) if text is not None else "" for name, (text, _) in fields.items()}
+        sizes = {name: estimate_tokens(text) for name, text in texts.items()}
+        tokens_before = sum(sizes.values())
+
+        # 1. Per-field cap
+        allowed = {name: min(size, self.max_field_tokens) for name, size in sizes.items()}
+        # 2. Trim lowest-priority fields first until the total fits the budget
+        excess = sum(allowed.values()) - budget
+        for name, _ in sorted(fields.items(), key=lambda item: item[1][1]):
+            if excess <= 0:
+                break
+            reducible = allowed[name] - self.min_field_tokens
+            if reducible > 0:
+                cut = min(reducible, excess)
+                allowed[name] -= cut
+                excess -= cut
+
+        fitted: Dict[str, str] = {}
+        truncated = 0
+        for name, text in texts.items():
+            if allowed[name] < sizes[name]:
+                fitted[name] = truncate_to_tokens(text, allowed[name])
+                truncated += 1
+            else:
+                fitted[name] = text
+        self._record(tokens_before, sum(estimate_tokens(text) for text in fitted.values()), truncated)
+        return fitted
+
+    def enforce_budget(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        """
+        Caps an assembled prompt at max_tokens (defaults to max_prompt_tokens) by removing text
+        from the middle, so the opening context and the closing instructions survive.
+        """
+        limit = max_tokens or self.max_prompt_tokens
+        tokens = estimate_tokens(prompt)
+        if tokens <= limit:
+            return prompt
+        # Head and tail are sized in tokens, so they never overlap however many characters a token spans
+        keep_tokens = max(0, limit - estimate_tokens(TRUNCATION_MARKER))
+        head = prompt[:_chars_for_tokens(prompt, keep_tokens // 2)]
+        tail_chars = _chars_for_tokens(prompt, keep_tokens - keep_tokens // 2, from_end=True)
+        tail = prompt[len(prompt) - tail_chars:] if tail_chars else ""
+        governed = head + TRUNCATION_MARKER + tail
+        self._record(tokens, estimate_tokens(governed), 1)
+        logger.warning(f"Prompt of ~{tokens} tokens exceeded the {limit}-token budget and was trimmed.")
+        return governed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """How often prompts were truncated and how many tokens that saved."""
+        with self._lock:
+            saved = self.tokens_before - self.tokens_after
+            return {
+                "prompts_checked": self.prompts_checked,
+                "prompts_truncated": self.prompts_truncated,
+                "fields_truncated": self.fields_truncated,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "tokens_saved": saved,
+                "savings_ratio": round(saved / self.tokens_before, 4) if self.tokens_before else 0.0,
+                "exact_token_counts": _get_encoding() is not None,
+            }
+
+
+_shared_governor: Optional[PromptGovernor] = None
+_shared_governor_lock = threading.Lock()
+
+
+def get_shared_prompt_governor() -> PromptGovernor:
+    """Returns the process-wide PromptGovernor configured from the environment."""
+    global _shared_governor
+    with _shared_governor_lock:
+        if _shared_governor is None:
+            _shared_governor = PromptGovernor()
+        return _shared_governor
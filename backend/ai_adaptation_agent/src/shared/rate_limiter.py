@@ -0,0 +1,269 @@
+# Process-wide adaptive rate limiting and retry backoff for LLM calls
+
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller could not obtain rate-limit capacity within its timeout."""
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parses OpenAI reset headers such as "1s", "6m0s", "250ms" or "1h2m3.5s" into seconds.
+    Returns None if the value cannot be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    multipliers = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(amount) * multipliers[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Reads retry-after-ms / retry-after (seconds) from response headers."""
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            return None  # HTTP-date form is not used by the OpenAI API
+    return None
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0, retry_after: Optional[float] = None) -> float:
+    """
+    Full-jitter exponential backoff: a random delay in [0, min(cap, base * 2**attempt)].
+    A server-provided retry_after is honoured as the minimum delay.
+    """
+    delay = random.uniform(0.0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+class TokenBucket:
+    """A token bucket refilled continuously at capacity per period_seconds. Not thread-safe on its own."""
+
+    def __init__(self, capacity: float, period_seconds: float = 60.0):
+        self.capacity = float(capacity)
+        self.refill_per_second = self.capacity / period_seconds
+        self.available = self.capacity
+        self._last_refill = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self.available = min(self.capacity, self.available + elapsed * self.refill_per_second)
+            self._last_refill = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be consumed (0.0 if it can be consumed now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)  # a single oversized request must still be able to run
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.refill_per_second
+
+    def consume(self, amount: float) -> None:
+        self.available -= min(amount, self.capacity)
+
+    def sync_remaining(self, remaining: float, reset_seconds: Optional[float], now: float) -> None:
+        """Aligns the bucket with the provider's view of remaining capacity."""
+        self._refill(now)
+        if remaining < self.available:
+            self.available = remaining
+        if reset_seconds and remaining <= 0:
+            # Provider says we are empty until reset; make the local refill match that horizon
+            self.available = -self.refill_per_second * reset_seconds
+
+
+class AdaptiveRateLimiter:
+    """
+    Token-bucket limiter for requests/min and tokens/min shared by all LLM calls in the process.
+    Callers block (or await) until capacity is available instead of failing, the buckets are
+    corrected from the provider's x-ratelimit-* headers, and a 429 pauses every caller for
+    the server's retry-after interval.
+    """
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 200000):
+        """
+        Args:
+            requests_per_minute: Request budget per minute.
+            tokens_per_minute: Token budget (prompt + max completion tokens) per minute.
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._condition = threading.Condition()
+        self._blocked_until = 0.0
+        self.waiting = 0
+        self.total_acquired = 0
+        self.total_throttled = 0
+        self.total_wait_seconds = 0.0
+        self.rate_limited_responses = 0
+        self.last_headers: Dict[str, str] = {}
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveRateLimiter":
+        """Reads LLM_RATE_LIMIT_RPM (default 500) and LLM_RATE_LIMIT_TPM (default 200000)."""
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_RATE_LIMIT_RPM", "500")),
+            tokens_per_minute=float(os.getenv("LLM_RATE_LIMIT_TPM", "200000")),
+        )
+
+    def _try_reserve(self, estimated_tokens: int) -> float:
+        """Consumes capacity and returns 0.0, or returns how long to wait. Caller holds the lock."""
+        now = time.monotonic()
+        wait = max(
+            self._blocked_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now),
+        )
+        if wait <= 0:
+            self.requests.consume(1)
+            self.tokens.consume(estimated_tokens)
+            self.total_acquired += 1
+            return 0.0
+        return wait
+
+    def acquire(self, estimated_tokens: int = 0, timeout: Optional[float] = None) -> float:
+        """
+        Blocks until one request and estimated_tokens are available.
+        Returns:
+            The number of seconds spent waiting.
+        Raises:
+            RateLimitTimeout: If capacity was not available within timeout seconds.
+        """
+        start = time.monotonic()
+        with self._condition:
+            wait = self._try_reserve(estimated_tokens)
+            if wait > 0:
+                self.total_throttled += 1
+                self.waiting += 1
+                try:
+                    while wait > 0:
+                        if timeout is not None and time.monotonic() - start + wait > timeout:
+                            raise RateLimitTimeout(f"LLM rate limit capacity not available within {timeout}s")
+                        self._condition.wait(timeout=wait)
+                        wait = self._try_reserve(estimated_tokens)
+                finally:
+                    self.waiting -= 1
+            waited = time.monotonic() - start
+            self.total_wait_seconds += waited
+            return waited
+
+    async def acquire_async(self, estimated_tokens: int = 0, timeout: Optional[float] = None) -> float:
+        """Async version of acquire that sleeps on the event loop instead of blocking a thread."""
+        start = time.monotonic()
+        throttled = False
+        while True:
+            with self._condition:
+                wait = self._try_reserve(estimated_tokens)
+                if wait <= 0:
+                    waited = time.monotonic() - start
+                    self.total_wait_seconds += waited
+                    if throttled:
+                        self.waiting -= 1
+                    return waited
+                if not throttled:
+                    throttled = True
+                    self.total_throttled += 1
+                    self.waiting += 1
+                if timeout is not None and time.monotonic() - start + wait > timeout:
+                    self.waiting -= 1
+                    raise RateLimitTimeout(f"LLM rate limit capacity not available within {timeout}s")
+            await asyncio.sleep(wait)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Returns over-reserved tokens to the bucket (or charges the shortfall) once usage is known."""
+        with self._condition:
+            self.tokens.available = min(self.tokens.capacity, self.tokens.available + (estimated_tokens - actual_tokens))
+            self._condition.notify_all()
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Corrects the local buckets from x-ratelimit-remaining-* / x-ratelimit-reset-* headers."""
+        if not headers:
+            return
+        now = time.monotonic()
+        with self._condition:
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining_value = float(remaining)
+                except ValueError:
+                    continue
+                bucket.sync_remaining(remaining_value, parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}")), now)
+                self.last_headers[f"remaining_{kind}"] = remaining
+            self._condition.notify_all()
+
+    def record_rate_limited(self, retry_after: Optional[float], headers: Optional[Mapping[str, str]] = None) -> None:
+        """Pauses all callers after a 429 for retry_after seconds (or the header's reset time)."""
+        self.update_from_headers(headers)
+        with self._condition:
+            self.rate_limited_responses += 1
+            pause = retry_after
+            if pause is None and headers:
+                pause = parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+            if pause:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+                logger.warning(f"LLM provider rate limit hit; pausing new calls for {pause:.2f}s.")
+
+    def get_state(self) -> Dict[str, Any]:
+        """Current limiter state for monitoring."""
+        now = time.monotonic()
+        with self._condition:
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                "requests_per_minute": self.requests.capacity,
+                "tokens_per_minute": self.tokens.capacity,
+                "available_requests": round(self.requests.available, 2),
+                "available_tokens": round(self.tokens.available, 2),
+                "blocked_for_seconds": round(max(0.0, self._blocked_until - now), 3),
+                "waiting_callers": self.waiting,
+                "total_acquired": self.total_acquired,
+                "total_throttled": self.total_throttled,
+                "total_wait_seconds": round(self.total_wait_seconds, 3),
+                "rate_limited_responses": self.rate_limited_responses,
+                "last_provider_headers": dict(self.last_headers),
+            }
+
+
+_shared_limiter: Optional[AdaptiveRateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_rate_limiter() -> AdaptiveRateLimiter:
+    """Returns the process-wide limiter, creating it from the environment on first use."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = AdaptiveRateLimiter.from_env()
+        return _shared_limiter
@@ -0,0 +1,220 @@
+# Batch sentiment helpers: a NumPy-vectorized lexicon scorer and the indexed multi-text LLM prompt format
+
+import os
+import re
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+LABELS = ("positive", "neutral", "negative")
+
+# Valence per word on a -3..3 scale. Extend or override with SENTIMENT_LEXICON_FILE (a JSON {"word": score} object).
+DEFAULT_LEXICON: Dict[str, float] = {
+    "amazing": 3.0, "awesome": 3.0, "excellent": 3.0, "outstanding": 3.0, "fantastic": 3.0, "perfect": 3.0,
+    "wonderful": 3.0, "love": 2.5, "loved": 2.5, "loves": 2.5, "best": 2.5, "great": 2.5, "superb": 3.0,
+    "brilliant": 2.5, "delighted": 2.5, "impressive": 2.0, "recommend": 2.0, "recommended": 2.0, "success": 2.0,
+    "good": 1.5, "nice": 1.5, "happy": 2.0, "pleased": 2.0, "friendly": 1.5, "helpful": 1.5, "professional": 1.5,
+    "reliable": 1.5, "fast": 1.0, "quick": 1.0, "clean": 1.0, "fair": 1.0, "affordable": 1.0, "easy": 1.0,
+    "knowledgeable": 1.5, "cozy": 1.5, "satisfied": 1.5, "thanks": 1.0, "thank": 1.0, "enjoy": 1.5, "enjoyed": 1.5,
+    "ok": 0.5, "okay": 0.5, "fine": 0.5,
+    "terrible": -3.0, "awful": -3.0, "horrible": -3.0, "worst": -3.0, "disgusting": -3.0, "scam": -3.0,
+    "hate": -2.5, "hated": -2.5, "useless": -2.5, "rude": -2.5, "disappointed": -2.0, "disappointing": -2.0,
+    "bad": -2.0, "poor": -2.0, "broken": -2.0, "dirty": -2.0, "unprofessional": -2.0, "overpriced": -2.0,
+    "refund": -1.0, "slow": -1.5, "late": -1.5, "expensive": -1.0, "problem": -1.5, "problems": -1.5,
+    "issue": -1.0, "issues": -1.0, "complaint": -1.5, "wrong": -1.5, "unhappy": -2.0,
+    "cancelled": -1.0, "unreliable": -2.0, "waste": -2.0, "mediocre": -1.0, "confusing": -1.0,
+}
+
+NEGATORS = frozenset({"not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "without", "hardly", "barely"})
+
+# Multiplier applied to the next sentiment word
+INTENSIFIERS: Dict[str, float] = {
+    "very": 1.5, "really": 1.5, "extremely": 1.8, "incredibly": 1.8, "so": 1.3, "super": 1.5, "totally": 1.4,
+    "absolutely": 1.6, "highly": 1.5, "quite": 1.2, "slightly": 0.5, "somewhat": 0.6, "fairly": 0.8, "little": 0.6,
+}
+
+NEGATION_SCALE = -0.75
+NEGATION_WINDOW = 3  # A negator flips sentiment words up to this many tokens after it
+NEUTRAL_THRESHOLD = 0.05  # |compound| below this is labelled neutral
+
+
+def load_lexicon() -> Dict[str, float]:
+    """DEFAULT_LEXICON, extended (and overridden) by the JSON object at SENTIMENT_LEXICON_FILE."""
+    lexicon = dict(DEFAULT_LEXICON)
+    lexicon_file = os.getenv("SENTIMENT_LEXICON_FILE")
+    if lexicon_file:
+        try:
+            with open(lexicon_file, "r", encoding="utf-8") as f:
+                extra = json.load(f)
+            lexicon.update({str(word).lower(): float(score) for word, score in extra.items()})
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            logger.warning(f"Ignoring invalid SENTIMENT_LEXICON_FILE {lexicon_file}: {e}")
+    return lexicon
+
+
+class LexiconSentimentScorer:
+    """
+    Scores a whole batch of texts at once. Texts are tokenized into one flat array of vocabulary ids;
+    valence, intensifier and negation lookups, the per-text sums (np.bincount) and the normalisation
+    are then array operations over the batch, so thousands of texts are scored per second.
+    Sentiment words are weighted by a preceding intensifier and flipped by a negator within
+    NEGATION_WINDOW tokens; the compound score is normalised to -1..1 as in VADER.
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None, alpha: float = 15.0):
+        """
+        Args:
+            lexicon: (Optional) Word -> valence mapping. Defaults to load_lexicon().
+            alpha: Normalisation constant for the compound score (larger = more texts near neutral).
+        """
+        lexicon = lexicon if lexicon is not None else load_lexicon()
+        self.alpha = alpha
+        words = sorted(set(lexicon) | NEGATORS | set(INTENSIFIERS))
+        self._vocabulary = {word: index + 1 for index, word in enumerate(words)}  # 0 = unknown word
+        size = len(words) + 1
+        self._valence = np.zeros(size, dtype=np.float64)
+        self._is_negator = np.zeros(size, dtype=bool)
+        self._intensity = np.ones(size, dtype=np.float64)
+        for word, index in self._vocabulary.items():
+            self._valence[index] = lexicon.get(word, 0.0)
+            self._is_negator[index] = word in NEGATORS
+            self._intensity[index] = INTENSIFIERS.get(word, 1.0)
+
+    def _token_ids(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Flat vocabulary ids of all tokens, and the number of tokens per text."""
+        vocabulary = self._vocabulary
+        ids: List[int] = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for position, text in enumerate(texts):
+            tokens = _TOKEN_PATTERN.findall((text or "").lower())
+            lengths[position] = len(tokens)
+            ids.extend(vocabulary.get(token, -1 if token.endswith("n't") else 0) for token in tokens)
+        return np.asarray(ids, dtype=np.int64), lengths
+
+    def score_arrays(self, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Args:
+            texts: The texts to score.
+
+        Returns:
+            Arrays of length len(texts): "positive", "neutral" and "negative" (proportions summing to 1)
+            and "compound" (-1..1).
+        """
+        n_texts = len(texts)
+        ids, lengths = self._token_ids(texts)
+        negated_contraction = ids == -1  # "don't", "isn't", ... negate like "not"
+        ids = np.where(negated_contraction, 0, ids)
+        doc = np.repeat(np.arange(n_texts), lengths)
+
+        valence = self._valence[ids]
+        is_negator = self._is_negator[ids] | negated_contraction
+        multiplier = np.ones(len(ids), dtype=np.float64)
+        if len(ids) > 1:
+            same_doc = doc[1:] == doc[:-1]
+            multiplier[1:] = np.where(same_doc, self._intensity[ids[:-1]], 1.0)
+            for distance in range(1, NEGATION_WINDOW + 1):
+                if len(ids) <= distance:
+                    break
+                negated = is_negator[:-distance] & (doc[distance:] == doc[:-distance])
+                multiplier[distance:] = np.where(negated, multiplier[distance:] * NEGATION_SCALE, multiplier[distance:])
+        scores = valence * multiplier
+
+        positive_mass = np.bincount(doc, weights=np.clip(scores, 0.0, None), minlength=n_texts)
+        negative_mass = np.bincount(doc, weights=np.clip(-scores, 0.0, None), minlength=n_texts)
+        neutral_mass = np.bincount(doc, weights=(scores == 0.0).astype(np.float64), minlength=n_texts)
+        total = positive_mass + negative_mass + neutral_mass
+        empty = total == 0.0
+        total = np.where(empty, 1.0, total)
+        net = positive_mass - negative_mass
+        return {
+            "positive": positive_mass / total,
+            "neutral": np.where(empty, 1.0, neutral_mass / total),
+            "negative": negative_mass / total,
+            "compound": net / np.sqrt(net * net + self.alpha),
+        }
+
+    def score(self, texts: Sequence[str]) -> List[Dict[str, Any]]:
+        """Per-text dicts with positive / neutral / negative / compound, label and source="lexicon", in input order."""
+        arrays = self.score_arrays(texts)
+        columns = [arrays[key].round(4).tolist() for key in ("positive", "neutral", "negative", "compound")]
+        return [
+            {
+                "positive": positive, "neutral": neutral, "negative": negative, "compound": compound,
+                "label": label_for(compound), "source": "lexicon",
+            }
+            for positive, neutral, negative, compound in zip(*columns)
+        ]
+
+
+def label_for(compound: float) -> str:
+    if compound >= NEUTRAL_THRESHOLD:
+        return "positive"
+    if compound <= -NEUTRAL_THRESHOLD:
+        return "negative"
+    return "neutral"
+
+
+def build_batch_prompt(texts: Sequence[str], max_text_chars: int) -> str:
+    """The multi-text prompt: each text on its own line behind its index in brackets."""
+    lines = []
+    for offset, text in enumerate(texts):
+        flattened = " ".join((text or "").split())[:max_text_chars]
+        lines.append(f"[{offset}] {flattened}")
+    text_block = "\n".join(lines)
+    return f"""Classify the sentiment of each numbered text below.
+
+Texts:
+{text_block}
+
+For every text, give the probability that it is positive, neutral and negative (floats between 0.0 and 1.0 that sum to 1.0).
+Return the response as a JSON object with key "results": a list of objects with keys "index" (int, the number in brackets), "positive", "neutral" and "negative".
+Example JSON response: {{"results": [{{"index": 0, "positive": 0.85, "neutral": 0.1, "negative": 0.05}}]}}
+"""
+
+
+def parse_batch_entry(entry: Any, batch_length: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """
+    Validates one entry of the "results" list.
+    Returns:
+        (offset within the batch, result dict with normalised probabilities), or None if the entry is unusable.
+    """
+    if not isinstance(entry, dict):
+        return None
+    offset = entry.get("index")
+    if isinstance(offset, bool) or not isinstance(offset, int) or not 0 <= offset < batch_length:
+        return None
+    probabilities = []
+    for label in LABELS:
+        value = entry.get(label)
+        if isinstance(value, bool) or not isinstance(value, (float, int)) or not 0.0 <= value <= 1.0:
+            return None
+        probabilities.append(float(value))
+    total = sum(probabilities)
+    if total <= 0.0:
+        return None
+    positive, neutral, negative = (round(p / total, 4) for p in probabilities)
+    compound = round(positive - negative, 4)
+    return offset, {
+        "positive": positive, "neutral": neutral, "negative": negative, "compound": compound,
+        "label": max(zip((positive, neutral, negative), LABELS))[1], "source": "llm",
+    }
+
+
+_shared_scorer: Optional[LexiconSentimentScorer] = None
+_shared_scorer_lock = threading.Lock()
+
+
+def get_shared_sentiment_scorer() -> LexiconSentimentScorer:
+    """Returns the process-wide LexiconSentimentScorer, building its lookup tables on first use."""
+    global _shared_scorer
+    with _shared_scorer_lock:
+        if _shared_scorer is None:
+            _shared_scorer = LexiconSentimentScorer()
+        return _shared_scorer
@@ -0,0 +1,110 @@
+# Single-flight coalescing of identical in-flight LLM calls
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _InFlightCall:
+    """One upstream call that other callers with the same key can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Ensures only one call per key is in flight at a time. Concurrent callers with the same key
+    wait for the leader's call and receive its result (or exception) instead of making their own.
+    Thread callers use do(); coroutines use do_async(), which coalesces per event loop.
+    Nothing is remembered once a call finishes - caching finished results is the response cache's job.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+        self._tasks: Dict[Tuple[int, Hashable], "asyncio.Task[Any]"] = {}
+        self.leader_calls = 0
+        self.deduplicated_calls = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Runs fn() unless an identical call is already running, in which case waits for its result.
+        Returns:
+            (result, shared) where shared is True if the result came from another caller's call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _InFlightCall()
+                self.leader_calls += 1
+            else:
+                self.deduplicated_calls += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    async def do_async(self, key: Hashable, coro_fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Async version of do(). The upstream call runs as its own task, so a cancelled caller
+        does not cancel the call for the others waiting on it.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[task_key] = loop.create_task(coro_fn())
+                task.add_done_callback(lambda _: self._forget_task(task_key))
+                self.leader_calls += 1
+            else:
+                self.deduplicated_calls += 1
+        return await asyncio.shield(task), not leader
+
+    def _forget_task(self, task_key: Tuple[int, Hashable]) -> None:
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters for monitoring how many upstream calls were saved."""
+        with self._lock:
+            total = self.leader_calls + self.deduplicated_calls
+            return {
+                "in_flight": len(self._calls) + len(self._tasks),
+                "leader_calls": self.leader_calls,
+                "deduplicated_calls": self.deduplicated_calls,
+                "dedup_ratio": round(self.deduplicated_calls / total, 4) if total else 0.0,
+            }
+
+
+_shared_single_flight: Optional[SingleFlight] = None
+_shared_single_flight_lock = threading.Lock()
+
+
+def get_shared_single_flight() -> SingleFlight:
+    """Returns the process-wide SingleFlight, so identical calls coalesce across service instances."""
+    global _shared_single_flight
+    with _shared_single_flight_lock:
+        if _shared_single_flight is None:
+            _shared_single_flight = SingleFlight()
+        return _shared_single_flight
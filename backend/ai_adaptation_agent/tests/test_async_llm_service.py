@@ -0,0 +1,76 @@
+# Tests for the AsyncLLMService concurrency limits and JSON helper
+
+import os
+import sys
+import asyncio
+import concurrent.futures
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared import async_llm_service
+from src.shared.async_llm_service import AsyncLLMService
+
+
+class FakeAsyncOpenAI:
+    """Records how many completions are in flight at once."""
+    instances = 0
+    in_flight = 0
+    max_in_flight = 0
+
+    def __init__(self, api_key=None, **kwargs):
+        FakeAsyncOpenAI.instances += 1
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=self._create)))
+
+    async def _create(self, **kwargs):
+        FakeAsyncOpenAI.in_flight += 1
+        FakeAsyncOpenAI.max_in_flight = max(FakeAsyncOpenAI.max_in_flight, FakeAsyncOpenAI.in_flight)
+        await asyncio.sleep(0.01)
+        FakeAsyncOpenAI.in_flight -= 1
+        content = '```json\n{"prompt": "%s"}\n```' % kwargs["messages"][1]["content"]
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+            usage=SimpleNamespace(total_tokens=5),
+        )
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+
+class TestAsyncLLMService(unittest.TestCase):
+
+    def setUp(self):
+        FakeAsyncOpenAI.instances = FakeAsyncOpenAI.in_flight = FakeAsyncOpenAI.max_in_flight = 0
+        patcher = mock.patch.object(async_llm_service, "AsyncOpenAI", FakeAsyncOpenAI)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_semaphore_caps_in_flight_calls_and_client_is_shared(self):
+        service = AsyncLLMService(api_key="test-key", enable_cache=False, max_concurrency=4)
+
+        async def fan_out():
+            return await asyncio.gather(*[service.generate_json_response_async(f"p{i}") for i in range(40)])
+
+        results = AsyncLLMService.run_coroutine(fan_out(), timeout=10)
+        self.assertEqual([r["prompt"] for r in results], [f"p{i}" for i in range(40)])
+        self.assertLessEqual(FakeAsyncOpenAI.max_in_flight, 4)
+        self.assertEqual(FakeAsyncOpenAI.instances, 1)
+
+    def test_cap_holds_across_event_loops(self):
+        service = AsyncLLMService(api_key="per-request-loop-key", enable_cache=False, max_concurrency=3)
+
+        async def fan_out(request):
+            return await asyncio.gather(*[service.generate_text_async(f"r{request}-{i}") for i in range(10)])
+
+        # One asyncio.run per request, as a synchronous view would do
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda request: asyncio.run(fan_out(request)), range(4)))
+        self.assertTrue(all(r.success for batch in results for r in batch))
+        self.assertLessEqual(FakeAsyncOpenAI.max_in_flight, 3)
+        self.assertEqual(FakeAsyncOpenAI.instances, 1)
+        self.assertFalse(service._sync_client_built)  # The unused synchronous client is never built
+
+
+if __name__ == "__main__":
+    unittest.main()
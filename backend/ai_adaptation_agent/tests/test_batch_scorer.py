@@ -0,0 +1,82 @@
+# Parity tests for the vectorized relevance scorer against CustomerMatcherService._calculate_relevance
+
+import os
+import sys
+import random
+import unittest
+
+import numpy as np
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import CustomerQuery
+from src.customer_matcher.batch_scorer import BatchRelevanceScorer, top_k_indices
+from tests.test_customer_matcher_scoring import FakeLLMService, InMemoryMatcher, make_profile
+
+WORDS = ["plumbing", "emergency", "leak", "repair", "garden", "lawn", "care", "insurance", "home", "auto",
+         "cake", "catering", "wedding", "seo", "website", "design", "electrician", "rewire", "tree", "drain"]
+TAGS = ["plumbing", "leak repair", "lawn care", "garden design", "home insurance", "catering", "seo", "web design"]
+INDUSTRIES = ["Home Services", "Landscaping", "Financial Services", "Food", "Marketing", ""]
+LOCATIONS = ["TestCity", "TestCity North", "Springfield", "Riverton", "city", None]
+
+
+def random_profiles(rng, count):
+    profiles = []
+    for i in range(count):
+        description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 12))) + rng.choice(["", ".", ", 24/7!"])
+        profiles.append(make_profile(f"biz_{i:05d}", f"Business {i}", rng.choice(INDUSTRIES), description,
+                                     rng.choice(LOCATIONS), rng.sample(TAGS, rng.randint(0, 3))))
+    return profiles
+
+
+def random_query(rng):
+    keywords = rng.sample(WORDS + TAGS + ["home services", "food"], rng.randint(0, 5))
+    location = rng.choice(["testcity", "springfield", "test", "nowhere", None])
+    return {"keywords": keywords, "location": location, "original_text": ""}
+
+
+class TestBatchRelevanceScorer(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.profiles = random_profiles(self.rng, 400)
+        self.matcher = InMemoryMatcher(FakeLLMService(api_key_available=False), self.profiles, semantic_mode="vector")
+
+    def test_scores_equal_calculate_relevance_exactly(self):
+        scorer = BatchRelevanceScorer()
+        features = [self.matcher.feature_cache.features_for(p) for p in self.profiles]
+        for _ in range(40):
+            query = random_query(self.rng)
+            semantic = np.array([self.rng.choice([np.nan, 0.0, self.rng.random()]) for _ in self.profiles])  # NaN: no score
+            for semantic_scores in (None, semantic):
+                batch = scorer.score(query, features, semantic_scores).tolist()
+                expected = [
+                    self.matcher._calculate_relevance(
+                        query, profile,
+                        semantic_result=None if semantic_scores is None or np.isnan(semantic_scores[i]) else (float(semantic_scores[i]), None)
+                    )[0]
+                    for i, profile in enumerate(self.profiles)
+                ]
+                self.assertEqual(batch, expected)
+
+    def test_matches_equal_per_candidate_path(self):
+        per_candidate = InMemoryMatcher(FakeLLMService(api_key_available=False), self.profiles, semantic_mode="vector", batch_scoring=False)
+        for text, keywords, location in [("emergency plumbing leak", ["plumbing", "leak repair"], "TestCity"),
+                                         ("garden design", ["garden", "lawn care"], None),
+                                         ("", ["home services"], "test")]:
+            query = CustomerQuery(query_text=text, keywords=keywords, location=location)
+            batched = [m.model_dump() for m in self.matcher.find_matched_businesses(query)]
+            self.assertTrue(batched)
+            self.assertEqual(batched, [m.model_dump() for m in per_candidate.find_matched_businesses(query)])
+
+    def test_top_k_uses_stable_tie_order(self):
+        scores = np.array([0.5, 0.9, 0.1, 0.5, 0.9, 0.5, 0.2])
+        self.assertEqual(top_k_indices(scores), [1, 4, 0, 3, 5, 6])
+        self.assertEqual(top_k_indices(scores, k=4), [1, 4, 0, 3])
+        self.assertEqual(top_k_indices(scores, k=0), [])
+        self.assertEqual(top_k_indices(np.zeros(0), k=3), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
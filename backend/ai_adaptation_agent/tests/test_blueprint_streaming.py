@@ -0,0 +1,109 @@
+# Tests for section-by-section blueprint streaming (no database or OpenAI key required)
+
+import os
+import sys
+import unittest
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import BusinessIntakeData
+from src.shared.llm_service import LLMStreamError
+from src.blueprint_generator.blueprint_service import BlueprintService
+
+NO_DB_CONFIG = {"host": "", "port": "5432", "user": "", "password": "", "dbname": ""}
+
+SECTION_ORDER = [
+    "business_profile_analysis",
+    "refined_target_audience_personas",
+    "strategic_marketing_plan",
+    "executive_summary",
+    "channel_plan",
+    "content_pillars_themes",
+    "lead_generation_funnel_outline",
+    "brand_voice_messaging_guidelines",
+    "kpi_measurement_framework",
+    "initial_action_plan",
+]
+
+
+class FakeStreamingLLMService:
+    """Streams each text section in two fragments; JSON sections fall back to their defaults."""
+
+    def __init__(self, fail_streams=False, cut_streams=False):
+        self.fail_streams = fail_streams
+        self.cut_streams = cut_streams
+        self.stream_calls = 0
+
+    def generate_text_stream(self, prompt, **kwargs):
+        self.stream_calls += 1
+        if self.fail_streams:
+            raise LLMStreamError("simulated failure")
+        yield "Part one. "
+        if self.cut_streams:
+            raise LLMStreamError("connection reset")
+        yield "Part two."
+
+    def generate_json_response(self, prompt, **kwargs):
+        return None
+
+
+def make_intake():
+    return BusinessIntakeData(
+        business_name="Artisan Coffee Roasters",
+        industry="Food & Beverage",
+        business_stage="Startup",
+        goals=["Build brand awareness"],
+        target_audience_description="Local coffee enthusiasts.",
+        products_services_description="Specialty roasted coffee beans.",
+        raw_responses={"business_id": "test_biz_001"},
+    )
+
+
+def collect_until_last_section(events):
+    collected = []
+    for event, payload in events:
+        collected.append((event, payload))
+        if event == "section" and payload["section"] == SECTION_ORDER[-1]:
+            break
+    return collected
+
+
+class TestBlueprintStreaming(unittest.TestCase):
+
+    def test_sections_stream_in_order_with_text_deltas(self):
+        llm = FakeStreamingLLMService()
+        service = BlueprintService(llm_service=llm, db_config=NO_DB_CONFIG)
+
+        events = collect_until_last_section(service.generate_blueprint_stream(make_intake(), stream_text=True))
+        sections = [payload["section"] for event, payload in events if event == "section"]
+        self.assertEqual(sections, SECTION_ORDER)
+        self.assertEqual(llm.stream_calls, 4)
+
+        deltas = [payload for event, payload in events if event == "delta"]
+        self.assertEqual(len(deltas), 8)
+        # Every delta for a section arrives before that section's "section" event
+        first_section_index = next(i for i, (event, _) in enumerate(events) if event == "section")
+        self.assertEqual([e for e, _ in events[:first_section_index]], ["delta", "delta"])
+        self.assertEqual(events[first_section_index][1]["content"], "Part one. Part two.")
+
+    def test_failed_stream_uses_section_fallback_without_deltas(self):
+        llm = FakeStreamingLLMService(fail_streams=True)
+        service = BlueprintService(llm_service=llm, db_config=NO_DB_CONFIG)
+
+        events = collect_until_last_section(service.generate_blueprint_stream(make_intake(), stream_text=True))
+        self.assertFalse(any(event == "delta" for event, _ in events))
+        self.assertEqual(events[0], ("error", {"section": "business_profile_analysis", "error": events[0][1]["error"]}))
+        self.assertEqual(events[1][1]["content"], "Could not generate business profile analysis.")
+
+    def test_stream_cut_off_part_way_is_an_error_not_a_short_section(self):
+        service = BlueprintService(llm_service=FakeStreamingLLMService(cut_streams=True), db_config=NO_DB_CONFIG)
+
+        events = collect_until_last_section(service.generate_blueprint_stream(make_intake(), stream_text=True))
+        self.assertEqual([event for event, _ in events[:3]], ["delta", "error", "section"])
+        self.assertEqual(events[2][1]["content"], "Could not generate business profile analysis.")
+        self.assertEqual(sum(1 for event, _ in events if event == "error"), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+# Tests for the precomputed per-business scoring features and their bounded cache
+
+import os
+import sys
+import unittest
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.customer_matcher.business_features import BusinessFeatureCache, build_features
+from tests.test_customer_matcher_scoring import SAMPLE_PROFILES, FakeLLMService, InMemoryMatcher, make_profile
+
+
+class TestBusinessFeatureCache(unittest.TestCase):
+
+    def test_features_are_normalized_once_and_reused(self):
+        cache = BusinessFeatureCache(max_entries=10)
+        features = cache.features_for(SAMPLE_PROFILES[0])
+        self.assertIn("plumbing", features.description_tokens)
+        self.assertEqual(features.tags, {"plumbing", "emergency", "leak repair", "drain cleaning"})
+        self.assertEqual((features.location, features.industry), ("testcity", "home services"))
+        self.assertIs(cache.features_for(SAMPLE_PROFILES[0]), features)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_changed_profile_is_rebuilt_and_size_is_bounded(self):
+        cache = BusinessFeatureCache(max_entries=2)
+        profile = make_profile("biz_009", "Bakery", "Food", "Cakes.", "Riverton", ["cakes"])
+        cache.put_profile(profile)
+        profile.raw_responses["service_tags"].append("catering")  # mutated in place
+        self.assertIn("catering", cache.features_for(profile).tags)
+
+        for other in SAMPLE_PROFILES:
+            cache.put(build_features(other))
+        self.assertEqual((len(cache), cache.evictions), (2, 2))
+
+    def test_vocabulary_is_per_cache_and_starts_over_when_too_large(self):
+        cache = BusinessFeatureCache(max_entries=10, max_terms=25)
+        other = BusinessFeatureCache(max_entries=10)
+        first = cache.features_for(SAMPLE_PROFILES[0])
+        self.assertIsNot(first.vocabulary, other.features_for(SAMPLE_PROFILES[0]).vocabulary)
+
+        for profile in SAMPLE_PROFILES[1:]:
+            cache.features_for(profile)  # Each profile adds ~10 terms
+        self.assertEqual(cache.vocabulary_resets, 1)
+        rebuilt = cache.features_for_batch(SAMPLE_PROFILES)
+        self.assertTrue(all(features.vocabulary is cache.vocabulary for features in rebuilt))
+        self.assertIsNot(rebuilt[0], first)
+        self.assertEqual(rebuilt[0].tags, first.tags)
+
+        cache.clear()
+        self.assertEqual(len(cache.vocabulary), 0)
+
+    def test_batch_scores_survive_a_vocabulary_reset(self):
+        query = {"keywords": ["plumbing", "insurance"], "location": "testcity", "original_text": ""}
+        matcher = InMemoryMatcher(FakeLLMService(api_key_available=False), SAMPLE_PROFILES, semantic_mode="llm",
+                                  feature_cache=BusinessFeatureCache(max_terms=1))
+        before = matcher.batch_scorer.score(query, matcher.feature_cache.features_for_batch(SAMPLE_PROFILES)).tolist()
+        after = matcher.batch_scorer.score(query, matcher.feature_cache.features_for_batch(SAMPLE_PROFILES)).tolist()
+        self.assertEqual(matcher.feature_cache.vocabulary_resets, 1)
+        self.assertEqual(before, after)
+        with self.assertRaises(ValueError):
+            matcher.batch_scorer.score(query, [build_features(profile) for profile in SAMPLE_PROFILES])
+
+    def test_scoring_is_unchanged_by_a_warm_cache(self):
+        query = {"keywords": ["plumbing", "emergency", "home services"], "location": "testcity", "original_text": ""}
+        cold = InMemoryMatcher(FakeLLMService(api_key_available=False), SAMPLE_PROFILES, semantic_mode="llm",
+                               feature_cache=BusinessFeatureCache(max_entries=1))
+        warm = InMemoryMatcher(FakeLLMService(api_key_available=False), SAMPLE_PROFILES, semantic_mode="llm")
+        for profile in SAMPLE_PROFILES:
+            warm.feature_cache.put_profile(profile)
+        for profile in SAMPLE_PROFILES:
+            self.assertEqual(cold._calculate_relevance(query, profile), warm._calculate_relevance(query, profile))
+            self.assertEqual(sorted(cold._extract_relevant_services(profile, query)), sorted(warm._extract_relevant_services(profile, query)))
+
+
+if __name__ == "__main__":
+    unittest.main()
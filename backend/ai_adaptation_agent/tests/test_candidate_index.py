@@ -0,0 +1,167 @@
+# Tests for candidate retrieval: the in-memory index, its refresh from updated_at, and the full-text search query
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import psycopg2.errors
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.customer_matcher.candidate_index import CandidateIndex
+from src.customer_matcher.customer_matcher_service import CustomerMatcherService
+from tests.test_customer_matcher_scoring import SAMPLE_PROFILES, FakeLLMService, make_profile
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_row(business_id, name, industry, description, location, tags, updated_at):
+    return {
+        "business_id": business_id, "business_name": name, "industry": industry, "business_stage": "Established",
+        "goals": [], "target_audience_description": "", "products_services_description": description,
+        "location": location, "service_tags": tags, "raw_data_json": None, "updated_at": updated_at,
+    }
+
+
+class FakeCursor:
+    def __init__(self, table):
+        self.table = table
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        self.table.queries.append((sql, params))
+        if self.table.fts_missing and "search_vector" in sql:
+            raise psycopg2.errors.UndefinedColumn('column "search_vector" does not exist')
+        rows = list(self.table.rows.values())
+        if "WHERE updated_at >=" in sql:
+            rows = [row for row in rows if row["updated_at"] >= params[0]]
+        elif "MAX(updated_at)" in sql:
+            rows = [{"updated_at": max((row["updated_at"] for row in rows), default=None)}]
+        elif "business_id = ANY(%s)" in sql:
+            rows = [row for row in rows if row["business_id"] in params[0]]
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeTable:
+    """Just enough of a psycopg2 pool/connection/cursor to serve business_profiles rows."""
+
+    def __init__(self, rows):
+        self.rows = {row["business_id"]: row for row in rows}
+        self.queries = []
+        self.fts_missing = False
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def getconn(self):
+        return self
+
+    def putconn(self, conn):
+        pass
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+
+class TestCandidateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CandidateIndex()
+        self.index.build(SAMPLE_PROFILES)
+
+    def test_any_keyword_matches_with_exact_location_filter(self):
+        self.assertEqual(self.index.candidate_ids(["plumbing", "insurance"]), ["biz_001", "biz_003"])
+        self.assertEqual(self.index.candidate_ids(["plumbing", "insurance"], location="testcity"), ["biz_001", "biz_003"])
+        self.assertEqual(self.index.candidate_ids(["lawn"], location="TestCity"), [])
+        self.assertEqual(self.index.candidate_ids([], location="TestSuburb"), ["biz_002"])
+
+    def test_prefix_multiword_and_ranking(self):
+        self.assertEqual(self.index.candidate_ids(["plumb"]), ["biz_001"])
+        self.assertEqual(self.index.candidate_ids(["home insurance"]), ["biz_003"])
+        self.assertEqual(self.index.candidate_ids(["ho"]), [])  # too short for prefix expansion
+        # biz_003 matches both keywords ("home" also appears in biz_001's industry)
+        self.assertEqual(self.index.candidate_ids(["home", "insurance"]), ["biz_003", "biz_001"])
+
+    def test_upsert_and_remove_update_postings(self):
+        self.index.upsert(make_profile("biz_001", "Plumbing Experts", "Home Services", "Boiler servicing.", "Riverton", ["boilers"]))
+        self.assertEqual(self.index.candidate_ids(["boiler"], location="Riverton"), ["biz_001"])
+        self.assertEqual(self.index.candidate_ids(["leak"]), [])
+        self.index.remove("biz_003")
+        self.assertEqual(self.index.candidate_ids(["insurance"]), [])
+        self.assertEqual(self.index.get_stats()["businesses"], 2)
+
+
+class TestIndexedRetrieval(unittest.TestCase):
+
+    def _matcher(self, table):
+        matcher = CustomerMatcherService(FakeLLMService(api_key_available=False), semantic_mode="llm",
+                                         connection_pool=table, retrieval_mode="index")
+        matcher.index_refresh_seconds = 0
+        return matcher
+
+    def test_loads_at_startup_and_serves_without_queries(self):
+        table = FakeTable([make_row("biz_001", "Plumbing Experts", "Home Services", "Emergency plumbing.", "TestCity", ["plumbing"], T0)])
+        matcher = self._matcher(table)
+        matcher.index_refresh_seconds = 3600
+        self.assertEqual(matcher.candidate_index.watermark, T0)
+        before = len(table.queries)
+        candidates = matcher._retrieve_candidate_businesses({"keywords": ["plumbing"], "location": "testcity"})
+        self.assertEqual([c.raw_responses["business_id"] for c in candidates], ["biz_001"])
+        self.assertEqual(len(table.queries), before)
+
+    def test_refresh_applies_updates_since_watermark_and_sweeps_deletions(self):
+        table = FakeTable([
+            make_row("biz_001", "Plumbing Experts", "Home Services", "Emergency plumbing.", "TestCity", ["plumbing"], T0),
+            make_row("biz_002", "Green Gardens", "Landscaping", "Lawn care.", "TestSuburb", ["lawn care"], T0 - timedelta(days=30)),
+        ])
+        matcher = self._matcher(table)
+        table.rows["biz_003"] = make_row("biz_003", "Secure Finance", "Financial", "Home insurance.", "TestCity", ["insurance"], T0 + timedelta(hours=1))
+        del table.rows["biz_002"]
+
+        counts = matcher.refresh_candidate_index()
+        self.assertEqual(counts, {"upserted": 2, "removed": 0})  # biz_001 is re-read inside the overlap window
+        self.assertEqual(matcher.candidate_index.watermark, T0 + timedelta(hours=1))
+        self.assertEqual(table.queries[-1][1], (T0 - timedelta(seconds=matcher.index_refresh_overlap_seconds),))
+        self.assertEqual(matcher.candidate_index.candidate_ids(["insurance"]), ["biz_003"])
+
+        self.assertEqual(matcher.refresh_candidate_index(sweep_deletions=True)["removed"], 1)
+        self.assertNotIn("biz_002", matcher.candidate_index)
+
+
+class TestFullTextRetrieval(unittest.TestCase):
+
+    def test_keywords_become_ranked_websearch_query(self):
+        matcher = CustomerMatcherService(FakeLLMService(api_key_available=False), semantic_mode="llm",
+                                         connection_pool=FakeTable([]), retrieval_mode="fts")
+        sql, params = matcher._fts_candidate_query(["lawn care", "-drain", "or", "plumbing"], "TestCity")
+        self.assertEqual(params, ["lawn care or drain or plumbing", "testcity"])
+        self.assertIn("websearch_to_tsquery('english', %s)", sql)
+        self.assertIn("search_vector @@ fts_query", sql)
+        self.assertTrue(sql.endswith("ORDER BY fts_rank DESC, business_id LIMIT 100;"))
+        self.assertIsNone(matcher._fts_candidate_query(["  ", "!"], None))
+
+    def test_missing_search_vector_falls_back_to_ilike(self):
+        table = FakeTable([make_row("biz_001", "Plumbing Experts", "Home Services", "Emergency plumbing.", "TestCity", ["plumbing"], T0)])
+        table.fts_missing = True
+        matcher = CustomerMatcherService(FakeLLMService(api_key_available=False), semantic_mode="llm",
+                                         connection_pool=table, retrieval_mode="fts")
+        candidates = matcher._retrieve_candidate_businesses({"keywords": ["plumbing"], "location": None})
+        self.assertEqual(len(candidates), 1)
+        self.assertEqual((matcher.retrieval_mode, table.rollbacks), ("sql", 1))
+        self.assertIn("ILIKE", table.queries[-1][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
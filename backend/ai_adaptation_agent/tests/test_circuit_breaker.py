@@ -0,0 +1,88 @@
+# Tests for the LLM circuit breaker, hedged calls and the matcher's degraded mode
+
+import os
+import sys
+import time
+import unittest
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, HedgedCaller
+from src.shared.data_models import CustomerQuery
+from tests.test_customer_matcher_scoring import SAMPLE_PROFILES, FakeLLMService, InMemoryMatcher
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_on_failure_rate_and_recovers_through_probe(self):
+        breaker = CircuitBreaker(failure_rate_threshold=0.5, window_size=4, min_calls=4, open_seconds=0.05)
+        for success in (True, False, True, False):
+            self.assertTrue(breaker.allow_request())
+            breaker.record(success)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow_request())   # the probe
+        self.assertFalse(breaker.allow_request())  # only one probe at a time
+        breaker.record(True, 0.01)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.get_stats()["times_opened"], 1)
+
+    def test_opens_on_slow_calls_and_failed_probe_reopens(self):
+        breaker = CircuitBreaker(slow_call_seconds=1.0, slow_call_rate_threshold=0.6, window_size=3, min_calls=3, open_seconds=0.05)
+        for _ in range(3):
+            breaker.allow_request()
+            breaker.record(True, 2.0)
+        self.assertEqual(breaker.state, OPEN)
+        time.sleep(0.06)
+        breaker.allow_request()
+        breaker.record(False)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.get_stats()["times_opened"], 2)
+
+
+class TestHedgedCaller(unittest.TestCase):
+
+    def test_hedge_wins_when_primary_is_slow(self):
+        caller = HedgedCaller(hedge_enabled=True, hedge_percentile=50, hedge_min_samples=3, min_hedge_delay_seconds=0.01)
+        for _ in range(3):
+            caller.call("task", lambda: "fast")
+        self.assertIsNotNone(caller.hedge_delay("task"))
+
+        result, timed_out = caller.call("task", lambda: time.sleep(0.5) or "slow", hedge=lambda: "hedged")
+        self.assertEqual((result, timed_out), ("hedged", False))
+        stats = caller.get_stats()
+        self.assertEqual((stats["hedges_sent"], stats["hedges_won"]), (1, 1))
+
+    def test_timeout_bounds_the_wait(self):
+        caller = HedgedCaller()
+        start = time.monotonic()
+        result, timed_out = caller.call("task", lambda: time.sleep(0.5) or "late", timeout=0.05)
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual((result, timed_out), (None, True))
+
+
+class TestMatcherDegradedMode(unittest.TestCase):
+
+    def test_open_circuit_skips_llm_and_keeps_keyword_location_scoring(self):
+        breaker = CircuitBreaker(failure_rate_threshold=0.5, window_size=2, min_calls=2, open_seconds=60)
+        llm = FakeLLMService()  # every LLM call fails (returns None)
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="llm", semantic_batch_size=1,
+                                  circuit_breaker=breaker, hedged_caller=HedgedCaller(), llm_timeout_seconds=0)
+        query = CustomerQuery(query_text="emergency plumbing", keywords=["plumbing"], location="TestCity")
+
+        matches = matcher.find_matched_businesses(query)
+        self.assertEqual(len(llm.json_calls), 2)  # intent + first candidate, then the circuit opened
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(matches[0].business_id, "biz_001")
+
+        matcher.find_matched_businesses(query)
+        self.assertEqual(len(llm.json_calls), 2)
+        self.assertEqual(matcher.get_llm_guard_stats()["circuit_breaker"]["state"], OPEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+# Unit tests for CustomerMatcherService scoring (no database or OpenAI key required)
+
+import os
+import sys
+import unittest
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import CustomerQuery, BusinessIntakeData
+from src.customer_matcher.customer_matcher_service import CustomerMatcherService
+from src.customer_matcher.semantic_index import SemanticIndex, business_profile_text
+
+NO_DB_CONFIG = {"host": "", "port": "5432", "user": "", "password": "", "dbname": ""}
+
+
+def make_profile(business_id, name, industry, description, location, tags):
+    return BusinessIntakeData(
+        business_name=name,
+        industry=industry,
+        business_stage="Established",
+        goals=[],
+        target_audience_description="",
+        products_services_description=description,
+        raw_responses={"business_id": business_id, "location": location, "service_tags": tags},
+    )
+
+
+SAMPLE_PROFILES = [
+    make_profile("biz_001", "Plumbing Experts", "Home Services",
+                 "24/7 emergency plumbing, leak detection, drain cleaning, pipe repair.",
+                 "TestCity", ["plumbing", "emergency", "leak repair", "drain cleaning"]),
+    make_profile("biz_002", "Green Gardens", "Landscaping Services",
+                 "Custom garden design, landscape architecture, lawn care, tree services.",
+                 "TestSuburb", ["garden design", "landscaping", "lawn care"]),
+    make_profile("biz_003", "Secure Finance", "Financial Services",
+                 "Home insurance, auto insurance, life insurance, investment advice.",
+                 "TestCity", ["insurance", "home insurance", "financial planning"]),
+]
+
+
+class FakeLLMService:
+    """Scripted stand-in for LLMService that records JSON calls."""
+
+    def __init__(self, json_responses=None, api_key_available=True):
+        self.json_responses = list(json_responses or [])
+        self.json_calls = []
+        self.api_key_available = api_key_available
+
+    def is_api_key_available(self):
+        return self.api_key_available
+
+    def generate_json_response(self, prompt, **kwargs):
+        self.json_calls.append(prompt)
+        return self.json_responses.pop(0) if self.json_responses else None
+
+
+class InMemoryMatcher(CustomerMatcherService):
+    """Matcher that serves candidates from a list instead of PostgreSQL."""
+
+    def __init__(self, llm_service, profiles, **kwargs):
+        super().__init__(llm_service=llm_service, db_config=NO_DB_CONFIG, **kwargs)
+        self.profiles = profiles
+
+    def _retrieve_candidate_businesses(self, processed_query, deadline=None):
+        return list(self.profiles)
+
+
+class TestBatchedSemanticScoring(unittest.TestCase):
+
+    def test_one_llm_call_per_batch(self):
+        batch_reply = {"results": [
+            {"index": 0, "semantic_score": 0.9, "semantic_justification": "Plumbing match."},
+            {"index": 1, "semantic_score": 0.1, "semantic_justification": "Unrelated."},
+        ]}
+        second_batch_reply = {"results": [{"index": 0, "semantic_score": 0.2, "semantic_justification": "Unrelated."}]}
+        llm = FakeLLMService(json_responses=[None, batch_reply, second_batch_reply])  # first reply: query understanding
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="llm", semantic_batch_size=2)
+
+        matches = matcher.find_matched_businesses(CustomerQuery(query_text="emergency plumbing", keywords=["plumbing"], location="TestCity"))
+        self.assertEqual(len(llm.json_calls), 3)
+        self.assertEqual(matches[0].business_id, "biz_001")
+        self.assertIn("Plumbing match.", matches[0].match_reason)
+
+    def test_unparseable_batch_falls_back_to_per_candidate(self):
+        per_candidate = [{"semantic_score": 0.5, "semantic_justification": "ok"}] * 3
+        llm = FakeLLMService(json_responses=[None, "not json"] + per_candidate)
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="llm", semantic_batch_size=10)
+
+        matcher.find_matched_businesses(CustomerQuery(query_text="emergency plumbing", keywords=["plumbing"]))
+        # 1 query understanding + 1 failed batch + 3 per-candidate fallbacks
+        self.assertEqual(len(llm.json_calls), 5)
+
+
+class TestVectorSemanticScoring(unittest.TestCase):
+
+    def test_semantic_index_ranks_related_business_first(self):
+        index = SemanticIndex()
+        index.build([(p.raw_responses["business_id"], business_profile_text(p)) for p in SAMPLE_PROFILES])
+        top = index.top_k("need someone to fix a leaking pipe and clean my drain", k=2)
+        self.assertEqual(top[0][0], "biz_001")
+        scores = index.score("garden lawn care", ["biz_002", "biz_003", "unknown"])
+        self.assertGreater(scores[0], scores[1])
+        self.assertEqual(scores[2], 0.0)
+
+    def test_index_grows_with_modest_headroom(self):
+        index = SemanticIndex()
+        index.build([(f"biz_{n}", f"business number {n}") for n in range(100)])
+        self.assertEqual(index._matrix.shape, (125, 1024))
+        for n in range(100, 130):
+            index.upsert(f"biz_{n}", f"business number {n}")
+        self.assertEqual((len(index), index._matrix.shape[0]), (130, 156))
+        self.assertEqual(index.top_k("business number 129", k=1)[0][0], "biz_129")
+
+    def test_vector_mode_makes_no_per_candidate_llm_calls(self):
+        llm = FakeLLMService(api_key_available=False)
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="vector")
+        matches = matcher.find_matched_businesses(CustomerQuery(query_text="emergency plumbing pipe repair", location="TestCity"))
+        self.assertEqual(llm.json_calls, [])
+        self.assertEqual(matches[0].business_id, "biz_001")
+        self.assertIn("Vector Semantic Score", matches[0].match_reason)
+
+    def test_zero_similarity_does_not_outrank_keyword_match(self):
+        handyman = make_profile("biz_004", "Handy Helpers", "General Contracting",
+                                "Odd jobs around the house: shelving, painting, furniture assembly, gutter clearing, tiling, "
+                                "door hanging, small plumbing fixes and general repairs.",
+                                "TestCity", ["odd jobs", "furniture assembly", "painting"])
+        matcher = InMemoryMatcher(FakeLLMService(api_key_available=False), SAMPLE_PROFILES + [handyman], semantic_mode="vector")
+        ranked = [m.business_id for m in matcher.find_matched_businesses(CustomerQuery(query_text="plumbing", location="TestCity"))]
+        self.assertLess(ranked.index("biz_004"), ranked.index("biz_003"))  # biz_003 (insurance) has no overlap at all
+        self.assertEqual(ranked[0], "biz_001")
+
+    def test_edited_profile_is_re_encoded(self):
+        matcher = InMemoryMatcher(FakeLLMService(api_key_available=False), SAMPLE_PROFILES, semantic_mode="vector")
+        query = {"original_text": "lawn mowing and hedge trimming"}
+        insurer = SAMPLE_PROFILES[2]
+        before = matcher._vector_semantic_scores(query, [insurer])[0][0]
+        edited = make_profile("biz_003", insurer.business_name, "Landscaping", "Lawn mowing and hedge trimming.",
+                              "TestCity", ["lawn care"])
+        after = matcher._vector_semantic_scores(query, [edited])[0][0]
+        self.assertLess(before, 0.1)
+        self.assertGreater(after, 0.5)
+        self.assertTrue(matcher.semantic_index.is_current("biz_003", business_profile_text(edited)))
+
+    def test_llm_rerank_only_scores_top_n(self):
+        rerank_reply = {"results": [{"index": 0, "semantic_score": 0.95, "semantic_justification": "Best fit."}]}
+        llm = FakeLLMService(json_responses=[None, rerank_reply])
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="vector", llm_rerank_top_n=1)
+        matches = matcher.find_matched_businesses(CustomerQuery(query_text="emergency plumbing", keywords=["plumbing"], location="TestCity"))
+        self.assertEqual(len(llm.json_calls), 2)  # query understanding + one rerank batch
+        self.assertIn("Best fit.", matches[0].match_reason)
+
+
+if __name__ == "__main__":
+    unittest.main()
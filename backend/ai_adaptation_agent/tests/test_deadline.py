@@ -0,0 +1,151 @@
+# Tests for the request deadline and per-stage budgets of the matching pipeline
+
+import os
+import sys
+import unittest
+
+import psycopg2.errors
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import CustomerQuery
+from src.customer_matcher.customer_matcher_service import CustomerMatcherService
+from src.customer_matcher.deadline import Deadline
+from tests.test_customer_matcher_scoring import SAMPLE_PROFILES, FakeLLMService, InMemoryMatcher
+from tests.test_candidate_index import T0, FakeCursor, FakeTable, make_row
+
+QUERY = CustomerQuery(query_text="emergency plumbing", keywords=["plumbing"], location="TestCity")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class ClockedLLMService(FakeLLMService):
+    """Each JSON call takes call_seconds on the fake clock."""
+
+    def __init__(self, clock, call_seconds, **kwargs):
+        super().__init__(**kwargs)
+        self.clock = clock
+        self.call_seconds = call_seconds
+
+    def generate_json_response(self, prompt, **kwargs):
+        self.clock.now += self.call_seconds
+        return super().generate_json_response(prompt, **kwargs)
+
+
+class CanceledCursor(FakeCursor):
+    def execute(self, sql, params=None):
+        super().execute(sql, params)
+        if sql.startswith("SELECT"):
+            raise psycopg2.errors.QueryCanceled("canceling statement due to statement timeout")
+
+
+class SlowTable(FakeTable):
+    def cursor(self, cursor_factory=None):
+        return CanceledCursor(self)
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_stage_budgets_share_one_clock_and_are_capped_by_the_deadline(self):
+        clock = FakeClock()
+        deadline = Deadline(1.0, {"semantic": 0.4}, clock=clock)
+        self.assertEqual(deadline.timeout_for("semantic", cap=10), 0.4)
+        clock.now += 0.3
+        self.assertAlmostEqual(deadline.timeout_for("semantic", cap=10), 0.1)
+        self.assertAlmostEqual(deadline.timeout_for("understanding", cap=0.5), 0.5)
+        clock.now += 0.2
+        self.assertFalse(deadline.allows("semantic"))
+        self.assertTrue(deadline.allows("understanding"))
+        clock.now += 0.6
+        self.assertEqual(deadline.timeout_for("understanding", cap=0.5), 0.0)
+        deadline.skip("semantic")
+        deadline.skip("semantic")
+        self.assertEqual((deadline.degraded, deadline.degraded_stages), (True, ["semantic"]))
+        self.assertIsNone(Deadline(0).remaining())
+        self.assertEqual(Deadline(None).timeout_for("semantic", cap=3), 3)
+
+
+class TestMatcherDeadline(unittest.TestCase):
+
+    def test_zero_deadline_disables_stage_budgets_too(self):
+        matcher = InMemoryMatcher(FakeLLMService(), SAMPLE_PROFILES, deadline_seconds=0, stage_budgets={"semantic": 0.0})
+        deadline = matcher.new_deadline()
+        self.assertEqual((deadline.remaining(), deadline.timeout_for("semantic", cap=10)), (None, 10))
+        self.assertTrue(deadline.allows("semantic"))
+        self.assertEqual(matcher.new_deadline(1.0).stage_budgets, {"semantic": 0.0})
+
+    def test_expired_deadline_skips_llm_stages_and_is_not_cached(self):
+        clock = FakeClock()
+        llm = FakeLLMService()
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="llm")
+        deadline = Deadline(1.0, matcher.stage_budgets, clock=clock)
+        clock.now += 2
+        page = matcher.find_matched_businesses_page(QUERY, deadline=deadline)
+        self.assertEqual(llm.json_calls, [])
+        self.assertEqual((page.degraded, page.degraded_stages), (True, ["understanding", "semantic"]))
+        self.assertEqual(page.matches[0].business_id, "biz_001")  # keyword/location scoring still ranks
+        self.assertEqual(len(matcher.result_cache), 0)
+
+    def test_semantic_budget_stops_further_batches(self):
+        clock = FakeClock()
+        batch_reply = {"results": [{"index": 0, "semantic_score": 0.9, "semantic_justification": "Plumbing match."}]}
+        llm = ClockedLLMService(clock, 0.5, json_responses=[None, batch_reply, batch_reply, batch_reply])
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="llm", semantic_batch_size=2,
+                                  stage_budgets={"understanding": 0.8, "semantic": 0.6})
+        page = matcher.find_matched_businesses_page(QUERY, deadline=Deadline(5.0, matcher.stage_budgets, clock=clock))
+        self.assertEqual(len(llm.json_calls), 3)  # understanding and two batches; the third batch is out of time
+        self.assertEqual(page.degraded_stages, ["semantic"])
+        self.assertIn("Plumbing match.", page.matches[0].match_reason)
+
+    def test_llm_calls_get_the_stage_time_left(self):
+        clock = FakeClock()
+        batch_reply = {"results": [{"index": 0, "semantic_score": 0.9, "semantic_justification": "Plumbing match."}]}
+        llm = ClockedLLMService(clock, 0.3, json_responses=[{"keywords": ["plumbing"]}, batch_reply, batch_reply])
+        timeouts = []
+        generate = llm.generate_json_response
+        llm.generate_json_response = lambda prompt, **kwargs: timeouts.append(kwargs["timeout"]) or generate(prompt, **kwargs)
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="llm", semantic_batch_size=2,
+                                  stage_budgets={"understanding": 0.8, "semantic": 0.6})
+        matcher.find_matched_businesses_page(QUERY, deadline=Deadline(5.0, matcher.stage_budgets, clock=clock))
+        self.assertAlmostEqual(timeouts[0], 0.8)
+        self.assertAlmostEqual(timeouts[1], 0.6)
+        self.assertAlmostEqual(timeouts[2], 0.3)  # The second semantic batch gets what the first one left
+
+    def test_rerank_is_skipped_without_time(self):
+        clock = FakeClock()
+        llm = FakeLLMService()
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="vector", llm_rerank_top_n=2,
+                                  stage_budgets={"understanding": 0.8, "rerank": 0.0})
+        llm.json_responses = [None]
+        page = matcher.find_matched_businesses_page(QUERY, deadline=Deadline(5.0, matcher.stage_budgets, clock=clock))
+        self.assertEqual(len(llm.json_calls), 1)  # understanding only
+        self.assertEqual(page.degraded_stages, ["rerank"])
+
+    def test_sql_retrieval_runs_under_statement_timeout(self):
+        rows = [make_row(p.raw_responses["business_id"], p.business_name, p.industry, p.products_services_description,
+                         p.raw_responses["location"], p.raw_responses["service_tags"], T0) for p in SAMPLE_PROFILES]
+        table = FakeTable(rows)
+        matcher = CustomerMatcherService(FakeLLMService(api_key_available=False), semantic_mode="llm",
+                                         connection_pool=table, retrieval_mode="sql", stage_budgets={"retrieval": 0.5})
+        page = matcher.find_matched_businesses_page(CustomerQuery(keywords=["insurance"]))
+        self.assertFalse(page.degraded)
+        statement, params = table.queries[-2]
+        self.assertEqual(statement, "SET LOCAL statement_timeout = %s;")
+        self.assertTrue(0 < params[0] <= 500)
+
+        slow = SlowTable(rows)
+        matcher = CustomerMatcherService(FakeLLMService(api_key_available=False), semantic_mode="llm",
+                                         connection_pool=slow, retrieval_mode="sql")
+        page = matcher.find_matched_businesses_page(CustomerQuery(keywords=["insurance"]))
+        self.assertEqual((page.matches, page.degraded_stages), ([], ["retrieval"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# Tests for the offline fake OpenAI server used by the benchmarks
+
+import os
+import sys
+import json
+import unittest
+
+# Add the project root to the Python path so both src/ and benchmarks/ are importable
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openai import OpenAI
+
+from benchmarks.fake_openai_server import FakeOpenAIServer, FakeServerConfig, canned_response
+from benchmarks.run_benchmark import percentile
+from src.shared.llm_metrics import LLMMetrics
+from src.shared.llm_service import LLMService
+from src.shared.rate_limiter import AdaptiveRateLimiter
+from src.shared.single_flight import SingleFlight
+
+
+def make_llm_service(server, max_retries=2):
+    llm_service = LLMService(api_key="sk-test", enable_cache=False, max_retries=max_retries,
+                             rate_limiter=AdaptiveRateLimiter(requests_per_minute=100000, tokens_per_minute=10 ** 8),
+                             single_flight=SingleFlight(), metrics=LLMMetrics())
+    llm_service.client = OpenAI(api_key="sk-test", base_url=server.base_url, max_retries=0)
+    return llm_service
+
+
+class TestFakeOpenAIServer(unittest.TestCase):
+
+    def test_canned_batch_scores_are_deterministic_and_cover_every_index(self):
+        prompt = "Assess the semantic similarity between the customer query and each numbered business offering.\n" \
+                 "Customer Query: emergency plumber\n\nBusinesses:\n[0] Plumbing Experts | x\n[1] Green Gardens | y\n"
+        kind, content = canned_response(prompt)
+        self.assertEqual(kind, "semantic_batch")
+        self.assertEqual([r["index"] for r in json.loads(content)["results"]], [0, 1])
+        self.assertEqual(content, canned_response(prompt)[1])
+        _, wrapped = canned_response("Generate 2 detailed audience personas", json_mode=True)
+        self.assertIn("personas", json.loads(wrapped))
+
+    def test_completion_and_stream_round_trip_through_openai_client(self):
+        with FakeOpenAIServer(FakeServerConfig(latency_ms=1, latency_distribution="fixed")) as server:
+            llm_service = make_llm_service(server)
+            response = llm_service.generate_text("Write a short tagline.", max_tokens=100)
+            self.assertFalse(response.metadata.get("error"))
+            self.assertGreater(response.metadata["completion_tokens"], 0)
+            streamed = "".join(llm_service.generate_text_stream("Write a short tagline.", max_tokens=100))
+            self.assertEqual(streamed, response.generated_text)
+            self.assertEqual((server.stats.completions, server.stats.streamed), (2, 1))
+
+    def test_injected_rate_limits_are_retried_then_reported(self):
+        config = FakeServerConfig(latency_ms=1, latency_distribution="fixed", rate_limit_rate=1.0, retry_after_ms=1)
+        with FakeOpenAIServer(config) as server:
+            llm_service = make_llm_service(server, max_retries=1)
+            response = llm_service.generate_text("hello", max_tokens=10)
+            self.assertTrue(response.metadata["error"])
+            self.assertEqual(server.stats.injected_rate_limits, 2)
+
+    def test_percentile_interpolates(self):
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0, 5.0], 0.5), 3.0)
+        self.assertAlmostEqual(percentile([1.0, 2.0], 0.95), 1.95)
+        self.assertEqual(percentile([], 0.99), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+# Tests for gazetteer location normalization, the grid GeoIndex and distance-decay location scoring
+
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import CustomerQuery
+from src.customer_matcher.customer_matcher_service import CustomerMatcherService
+from src.customer_matcher.geo import Gazetteer, GeoIndex, LocationScorer, Place, haversine_km
+from tests.test_customer_matcher_scoring import FakeLLMService, InMemoryMatcher, make_profile
+from tests.test_candidate_index import T0, FakeTable, make_row
+
+PLACES = [
+    Place("Demo City", 40.0, -100.0, region="CA", country="US", population=50000, aliases=("DemoCity",)),
+    Place("Demo Heights", 40.09, -100.0, region="CA", country="US", population=8000),  # ~10 km north
+    Place("Far Town", 41.0, -100.0, region="CA", country="US", population=3000),       # ~111 km north
+    Place("Springfield", 39.8, -89.65, region="IL", country="US", population=114000),
+    Place("Springfield", 37.2, -93.3, region="MO", country="US", population=169000),
+]
+
+
+class TestGazetteer(unittest.TestCase):
+
+    def setUp(self):
+        self.gazetteer = Gazetteer(PLACES)
+
+    def test_spelling_variants_resolve_to_one_place(self):
+        demo_city = self.gazetteer.resolve("Demo City")
+        self.assertEqual(demo_city.name, "Demo City")
+        for text in ("DemoCity", "democity", "demo-city", "Demo City, CA", "DEMO CITY, US"):
+            self.assertIs(self.gazetteer.resolve(text), demo_city, text)
+        self.assertIsNone(self.gazetteer.resolve("Nowhere, CA"))
+        self.assertIsNone(self.gazetteer.resolve(""))
+
+    def test_qualifier_then_population_disambiguates(self):
+        self.assertEqual(self.gazetteer.resolve("Springfield, IL").region, "IL")
+        self.assertEqual(self.gazetteer.resolve("Springfield").region, "MO")  # most populous
+        self.assertEqual(self.gazetteer.resolve("Springfield, XX").region, "MO")
+
+    def test_loads_csv_and_skips_invalid_rows(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as f:
+            f.write("name,latitude,longitude,region,country,population,aliases\n")
+            f.write("Demo City,40.0,-100.0,CA,US,50000,DemoCity|DC\n")
+            f.write("Broken,not-a-number,1.0,,,,\n")
+            f.write("Off Map,95.0,1.0,,,,\n")
+        self.addCleanup(os.remove, f.name)
+        gazetteer = Gazetteer.from_file(f.name)
+        self.assertEqual(len(gazetteer), 1)
+        self.assertEqual(gazetteer.resolve("dc").name, "Demo City")
+
+
+class TestGeoIndex(unittest.TestCase):
+
+    def test_radius_query_matches_brute_force(self):
+        rng = random.Random(3)
+        points = {f"biz_{i}": (rng.uniform(-60, 60), rng.uniform(-180, 180)) for i in range(3000)}
+        points.update({"east": (10.0, 179.9), "west": (10.0, -179.9)})  # ~22 km apart across the antimeridian
+        index = GeoIndex()
+        index.build((business_id, lat, lon) for business_id, (lat, lon) in points.items())
+        for lat, lon, radius in [(10.0, 179.95, 50.0), (0.0, 0.0, 800.0), (55.0, 20.0, 300.0), (-30.0, -179.0, 1500.0)]:
+            expected = {business_id for business_id, (plat, plon) in points.items() if haversine_km(lat, lon, plat, plon) <= radius}
+            self.assertEqual(set(index.within_radius(lat, lon, radius)), expected)
+        self.assertEqual(set(index.within_radius(10.0, 179.95, 50.0)) & {"east", "west"}, {"east", "west"})
+
+    def test_upsert_moves_and_remove_drops(self):
+        index = GeoIndex()
+        index.upsert("biz_001", 40.0, -100.0)
+        index.upsert("biz_001", 41.0, -100.0)
+        self.assertEqual(list(index.within_radius(40.0, -100.0, 50.0)), [])
+        self.assertEqual(list(index.within_radius(41.0, -100.0, 1.0)), ["biz_001"])
+        index.remove("biz_001")
+        self.assertEqual((len(index), index.get_stats()["cells"]), (0, 0))
+
+
+class TestLocationScorer(unittest.TestCase):
+
+    def setUp(self):
+        self.scorer = LocationScorer(Gazetteer(PLACES), half_distance_km=10.0)
+
+    def test_distance_decay_when_both_locations_resolve(self):
+        self.assertEqual(self.scorer.score("democity", "demo city, ca"), (1.0, "Exact location match."))
+        score, reason = self.scorer.score("demo city", "demo heights")
+        self.assertAlmostEqual(score, 0.5, delta=0.02)
+        self.assertEqual(reason, "10.0 km from Demo City.")
+        self.assertLess(self.scorer.score("demo city", "far town")[0], 0.001)
+
+    def test_string_comparison_otherwise(self):
+        self.assertEqual(self.scorer.score("test city", "TestCity"), (1.0, "Exact location match."))
+        self.assertEqual(self.scorer.score("testcity", "testcity north"), (0.5, "Partial location match."))
+        self.assertEqual(self.scorer.score("testcity", "riverton"), (0.0, None))
+        self.assertEqual(self.scorer.score("testcity", ""), (0.0, None))
+        self.assertEqual(self.scorer.score(None, "riverton"), (0.2, None))
+
+
+class TestGeoMatching(unittest.TestCase):
+
+    def setUp(self):
+        self.gazetteer = Gazetteer(PLACES)
+        self.profiles = [
+            make_profile("biz_001", "Plumbing Experts", "Home Services", "Emergency plumbing.", "DemoCity", ["plumbing"]),
+            make_profile("biz_002", "Heights Plumbing", "Home Services", "Plumbing and drains.", "Demo Heights", ["plumbing"]),
+            make_profile("biz_003", "Far Plumbing", "Home Services", "Plumbing.", "Far Town", ["plumbing"]),
+            make_profile("biz_004", "Local Plumbing", "Home Services", "Plumbing.", "Unknown Village", ["plumbing"]),
+        ]
+
+    def test_batch_and_per_candidate_scores_agree_with_gazetteer(self):
+        query = CustomerQuery(keywords=["plumbing"], location="Demo City, CA")
+        results = []
+        for batch_scoring in (True, False):
+            matcher = InMemoryMatcher(FakeLLMService(api_key_available=False), self.profiles, semantic_mode="llm",
+                                      gazetteer=self.gazetteer, batch_scoring=batch_scoring)
+            results.append([m.model_dump() for m in matcher.find_matched_businesses(query)])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual([m["business_id"] for m in results[0]][:2], ["biz_001", "biz_002"])
+        self.assertIn("Exact location match.", results[0][0]["match_reason"])
+
+    def test_index_retrieval_filters_by_radius(self):
+        table = FakeTable([make_row(p.raw_responses["business_id"], p.business_name, p.industry, p.products_services_description,
+                                    p.raw_responses["location"], p.raw_responses["service_tags"], T0) for p in self.profiles])
+        matcher = CustomerMatcherService(FakeLLMService(api_key_available=False), semantic_mode="llm", connection_pool=table,
+                                         retrieval_mode="index", gazetteer=self.gazetteer, geo_radius_km=25.0)
+        matcher.index_refresh_seconds = 3600
+        self.assertEqual(matcher.get_candidate_index_stats()["geo_index"]["businesses"], 3)
+
+        def candidate_ids(**query):
+            processed = matcher._preprocess_query(CustomerQuery(keywords=["plumbing"], **query))
+            return sorted(p.raw_responses["business_id"] for p in matcher._retrieve_candidate_businesses(processed))
+
+        self.assertEqual(candidate_ids(location="Demo City, CA"), ["biz_001", "biz_002"])
+        self.assertEqual(candidate_ids(location="democity", radius_km=150), ["biz_001", "biz_002", "biz_003"])
+        self.assertEqual(candidate_ids(location="unknown village"), ["biz_004"])  # not in the gazetteer: exact filter only
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+# Tests for structured JSON output: incremental parsing, local repair, validation and early stop
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from typing import Dict, List
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import AudiencePersona, LLMResponse
+from src.shared.json_output import IncrementalJSONParser, repair_json, validate_json
+from src.shared.llm_cache import TieredResponseCache
+from src.shared.llm_metrics import LLMMetrics
+from src.shared.llm_service import LLMService, LLMStreamError
+
+
+def _chunk(content=None, finish_reason=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)])
+
+
+class FakeCompletions:
+    """Replies with fixed text, either whole or as a stream of small chunks."""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = []
+        self.chunks_served = 0
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def _stream(self, include_usage=False):
+        for start in range(0, len(self.text), 4):
+            self.chunks_served += 1
+            yield _chunk(self.text[start:start + 4])
+        yield _chunk(finish_reason="stop")
+        if include_usage:
+            yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=40, completion_tokens=25, total_tokens=65))
+
+    def _create_raw(self, **kwargs):
+        self.calls.append(kwargs)
+        if kwargs.get("stream"):
+            include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+            return SimpleNamespace(headers={}, parse=lambda: self._stream(include_usage))
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.text), finish_reason="stop")],
+            usage=None,
+        )
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+
+class CutOffCompletions(FakeCompletions):
+    """Drops the connection after two chunks."""
+
+    def _stream(self, include_usage=False):
+        stream = super()._stream(include_usage)
+        yield next(stream)
+        yield next(stream)
+        raise ConnectionResetError("connection reset by peer")
+
+
+def _service(text, completions_class=FakeCompletions):
+    llm_service = LLMService(api_key="test-key", cache=TieredResponseCache(), metrics=LLMMetrics(pricing={}))
+    completions = completions_class(text)
+    llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return llm_service, completions
+
+
+class TestJSONOutput(unittest.TestCase):
+
+    def test_incremental_parser_tracks_completed_keys(self):
+        parser = IncrementalJSONParser()
+        for piece in ('Sure: {"score": 0', '.8, "why": "a, b}', '", "extra": [1, {"x": 2}', ']'):
+            parser.feed(piece)
+        self.assertEqual(parser.completed_keys, {"score", "why"})
+        self.assertTrue(parser.has_keys(["score", "why"]))
+        self.assertFalse(parser.done)
+        self.assertEqual(parser.value(), {"score": 0.8, "why": "a, b}"})
+        parser.feed("}")
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.value()["extra"], [1, {"x": 2}])
+
+    def test_repair_json_fixes_common_defects(self):
+        self.assertEqual(repair_json('```json\n{"a": 1,}\n```'), {"a": 1})
+        self.assertEqual(repair_json('Here you go: [1, 2, 3] Hope it helps'), [1, 2, 3])
+        self.assertEqual(repair_json('{"a": [1, 2], "b": "trunc'), {"a": [1, 2], "b": "trunc"})
+        self.assertEqual(repair_json('{"a": 1, "b":'), {"a": 1})
+        self.assertEqual(repair_json("{'a': True, 'b': None}"), {"a": True, "b": None})
+        self.assertEqual(repair_json("{“a”: “b”}"), {"a": "b"})
+        self.assertIsNone(repair_json("no json here"))
+
+    def test_validate_json_unwraps_and_drops_invalid_items(self):
+        valid = {"name": "Ian", "demographics": {"age": "30"}, "psychographics": [], "pain_points": [], "goals": [], "preferred_channels": ["Blogs"]}
+        value = validate_json({"personas": [valid, {"name": "Broken"}]}, List[AudiencePersona])
+        self.assertEqual(value, [valid])
+        self.assertIsNone(validate_json({"a": ["not", "a", "string"]}, Dict[str, str]))
+
+    def test_generate_json_response_uses_json_mode_and_repairs_locally(self):
+        llm_service, completions = _service('{"Blog": "Thought leadership", "LinkedIn": "Outreach",}')
+        self.assertTrue(llm_service.is_api_key_available())
+        value = llm_service.generate_json_response("Channels as JSON", response_model=Dict[str, str], caller="blueprint.channels")
+        self.assertEqual(value, {"Blog": "Thought leadership", "LinkedIn": "Outreach"})
+        self.assertEqual(len(completions.calls), 1)  # repaired without a second round trip
+        self.assertEqual(completions.calls[0]["response_format"], {"type": "json_object"})
+
+    def test_required_keys_stop_the_stream_early(self):
+        text = '{"semantic_score": 0.9, "semantic_justification": "Close match.", "notes": "' + "x" * 400 + '"}'
+        llm_service, completions = _service(text)
+        value = llm_service.generate_json_response("Score it", required_keys=["semantic_score", "semantic_justification"], caller="matcher.semantic")
+        self.assertEqual(value, {"semantic_score": 0.9, "semantic_justification": "Close match."})
+        self.assertLess(completions.chunks_served, len(text) // 4)
+        summary = llm_service.metrics.get_summary()["matcher.semantic"]
+        self.assertEqual(summary["upstream_calls"], 1)
+        self.assertGreater(summary["prompt_tokens"], 0)  # Stopped before the usage chunk: estimated
+        self.assertGreater(summary["completion_tokens"], 0)
+
+        # The kept part is cached, so the identical call is served without the provider
+        again = llm_service.generate_json_response("Score it", required_keys=["semantic_score", "semantic_justification"], caller="matcher.semantic")
+        self.assertEqual(again, value)
+        self.assertEqual(len(completions.calls), 1)
+
+    def test_streamed_calls_record_reported_usage(self):
+        llm_service, completions = _service('{"intent": "plumbing"}')
+        value = llm_service.generate_json_response("Intent", required_keys=["intent", "urgency"], caller="matcher.intent")
+        self.assertEqual(value, {"intent": "plumbing"})
+        self.assertEqual(completions.calls[0]["stream_options"], {"include_usage": True})
+        summary = llm_service.metrics.get_summary()["matcher.intent"]
+        self.assertEqual((summary["prompt_tokens"], summary["completion_tokens"]), (40, 25))
+
+    def test_cut_off_stream_raises_and_is_not_cached(self):
+        llm_service, completions = _service('{"intent": "plumbing", "urgency": "high"}', CutOffCompletions)
+        stream = llm_service.generate_text_stream("Intent", caller="matcher.intent")
+        self.assertEqual(next(stream), '{"in')
+        with self.assertRaises(LLMStreamError):
+            list(stream)
+        self.assertIsNone(llm_service.generate_json_response("Intent", required_keys=["intent", "urgency"], caller="matcher.intent"))
+        self.assertEqual((llm_service.get_cache_stats()["writes"], len(completions.calls)), (0, 2))
+
+    def test_llm_response_success(self):
+        self.assertTrue(LLMResponse(original_prompt="p", generated_text="ok").success)
+        self.assertFalse(LLMResponse(original_prompt="p", generated_text="Error: x", metadata={"error": True}).success)
+
+
+if __name__ == "__main__":
+    unittest.main()
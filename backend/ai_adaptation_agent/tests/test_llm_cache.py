@@ -0,0 +1,133 @@
+# Tests for the tiered LLM response cache
+
+import os
+import sys
+import time
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.llm_cache import LRUTTLCache, SQLiteResponseCache, TieredResponseCache, get_shared_response_cache, make_cache_key
+from src.shared.llm_service import LLMService
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions and counts upstream calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def _create_raw(self, **kwargs):
+        self.calls += 1
+        if kwargs.get("stream"):
+            chunks = [
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=reason)])
+                for text, reason in (("streamed ", None), ("answer", None), (None, "stop"))
+            ]
+            return SimpleNamespace(headers={}, parse=lambda: iter(chunks))
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {self.calls}"), finish_reason="stop")],
+            usage=SimpleNamespace(total_tokens=42),
+        )
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+
+class TestLLMCache(unittest.TestCase):
+
+    def test_cache_key_covers_all_inputs(self):
+        base = make_cache_key("gpt-4", "sys", "hello", 0.7, 100)
+        self.assertEqual(base, make_cache_key("gpt-4", "sys", "hello", 0.7, 100))
+        self.assertNotEqual(base, make_cache_key("gpt-3.5-turbo", "sys", "hello", 0.7, 100))
+        self.assertNotEqual(base, make_cache_key("gpt-4", "other", "hello", 0.7, 100))
+        self.assertNotEqual(base, make_cache_key("gpt-4", "sys", "hello", 0.2, 100))
+        self.assertNotEqual(base, make_cache_key("gpt-4", "sys", "hello", 0.7, 200))
+        self.assertNotEqual(base, make_cache_key("gpt-4", "sys", "hello", 0.7, 100, top_p=0.5))
+
+    def test_lru_eviction_and_ttl(self):
+        cache = LRUTTLCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", {"v": 1})
+        cache.set("b", {"v": 2})
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", {"v": 3})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"v": 1})
+        self.assertEqual(cache.evictions, 1)
+
+        cache.set("short", {"v": 4}, ttl_seconds=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("short"))
+        self.assertEqual(cache.expirations, 1)
+
+    def test_disk_tier_survives_restart_and_promotes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "llm_cache.sqlite3")
+            first = TieredResponseCache(disk_tier=SQLiteResponseCache(path))
+            first.set("k", {"generated_text": "persisted"})
+            first.disk_tier.close()
+
+            second = TieredResponseCache(disk_tier=SQLiteResponseCache(path))
+            value, tier = second.get("k")
+            self.assertEqual(value, {"generated_text": "persisted"})
+            self.assertEqual(tier, "disk")
+            _, tier = second.get("k")
+            self.assertEqual(tier, "memory")
+            stats = second.get_stats()
+            self.assertEqual((stats["disk_hits"], stats["memory_hits"], stats["misses"]), (1, 1, 0))
+            second.disk_tier.close()
+
+    def test_disk_tier_prunes_oldest_rows_without_recounting(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "llm_cache.sqlite3")
+            disk = SQLiteResponseCache(path, max_entries=3)
+            for key in ("a", "b", "c", "c", "d", "e"):  # Rewriting "c" does not add a row
+                disk.set(key, {"v": key})
+            self.assertEqual((disk._row_count, disk.evictions), (3, 2))
+            self.assertEqual([key for key in "abcde" if disk.get(key) is not None], ["c", "d", "e"])
+            disk.delete("c")
+            disk.close()
+
+            reopened = SQLiteResponseCache(path, max_entries=3)
+            self.assertEqual(reopened._row_count, 2)
+            reopened.close()
+
+    def test_services_share_one_cache_by_default(self):
+        first, second = LLMService(api_key="test-key"), LLMService(api_key="test-key")
+        self.assertIs(first.cache, get_shared_response_cache())
+        self.assertIs(second.cache, first.cache)
+        self.assertIsNone(LLMService(api_key="test-key", enable_cache=False).cache)
+
+    def test_generate_text_uses_cache_and_bypass(self):
+        llm_service = LLMService(api_key="test-key", cache=TieredResponseCache())
+        fake = FakeCompletions()
+        llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+
+        first = llm_service.generate_text("prompt", max_tokens=10)
+        second = llm_service.generate_text("prompt", max_tokens=10)
+        self.assertEqual(fake.calls, 1)
+        self.assertEqual(first.generated_text, second.generated_text)
+        self.assertTrue(second.metadata["cache_hit"])
+
+        bypassed = llm_service.generate_text("prompt", max_tokens=10, use_cache=False)
+        self.assertEqual(fake.calls, 2)
+        self.assertEqual(bypassed.generated_text, "answer 2")
+
+        stats = llm_service.get_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_completed_stream_is_cached(self):
+        llm_service = LLMService(api_key="test-key", cache=TieredResponseCache())
+        fake = FakeCompletions()
+        llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+
+        self.assertEqual(list(llm_service.generate_text_stream("prompt", max_tokens=10)), ["streamed ", "answer"])
+        self.assertEqual(list(llm_service.generate_text_stream("prompt", max_tokens=10)), ["streamed answer"])
+        self.assertEqual(llm_service.generate_text("prompt", max_tokens=10).generated_text, "streamed answer")
+        self.assertEqual(fake.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
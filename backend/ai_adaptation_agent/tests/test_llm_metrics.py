@@ -0,0 +1,72 @@
+# Tests for per-call LLM instrumentation and Prometheus export
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.llm_cache import TieredResponseCache
+from src.shared.llm_metrics import Histogram, LLMCallRecord, LLMMetrics
+from src.shared.llm_service import LLMService
+
+
+class UsageCompletions:
+    """Returns completions with full usage details."""
+
+    def __init__(self):
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def _create_raw(self, **kwargs):
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=500, total_tokens=1500),
+        )
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+
+class TestLLMMetrics(unittest.TestCase):
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram("test_seconds", "Test.", (0.1, 1.0), ("caller",))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value, "a")
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{caller="a",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{caller="a",le="1"} 3', lines)
+        self.assertIn('test_seconds_bucket{caller="a",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_count{caller="a"} 4', lines)
+
+    def test_generate_text_records_tagged_call(self):
+        metrics = LLMMetrics(pricing={"gpt-3.5-turbo": (0.001, 0.002)})
+        llm_service = LLMService(api_key="test-key", cache=TieredResponseCache(), metrics=metrics)
+        llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=UsageCompletions()))
+
+        response = llm_service.generate_text("prompt", max_tokens=10, caller="blueprint.personas")
+        llm_service.generate_text("prompt", max_tokens=10, caller="blueprint.personas")  # cache hit
+        self.assertEqual(response.metadata["prompt_tokens"], 1000)
+        self.assertEqual(response.metadata["caller"], "blueprint.personas")
+        self.assertIn("latency_ms", response.metadata)
+
+        summary = llm_service.get_metrics_summary()["blueprint.personas"]
+        self.assertEqual((summary["calls"], summary["upstream_calls"]), (2, 1))
+        self.assertAlmostEqual(summary["cost_usd"], 0.002)
+
+        exported = metrics.render_prometheus()
+        self.assertIn('llm_calls_total{caller="blueprint.personas",model="gpt-3.5-turbo",outcome="success",finish_reason="stop"} 1', exported)
+        self.assertIn('llm_calls_total{caller="blueprint.personas",model="gpt-3.5-turbo",outcome="cache_hit",finish_reason=""} 1', exported)
+        self.assertIn('llm_prompt_tokens_bucket{caller="blueprint.personas",model="gpt-3.5-turbo",le="1024"} 1', exported)
+        self.assertIn("# TYPE llm_call_duration_seconds histogram", exported)
+
+    def test_dated_model_snapshot_uses_base_model_price(self):
+        metrics = LLMMetrics(pricing={"gpt-4o": (1.0, 1.0), "gpt-4o-mini": (0.1, 0.1)})
+        self.assertAlmostEqual(metrics.estimate_cost("gpt-4o-mini-2024-07-18", 1000, 0), 0.1)
+        self.assertAlmostEqual(metrics.estimate_cost("unknown-model", 1000, 1000), 0.0)
+        metrics.record(LLMCallRecord(caller="", model="unknown-model", outcome="error"))
+        self.assertIn("untagged", metrics.get_summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# Tests for task-aware model routing (per-caller model, token cap, timeout and fallback)
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.llm_cache import TieredResponseCache
+from src.shared.llm_metrics import LLMMetrics
+from src.shared.llm_service import LLMService, LLMStreamError
+from src.shared.model_router import ModelRouter
+
+ROUTES = {
+    "default": {"timeout_seconds": 60},
+    "matcher": {"model": "small-model", "timeout_seconds": 5, "fallback_model": "big-model"},
+    "matcher.intent": {"model": "small-model", "max_tokens": 50, "timeout_seconds": 2, "fallback_model": "big-model"},
+}
+
+
+class FailingModelCompletions:
+    """Fails every call for one model and answers the rest, streaming or not."""
+
+    def __init__(self, failing_model):
+        self.failing_model = failing_model
+        self.calls = []
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def _create_raw(self, **kwargs):
+        self.calls.append(kwargs)
+        if kwargs["model"] == self.failing_model:
+            raise ValueError("model unavailable")
+        if kwargs.get("stream"):
+            chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=f"from {kwargs['model']}"), finish_reason="stop")])]
+            return SimpleNamespace(headers={}, parse=lambda: iter(chunks))
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"from {kwargs['model']}"), finish_reason="stop")],
+            usage=None,
+        )
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+
+def _service(failing_model):
+    llm_service = LLMService(api_key="test-key", cache=TieredResponseCache(), metrics=LLMMetrics(pricing={}), router=ModelRouter(ROUTES))
+    completions = FailingModelCompletions(failing_model)
+    llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return llm_service, completions
+
+
+class TestModelRouter(unittest.TestCase):
+
+    def test_resolve_prefers_exact_then_prefix_then_default(self):
+        router = ModelRouter(ROUTES)
+        self.assertEqual(router.resolve("matcher.intent").max_tokens, 50)
+        self.assertEqual(router.resolve("matcher.semantic").name, "matcher")
+        self.assertEqual(router.resolve("blueprint.summary").name, "default")
+        self.assertIsNone(router.resolve(None).model)
+        self.assertEqual(router.resolve("matcher.intent").cap_tokens(150), 50)
+
+    def test_default_routes_keep_the_service_model(self):
+        router = ModelRouter()
+        for caller in ("matcher.intent", "matcher.semantic", "sentiment.batch", "blueprint.strategy"):
+            route = router.resolve(caller)
+            self.assertEqual((route.model, route.fallback_model), (None, None))
+        self.assertEqual(router.resolve("matcher.intent").max_tokens, 150)
+
+    def test_routes_are_configurable_from_the_environment(self):
+        with mock.patch.dict(os.environ, {"LLM_ROUTES_JSON": '{"blueprint.strategy": {"model": "gpt-4o", "timeout_seconds": 90}}'}):
+            route = ModelRouter().resolve("blueprint.strategy")
+        self.assertEqual((route.model, route.timeout_seconds), ("gpt-4o", 90.0))
+
+    def test_generate_text_uses_route_and_falls_back(self):
+        llm_service, completions = _service(failing_model="small-model")
+        response = llm_service.generate_text("Extract intent", max_tokens=150, caller="matcher.intent")
+
+        self.assertEqual(response.generated_text, "from big-model")
+        self.assertEqual(response.metadata["fallback_from"], "small-model")
+        self.assertEqual([call["model"] for call in completions.calls], ["small-model", "big-model"])
+        self.assertEqual((completions.calls[0]["max_tokens"], completions.calls[0]["timeout"]), (50, 2.0))
+
+        stats = llm_service.get_routing_stats()["matcher.intent"]
+        self.assertEqual((stats["calls"], stats["fallbacks"], stats["errors"]), (1, 1, 0))
+        self.assertEqual(stats["models_used"], {"big-model": 1})
+        self.assertIsNotNone(stats["p95_ms"])
+
+    def test_call_timeout_caps_route_timeout_and_skips_spent_fallback(self):
+        llm_service, completions = _service(failing_model="missing-model")
+        llm_service.generate_text("Extract intent", caller="matcher.intent", timeout=0.5)
+        self.assertLessEqual(completions.calls[0]["timeout"], 0.5)
+
+        llm_service, completions = _service(failing_model="small-model")
+        response = llm_service.generate_text("Extract intent", caller="matcher.intent", timeout=0.0)
+        self.assertFalse(response.success)
+        self.assertEqual([call["model"] for call in completions.calls], ["small-model"])
+        with self.assertRaises(LLMStreamError):
+            "".join(llm_service.generate_text_stream("Score it", caller="matcher.semantic", timeout=0.0))
+        self.assertEqual(len(completions.calls), 2)  # No streamed fallback either
+
+    def test_stream_falls_back_before_first_chunk(self):
+        llm_service, completions = _service(failing_model="small-model")
+        text = "".join(llm_service.generate_text_stream("Score it", caller="matcher.semantic"))
+        self.assertEqual(text, "from big-model")
+        self.assertEqual(llm_service.get_routing_stats()["matcher"]["fallbacks"], 1)
+
+        untagged = llm_service.generate_text("Write a tagline")
+        self.assertEqual(untagged.generated_text, "from gpt-3.5-turbo")  # default route keeps the service model
+
+
+if __name__ == "__main__":
+    unittest.main()
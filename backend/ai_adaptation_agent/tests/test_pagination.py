@@ -0,0 +1,133 @@
+# Tests for limit/cursor paging of match results and the top-k selection behind it
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import CustomerQuery
+from src.customer_matcher.batch_scorer import top_k_indices
+from src.customer_matcher.result_cache import MatchResultCache
+from src.customer_matcher.pagination import InvalidCursor, decode_cursor, encode_cursor, query_fingerprint
+from tests.test_customer_matcher_scoring import FakeLLMService, InMemoryMatcher, make_profile
+
+# Identical profiles apart from the id, so every score ties and order falls to business_id
+PLUMBERS = [make_profile(f"biz_{number:03d}", f"Plumber {number}", "Home Services", "Emergency plumbing and leak repair.",
+                         "TestCity", ["plumbing", "leak repair"]) for number in (7, 3, 12, 1, 9)]
+PLUMBING_QUERY = CustomerQuery(keywords=["plumbing"], location="TestCity")
+
+
+class CountingServicesMatcher(InMemoryMatcher):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.service_extractions = 0
+
+    def _extract_relevant_services(self, business_profile, processed_query):
+        self.service_extractions += 1
+        return super()._extract_relevant_services(business_profile, processed_query)
+
+
+class ShiftingRerankLLM(FakeLLMService):
+    """Answers query understanding, and gives each rerank call a different opinion of the same candidates."""
+
+    def __init__(self):
+        super().__init__()
+        self.rerank_calls = 0
+
+    def generate_json_response(self, prompt, **kwargs):
+        self.json_calls.append(prompt)
+        if not prompt.startswith("Assess the semantic similarity"):
+            return {"keywords": ["plumbing"], "location": "TestCity"}
+        self.rerank_calls += 1
+        scores = [0.9, 0.1] if self.rerank_calls % 2 else [0.1, 0.9]
+        return {"results": [{"index": i, "semantic_score": score, "semantic_justification": "ok"} for i, score in enumerate(scores)]}
+
+
+def make_matcher(**kwargs):
+    return CountingServicesMatcher(FakeLLMService(api_key_available=False), PLUMBERS, semantic_mode="vector",
+                                   result_cache=MatchResultCache(max_entries=0), **kwargs)
+
+
+class TestCursor(unittest.TestCase):
+
+    def test_round_trip_and_rejection(self):
+        fingerprint = query_fingerprint((("plumbing",), "testcity", None, "unknown"))
+        cursor = encode_cursor(0.1 + 0.2, "biz_003", fingerprint)
+        self.assertEqual(decode_cursor(cursor, fingerprint), (0.1 + 0.2, "biz_003"))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(cursor, query_fingerprint((("garden",), "", None, "unknown")))
+        for garbage in ("not a cursor", "", encode_cursor(0.5, "biz_003", fingerprint)[:-3]):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(garbage, fingerprint)
+
+
+class TestTopK(unittest.TestCase):
+
+    def test_ties_by_key_and_keyset_position(self):
+        scores = np.array([0.5, 0.9, 0.5, 0.5, 0.05])
+        keys = ["c", "z", "a", "b", "d"]
+        self.assertEqual(top_k_indices(scores, k=3, tie_keys=keys), [1, 2, 3])
+        self.assertEqual(top_k_indices(scores, k=3, tie_keys=keys, after=(0.5, "a")), [3, 0])
+        self.assertEqual(top_k_indices(scores, tie_keys=keys, after=(0.9, "z")), [2, 3, 0])
+
+
+class TestMatchPaging(unittest.TestCase):
+
+    def test_pages_concatenate_to_the_full_ranking(self):
+        matcher = make_matcher()
+        full = [m.business_id for m in matcher.find_matched_businesses(PLUMBING_QUERY)]
+        self.assertEqual(full, ["biz_001", "biz_003", "biz_007", "biz_009", "biz_012"])
+
+        paged, cursor, pages = [], None, 0
+        while True:
+            page = matcher.find_matched_businesses_page(PLUMBING_QUERY, limit=2, cursor=cursor)
+            paged.extend(m.business_id for m in page.matches)
+            pages += 1
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual((paged, pages), (full, 3))
+
+    def test_only_the_page_gets_services_and_reasons(self):
+        for batch_scoring in (True, False):
+            matcher = make_matcher(batch_scoring=batch_scoring)
+            page = matcher.find_matched_businesses_page(PLUMBING_QUERY, limit=2)
+            self.assertEqual(matcher.service_extractions, 2)
+            self.assertTrue(all(m.match_reason for m in page.matches))
+            self.assertIsNotNone(page.next_cursor)
+
+    def test_cursor_of_another_query_and_bad_limit_are_rejected(self):
+        matcher = make_matcher()
+        cursor = matcher.find_matched_businesses_page(PLUMBING_QUERY, limit=1).next_cursor
+        with self.assertRaises(InvalidCursor):
+            matcher.find_matched_businesses_page(CustomerQuery(keywords=["leak repair"]), limit=1, cursor=cursor)
+        with self.assertRaises(ValueError):
+            matcher.find_matched_businesses_page(PLUMBING_QUERY, limit=0)
+
+    def test_rerank_runs_once_per_query_not_per_page(self):
+        llm = ShiftingRerankLLM()
+        matcher = InMemoryMatcher(llm, PLUMBERS, semantic_mode="vector", llm_rerank_top_n=2)
+        query = CustomerQuery(query_text="emergency plumbing", keywords=["plumbing"], location="TestCity")
+        first = matcher.find_matched_businesses_page(query, limit=1)
+        second = matcher.find_matched_businesses_page(query, limit=1, cursor=first.next_cursor)
+        rest = matcher.find_matched_businesses_page(query, cursor=second.next_cursor)
+        paged = [m.business_id for page in (first, second, rest) for m in page.matches]
+        self.assertEqual(llm.rerank_calls, 1)
+        self.assertEqual(sorted(paged), sorted(p.raw_responses["business_id"] for p in PLUMBERS))
+        # Both re-ranked businesses keep their LLM reasons, whichever page they land on
+        self.assertEqual(sum("ok" in m.match_reason for page in (first, second, rest) for m in page.matches), 2)
+
+    def test_pages_are_cached_per_position(self):
+        matcher = InMemoryMatcher(FakeLLMService(api_key_available=False), PLUMBERS, semantic_mode="vector")
+        first = matcher.find_matched_businesses_page(PLUMBING_QUERY, limit=2)
+        second = matcher.find_matched_businesses_page(PLUMBING_QUERY, limit=2, cursor=first.next_cursor)
+        self.assertEqual(matcher.find_matched_businesses_page(PLUMBING_QUERY, limit=2, cursor=first.next_cursor), second)
+        self.assertEqual(len(matcher.result_cache), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
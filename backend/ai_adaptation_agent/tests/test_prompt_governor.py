@@ -0,0 +1,85 @@
+# Tests for the prompt size governor
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import BusinessIntakeData
+from src.shared import prompt_governor
+from src.shared.prompt_governor import PromptGovernor, TRUNCATION_MARKER, estimate_tokens, truncate_to_tokens
+from src.blueprint_generator.blueprint_service import BlueprintService
+
+NO_DB_CONFIG = {"host": "", "port": "5432", "user": "", "password": "", "dbname": ""}
+LONG_TEXT = "We sell handmade furniture built from reclaimed oak. " * 200
+
+
+class CharEncoding:
+    """One token per character, like digit-, code- or CJK-heavy text."""
+
+    def encode(self, text, disallowed_special=()):
+        return [ord(char) for char in text]
+
+    def decode(self, token_ids):
+        return "".join(chr(token_id) for token_id in token_ids)
+
+
+class TestPromptGovernor(unittest.TestCase):
+
+    def test_truncation_keeps_whole_leading_sentences(self):
+        trimmed = truncate_to_tokens(LONG_TEXT, 30)
+        self.assertTrue(trimmed.endswith("oak." + TRUNCATION_MARKER))
+        self.assertLessEqual(estimate_tokens(trimmed), 32)
+        self.assertEqual(truncate_to_tokens("short text", 30), "short text")
+
+    def test_lowest_priority_fields_are_trimmed_first(self):
+        governor = PromptGovernor(field_budget_tokens=300, max_field_tokens=1000, min_field_tokens=20)
+        fitted = governor.fit_fields({
+            "products": (LONG_TEXT[:800], 3),     # ~200 tokens, high priority
+            "competitors": (LONG_TEXT[:800], 1),  # ~200 tokens, low priority
+            "name": ("Oak & Co", 2),
+        })
+        self.assertEqual(fitted["products"], LONG_TEXT[:800])
+        self.assertEqual(fitted["name"], "Oak & Co")
+        self.assertTrue(fitted["competitors"].endswith(TRUNCATION_MARKER))
+        stats = governor.get_stats()
+        self.assertEqual((stats["prompts_truncated"], stats["fields_truncated"]), (1, 1))
+        self.assertGreater(stats["tokens_saved"], 0)
+
+    def test_enforce_budget_keeps_head_and_tail(self):
+        governor = PromptGovernor(max_prompt_tokens=100)
+        prompt = "Context start. " + LONG_TEXT + "Return the response as JSON."
+        governed = governor.enforce_budget(prompt)
+        self.assertTrue(governed.startswith("Context start."))
+        self.assertTrue(governed.endswith("Return the response as JSON."))
+        self.assertLessEqual(estimate_tokens(governed), 100)
+
+    def test_trimming_uses_the_encoding_not_four_chars_per_token(self):
+        prompt = "HEAD" + "7" * 96 + "TAIL"
+        with mock.patch.object(prompt_governor, "_get_encoding", return_value=CharEncoding()):
+            governed = PromptGovernor(max_prompt_tokens=100).enforce_budget(prompt)
+            trimmed = truncate_to_tokens("1234 5678. " * 20, 50)
+        self.assertEqual(len(governed), 100)
+        self.assertEqual((governed.count("HEAD"), governed.count("TAIL")), (1, 1))
+        self.assertTrue(governed.startswith("HEAD") and governed.endswith("TAIL"))
+        self.assertLessEqual(len(trimmed), 50)
+        self.assertTrue(trimmed.endswith("5678." + TRUNCATION_MARKER))
+
+    def test_blueprint_prompt_is_bounded_for_verbose_intake(self):
+        governor = PromptGovernor(field_budget_tokens=600, max_field_tokens=300)
+        service = BlueprintService(llm_service=None, db_config=NO_DB_CONFIG, prompt_governor=governor)
+        intake = BusinessIntakeData(
+            business_name="Oak & Co", industry="Furniture", business_stage="Growth", goals=["Sell online"],
+            target_audience_description=LONG_TEXT, products_services_description=LONG_TEXT,
+            raw_responses={"current_marketing_efforts": LONG_TEXT, "competitors": LONG_TEXT},
+        )
+        prompt = service._business_profile_analysis_prompt(intake)
+        self.assertLess(estimate_tokens(prompt), 600 + 300)
+        self.assertIn("Provide the analysis as a coherent text block", prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
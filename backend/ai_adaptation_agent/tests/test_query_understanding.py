@@ -0,0 +1,136 @@
+# Tests for the memoized query-understanding store (LFU memory tier + Postgres tier)
+
+import os
+import sys
+import unittest
+
+import psycopg2.errors
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import CustomerQuery
+from src.customer_matcher.query_understanding import LFUCache, QueryUnderstandingStore, canonicalize_query_text
+from tests.test_customer_matcher_scoring import SAMPLE_PROFILES, FakeLLMService, InMemoryMatcher
+
+UNDERSTANDING = {"intent": "find_service", "service_keywords": ["plumber", "burst pipe"],
+                 "location_extracted": "TestCity", "other_details": "Urgent."}
+
+
+class FakeUnderstandingCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        self.db.statements.append(sql.split()[0])
+        if self.db.missing:
+            raise psycopg2.errors.UndefinedTable('relation "query_understanding" does not exist')
+        if sql.startswith("INSERT"):
+            self.db.rows[params[0]] = {"result": params[1].adapted, "hit_count": 0}
+        elif sql.startswith("UPDATE"):
+            row = self.db.rows.get(params[0])
+            if row is not None:
+                row["hit_count"] += 1
+            self.rows = [{"result": row["result"]}] if row is not None else []
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeUnderstandingDB:
+    """Just enough of a psycopg2 pool/connection to serve the query_understanding table."""
+
+    def __init__(self):
+        self.rows = {}
+        self.statements = []
+        self.missing = False
+
+    def getconn(self):
+        return self
+
+    def putconn(self, conn):
+        pass
+
+    def cursor(self, cursor_factory=None):
+        return FakeUnderstandingCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class TestLFUCache(unittest.TestCase):
+
+    def test_evicts_least_frequent_then_least_recent(self):
+        cache = LFUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)  # b has the lowest frequency
+        self.assertNotIn("b", cache)
+        cache.put("d", 4)  # c and d tie at frequency 1; c is older
+        self.assertEqual((sorted(cache._values), cache.evictions), (["a", "d"], 2))
+        self.assertEqual(cache.frequency("a"), 2)
+        LFUCache(0).put("a", 1)
+
+
+class TestQueryUnderstandingStore(unittest.TestCase):
+
+    def test_canonicalization_folds_case_whitespace_and_punctuation(self):
+        self.assertEqual(canonicalize_query_text("  Emergency PLUMBER,\tin  TestCity?! "), "emergency plumber in testcity")
+        self.assertEqual(QueryUnderstandingStore.key_for("Plumber!"), QueryUnderstandingStore.key_for("plumber"))
+
+    def test_database_tier_is_shared_between_instances(self):
+        db = FakeUnderstandingDB()
+        QueryUnderstandingStore(db).put("Emergency plumber in TestCity", UNDERSTANDING)
+        other = QueryUnderstandingStore(db)
+        self.assertEqual(other.get("emergency plumber in testcity!"), UNDERSTANDING)
+        self.assertEqual(other.get("emergency plumber in testcity"), UNDERSTANDING)
+        self.assertIsNone(other.get("garden design"))
+        stats = other.get_stats()
+        self.assertEqual((stats["db_hits"], stats["memory_hits"], stats["misses"]), (1, 1, 1))
+        self.assertEqual(db.statements.count("UPDATE"), 2)  # the memory hit did not go to the database
+
+    def test_missing_table_falls_back_to_memory(self):
+        db = FakeUnderstandingDB()
+        db.missing = True
+        store = QueryUnderstandingStore(db)
+        store.put("plumber", UNDERSTANDING)
+        self.assertFalse(store.db_enabled)
+        self.assertEqual(store.get("plumber"), UNDERSTANDING)
+        self.assertEqual(len(db.statements), 1)
+
+
+class TestMatcherQueryUnderstanding(unittest.TestCase):
+
+    def test_repeat_text_skips_llm_round_trip(self):
+        llm = FakeLLMService(json_responses=[UNDERSTANDING])
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="vector", llm_rerank_top_n=0)
+        first = matcher._preprocess_query(CustomerQuery(query_text="Emergency plumber, burst pipe!"))
+        second = matcher._preprocess_query(CustomerQuery(query_text="emergency plumber burst pipe"))
+        self.assertEqual(len(llm.json_calls), 1)
+        self.assertEqual((second["intent"], second["location"]), ("find_service", "testcity"))
+        self.assertEqual(sorted(first["keywords"]), sorted(second["keywords"]))
+
+        llm.api_key_available = False  # stored understanding is still used while the LLM is unavailable
+        self.assertEqual(matcher._preprocess_query(CustomerQuery(query_text="EMERGENCY plumber burst pipe"))["intent"], "find_service")
+
+    def test_failed_understanding_is_not_stored(self):
+        llm = FakeLLMService(json_responses=[None, UNDERSTANDING])
+        matcher = InMemoryMatcher(llm, SAMPLE_PROFILES, semantic_mode="vector", llm_rerank_top_n=0)
+        matcher._preprocess_query(CustomerQuery(query_text="emergency plumber"))
+        self.assertEqual(matcher._preprocess_query(CustomerQuery(query_text="emergency plumber"))["intent"], "find_service")
+        self.assertEqual(len(llm.json_calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
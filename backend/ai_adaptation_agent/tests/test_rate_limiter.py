@@ -0,0 +1,107 @@
+# Tests for the adaptive rate limiter and LLMService retry behaviour
+
+import os
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from openai import RateLimitError, BadRequestError
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared import llm_service as llm_service_module
+from src.shared.llm_service import LLMService
+from src.shared.rate_limiter import AdaptiveRateLimiter, RateLimitTimeout, backoff_delay, parse_reset_duration
+
+
+def make_status_error(error_class, status_code, headers=None):
+    response = SimpleNamespace(status_code=status_code, headers=headers or {}, request=None)
+    return error_class("error", response=response, body=None)
+
+
+class ScriptedCompletions:
+    """Raises the scripted exceptions in order, then succeeds."""
+
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def _create_raw(self, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"), finish_reason="stop")],
+            usage=SimpleNamespace(total_tokens=10),
+        )
+        return SimpleNamespace(headers={"x-ratelimit-remaining-requests": "99"}, parse=lambda: completion)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_parse_reset_duration(self):
+        self.assertEqual(parse_reset_duration("1s"), 1.0)
+        self.assertEqual(parse_reset_duration("6m0s"), 360.0)
+        self.assertAlmostEqual(parse_reset_duration("250ms"), 0.25)
+        self.assertIsNone(parse_reset_duration("soon"))
+
+    def test_backoff_honours_retry_after_and_cap(self):
+        for attempt in range(6):
+            self.assertLessEqual(backoff_delay(attempt, base=0.5, cap=4.0), 4.0)
+        self.assertGreaterEqual(backoff_delay(0, retry_after=2.0), 2.0)
+
+    def test_callers_are_throttled_not_rejected(self):
+        limiter = AdaptiveRateLimiter(requests_per_minute=600, tokens_per_minute=10**6)  # 10 requests/s
+        limiter.requests.available = 1
+        start = time.monotonic()
+        limiter.acquire()
+        limiter.acquire()  # must wait ~0.1s for a refill
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+        state = limiter.get_state()
+        self.assertEqual(state["total_acquired"], 2)
+        self.assertEqual(state["total_throttled"], 1)
+
+    def test_acquire_timeout(self):
+        limiter = AdaptiveRateLimiter(requests_per_minute=1, tokens_per_minute=10**6)
+        limiter.acquire()
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire(timeout=0.01)
+
+    def test_headers_shrink_available_capacity(self):
+        limiter = AdaptiveRateLimiter(requests_per_minute=100, tokens_per_minute=1000)
+        limiter.update_from_headers({"x-ratelimit-remaining-tokens": "10", "x-ratelimit-reset-tokens": "2s"})
+        self.assertLessEqual(limiter.get_state()["available_tokens"], 10)
+
+
+class TestLLMServiceRetries(unittest.TestCase):
+
+    def make_service(self, completions):
+        service = LLMService(api_key="test-key", enable_cache=False, max_retries=3,
+                             rate_limiter=AdaptiveRateLimiter(requests_per_minute=10**6, tokens_per_minute=10**9))
+        service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        return service
+
+    def test_retries_rate_limit_with_retry_after(self):
+        completions = ScriptedCompletions([make_status_error(RateLimitError, 429, {"retry-after-ms": "5"})] * 2)
+        service = self.make_service(completions)
+        with mock.patch.object(llm_service_module.time, "sleep") as fake_sleep:
+            response = service.generate_text("hello")
+        self.assertEqual(response.generated_text, "ok")
+        self.assertEqual(response.metadata["attempts"], 3)
+        self.assertEqual(fake_sleep.call_count, 2)
+        self.assertEqual(service.get_rate_limiter_state()["rate_limited_responses"], 2)
+
+    def test_non_retryable_error_returns_immediately(self):
+        completions = ScriptedCompletions([make_status_error(BadRequestError, 400)])
+        service = self.make_service(completions)
+        response = service.generate_text("hello")
+        self.assertTrue(response.metadata["error"])
+        self.assertEqual(completions.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
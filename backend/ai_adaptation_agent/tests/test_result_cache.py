@@ -0,0 +1,148 @@
+# Tests for the normalized-query result cache and its invalidation from business_profiles changes
+
+import os
+import sys
+import time
+import unittest
+from datetime import timedelta
+
+import psycopg2.pool
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import CustomerQuery, MatchedBusiness, MatchedBusinessPage
+from src.customer_matcher.customer_matcher_service import CustomerMatcherService
+from src.customer_matcher.result_cache import MatchResultCache, result_cache_key
+from tests.test_customer_matcher_scoring import SAMPLE_PROFILES, FakeLLMService, InMemoryMatcher
+from tests.test_candidate_index import T0, FakeTable, make_row
+
+
+def match(business_id, score=0.5):
+    return MatchedBusiness(business_id=business_id, business_name=business_id, relevant_services=[], relevance_score=score)
+
+
+def page(*business_ids):
+    return MatchedBusinessPage(matches=[match(business_id) for business_id in business_ids])
+
+
+def first_page_key(matcher, query):
+    return result_cache_key(matcher._preprocess_query(query)), None, None
+
+
+class CountingMatcher(InMemoryMatcher):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retrievals = 0
+
+    def _retrieve_candidate_businesses(self, processed_query, deadline=None):
+        self.retrievals += 1
+        return super()._retrieve_candidate_businesses(processed_query, deadline)
+
+
+class TestMatchResultCache(unittest.TestCase):
+
+    def test_key_ignores_keyword_order_and_duplicates(self):
+        a = {"keywords": ["plumbing", "leak", "plumbing"], "location": "testcity", "intent": "find_service", "original_text": "a"}
+        b = {"keywords": ["leak", "plumbing"], "location": "testcity", "intent": "find_service", "original_text": "b"}
+        self.assertEqual(result_cache_key(a), result_cache_key(b))
+        self.assertNotEqual(result_cache_key(a), result_cache_key({**b, "location": "springfield"}))
+        self.assertNotEqual(result_cache_key(a), result_cache_key({**b, "intent": "request_quote"}))
+
+    def test_invalidation_drops_only_entries_containing_the_business(self):
+        cache = MatchResultCache(max_entries=10, ttl_seconds=60)
+        cache.put("plumbing", page("biz_001", "biz_003"))
+        cache.put("garden", page("biz_002"))
+        self.assertEqual(cache.invalidate_business("biz_003"), 1)
+        self.assertIsNone(cache.get("plumbing"))
+        self.assertEqual([m.business_id for m in cache.get("garden").matches], ["biz_002"])
+        self.assertEqual(cache.invalidate_business("biz_003"), 0)
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["invalidations"], stats["invalidated_businesses"]), (1, 1, 1, 1))
+        self.assertEqual(cache.business_ids(), {"biz_002"})
+
+    def test_ttl_lru_copies_and_generation_guard(self):
+        cache = MatchResultCache(max_entries=1, ttl_seconds=0.05)
+        cache.put("a", page("biz_001"))
+        cache.get("a").matches[0].relevance_score = 0.99
+        self.assertEqual(cache.get("a").matches[0].relevance_score, 0.5)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get_stats()["expirations"], 1)
+
+        cache = MatchResultCache(max_entries=1, ttl_seconds=60)
+        generation = cache.generation
+        cache.invalidate_business("biz_009")  # a profile changed while the result was being computed
+        self.assertFalse(cache.put("a", page("biz_001"), generation))
+        cache.put("a", page("biz_001"))
+        cache.put("b", page("biz_002"))
+        self.assertEqual((len(cache), cache.get_stats()["evictions"]), (1, 1))
+        self.assertFalse(MatchResultCache(max_entries=0).put("a", page()))
+
+
+class ExhaustedPool:
+    def getconn(self):
+        raise psycopg2.pool.PoolError("connection pool exhausted")
+
+    def putconn(self, conn):
+        pass
+
+
+class TestMatcherResultCaching(unittest.TestCase):
+
+    def test_failed_retrieval_is_degraded_and_not_cached(self):
+        matcher = CustomerMatcherService(FakeLLMService(api_key_available=False), semantic_mode="llm",
+                                         connection_pool=ExhaustedPool(), retrieval_mode="sql")
+        page = matcher.find_matched_businesses_page(CustomerQuery(keywords=["insurance"]))
+        self.assertEqual((page.matches, page.degraded, page.degraded_stages), ([], True, ["retrieval"]))
+        self.assertEqual(len(matcher.result_cache), 0)
+
+    def test_repeated_query_skips_retrieval_and_scoring(self):
+        matcher = CountingMatcher(FakeLLMService(api_key_available=False), SAMPLE_PROFILES, semantic_mode="vector")
+        first = matcher.find_matched_businesses(CustomerQuery(keywords=["plumbing", "leak repair"], location="TestCity"))
+        second = matcher.find_matched_businesses(CustomerQuery(keywords=["leak repair", "plumbing"], location="testcity "))
+        self.assertEqual(matcher.retrievals, 1)
+        self.assertEqual([m.model_dump() for m in first], [m.model_dump() for m in second])
+        self.assertEqual(matcher.get_result_cache_stats()["hit_rate"], 0.5)
+
+    def test_index_refresh_invalidates_entries_of_updated_rows_once(self):
+        table = FakeTable([make_row(p.raw_responses["business_id"], p.business_name, p.industry, p.products_services_description,
+                                    p.raw_responses["location"], p.raw_responses["service_tags"], T0) for p in SAMPLE_PROFILES])
+        matcher = CustomerMatcherService(FakeLLMService(api_key_available=False), semantic_mode="llm",
+                                         connection_pool=table, retrieval_mode="index")
+        matcher.index_refresh_seconds = 3600
+        plumbing, garden = CustomerQuery(keywords=["plumbing"]), CustomerQuery(keywords=["lawn care"])
+        for query in (plumbing, garden):
+            matcher.find_matched_businesses(query)
+        matcher.refresh_candidate_index()  # first refresh reads the overlap window: rows it has not seen yet
+        for query in (plumbing, garden):
+            matcher.find_matched_businesses(query)
+        self.assertEqual(len(matcher.result_cache), 2)
+
+        matcher.refresh_candidate_index()  # same rows again: nothing changed
+        self.assertEqual(len(matcher.result_cache), 2)
+        table.rows["biz_001"] = {**table.rows["biz_001"], "updated_at": T0 + timedelta(minutes=5)}
+        matcher.refresh_candidate_index()
+        self.assertIsNone(matcher.result_cache.get(first_page_key(matcher, plumbing)))
+        self.assertIsNotNone(matcher.result_cache.get(first_page_key(matcher, garden)))
+
+    def test_sql_retrieval_polls_changes_and_sweeps_deletions(self):
+        table = FakeTable([make_row(p.raw_responses["business_id"], p.business_name, p.industry, p.products_services_description,
+                                    p.raw_responses["location"], p.raw_responses["service_tags"], T0) for p in SAMPLE_PROFILES])
+        matcher = CustomerMatcherService(FakeLLMService(api_key_available=False), semantic_mode="llm",
+                                         connection_pool=table, retrieval_mode="sql")
+        self.assertEqual(matcher.refresh_result_cache(), 0)  # sets the watermark
+        self.assertEqual(matcher.refresh_result_cache(), 3)  # rows in the overlap window, first seen
+        query = CustomerQuery(keywords=["insurance"])
+        matcher.find_matched_businesses(query)
+        key = first_page_key(matcher, query)
+        self.assertIsNotNone(matcher.result_cache.get(key))
+
+        self.assertEqual(matcher.refresh_result_cache(), 0)
+        del table.rows["biz_003"]
+        self.assertEqual(matcher.refresh_result_cache(sweep_deletions=True), 1)
+        self.assertIsNone(matcher.result_cache.get(key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# Tests for batch sentiment analysis: indexed multi-text LLM calls and the vectorized lexicon fallback
+
+import os
+import re
+import sys
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.llm_metrics import LLMMetrics
+from src.shared.llm_service import LLMService
+from src.shared.sentiment import LexiconSentimentScorer, parse_batch_entry
+
+
+class IndexedSentimentCompletions:
+    """Answers each batch prompt with a result per bracketed index, except the indices in skip."""
+
+    def __init__(self, skip=()):
+        self.skip = set(skip)
+        self.prompts = []
+        self.models = []
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def _create_raw(self, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        self.prompts.append(prompt)
+        self.models.append(kwargs["model"])
+        results = [
+            {"index": int(index), "positive": 0.1, "neutral": 0.1, "negative": 0.8}
+            for index, _ in re.findall(r"^\[(\d+)\] (.*)$", prompt, flags=re.MULTILINE)
+            if int(index) not in self.skip
+        ]
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"results": results})), finish_reason="stop")],
+            usage=None,
+        )
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+
+def _service(completions):
+    llm_service = LLMService(api_key="test-key", enable_cache=False, metrics=LLMMetrics(pricing={}))
+    llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return llm_service
+
+
+class TestLexiconSentimentScorer(unittest.TestCase):
+
+    def setUp(self):
+        self.scorer = LexiconSentimentScorer()
+
+    def test_labels_polarity_negation_and_intensity(self):
+        results = self.scorer.score([
+            "Excellent service, really friendly staff!",
+            "Terrible experience and rude staff.",
+            "The staff was not helpful.",
+            "The staff wasn't helpful.",
+            "We booked an appointment for Tuesday.",
+            "",
+        ])
+        self.assertEqual([r["label"] for r in results], ["positive", "negative", "negative", "negative", "neutral", "neutral"])
+        self.assertEqual(results[5]["neutral"], 1.0)
+        for result in results:
+            self.assertAlmostEqual(result["positive"] + result["neutral"] + result["negative"], 1.0, places=3)
+        very, plain = self.scorer.score_arrays(["very good", "good"])["compound"]
+        self.assertGreater(very, plain)
+
+    def test_batch_scores_equal_individual_scores(self):
+        texts = ["great", "not bad at all", "no", "so so slow and expensive", "Love it. Never again though."] * 20
+        batch = self.scorer.score_arrays(texts)
+        for index in (0, 1, 2, 3, 4, 99):
+            single = self.scorer.score_arrays([texts[index]])
+            for key in ("positive", "neutral", "negative", "compound"):
+                self.assertAlmostEqual(batch[key][index], single[key][0])
+
+
+class TestAnalyzeSentimentBatch(unittest.TestCase):
+
+    def test_packs_texts_into_indexed_batches_and_fills_gaps_locally(self):
+        completions = IndexedSentimentCompletions(skip={1})
+        llm_service = _service(completions)
+        texts = [f"Review number {i} was great" for i in range(5)]
+        results = llm_service.analyze_sentiment_batch(texts, batch_size=2)
+
+        self.assertEqual(len(completions.prompts), 3)  # 2 + 2 + 1 texts
+        self.assertEqual([r["source"] for r in results], ["llm", "lexicon", "llm", "lexicon", "llm"])
+        self.assertEqual(results[0]["label"], "negative")  # from the LLM reply, not the lexicon
+        self.assertEqual(results[3]["label"], "positive")
+
+    def test_respects_character_budget_and_local_only_mode(self):
+        completions = IndexedSentimentCompletions()
+        llm_service = _service(completions)
+        with mock.patch.dict(os.environ, {"SENTIMENT_BATCH_MAX_CHARS": "50"}):
+            llm_service.analyze_sentiment_batch(["x" * 30, "y" * 30, "z" * 10], batch_size=10)
+        self.assertEqual(len(completions.prompts), 2)
+
+        results = llm_service.analyze_sentiment_batch(["good", "bad"], use_llm=False)
+        self.assertEqual(len(completions.prompts), 2)
+        self.assertEqual([r["label"] for r in results], ["positive", "negative"])
+
+    def test_model_override_reaches_the_llm_call(self):
+        completions = IndexedSentimentCompletions()
+        llm_service = _service(completions)
+        self.assertEqual(llm_service.analyze_sentiment("Awful.", model_override="gpt-4o")["source"], "llm")
+        llm_service.analyze_sentiment("Awful again.")
+        self.assertEqual(completions.models, ["gpt-4o", llm_service.model_name])
+
+    def test_parse_batch_entry_rejects_bad_entries_and_normalises(self):
+        self.assertIsNone(parse_batch_entry({"index": 3, "positive": 1, "neutral": 0, "negative": 0}, 2))
+        self.assertIsNone(parse_batch_entry({"index": 0, "positive": 1.5, "neutral": 0, "negative": 0}, 2))
+        self.assertIsNone(parse_batch_entry({"index": True, "positive": 1, "neutral": 0, "negative": 0}, 2))
+        offset, result = parse_batch_entry({"index": 1, "positive": 0.6, "neutral": 0.6, "negative": 0.0}, 2)
+        self.assertEqual((offset, result["positive"], result["label"]), (1, 0.5, "positive"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+# Tests for single-flight coalescing of identical in-flight LLM calls
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared import async_llm_service
+from src.shared.async_llm_service import AsyncLLMService
+from src.shared.llm_service import LLMService
+from src.shared.single_flight import SingleFlight
+
+
+def make_completion(content):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+        usage=SimpleNamespace(total_tokens=5),
+    )
+
+
+class BlockingCompletions:
+    """Blocks every upstream call until released, counting how many were made."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    def _create_raw(self, **kwargs):
+        self.calls += 1
+        self.release.wait(timeout=5)
+        completion = make_completion(f"answer {self.calls}")
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+
+class FakeAsyncOpenAI:
+    calls = 0
+
+    def __init__(self, api_key=None, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=self._create)))
+
+    async def _create(self, **kwargs):
+        FakeAsyncOpenAI.calls += 1
+        await asyncio.sleep(0.02)
+        completion = make_completion("shared")
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_identical_calls_share_one_upstream_call(self):
+        single_flight = SingleFlight()
+        llm_service = LLMService(api_key="test-key", enable_cache=False, single_flight=single_flight)
+        fake = BlockingCompletions()
+        llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(llm_service.generate_text("same prompt", max_tokens=10)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while single_flight.deduplicated_calls < 4 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        fake.release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(fake.calls, 1)
+        self.assertEqual({r.generated_text for r in results}, {"answer 1"})
+        self.assertEqual(sum(1 for r in results if r.metadata.get("coalesced")), 4)
+        stats = llm_service.get_single_flight_stats()
+        self.assertEqual((stats["leader_calls"], stats["deduplicated_calls"], stats["in_flight"]), (1, 4, 0))
+
+        # Finished calls are not remembered; use_cache=False opts out of coalescing entirely
+        llm_service.generate_text("same prompt", max_tokens=10)
+        llm_service.generate_text("same prompt", max_tokens=10, use_cache=False)
+        self.assertEqual(fake.calls, 3)
+
+    def test_leader_exception_is_shared_with_waiters(self):
+        single_flight = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def failing_call():
+            started.set()
+            time.sleep(0.05)
+            raise ValueError("upstream failed")
+
+        def call():
+            try:
+                single_flight.do("key", failing_call)
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(timeout=5)
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join(timeout=5)
+        follower.join(timeout=5)
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(single_flight.get_stats()["deduplicated_calls"], 1)
+
+    def test_async_identical_calls_are_coalesced(self):
+        FakeAsyncOpenAI.calls = 0
+        with mock.patch.object(async_llm_service, "AsyncOpenAI", FakeAsyncOpenAI):
+            service = AsyncLLMService(api_key="coalesce-key", enable_cache=False, single_flight=SingleFlight())
+
+            async def fan_out():
+                return await asyncio.gather(*[service.generate_text_async("same prompt") for _ in range(10)])
+
+            results = AsyncLLMService.run_coroutine(fan_out(), timeout=10)
+        self.assertEqual(FakeAsyncOpenAI.calls, 1)
+        self.assertEqual(sum(1 for r in results if r.metadata.get("coalesced")), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# Tests for the taxonomy/synonym automaton that maps query phrases to canonical service tags
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+# Add the src directory to the Python path to allow imports from sibling directories
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.shared.data_models import CustomerQuery
+from src.customer_matcher.taxonomy import DEFAULT_TAXONOMY_FILE, Taxonomy, tokenize
+from tests.test_customer_matcher_scoring import SAMPLE_PROFILES, FakeLLMService, InMemoryMatcher
+
+SYNONYMS = {
+    "plumbing": ["plumber", "burst pipe", "pipe"],
+    "drain cleaning": ["blocked drain"],
+    "Emergency": ["24 hour", "urgent"],
+}
+
+
+class TestTaxonomy(unittest.TestCase):
+
+    def test_finds_overlapping_multi_word_phrases_on_whole_words(self):
+        taxonomy = Taxonomy(SYNONYMS)
+        self.assertEqual(taxonomy.find("Urgent: 24-hour plumbers for BURST PIPES, blocked drains"), [
+            (0, 1, "emergency"), (1, 3, "emergency"), (3, 4, "plumbing"),
+            (5, 7, "plumbing"), (6, 7, "plumbing"), (7, 9, "drain cleaning"),
+        ])
+        self.assertEqual(taxonomy.find("pipeline drainage"), [])
+        self.assertEqual(taxonomy.find("burst balloon"), [])
+        self.assertEqual(taxonomy.canonical_tags(["", None, "plumbing"]), {"plumbing"})
+        self.assertEqual(Taxonomy().find("plumber"), [])
+
+    def test_failure_links_resume_inside_a_longer_phrase(self):
+        taxonomy = Taxonomy({"a": ["x y z"], "b": ["y z w"]})
+        self.assertEqual(taxonomy.find("x y z w"), [(0, 3, "a"), (1, 4, "b")])
+        self.assertEqual(taxonomy.find("x y y z w"), [(2, 5, "b")])
+
+    def test_plural_folding(self):
+        self.assertEqual(tokenize("Companies' Glass Pipes bus"), ["company", "glass", "pipe", "bus"])
+
+    def test_from_file_skips_invalid_entries(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"plumbing": ["plumber"], "broken": "not a list"}, f)
+        try:
+            taxonomy = Taxonomy.from_file(f.name)
+        finally:
+            os.unlink(f.name)
+        self.assertEqual(taxonomy.tags, ["plumbing"])
+        bundled = Taxonomy.from_file(DEFAULT_TAXONOMY_FILE)
+        self.assertEqual(bundled.canonical_tags(["need a plumber for a leaking pipe"]), {"plumbing", "leak repair"})
+
+
+class TestMatcherTaxonomy(unittest.TestCase):
+
+    def test_synonyms_reach_service_tags_without_the_llm(self):
+        matcher = InMemoryMatcher(FakeLLMService(api_key_available=False), SAMPLE_PROFILES, semantic_mode="vector",
+                                  taxonomy=Taxonomy(SYNONYMS))
+        processed = matcher._preprocess_query(CustomerQuery(query_text="Urgent plumber needed", location="TestCity"))
+        self.assertEqual(processed["entities"]["taxonomy_tags"], ["emergency", "plumbing"])
+        matches = matcher.find_matched_businesses(CustomerQuery(query_text="Urgent plumber needed", location="TestCity"))
+        self.assertEqual(matches[0].business_id, "biz_001")
+        self.assertIn("keyword(s) in service tags", matches[0].match_reason)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 # /home/ubuntu/ai-marketing-system-new/backend/ai_services_api/src/main.py
 import os
 import sys
-from flask import Flask
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -46,6 +46,9 @@ else:
 # Import routes after path adjustment
 from .routes.blueprint_routes import blueprint_bp
 from .routes.customer_matcher_routes import customer_matcher_bp
+from shared.llm_metrics import get_shared_metrics
+from shared.model_router import get_shared_model_router
+from .service_container import init_app as init_services
 
 app = Flask(__name__)
 
@@ -60,6 +63,9 @@ app.config["DB_HOST"] = os.getenv("DB_HOST", "localhost") # Or your Cloud SQL pr
 app.config["DB_PORT"] = os.getenv("DB_PORT", "5432")
 app.config["DB_NAME"] = os.getenv("DB_NAME", "ai_marketing_db") # Ensure this is the correct DB name
 
+# One LLM client, DB pool and set of services per worker process, closed at exit
+init_services(app)
+
 # Enable CORS for all routes and origins (adjust for production)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
@@ -71,6 +77,16 @@ app.register_blueprint(customer_matcher_bp, url_prefix="/api/matcher")
 def health_check():
     return {"status": "healthy", "service": "AI Services API"}, 200
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    # LLM call latency, queue wait, token and cost histograms for Prometheus scraping
+    return Response(get_shared_metrics().render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/llm/routes", methods=["GET"])
+def llm_routes():
+    # Per-task model routes (LLM_ROUTES_FILE / LLM_ROUTES_JSON) with call counts, fallbacks and latency percentiles
+    return jsonify(get_shared_model_router().get_stats()), 200
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5002)) # Different port from auth_service
     app.run(host="0.0.0.0", port=port, debug=True) # Debug should be False in production
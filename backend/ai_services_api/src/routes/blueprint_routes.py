@@ -1,33 +1,18 @@
 # /home/ubuntu/ai-marketing-system-new/backend/ai_services_api/src/routes/blueprint_routes.py
 import os
-from flask import Blueprint, request, jsonify, current_app
+import json
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 
 # Assuming BlueprintService and BusinessIntakeData are accessible via the path adjustments in main.py
 from blueprint_generator.blueprint_service import BlueprintService
 from shared.data_models import BusinessIntakeData, BusinessBlueprint # For type hinting and validation
-from shared.llm_service import LLMService # BlueprintService depends on LLMService
+from ..service_container import get_services
 
 blueprint_bp = Blueprint("blueprint_bp", __name__)
 
-# Initialize services. Ideally, these would be managed by Flask app context or a DI container
-# For simplicity here, we might instantiate them per request or globally if stateless and thread-safe.
-# Given they might hold db connections or LLM clients, careful instantiation is needed.
-
 def get_blueprint_service():
-    # LLMService needs an API key
-    llm_service = LLMService(api_key=current_app.config.get("OPENAI_API_KEY"))
-    
-    # BlueprintService needs LLMService and DB config
-    db_config = {
-        "user": current_app.config.get("DB_USER"),
-        "password": current_app.config.get("DB_PASSWORD"),
-        "host": current_app.config.get("DB_HOST"),
-        "port": current_app.config.get("DB_PORT"),
-        "dbname": current_app.config.get("DB_NAME"),
-    }
-    # Note: BlueprintService was updated to accept db_config in its __init__
-    blueprint_service = BlueprintService(llm_service=llm_service, db_config=db_config)
-    return blueprint_service
+    # Built once per worker by the app's ServiceContainer (shared LLM client and DB pool)
+    return get_services(current_app).blueprint_service
 
 @blueprint_bp.route("/generate", methods=["POST"])
 def generate_blueprint_route():
@@ -68,6 +53,67 @@ def generate_blueprint_route():
         current_app.logger.error(f"Error generating blueprint: {e}", exc_info=True)
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+def _sse_event(event, payload):
+    """Formats one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+@blueprint_bp.route("/generate/stream", methods=["POST"])
+def generate_blueprint_stream_route():
+    """
+    Streams blueprint generation as Server-Sent Events. Each section is sent as a "section" event
+    as soon as it is ready; with "stream_text": true, free-text sections also emit "delta" events
+    token by token; if such a section's stream fails, an "error" event names it and its "section" event
+    carries the fallback text. The final "complete" event carries the whole blueprint, followed by "saved".
+    """
+    data = request.json
+    if not data:
+        return jsonify({"error": "Missing request data"}), 400
+
+    try:
+        intake_data_dict = data.get("intake_data")
+        if not intake_data_dict:
+            return jsonify({"error": "Missing intake_data in request"}), 400
+        intake_data = BusinessIntakeData(**intake_data_dict)
+        business_id = data.get("business_id")
+        if not business_id:
+            return jsonify({"error": "Missing business_id"}), 400
+        intake_data.raw_responses.setdefault("business_id", business_id)
+    except TypeError as e:
+        return jsonify({"error": f"Invalid intake_data format: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error processing input: {e}"}), 400
+
+    blueprint_service = get_blueprint_service()
+    stream_text = bool(data.get("stream_text", False))
+    logger = current_app.logger
+
+    def generate_events():
+        try:
+            for event, payload in blueprint_service.generate_blueprint_stream(intake_data, stream_text=stream_text):
+                if event != "complete":
+                    yield _sse_event(event, payload)
+                    continue
+                blueprint_data = payload.model_dump() if hasattr(payload, "model_dump") else payload.__dict__
+                yield _sse_event("complete", blueprint_data)
+                try:
+                    saved_id = blueprint_service.save_blueprint(payload)
+                    if saved_id:
+                        yield _sse_event("saved", {"blueprint_id": saved_id})
+                    else:
+                        yield _sse_event("error", {"error": "Blueprint generated but could not be saved"})
+                except Exception as e:
+                    logger.error(f"Error saving streamed blueprint: {e}", exc_info=True)
+                    yield _sse_event("error", {"error": f"Blueprint generated but could not be saved: {str(e)}"})
+        except Exception as e:
+            logger.error(f"Error streaming blueprint: {e}", exc_info=True)
+            yield _sse_event("error", {"error": f"An unexpected error occurred: {str(e)}"})
+
+    return Response(
+        stream_with_context(generate_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @blueprint_bp.route("/<string:blueprint_id>", methods=["GET"])
 def get_blueprint_route(blueprint_id):
     blueprint_service = get_blueprint_service()
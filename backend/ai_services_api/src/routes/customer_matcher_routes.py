@@ -4,26 +4,19 @@ from flask import Blueprint, request, jsonify, current_app
 
 # Assuming CustomerMatcherService and CustomerQuery are accessible via path adjustments in main.py
 from customer_matcher.customer_matcher_service import CustomerMatcherService
+from customer_matcher.pagination import InvalidCursor
 from shared.data_models import CustomerQuery # For type hinting and validation
-from shared.llm_service import LLMService # CustomerMatcherService depends on LLMService
+from ..service_container import get_services
 
 customer_matcher_bp = Blueprint("customer_matcher_bp", __name__)
 
+DEFAULT_PAGE_SIZE = int(os.getenv("MATCHER_DEFAULT_PAGE_SIZE", "20"))
+MAX_PAGE_SIZE = 100
+DEADLINE_HEADER = "X-Request-Deadline-Ms" # Time the caller allows for this request; overrides MATCHER_DEADLINE_SECONDS
+
 def get_customer_matcher_service():
-    # LLMService needs an API key
-    llm_service = LLMService(api_key=current_app.config.get("OPENAI_API_KEY"))
-    
-    # CustomerMatcherService needs LLMService and DB config
-    db_config = {
-        "user": current_app.config.get("DB_USER"),
-        "password": current_app.config.get("DB_PASSWORD"),
-        "host": current_app.config.get("DB_HOST"),
-        "port": current_app.config.get("DB_PORT"),
-        "dbname": current_app.config.get("DB_NAME"),
-    }
-    # Note: CustomerMatcherService was updated to accept db_config in its __init__
-    customer_matcher_service = CustomerMatcherService(llm_service=llm_service, db_config=db_config)
-    return customer_matcher_service
+    # Built once per worker by the app's ServiceContainer (shared LLM client and DB pool)
+    return get_services(current_app).customer_matcher_service
 
 @customer_matcher_bp.route("/match", methods=["POST"])
 def match_customer_route():
@@ -37,16 +30,28 @@ def match_customer_route():
         service_category = data.get("service_category")
         keywords = data.get("keywords", [])
         location = data.get("location")
+        radius_km = data.get("radius_km") # Optional search radius around the location, in km
+        limit = data.get("limit", DEFAULT_PAGE_SIZE) # Page size
+        cursor = data.get("cursor") # next_cursor of the previous page, to continue the same query
         # user_id = data.get("user_id") # Optional, if you want to associate queries with users
 
         if not query_text or not service_category:
             return jsonify({"error": "Missing required fields: query_text, service_category"}), 400
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be an integer between 1 and {MAX_PAGE_SIZE}"}), 400
+        if cursor is not None and not isinstance(cursor, str):
+            return jsonify({"error": "cursor must be a string"}), 400
+        deadline_ms = request.headers.get(DEADLINE_HEADER)
+        deadline_seconds = float(deadline_ms) / 1000 if deadline_ms is not None else None
+        if deadline_seconds is not None and not deadline_seconds > 0:
+            return jsonify({"error": f"{DEADLINE_HEADER} must be a positive number of milliseconds"}), 400
 
         customer_query = CustomerQuery(
             query_text=query_text,
             service_category=service_category,
             keywords=keywords,
-            location=location
+            location=location,
+            radius_km=radius_km
         )
     except TypeError as e:
         return jsonify({"error": f"Invalid customer query format: {e}"}), 400
@@ -55,24 +60,32 @@ def match_customer_route():
 
     matcher_service = get_customer_matcher_service()
     try:
-        matched_businesses = matcher_service.find_matched_businesses(customer_query)
-        
-        # Convert list of MatchedBusinessProfile objects to list of dicts
-        # Assuming MatchedBusinessProfile has a to_dict() or is Pydantic model
-        results = []
-        for mbp in matched_businesses:
-            business_dict = mbp.business_profile.model_dump() if hasattr(mbp.business_profile, "model_dump") else mbp.business_profile.__dict__
-            results.append({
-                "business_profile": business_dict,
-                "relevance_score": mbp.relevance_score,
-                "matching_reasons": mbp.matching_reasons
-            })
-            
-        return jsonify(results), 200
+        deadline = matcher_service.new_deadline(deadline_seconds)
+        page = matcher_service.find_matched_businesses_page(customer_query, limit=limit, cursor=cursor, deadline=deadline)
+        return jsonify({
+            "matches": [matched_business.model_dump() for matched_business in page.matches],
+            "next_cursor": page.next_cursor,
+            "degraded": page.degraded, # Stages were skipped to meet the deadline or failed (e.g. retrieval)
+            "degraded_stages": page.degraded_stages
+        }), 200
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error matching customer query: {e}", exc_info=True)
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+@customer_matcher_bp.route("/stats", methods=["GET"])
+def matcher_stats_route():
+    # Result cache and query understanding hit rates, taxonomy size, invalidations, candidate index size and LLM circuit state
+    matcher_service = get_customer_matcher_service()
+    return jsonify({
+        "result_cache": matcher_service.get_result_cache_stats(),
+        "query_understanding": matcher_service.query_understanding.get_stats(),
+        "taxonomy": matcher_service.taxonomy.get_stats(),
+        "candidate_index": matcher_service.get_candidate_index_stats(),
+        "llm_guard": matcher_service.get_llm_guard_stats(),
+    }), 200
+
 # Potential future endpoint to get business profile details if not fully returned by match
 # @customer_matcher_bp.route("/business/<string:business_id>", methods=["GET"])
 # def get_business_profile_route(business_id):
@@ -0,0 +1,180 @@
+# App-scoped service container: builds the LLM client, DB pool and services once per worker process
+import os
+import atexit
+import logging
+import threading
+
+import psycopg2
+from psycopg2 import pool
+
+from blueprint_generator.blueprint_service import BlueprintService
+from customer_matcher.customer_matcher_service import CustomerMatcherService
+from shared.llm_service import LLMService
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = "ai_services"
+
+
+class BlockingConnectionPool(pool.ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool whose getconn waits up to wait_seconds for a connection to be returned when all
+    maxconn are in use, instead of raising PoolError at once. A request burst then queues briefly rather than
+    failing; PoolError is still raised after the wait. Connections are taken without a key (one slot each).
+    """
+
+    def __init__(self, minconn, maxconn, *args, wait_seconds=5.0, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.wait_seconds = wait_seconds
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            raise pool.PoolError(f"no database connection became free within {self.wait_seconds}s")
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+class ServiceContainer:
+    """
+    Lazily builds and shares, per worker process:
+    - one LLMService (one OpenAI HTTP client with keep-alive connections),
+    - one BlockingConnectionPool (DB_POOL_MIN_CONN / DB_POOL_MAX_CONN; a request waits up to
+      DB_POOL_WAIT_SECONDS for a free connection),
+    - one BlueprintService and one CustomerMatcherService using both.
+    Creation is guarded by a lock so concurrent first requests build each object once. The matcher, whose
+    index loads can take seconds, is built under its own lock so other services stay available meanwhile. If the process
+    was forked after the container was populated (e.g. gunicorn --preload), the inherited objects are
+    discarded and rebuilt, since sockets must not be shared across processes.
+    """
+
+    def __init__(self, config):
+        """
+        Args:
+            config: Mapping with OPENAI_API_KEY and DB_USER / DB_PASSWORD / DB_HOST / DB_PORT / DB_NAME
+                    (typically the Flask app.config).
+        """
+        self.config = config
+        self.min_conn = int(os.getenv("DB_POOL_MIN_CONN", "1"))
+        self.max_conn = int(os.getenv("DB_POOL_MAX_CONN", "10"))
+        self.pool_wait_seconds = float(os.getenv("DB_POOL_WAIT_SECONDS", "5"))
+        self._lock = threading.RLock()
+        self._matcher_build_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._llm_service = None
+        self._connection_pool = None
+        self._pool_attempted = False
+        self._blueprint_service = None
+        self._customer_matcher_service = None
+
+    def _check_fork(self):
+        """Caller holds the lock. Drops objects inherited from a parent process."""
+        if self._pid != os.getpid():
+            logger.info("Process fork detected; rebuilding services for this worker.")
+            self._reset()
+
+    def _db_config(self):
+        return {
+            "user": self.config.get("DB_USER"),
+            "password": self.config.get("DB_PASSWORD"),
+            "host": self.config.get("DB_HOST"),
+            "port": self.config.get("DB_PORT"),
+            "dbname": self.config.get("DB_NAME"),
+        }
+
+    @property
+    def llm_service(self) -> LLMService:
+        with self._lock:
+            self._check_fork()
+            if self._llm_service is None:
+                self._llm_service = LLMService(api_key=self.config.get("OPENAI_API_KEY"))
+            return self._llm_service
+
+    @property
+    def connection_pool(self):
+        """The shared BlockingConnectionPool, or None if the database is not configured or unreachable."""
+        with self._lock:
+            self._check_fork()
+            if not self._pool_attempted:
+                self._pool_attempted = True
+                db_config = self._db_config()
+                if all(db_config[key] for key in ("host", "user", "password", "dbname")):
+                    try:
+                        self._connection_pool = BlockingConnectionPool(
+                            self.min_conn, self.max_conn, wait_seconds=self.pool_wait_seconds, **db_config
+                        )
+                        logger.info(f"Shared database pool created ({self.min_conn}-{self.max_conn} connections).")
+                    except psycopg2.Error as e:
+                        logger.error(f"Error creating shared database pool: {e}")
+                else:
+                    logger.warning("Database configuration is incomplete. Shared connection pool not created.")
+            return self._connection_pool
+
+    @property
+    def blueprint_service(self) -> BlueprintService:
+        with self._lock:
+            self._check_fork()
+            if self._blueprint_service is None:
+                self._blueprint_service = BlueprintService(
+                    llm_service=self.llm_service, db_config=self._db_config(), connection_pool=self.connection_pool
+                )
+            return self._blueprint_service
+
+    @property
+    def customer_matcher_service(self) -> CustomerMatcherService:
+        with self._lock:
+            self._check_fork()
+            if self._customer_matcher_service is not None:
+                return self._customer_matcher_service
+        llm_service, connection_pool = self.llm_service, self.connection_pool
+        # Building loads the candidate/semantic indexes; hold only the matcher's lock meanwhile
+        with self._matcher_build_lock:
+            with self._lock:
+                self._check_fork()
+                if self._customer_matcher_service is not None:
+                    return self._customer_matcher_service
+            service = CustomerMatcherService(
+                llm_service=llm_service, db_config=self._db_config(), connection_pool=connection_pool
+            )
+            with self._lock:
+                self._check_fork()
+                if self._customer_matcher_service is None:
+                    self._customer_matcher_service = service
+                return self._customer_matcher_service
+
+    def shutdown(self):
+        """Closes the pool's connections and the LLM HTTP client. Safe to call more than once."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return  # Objects belong to the parent process
+            if self._connection_pool is not None and not self._connection_pool.closed:
+                self._connection_pool.closeall()
+                logger.info("Shared database pool closed.")
+            if self._llm_service is not None:
+                self._llm_service.close()
+            self._reset()
+
+
+def init_app(app) -> ServiceContainer:
+    """Attaches a ServiceContainer to app.extensions and closes it at interpreter exit."""
+    container = ServiceContainer(app.config)
+    app.extensions[EXTENSION_KEY] = container
+    atexit.register(container.shutdown)
+    return container
+
+
+def get_services(app) -> ServiceContainer:
+    """Returns the app's ServiceContainer (use with flask.current_app inside requests)."""
+    return app.extensions[EXTENSION_KEY]
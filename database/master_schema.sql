@@ -13,6 +13,13 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- array_to_string is only STABLE, so generated columns cannot call it directly.
+-- Safe to declare IMMUTABLE for text[] input, whose output does not depend on any setting.
+CREATE OR REPLACE FUNCTION immutable_array_to_string(text[], text)
+RETURNS text AS $$
+    SELECT array_to_string($1, $2);
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
 -- ----------------------------------------------------------------------------
 -- Users Table (from schema_users.sql)
 -- ----------------------------------------------------------------------------
@@ -71,6 +78,17 @@ CREATE INDEX IF NOT EXISTS idx_business_profiles_location_gin ON business_profil
 CREATE INDEX IF NOT EXISTS idx_business_profiles_service_tags_gin ON business_profiles USING GIN (service_tags);
 CREATE INDEX IF NOT EXISTS idx_business_profiles_goals_gin ON business_profiles USING GIN (goals);
 
+-- Weighted full-text document for candidate retrieval (MATCHER_RETRIEVAL_MODE=fts):
+-- name (A), service tags and industry (B), description (C). Added with ALTER so existing databases pick it up.
+ALTER TABLE business_profiles ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(business_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(immutable_array_to_string(service_tags, ' '), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(industry, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(products_services_description, '')), 'C')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS idx_business_profiles_search_vector ON business_profiles USING GIN (search_vector);
+
 COMMENT ON TABLE business_profiles IS 'Stores detailed profiles of businesses for the AI Marketing System.';
 -- (Add other comments from original schema.sql if desired)
 
@@ -111,6 +129,22 @@ CREATE INDEX IF NOT EXISTS idx_marketing_blueprints_created_at ON marketing_blue
 COMMENT ON TABLE marketing_blueprints IS 'Stores generated marketing blueprints for businesses.';
 -- (Add other comments from original schema_blueprints.sql if desired)
 
+-- ----------------------------------------------------------------------------
+-- Query Understanding Table (memoized LLM intent/keyword/location extraction)
+-- ----------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS query_understanding (
+    query_key TEXT PRIMARY KEY, -- prompt version + canonicalized query text
+    result JSONB NOT NULL,
+    hit_count BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Pruning keeps the most used rows
+CREATE INDEX IF NOT EXISTS idx_query_understanding_usage ON query_understanding (hit_count DESC, last_used_at DESC);
+
+COMMENT ON TABLE query_understanding IS 'Memoized LLM query understanding shared by all matcher instances.';
+
 -- Final notes:
 -- Ensure the database user executing this script has permissions to create extensions and tables.
 -- This consolidated script should be run once to set up the entire database.